@@ -0,0 +1,174 @@
+"""
+OpenSecondDisplay - Adaptive Bitrate Congestion Simulation
+Role: Networking & Performance Engineer
+
+Description:
+    Drives sender/abr.py's AdaptiveController against a simulated link whose
+    capacity collapses (busy Wi-Fi) and later recovers. The sender queue,
+    the receiver's OSD_STATS feedback, GOP-aligned profile switches and the
+    post-restart warmup are modelled in 10ms steps.
+
+    A fixed-bitrate run is simulated alongside for comparison: its queueing
+    delay grows for as long as the congestion lasts ("delay that grows over
+    time" in docs/tuning.md). The ABR run must keep latency under --budget-ms
+    once it has had --settle seconds to react, otherwise the script exits 1.
+
+Usage:
+    python3 bench/abr_sim.py
+    python3 bench/abr_sim.py --congested-mbps 1.5 --budget-ms 800 --output abr.json
+"""
+
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+STEP = 0.01
+FEEDBACK_DELAY = 0.01
+
+
+def capacity_at(t, args):
+    """Link capacity in bits/sec at time t (with +-15% Wi-Fi noise)."""
+    base = args.congested_mbps if args.congest_at <= t < args.recover_at else args.clear_mbps
+    return base * 1e6 * random.uniform(0.85, 1.15)
+
+
+def simulate(abr, config, args, adaptive=True):
+    ladder = abr.load_ladder()
+    clock = {"t": 0.0}
+    controller = abr.AdaptiveController(ladder, abr.start_index(ladder), clock=lambda: clock["t"])
+    profile = controller.profile
+
+    produced = received = 0.0
+    queue = 0.0
+    stale = 0.0                  # bytes of the previous connection still ahead on the link
+    frame = 0.0
+    reports = []                 # (deliver_at, received_total, arrival_bps)
+    report_total = report_bps = None
+    sent_at_report = 0.0
+    last_report = last_sample = 0.0
+    window_received = last_produced = 0.0
+    switch_at = None
+    timeline = []
+    changes = []
+
+    t = 0.0
+    while t < args.duration:
+        clock["t"] = t
+        capacity = capacity_at(t, args)
+
+        # Encoder (worst case: busy content, bitrate fully used)
+        chunk = abr.bitrate_bps(profile.bitrate) / 8 * STEP
+        produced += chunk
+        queue += chunk
+        frame += profile.fps * STEP
+
+        # Link (the previous connection's backlog drains first)
+        budget = capacity / 8 * STEP
+        drained = min(stale, budget)
+        stale -= drained
+        sent = min(queue, budget - drained)
+        queue -= sent
+        received += sent
+        window_received += sent
+        latency_ms = (stale + queue) * 8 / capacity * 1000
+
+        # Receiver feedback
+        if t - last_report >= config.ABR_SAMPLE_INTERVAL:
+            reports.append((t + FEEDBACK_DELAY, received, window_received / (t - last_report)))
+            window_received = 0.0
+            last_report = t
+        while reports and reports[0][0] <= t:
+            _, report_total, report_bps = reports.pop(0)
+            sent_at_report = produced
+
+        # Controller
+        if adaptive:
+            if switch_at is not None and frame >= switch_at - 1:
+                profile = controller.commit()
+                changes.append([round(t, 2), profile.bitrate])
+                switch_at = None
+                frame = 0.0
+                produced = received = sent_at_report = last_produced = 0.0  # new connection, counters restart
+                window_received = 0.0
+                last_report = last_sample = t
+                report_total = report_bps = None
+                reports.clear()
+                # The old connection's backlog is already on its way and still
+                # holds up the link; the receiver only drops it on arrival, so
+                # it stays in the latency but not in the new counters.
+                stale += queue
+                queue = 0.0
+            elif switch_at is None and t - last_sample >= config.ABR_SAMPLE_INTERVAL:
+                have_report = report_total is not None
+                sample = abr.CongestionSample(
+                    backlog_bytes=max(0.0, sent_at_report - report_total) if have_report else None,
+                    arrival_bps=report_bps if have_report else None,
+                    send_bps=(produced - last_produced) / (t - last_sample),
+                    encoder_speed=1.0,
+                )
+                last_sample, last_produced = t, produced
+                if controller.update(sample) is not None:
+                    switch_at = 0 if controller.urgent(sample) else abr.next_keyframe(frame + 1, config.GOP_SIZE)
+
+        timeline.append((t, latency_ms, profile.bitrate))
+        t += STEP
+
+    return controller, timeline, changes
+
+
+def summarize(timeline, args, controller=None, changes=None):
+    def window(start, end):
+        return [lat for t, lat, _ in timeline if start <= t < end]
+
+    settled = window(args.congest_at + args.settle, args.recover_at)
+    result = {
+        "max_latency_ms": round(max(lat for _, lat, _ in timeline), 1),
+        "congested_settled_latency_ms": common.summarize(settled, 1),
+        "final_latency_ms": round(timeline[-1][1], 1),
+    }
+    if controller:
+        result["profile_changes"] = changes
+        result["final_profile"] = controller.profile._asdict()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated congestion test for the ABR controller")
+    parser.add_argument("--duration", type=float, default=90.0)
+    parser.add_argument("--clear-mbps", type=float, default=12.0)
+    parser.add_argument("--congested-mbps", type=float, default=2.5)
+    parser.add_argument("--congest-at", type=float, default=15.0)
+    parser.add_argument("--recover-at", type=float, default=50.0)
+    parser.add_argument("--settle", type=float, default=8.0, help="Seconds the controller gets to react")
+    parser.add_argument("--budget-ms", type=float, default=500.0, help="Max settled latency under congestion")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    sender = common.load_side("sender", "abr")
+    sender.config.BITRATE = sender.config.ABR_LADDER[0][0]  # start at the top of the ladder
+
+    random.seed(args.seed)
+    controller, adaptive, changes = simulate(sender.abr, sender.config, args, adaptive=True)
+    random.seed(args.seed)
+    _, fixed, _ = simulate(sender.abr, sender.config, args, adaptive=False)
+
+    result = {
+        "link": {"clear_mbps": args.clear_mbps, "congested_mbps": args.congested_mbps,
+                 "congested_s": [args.congest_at, args.recover_at]},
+        "adaptive": summarize(adaptive, args, controller, changes),
+        "fixed_bitrate": summarize(fixed, args),
+        "budget_ms": args.budget_ms,
+    }
+    settled_max = result["adaptive"]["congested_settled_latency_ms"].get("max", 0)
+    result["passed"] = settled_max <= args.budget_ms and result["adaptive"]["final_latency_ms"] <= args.budget_ms
+    common.write_result(result, args.output)
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+OpenSecondDisplay - Benchmark Helpers
+Role: Networking & Performance Engineer
+
+Description:
+    Shared plumbing for the scripts in bench/: importing sender and receiver
+    modules into one process (both sides have their own `config` module),
+    config overrides from the command line, percentiles and JSON output.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIDES = ("sender", "receiver")
+
+
+def load_side(side, *modules):
+    """Imports modules from sender/ or receiver/ against that side's config.py.
+
+    Returns a namespace with the imported modules (plus `config`). The modules
+    are removed from sys.modules again so the other side can be loaded next;
+    they keep working because they hold references to their own imports.
+    """
+    side_dir = os.path.join(ROOT, side)
+
+    def from_side(module):
+        path = getattr(module, "__file__", None) or ""
+        return os.path.dirname(os.path.abspath(path)) in [os.path.join(ROOT, s) for s in SIDES]
+
+    stale = [name for name, module in sys.modules.items() if from_side(module)]
+    for name in stale:
+        del sys.modules[name]
+
+    sys.path.insert(0, side_dir)
+    try:
+        loaded = {name: __import__(name) for name in ("config",) + modules}
+    finally:
+        sys.path.remove(side_dir)
+        for name, module in list(sys.modules.items()):
+            if from_side(module):
+                del sys.modules[name]
+    return types.SimpleNamespace(**loaded)
+
+
+def apply_overrides(config, overrides):
+    """Applies KEY=VALUE strings (e.g. "BITRATE=2000k") to a config module."""
+    for item in overrides or []:
+        key, _, value = item.partition("=")
+        if not hasattr(config, key):
+            raise SystemExit(f"Unknown config key: {key}")
+        current = getattr(config, key)
+        if value.lower() == "none":
+            value = None
+        elif isinstance(current, bool):
+            value = value.lower() in ("1", "true", "yes", "on")
+        elif isinstance(current, int):
+            value = int(value)
+        elif isinstance(current, float):
+            value = float(value)
+        setattr(config, key, value)
+
+
+def config_snapshot(config, keys):
+    return {key: getattr(config, key, None) for key in keys}
+
+
+def free_port(kind=socket.SOCK_STREAM):
+    sock = socket.socket(socket.AF_INET, kind)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(values, digits=2):
+    """p50/p95/p99/mean/max of a list of numbers."""
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), digits),
+        "p95": round(percentile(values, 95), digits),
+        "p99": round(percentile(values, 99), digits),
+        "mean": round(sum(values) / len(values), digits),
+        "max": round(values[-1], digits),
+    }
+
+
+class ByteSink:
+    """Loopback TCP listener that counts and discards what it receives."""
+
+    def __init__(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        self.received = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        conn, _ = self.listener.accept()
+        buffer = bytearray(65536)
+        while True:
+            n = conn.recv_into(buffer)
+            if not n:
+                break
+            self.received += n
+        conn.close()
+        self.listener.close()
+
+
+def stop_process(process, timeout=5):
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def write_result(result, path=None):
+    """Prints the result as JSON and optionally writes it to path."""
+    text = json.dumps(result, indent=2)
+    print(text)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
@@ -0,0 +1,99 @@
+"""
+OpenSecondDisplay - Control API Check
+Role: Networking & Performance Engineer
+
+Description:
+    Posts good and bad requests to sender/control.py's POST /settings and
+    checks the status codes: values that would break the running sender (a
+    zero bitrate, booleans for fps or gop), malformed Content-Length headers,
+    wrong content types and cross-origin requests must be refused before they
+    reach apply(). The server runs on a free localhost port with stub
+    status()/apply() callbacks, so no capture or encoder is started. Exits 1
+    if any request gets an unexpected answer.
+
+Usage:
+    python3 bench/control.py
+    python3 bench/control.py --output control.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+JSON = {"Content-Type": "application/json"}
+
+# (name, body, headers, expected status)
+CASES = [
+    ("bitrate", b'{"bitrate": "2500k"}', JSON, 200),
+    ("fps and gop", b'{"fps": 60, "gop": 120}', JSON, 200),
+    ("native resolution", b'{"resolution": "native"}', JSON, 200),
+    ("zero bitrate", b'{"bitrate": "0k"}', JSON, 400),
+    ("zero bitrate, no unit", b'{"bitrate": "0"}', JSON, 400),
+    ("zero bitrate in Mbit/s", b'{"bitrate": "0M"}', JSON, 400),
+    ("bitrate below 1 bit/s", b'{"bitrate": "0.5"}', JSON, 400),
+    ("boolean fps with zero bitrate", b'{"fps": true, "bitrate": "0k"}', JSON, 400),
+    ("boolean fps", b'{"fps": true}', JSON, 400),
+    ("boolean gop", b'{"gop": true}', JSON, 400),
+    ("odd resolution", b'{"resolution": "1921:1080"}', JSON, 400),
+    ("unknown setting", b'{"quality": 1}', JSON, 400),
+    ("not JSON", b"fps=60", JSON, 400),
+    ("text/plain", b'{"fps": 60}', {"Content-Type": "text/plain"}, 415),
+    ("cross-origin", b'{"fps": 60}', dict(JSON, Origin="http://example.com"), 403),
+    ("bad Content-Length", b'{"fps": 60}', dict(JSON, **{"Content-Length": "abc"}), 400),
+    ("negative Content-Length", b'{"fps": 60}', dict(JSON, **{"Content-Length": "-1"}), 400),
+    ("oversized body", b'{"fps": 60}', dict(JSON, **{"Content-Length": "100000"}), 413),
+]
+
+
+def post(port, body, headers):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.request("POST", "/settings", body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        return None, {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Status codes of the control API for good and bad requests")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    side = common.load_side("sender", "control")
+    applied = []
+
+    def apply(changes):
+        applied.append(changes)
+        return {"applied": changes}
+
+    server = side.control.ControlServer(lambda: {}, apply, ("127.0.0.1", common.free_port()))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    results = []
+    try:
+        for name, body, headers, expected in CASES:
+            before = len(applied)
+            status, reply = post(server.server_address[1], body, headers)
+            reached_apply = len(applied) > before
+            ok = status == expected and reached_apply == (expected == 200)
+            results.append({"case": name, "status": status, "expected": expected, "ok": ok,
+                            "reply": reply})
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    failed = [r["case"] for r in results if not r["ok"]]
+    common.write_result({"cases": results, "failed": failed, "passed": not failed}, args.output)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
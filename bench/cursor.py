@@ -0,0 +1,99 @@
+"""
+OpenSecondDisplay - Cursor Latency Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Pointer latency with the cursor drawn into the video (the default) and
+    with the cursor channel (CURSOR_CHANNEL, cursor.py), measured in one
+    run so the channel competes with a live video stream:
+
+      video   - bench/latency.py's barcode clip through the real encode and
+                decode settings; a pointer movement additionally waits for
+                the next captured frame (0 .. 1/FPS)
+      channel - sender/cursor.py's CursorSender with a synthetic pointer at
+                CURSOR_RATE to the receiver's CursorListener over loopback;
+                a movement waits for the next poll (0 .. 1/CURSOR_RATE)
+
+    Both end when the receiver has the new position (decoded frame / parsed
+    datagram); drawing it and the display refresh come on top for either
+    mode. The wait for the next capture or poll is spread evenly over its
+    interval (a movement can start at any moment).
+
+Usage:
+    python3 bench/cursor.py
+    python3 bench/cursor.py --duration 20 --set FPS=60 --set CURSOR_RATE=120 --output cursor.json
+
+Dependencies:
+    - ffmpeg with libx264 and lavfi (Linux host)
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+import latency
+
+GOLDEN = 0.6180339887498949  # spreads the k-th movement over the interval without clustering
+
+
+def with_wait(samples_ms, interval_s):
+    """samples plus the wait for the next capture/poll, evenly spread over interval_s."""
+    return [ms + (k * GOLDEN % 1.0) * interval_s * 1000 for k, ms in enumerate(samples_ms)]
+
+
+def main():
+    args = latency.build_arg_parser("Pointer latency: drawn into the video vs the cursor channel").parse_args()
+    sender = common.load_side("sender", "sender", "cursor")
+    receiver = common.load_side("receiver", "receiver", "cursor")
+    common.apply_overrides(sender.config, args.set)
+    width, height = latency.parse_size(args.source_size)
+
+    arrivals = []  # (receive time us, network ms)
+    port = common.free_port()
+    listener = receiver.cursor.CursorListener(
+        port, "127.0.0.1",
+        on_position=lambda position, now_us: arrivals.append((now_us, (now_us - position["sent_us"]) / 1000)))
+    threading.Thread(target=listener.run, daemon=True).start()
+    pointer = sender.cursor.SyntheticPointer(width, height)
+    cursor_sender = sender.cursor.CursorSender(pointer, [("127.0.0.1", port)], (width, height)).start()
+    started = time.perf_counter()
+    started_us = time.time_ns() // 1000
+    try:
+        video = latency.run_benchmark(sender.sender, receiver.receiver, args.duration, args.warmup,
+                                      (width, height), keep_samples=True)
+    finally:
+        cursor_sender.close()
+        listener.close()
+    elapsed = time.perf_counter() - started
+
+    network = [ms for now_us, ms in arrivals if now_us - started_us >= args.warmup * 1e6]
+    frames = video.pop("latency_samples_ms")
+    fps = int(sender.config.FPS)
+    video_cursor = common.summarize(with_wait(frames, 1 / fps))
+    channel_cursor = common.summarize(with_wait(network, 1 / sender.config.CURSOR_RATE), 3)
+    common.write_result({
+        "sender_config": common.config_snapshot(sender.config, latency.SENDER_KEYS + ("CURSOR_RATE",)),
+        "video": {
+            "frame_latency_ms": video["latency_ms"],
+            "cursor_latency_ms": video_cursor,
+            "frames_received": video["frames_received"],
+            "dropped_frames": video["dropped_frames"],
+        },
+        "channel": {
+            "network_ms": common.summarize(network, 3),
+            "cursor_latency_ms": channel_cursor,
+            "updates": listener.received,
+            "out_of_order": listener.stale,
+            "updates_per_s": round(cursor_sender.sent / elapsed, 1),
+            "bytes_per_s": round(cursor_sender.sent * sender.cursor.cursorwire.POSITION.size / elapsed),
+        },
+        "p50_saved_ms": round(video_cursor["p50"] - channel_cursor["p50"], 1)
+        if video_cursor.get("p50") is not None and channel_cursor.get("p50") is not None else None,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+OpenSecondDisplay - Frame Gate Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Streams a synthetic "desktop" that alternates static and moving segments
+    (a frozen testsrc2 background with a moving window on top for
+    --moving-pct of every --period seconds) through sender.start_stream() twice: once as a
+    constant frame rate stream and once behind the frame gate (FRAME_GATE).
+    The stream goes to a loopback TCP sink that only counts bytes.
+
+    Reports, per run: CPU seconds of each FFmpeg process (and of the gate
+    itself), bytes sent, and for the gated run how many frames were captured,
+    sent and skipped. Rendering testsrc2 costs far more than a real screen
+    grab, so the source is also rendered once on its own and its CPU time is
+    subtracted before computing cpu_saved_pct.
+
+Usage:
+    python3 bench/framegate.py
+    python3 bench/framegate.py --duration 30 --period 10 --set PRESET=veryfast --output gate.json
+"""
+
+import argparse
+import os
+import resource
+import sys
+import subprocess
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+
+def alternating_input_args(width, height, fps, duration, period, moving_pct):
+    """lavfi desktop: moving for the first moving_pct% of every `period` seconds, then static."""
+    window_w, window_h = width // 3 // 2 * 2, height // 3 // 2 * 2
+    graph = (
+        f"testsrc2=size={width}x{height}:rate={fps},loop=loop=-1:size=1[desktop];"
+        f"testsrc2=size={window_w}x{window_h}:rate={fps}[window];"
+        f"[desktop][window]overlay=x={width // 3}:y={height // 3}:enable='lt(mod(t,{period}),{period * moving_pct / 100:g})'"
+    )
+    return ["-re", "-t", str(duration), "-f", "lavfi", "-i", graph]
+
+
+def wait_with_usage(process):
+    """Reaps process and returns the CPU seconds it used."""
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return usage.ru_utime + usage.ru_stime
+
+
+def cpu_seconds(before, after):
+    return (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+
+
+def measure_source(sender, input_args):
+    """CPU seconds spent just rendering (and scaling) the synthetic source."""
+    process = subprocess.Popen(sender.build_capture_command(input_args) + ["-loglevel", "error"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return wait_with_usage(process)
+
+
+def run_once(sender, input_args, gated):
+    sender.config.FRAME_GATE = gated
+    sink = common.ByteSink()
+    sender.config.RECEIVER_IP = "127.0.0.1"
+    sender.config.RECEIVER_PORT = sink.port
+    sender.config.TRANSPORT = "tcp"
+
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.monotonic()
+    process = sender.start_stream(input_args=input_args)
+    if process is None:
+        raise SystemExit("capture failed to start")
+    cpu = {"encoder": wait_with_usage(process)}
+    if gated:
+        sender.frame_gate.thread.join(timeout=5)  # reaps the capture process
+        # The capture is the only other child; the gate runs in this process
+        # (the byte sink's share of it is negligible).
+        cpu["capture"] = cpu_seconds(children_before, resource.getrusage(resource.RUSAGE_CHILDREN)) - cpu["encoder"]
+        cpu["gate"] = cpu_seconds(self_before, resource.getrusage(resource.RUSAGE_SELF))
+    sink.thread.join(timeout=5)
+    elapsed = time.monotonic() - started
+
+    result = {
+        "frame_gate": gated,
+        "exit_code": process.returncode,
+        "wall_s": round(elapsed, 2),
+        "cpu_s": {name: round(seconds, 2) for name, seconds in cpu.items()},
+        "cpu_total_s": round(sum(cpu.values()), 2),
+        "bytes_sent": sink.received,
+        "mbps": round(sink.received * 8 / elapsed / 1e6, 3),
+    }
+    if gated:
+        result["frames"] = sender.frame_gate.stats()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU and bandwidth with and without the frame gate")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of video per run")
+    parser.add_argument("--period", type=float, default=10.0, help="Seconds per moving+static cycle")
+    parser.add_argument("--moving-pct", type=float, default=20.0, help="Share of each cycle with motion")
+    parser.add_argument("--source-size", default="1280x720", help="Synthetic desktop size (WxH)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a sender config value, e.g. --set IDLE_FPS=2")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    width, height = (int(x) for x in args.source_size.lower().split("x"))
+    sender = common.load_side("sender", "sender")
+    common.apply_overrides(sender.config, args.set)
+    input_args = alternating_input_args(width, height, sender.config.FPS, args.duration, args.period,
+                                        args.moving_pct)
+
+    source_cpu = measure_source(sender.sender, input_args)
+    runs = [run_once(sender.sender, input_args, gated) for gated in (False, True)]
+    constant, gated = runs
+    for run in runs:
+        run["cpu_without_source_s"] = round(max(0.0, run["cpu_total_s"] - source_cpu), 2)
+    result = {
+        "source": {"size": args.source_size, "fps": sender.config.FPS,
+                   "duration_s": args.duration, "period_s": args.period, "moving_pct": args.moving_pct},
+        "config": common.config_snapshot(sender.config, [
+            "SCALING_RESOLUTION", "BITRATE", "IDLE_FPS", "FRAME_GATE_TILE",
+            "FRAME_GATE_THRESHOLD", "FRAME_GATE_MIN_TILES"]),
+        "runs": runs,
+        "source_cpu_s": round(source_cpu, 2),
+        "cpu_saved_pct": round(100 * (1 - gated["cpu_without_source_s"] / constant["cpu_without_source_s"]), 1)
+        if constant["cpu_without_source_s"] else None,
+        "bytes_saved_pct": round(100 * (1 - gated["bytes_sent"] / constant["bytes_sent"]), 1)
+        if constant["bytes_sent"] else None,
+    }
+    common.write_result(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
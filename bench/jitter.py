@@ -0,0 +1,185 @@
+"""
+OpenSecondDisplay - Jitter Buffer Simulation
+Role: Networking & Performance Engineer
+
+Description:
+    Feeds a synthetic stream (one small PES per frame, with PTS/DTS) through
+    receiver/catchup.py and receiver/jitterbuffer.py on a simulated clock.
+    Frames leave the sender every 1/--fps seconds and arrive after a base
+    delay plus Gaussian jitter and occasional spikes (Wi-Fi retries); TCP
+    keeps them in order, so a spike also delays the frames behind it.
+
+    A frame is shown at the first display refresh after the next frame's
+    first packet reached the decoder (see jitterbuffer.py). Every run is
+    scored from those display times alone:
+
+      latency_ms  - capture to display
+      gap_std_ms  - spread of the time between displayed frames (judder)
+      irregular   - share of frames not shown for their nominal number of
+                    refreshes
+      repeated    - refreshes a frame stayed up beyond its nominal share
+      dropped     - frames replaced in the same refresh (never seen)
+
+    "off" hands frames to the decoder as they arrive (the default). The
+    other runs use JITTER_BUFFER with JITTER_MAX_FRAMES set to each of
+    --max-frames; the pacer's own counters are included.
+
+Usage:
+    python3 bench/jitter.py
+    python3 bench/jitter.py --fps 30 --refresh 60 --jitter-ms 8 --max-frames 2 3 4 --output jitter.json
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+VIDEO_PID = 0x100
+PACKETS_PER_FRAME = 4
+
+
+def pes_timestamp(prefix, ts):
+    return bytes([(prefix << 4) | ((ts >> 29) & 0x0E) | 1, (ts >> 22) & 0xFF, ((ts >> 14) & 0xFE) | 1,
+                  (ts >> 7) & 0xFF, ((ts << 1) & 0xFE) | 1])
+
+
+def frame_packets(ts, cc):
+    """A frame: a PES start with PTS = DTS = ts, then continuation packets."""
+    out = bytearray()
+    pes = b"\x00\x00\x01\xe0\x00\x00\x80\xc0\x0a" + pes_timestamp(3, ts) + pes_timestamp(1, ts)
+    for i in range(PACKETS_PER_FRAME):
+        head = bytes([0x47, (0x40 if i == 0 else 0) | (VIDEO_PID >> 8), VIDEO_PID & 0xFF, 0x10 | cc])
+        body = pes if i == 0 else b""
+        out += head + body + b"\x00" * (184 - len(body))
+        cc = (cc + 1) & 0x0F
+    return bytes(out), cc
+
+
+def arrivals(args):
+    """(arrival time, capture time) of every frame."""
+    rng = random.Random(args.seed)
+    result = []
+    last = 0.0
+    for k in range(int(args.duration * args.fps)):
+        captured = k / args.fps
+        delay = args.base_ms + abs(rng.gauss(0, args.jitter_ms))
+        if rng.random() < args.spike_rate:
+            delay += rng.uniform(0.5, 1.0) * args.spike_ms
+        last = max(last, captured + delay / 1000)
+        result.append((last, captured))
+    return result
+
+
+def simulate(receiver, frames, args, paced):
+    clock = {"t": 0.0}
+    queue = receiver.catchup.CatchUp(max_frames=10**6, max_bytes=1 << 30, clock=lambda: clock["t"])
+    pacer = receiver.jitterbuffer.FramePacer(args.refresh, clock=lambda: clock["t"]) if paced else None
+    header = receiver.mpegts.synthetic_stream(0, VIDEO_PID)
+    queue.push(header)
+    starts = []  # (time, dts) a frame's first packet reached the decoder
+
+    def started(dts):
+        starts.append((clock["t"], dts))
+        if pacer:
+            pacer.started(dts)
+
+    r, w = os.pipe()
+    os.set_blocking(r, False)
+    os.set_blocking(w, False)
+    cc = 0
+    i = 0
+    try:
+        while i < len(frames) or (pacer and pacer.wakeup is not None):
+            next_arrival = frames[i][0] if i < len(frames) else math.inf
+            wakeup = pacer.wakeup if pacer and pacer.wakeup is not None else math.inf
+            clock["t"] = min(next_arrival, wakeup)
+            if next_arrival <= clock["t"]:
+                data, cc = frame_packets(round(frames[i][1] * 90_000), cc)
+                events = queue.push(data)
+                if pacer:
+                    pacer.arrived(memoryview(data), events)
+                i += 1
+            limit = pacer.write_limit(queue.frames) if pacer else None
+            while True:
+                queue.write_to(w, limit, started)
+                drain(r)  # the "decoder" reads everything at once
+                if not queue.has_pending(limit):
+                    break
+    finally:
+        os.close(r)
+        os.close(w)
+    return starts, pacer
+
+
+def drain(fd):
+    try:
+        while os.read(fd, 1 << 16):
+            pass
+    except BlockingIOError:
+        pass
+
+
+def score(starts, frames, args):
+    refresh = 1 / args.refresh
+    captured = {round(c * 90_000): c for _, c in frames}
+    # A frame is shown at the first refresh after the next frame started.
+    shown = [(math.ceil(t_next / refresh - 1e-9) * refresh, captured[dts])
+             for (_, dts), (t_next, _) in zip(starts, starts[1:])]
+    nominal = max(1, round(args.refresh / args.fps))
+    gaps = [b[0] - a[0] for a, b in zip(shown, shown[1:])]
+    slots = [round(g / refresh) for g in gaps]
+    return {
+        "frames_shown": len(shown),
+        "latency_ms": common.summarize([(t - c) * 1000 for t, c in shown], 1),
+        "gap_std_ms": round(_std(gaps) * 1000, 2) if gaps else None,
+        "irregular_pct": round(100 * sum(s != nominal for s in slots) / len(slots), 2) if slots else None,
+        "repeated": sum(max(0, s - nominal) for s in slots),
+        "dropped": sum(s == 0 for s in slots),
+    }
+
+
+def _std(values):
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated arrival jitter with and without the jitter buffer")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--refresh", type=float, default=60.0, help="Display refresh rate (Hz)")
+    parser.add_argument("--base-ms", type=float, default=3.0)
+    parser.add_argument("--jitter-ms", type=float, default=4.0, help="Gaussian jitter (sigma)")
+    parser.add_argument("--spike-ms", type=float, default=40.0)
+    parser.add_argument("--spike-rate", type=float, default=0.01, help="Share of frames hit by a spike")
+    parser.add_argument("--max-frames", type=float, nargs="+", default=[2.0, 3.0])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", help="receiver config override")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    receiver = common.load_side("receiver", "catchup", "jitterbuffer", "mpegts")
+    common.apply_overrides(receiver.config, args.set)
+    frames = arrivals(args)
+    starts, _ = simulate(receiver, frames, args, paced=False)
+    runs = {"off": score(starts, frames, args)}
+    for max_frames in args.max_frames:
+        receiver.config.JITTER_MAX_FRAMES = max_frames
+        starts, pacer = simulate(receiver, frames, args, paced=True)
+        runs[f"max_{max_frames:g}_frames"] = dict(score(starts, frames, args), pacer=pacer.stats())
+
+    common.write_result({
+        "network": {"fps": args.fps, "refresh_hz": args.refresh, "base_ms": args.base_ms,
+                    "jitter_ms": args.jitter_ms, "spike_ms": args.spike_ms, "spike_rate": args.spike_rate},
+        "receiver_config": common.config_snapshot(receiver.config, (
+            "JITTER_MIN_FRAMES", "JITTER_QUANTILE", "JITTER_WINDOW", "JITTER_SHRINK")),
+        "runs": runs,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+OpenSecondDisplay - Glass-to-Glass Latency Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Replaces the stopwatch photo in docs/tuning.md with numbers a regression
+    suite can compare. A lavfi testsrc2 clip is pushed through the real
+    sender.build_ffmpeg_command() encode settings with each frame's sequence
+    number burned in as a barcode strip. The receive side decodes over
+    loopback with the receiver's low-latency input flags to rawvideo, reads
+    the barcode back and matches it against the moment the frame was handed
+    to the encoder.
+
+    Reports p50/p95/p99 latency, throughput and dropped frames as JSON.
+
+Usage:
+    python3 bench/latency.py
+    python3 bench/latency.py --duration 20 --set PRESET=veryfast --set BITRATE=2000k
+    python3 bench/latency.py --source-size 1920x1080 --output result.json
+
+Dependencies:
+    - ffmpeg with libx264 and lavfi (Linux host)
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+# Barcode layout: ID_BITS of frame id + CHECK_BITS of popcount, one block each,
+# with a one-block margin on both sides.
+ID_BITS = 20
+CHECK_BITS = 4
+BARCODE_BITS = ID_BITS + CHECK_BITS
+LEVEL_ONE = 235
+LEVEL_ZERO = 16
+
+SOURCE_LOOP_FRAMES = 30
+
+SENDER_KEYS = ("SCALING_RESOLUTION", "FPS", "PRESET", "TUNE", "BITRATE", "GOP_SIZE", "TRANSPORT")
+
+# A gap between two received frames longer than this many frame intervals is a stall.
+STALL_FRAMES = 3
+
+
+def parse_size(text):
+    width, height = text.replace("x", ":").split(":")
+    return int(width), int(height)
+
+
+def barcode_value(frame_id):
+    frame_id &= (1 << ID_BITS) - 1
+    return frame_id | ((bin(frame_id).count("1") & 0xF) << ID_BITS)
+
+
+class Barcode:
+    """Burns a frame id into the top-left of the luma plane and reads it back."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.block_w = width // (BARCODE_BITS + 2)
+        self.block_h = max(8, height // 18)
+        self.one = bytes([LEVEL_ONE]) * self.block_w
+        self.zero = bytes([LEVEL_ZERO]) * self.block_w
+
+    def stamp(self, frame, frame_id):
+        value = barcode_value(frame_id)
+        row = b"".join(self.one if value >> bit & 1 else self.zero for bit in range(BARCODE_BITS))
+        for y in range(self.block_h):
+            start = y * self.width + self.block_w
+            frame[start:start + len(row)] = row
+
+    def read(self, luma, width, height):
+        """Returns the frame id from a (possibly rescaled) luma plane, or None."""
+        sx = width / self.width
+        y = int(self.block_h / 2 * height / self.height)
+        value = 0
+        for bit in range(BARCODE_BITS):
+            x = int((self.block_w * (bit + 1.5)) * sx)
+            if luma[y * width + x] > 128:
+                value |= 1 << bit
+        frame_id = value & ((1 << ID_BITS) - 1)
+        if barcode_value(frame_id) != value:
+            return None
+        return frame_id
+
+
+def read_exact(stream, view):
+    """Fills view from stream. Returns False on EOF."""
+    got = 0
+    while got < len(view):
+        n = stream.readinto(view[got:])
+        if not n:
+            return False
+        got += n
+    return True
+
+
+def load_source_frames(width, height, fps, count=SOURCE_LOOP_FRAMES):
+    """Renders a short testsrc2 loop to raw yuv420p frames in memory."""
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}",
+        "-frames:v", str(count),
+        "-f", "rawvideo", "-pix_fmt", "yuv420p", "pipe:1",
+    ]
+    data = subprocess.run(cmd, stdout=subprocess.PIPE, check=True).stdout
+    frame_size = width * height * 3 // 2
+    return [data[i:i + frame_size] for i in range(0, len(data), frame_size)]
+
+
+def synthetic_input_args(width, height, fps):
+    return [
+        "-f", "rawvideo",
+        "-pix_fmt", "yuv420p",
+        "-video_size", f"{width}x{height}",
+        "-framerate", str(fps),
+        "-i", "pipe:0",
+    ]
+
+
+def run_benchmark(sender, receiver, duration=10.0, warmup=1.0, source_size=(1920, 1080),
+                  receiver_url=None, receiver_port=None, sender_port=None, keep_samples=False):
+    """Runs one sender -> loopback -> receiver pass and returns the result dict.
+
+    Both ends use sender.config.TRANSPORT. sender_port lets a proxy sit in
+    between (default: the sender talks straight to the receiver port).
+    keep_samples adds the per-frame latencies (latency_samples_ms) and
+    [send time (time.monotonic() clock), latency ms] per frame in frame order
+    (latency_timeline).
+    """
+    fps = int(sender.config.FPS)
+    width, height = source_size
+    if sender.config.SCALING_RESOLUTION:
+        out_w, out_h = parse_size(sender.config.SCALING_RESOLUTION)
+    else:
+        out_w, out_h = width, height
+
+    receiver_port = receiver_port or common.free_port()
+    sender.config.RECEIVER_IP = "127.0.0.1"
+    sender.config.RECEIVER_PORT = sender_port or receiver_port
+    receiver.config.LISTEN_IP = "127.0.0.1"
+    receiver.config.TRANSPORT = sender.config.TRANSPORT
+    if receiver_url is None:
+        receiver_url = receiver.build_input_url(receiver_port)
+
+    frames = load_source_frames(width, height, fps)
+    barcode = Barcode(width, height)
+    total = int(duration * fps)
+    send_times = [None] * total
+    recv = {"times": {}, "unreadable": 0, "first": None, "last": None, "gaps": []}
+    progress = {"total_size": 0}
+
+    decoder = subprocess.Popen(receiver.build_raw_decoder_command(receiver_url, "gray"), stdout=subprocess.PIPE)
+
+    def receive():
+        frame = bytearray(out_w * out_h)
+        view = memoryview(frame)
+        while read_exact(decoder.stdout, view):
+            now = time.perf_counter()
+            frame_id = barcode.read(frame, out_w, out_h)
+            if frame_id is None or frame_id >= total or frame_id in recv["times"]:
+                recv["unreadable"] += 1
+                continue
+            recv["times"][frame_id] = now
+            if recv["last"] is not None:
+                recv["gaps"].append(now - recv["last"])
+            recv["first"] = recv["first"] or now
+            recv["last"] = now
+
+    receive_thread = threading.Thread(target=receive, daemon=True)
+    receive_thread.start()
+    time.sleep(0.5)  # let the decoder start listening
+
+    cmd = sender.build_ffmpeg_command(input_args=synthetic_input_args(width, height, fps))
+    cmd[1:1] = ["-hide_banner", "-loglevel", "error", "-nostats", "-progress", "pipe:1"]
+    encoder = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def read_progress():
+        for line in encoder.stdout:
+            key, _, value = line.decode(errors="replace").strip().partition("=")
+            if key == "total_size" and value.isdigit():
+                progress["total_size"] = int(value)
+
+    threading.Thread(target=read_progress, daemon=True).start()
+
+    work = bytearray(len(frames[0]))
+    start = time.perf_counter()
+    try:
+        for frame_id in range(total):
+            delay = start + frame_id / fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            work[:] = frames[frame_id % len(frames)]
+            barcode.stamp(work, frame_id)
+            send_times[frame_id] = time.perf_counter()
+            encoder.stdin.write(work)
+        encoder.stdin.close()
+    except BrokenPipeError:
+        pass
+    elapsed = time.perf_counter() - start
+
+    try:
+        encoder.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        pass
+    receive_thread.join(timeout=10)
+    common.stop_process(encoder)
+    common.stop_process(decoder)
+
+    skip = int(warmup * fps)
+    latencies = [
+        (t - send_times[i]) * 1000
+        for i, t in recv["times"].items()
+        if i >= skip and send_times[i] is not None
+    ]
+    received = len(recv["times"])
+    # Frames lost before the decoder produced its first picture are startup
+    # cost (probing, waiting for an IDR), not drops.
+    first_id = min(recv["times"]) if received else total
+    recv_span = (recv["last"] - recv["first"]) if received > 1 else 0
+    stalls = [gap for gap in recv["gaps"] if gap > STALL_FRAMES / fps]
+    result = {
+        "sender_config": common.config_snapshot(sender.config, SENDER_KEYS),
+        "source_size": f"{width}x{height}",
+        "output_size": f"{out_w}x{out_h}",
+        "duration_s": round(elapsed, 3),
+        "frames_sent": total,
+        "frames_received": received,
+        "startup_frames": first_id,
+        "dropped_frames": total - first_id - received,
+        "unreadable_frames": recv["unreadable"],
+        "stalls": len(stalls),
+        "stall_time_ms": round(sum(stalls) * 1000, 1),
+        "latency_ms": common.summarize(latencies),
+        "throughput": {
+            "fps": round((received - 1) / recv_span, 2) if recv_span else 0,
+            "mbps": round(progress["total_size"] * 8 / elapsed / 1e6, 3) if elapsed else 0,
+        },
+    }
+    if keep_samples:
+        result["latency_samples_ms"] = latencies
+        to_monotonic = time.monotonic() - time.perf_counter()
+        result["latency_timeline"] = [
+            [send_times[i] + to_monotonic, (t - send_times[i]) * 1000]
+            for i, t in sorted(recv["times"].items()) if send_times[i] is not None
+        ]
+    return result
+
+
+def build_arg_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of video to send")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Seconds excluded from latency stats")
+    parser.add_argument("--source-size", default="1920x1080", help="Synthetic capture size (WxH)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a sender/config.py value (repeatable)")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    return parser
+
+
+def main():
+    args = build_arg_parser("Glass-to-glass latency benchmark over loopback").parse_args()
+    sender = common.load_side("sender", "sender")
+    receiver = common.load_side("receiver", "receiver")
+    common.apply_overrides(sender.config, args.set)
+    result = run_benchmark(sender.sender, receiver.receiver, args.duration, args.warmup, parse_size(args.source_size))
+    common.write_result(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+OpenSecondDisplay - Multi-Stream Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Runs 1..--max-streams synthetic streams at once through multistream.py
+    (one real sender process per stream, each with its own encoder) into
+    loopback sinks, with the capture running flat out (SYNTHETIC_REALTIME =
+    False) so every encoder goes as fast as its CPU share allows.
+
+    For each stream count it reports the aggregate and per-stream encode
+    rate (frames and Mbps over the measurement window, after --warmup) and
+    the scaling efficiency: aggregate fps / (streams * single-stream fps).
+    Run it with --affinity auto (pinned) and --affinity none to compare
+    pinning against letting the scheduler place the encoders.
+
+Usage:
+    python3 bench/multistream.py
+    python3 bench/multistream.py --max-streams 4 --duration 10 --affinity none --output multi.json
+"""
+
+import argparse
+import os
+import socket
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+START_TIMEOUT = 20.0  # seconds for every stream to report encoded frames
+
+
+def typed_overrides(config, items):
+    """--set KEY=VALUE items converted like common.apply_overrides() does for a config module."""
+    keys = [item.partition("=")[0] for item in items]
+    values = types.SimpleNamespace(**{key: getattr(config, key) for key in keys if hasattr(config, key)})
+    common.apply_overrides(values, items)
+    return vars(values)
+
+
+def stream_overrides(sink, args, extra):
+    overrides = {
+        "RECEIVER_IP": "127.0.0.1",
+        "RECEIVER_PORT": sink.port,
+        "TRANSPORT": "tcp",
+        "FEEDBACK_PORT": common.free_port(socket.SOCK_DGRAM),
+        "CONTROL_PORT": common.free_port(),
+        "CAPTURE_BACKEND": "synthetic",
+        "SYNTHETIC_SIZE": args.source_size,
+        "SYNTHETIC_REALTIME": False,
+        "SCALING_RESOLUTION": None,
+        "ADAPTIVE_BITRATE": False,
+        "TELEMETRY_PRINT": False,
+        "RECONNECT": False,
+    }
+    overrides.update(extra)
+    return overrides
+
+
+def frames(multi):
+    return [(row["frame"] or 0) for row in multi.poll()]
+
+
+def run_count(side, count, args, extra):
+    sinks = [common.ByteSink() for _ in range(count)]
+    affinity = {"auto": "auto", "none": []}[args.affinity]
+    multi = side.multistream.MultiStream([stream_overrides(sink, args, extra) for sink in sinks],
+                                         affinity=affinity, echo=args.verbose)
+    multi.start()
+    try:
+        deadline = time.monotonic() + START_TIMEOUT
+        while not all(frames(multi)):
+            if time.monotonic() > deadline or not multi.running():
+                raise SystemExit(f"{count} streams: not every stream started encoding")
+            time.sleep(0.2)
+        time.sleep(args.warmup)
+        start, start_bytes = time.monotonic(), [sink.received for sink in sinks]
+        first = frames(multi)
+        time.sleep(args.duration)
+        last = frames(multi)
+        elapsed = time.monotonic() - start
+        sent = [sink.received - before for sink, before in zip(sinks, start_bytes)]
+    finally:
+        multi.stop()
+    per_stream = [(b - a) / elapsed for a, b in zip(first, last)]
+    return {
+        "streams": count,
+        "cores": [stream.cores for stream in multi.streams],
+        "encoder_threads": [stream.settings["ENCODER_THREADS"] for stream in multi.streams],
+        "aggregate_fps": round(sum(per_stream), 1),
+        "per_stream_fps": [round(fps, 1) for fps in per_stream],
+        "aggregate_mbps": round(sum(sent) * 8 / elapsed / 1e6, 1),
+        "min_stream_fps": round(min(per_stream), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate encode throughput of 1..N parallel streams")
+    parser.add_argument("--max-streams", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=6.0, help="Measured seconds per stream count")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of encoding before measuring")
+    parser.add_argument("--source-size", default="1280x720", help="Synthetic capture size (WxH)")
+    parser.add_argument("--affinity", choices=["auto", "none"], default="auto",
+                        help="Pin streams to their own cores (auto) or not (none)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Sender config override for every stream, e.g. --set PRESET=veryfast")
+    parser.add_argument("--verbose", action="store_true", help="Show the streams' output")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    side = common.load_side("sender", "multistream")
+    extra = typed_overrides(side.config, args.set)
+    runs = [run_count(side, count, args, extra) for count in range(1, args.max_streams + 1)]
+    single = runs[0]["aggregate_fps"] or 1
+    for run in runs:
+        run["scaling"] = round(run["aggregate_fps"] / (run["streams"] * single), 2)
+    common.write_result({
+        "cpu_count": os.cpu_count(),
+        "usable_cores": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count(),
+        "affinity": args.affinity,
+        "source_size": args.source_size,
+        "runs": runs,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
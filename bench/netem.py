@@ -0,0 +1,375 @@
+"""
+OpenSecondDisplay - Network Impairment Proxy
+Role: Networking & Performance Engineer
+
+Description:
+    A loopback proxy (asyncio) between sender and receiver that plays back a
+    network: propagation delay, jitter, a bandwidth cap with a bounded
+    bottleneck queue, loss and reordering. Profiles are lists of phases, so a
+    profile can also script a change (a microwave turning on, a roaming
+    client): each phase starts at a time (seconds since the proxy started)
+    and overrides any of the link parameters.
+
+      delay_ms, jitter_ms - one-way delay per packet, plus |N(0, jitter)|
+      rate_mbps           - bottleneck rate; None = unlimited
+      queue_ms            - bottleneck queue; beyond it datagrams are dropped
+                            (UDP) or the proxy stops reading (TCP: the
+                            sender's socket fills up, as on a real link)
+      loss_pct            - per packet (1448-byte segment for TCP)
+      reorder_pct         - share of datagrams held back by REORDER_MS (UDP)
+
+    UDP (and SRT) datagrams are dropped and reordered for real. A TCP byte
+    stream cannot lose bytes, so loss costs what it costs TCP: the lost
+    segment and everything behind it wait for the retransmission, 1.5 RTT
+    after a single loss (fast retransmit), TCP_RTO when a burst is lost.
+    Reordering is absorbed by TCP and not modelled. The return path
+    (receiver -> sender) is forwarded unimpaired.
+
+    bench/regression.py runs the real pipelines through every profile.
+
+Usage:
+    python3 bench/netem.py --list
+    python3 bench/netem.py --profile wifi-2.4ghz-busy --listen 5100 --target 127.0.0.1:5000
+        (then point the sender at port 5100; --udp for udp/srt)
+    python3 bench/netem.py --profile-file my_profiles.json --profile office --listen 5100 --target 10.0.0.5:5000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+TCP_RTO = 0.2          # Linux minimum retransmission timeout
+TCP_SEGMENT = 1448     # MSS on a 1500 MTU
+REORDER_MS = 5.0       # extra hold for a reordered datagram
+CHUNK_SIZE = 16 * 1024  # TCP bytes timed as one unit
+
+LINK_DEFAULTS = {"delay_ms": 0.0, "jitter_ms": 0.0, "rate_mbps": None, "queue_ms": 200.0,
+                 "loss_pct": 0.0, "reorder_pct": 0.0}
+
+# name: [(start second, parameters), ...]; later phases override earlier ones.
+PROFILES = {
+    "gigabit": [(0, {"delay_ms": 0.2, "jitter_ms": 0.05, "rate_mbps": 940})],
+    "wifi-5ghz": [(0, {"delay_ms": 2, "jitter_ms": 1.5, "rate_mbps": 200, "loss_pct": 0.1,
+                       "reorder_pct": 0.1})],
+    "wifi-2.4ghz-busy": [(0, {"delay_ms": 4, "jitter_ms": 8, "rate_mbps": 18, "queue_ms": 300,
+                              "loss_pct": 1.0, "reorder_pct": 1.0})],
+    "congested": [(0, {"delay_ms": 15, "jitter_ms": 10, "rate_mbps": 6, "queue_ms": 500, "loss_pct": 2.0})],
+    # 5 GHz Wi-Fi that collapses to 2 Mbps for 3 seconds (interference, roaming) and comes back.
+    "wifi-dropout": [(0, {"delay_ms": 2, "jitter_ms": 1.5, "rate_mbps": 200, "loss_pct": 0.1}),
+                     (4, {"rate_mbps": 2, "jitter_ms": 20, "loss_pct": 3.0}),
+                     (7, {"rate_mbps": 200, "jitter_ms": 1.5, "loss_pct": 0.1})],
+}
+
+
+def load_profiles(path=None):
+    """PROFILES, plus (or overridden by) {"name": [[start, {...}], ...]} from a JSON file."""
+    profiles = dict(PROFILES)
+    if path:
+        with open(path) as f:
+            for name, phases in json.load(f).items():
+                profiles[name] = [(float(start), params) for start, params in phases]
+    for name, phases in profiles.items():
+        for _, params in phases:
+            unknown = set(params) - set(LINK_DEFAULTS)
+            if unknown:
+                raise SystemExit(f"Profile {name}: unknown parameters {sorted(unknown)}")
+    return profiles
+
+
+def recovery_start(phases):
+    """Start of the last phase of a scripted profile (when the link is back), None for one-phase profiles."""
+    return phases[-1][0] if len(phases) > 1 else None
+
+
+class Link:
+    """The impairment state: when does a packet of a given size that arrives now leave?"""
+
+    def __init__(self, phases, seed=None):
+        self.phases = sorted(phases, key=lambda phase: phase[0])
+        self.rng = random.Random(seed)
+        self.started = time.monotonic()
+        self.busy_until = 0.0   # bottleneck serialization
+        self.last_release = 0.0  # in-order delivery
+        self.packets = 0
+        self.bytes = 0
+        self.lost = 0
+        self.queue_drops = 0
+        self.reordered = 0
+        self.retransmits = 0
+        self.max_queue_ms = 0.0
+
+    def params(self, now):
+        result = dict(LINK_DEFAULTS)
+        for start, params in self.phases:
+            if now - self.started >= start:
+                result.update(params)
+        return result
+
+    def _serialize(self, p, now, size):
+        """Time the last bit leaves the bottleneck; None if the queue is full (tail drop)."""
+        if not p["rate_mbps"]:
+            return now
+        start = max(now, self.busy_until)
+        queued_ms = (start - now) * 1000
+        if queued_ms > p["queue_ms"]:
+            return None
+        self.max_queue_ms = max(self.max_queue_ms, queued_ms)
+        self.busy_until = start + size * 8 / (p["rate_mbps"] * 1e6)
+        return self.busy_until
+
+    def _propagation(self, p):
+        return (p["delay_ms"] + abs(self.rng.gauss(0, p["jitter_ms"]))) / 1000 if p["jitter_ms"] else p["delay_ms"] / 1000
+
+    def datagram(self, size):
+        """(release time, in order) of a datagram, or None if it is lost."""
+        now = time.monotonic()
+        p = self.params(now)
+        self.packets += 1
+        if self.rng.random() < p["loss_pct"] / 100:
+            self.lost += 1
+            return None
+        sent = self._serialize(p, now, size)
+        if sent is None:
+            self.queue_drops += 1
+            return None
+        self.bytes += size
+        release = sent + self._propagation(p)
+        if self.rng.random() < p["reorder_pct"] / 100:
+            self.reordered += 1
+            return release + REORDER_MS / 1000, False
+        release = max(release, self.last_release)
+        self.last_release = release
+        return release, True
+
+    def stream(self, size):
+        """Release time of a TCP chunk (in order), or None if the bottleneck queue is full."""
+        now = time.monotonic()
+        p = self.params(now)
+        sent = self._serialize(p, now, size)
+        if sent is None:
+            return None
+        segments = -(-size // TCP_SEGMENT)
+        self.packets += segments
+        self.bytes += size
+        release = sent + self._propagation(p)
+        lost = sum(self.rng.random() < p["loss_pct"] / 100 for _ in range(segments)) if p["loss_pct"] else 0
+        if lost:
+            self.lost += lost
+            self.retransmits += 1
+            rtt = 2 * p["delay_ms"] / 1000
+            release += TCP_RTO if lost > 1 else max(0.001, 1.5 * rtt)
+        release = max(release, self.last_release)
+        self.last_release = release
+        return release
+
+    def stats(self):
+        return {
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "lost": self.lost,
+            "queue_drops": self.queue_drops,
+            "reordered": self.reordered,
+            "tcp_retransmits": self.retransmits,
+            "max_queue_ms": round(self.max_queue_ms, 1),
+        }
+
+
+class _DatagramFront(asyncio.DatagramProtocol):
+    def __init__(self, proxy):
+        self.proxy = proxy
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.proxy.client = addr
+        timing = self.proxy.link.datagram(len(data))
+        if timing is not None:
+            self.proxy.send_at(*timing, data)
+
+
+class _DatagramBack(asyncio.DatagramProtocol):
+    def __init__(self, proxy):
+        self.proxy = proxy
+
+    def datagram_received(self, data, addr):
+        if self.proxy.client and self.proxy.front:
+            self.proxy.front.sendto(data, self.proxy.client)
+
+
+class ImpairmentProxy:
+    """Forwards 127.0.0.1:listen_port -> target through a Link, on its own thread and event loop."""
+
+    def __init__(self, kind, listen_port, target, phases, seed=None, listen_ip="127.0.0.1"):
+        self.kind = kind  # "tcp", or "udp" (also for srt)
+        self.listen = (listen_ip, listen_port)
+        self.target = target if isinstance(target, tuple) else ("127.0.0.1", target)
+        self.link = Link(phases, seed)
+        self.loop = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.front = self.back = self.client = None
+        self.pending = deque()  # (release, datagram) in release order
+        self.timer = None
+        self.connections = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        if not self.ready.wait(5):
+            raise RuntimeError("impairment proxy did not start")
+        return self
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def send_at(self, release, in_order, data):
+        """Sends a datagram upstream at release (time.monotonic() clock, like the event loop's)."""
+        if not in_order:
+            # Timers with equal deadlines may fire in any order, so only reordered datagrams get their own.
+            self.loop.call_at(release, self._send, data)
+            return
+        self.pending.append((release, data))
+        if self.timer is None:
+            self.timer = self.loop.call_at(release, self._pump)
+
+    def _pump(self):
+        self.timer = None
+        now = self.loop.time()
+        while self.pending and self.pending[0][0] <= now:
+            self._send(self.pending.popleft()[1])
+        if self.pending:
+            self.timer = self.loop.call_at(self.pending[0][0], self._pump)
+
+    def _send(self, data):
+        if self.back:
+            self.back.sendto(data)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(self._open())
+        self.link.started = time.monotonic()
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            if server:
+                server.close()
+            for transport in (self.front, self.back):
+                if transport:
+                    transport.close()
+            self.loop.close()
+
+    async def _open(self):
+        loop = asyncio.get_running_loop()
+        if self.kind == "tcp":
+            return await asyncio.start_server(self._serve_tcp, *self.listen)
+        self.front, _ = await loop.create_datagram_endpoint(lambda: _DatagramFront(self), local_addr=self.listen)
+        self.back, _ = await loop.create_datagram_endpoint(lambda: _DatagramBack(self), remote_addr=self.target)
+        return None
+
+    async def _serve_tcp(self, reader, writer):
+        try:
+            up_reader, up_writer = await asyncio.open_connection(*self.target)
+        except OSError:
+            writer.close()
+            return
+        self.connections += 1
+        for w in (writer, up_writer):
+            w.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        queue = asyncio.Queue()
+        impair = asyncio.ensure_future(self._impair(reader, queue))
+        deliver = asyncio.ensure_future(self._deliver(queue, up_writer))
+        back = asyncio.ensure_future(self._copy(up_reader, writer))
+        # Done when everything the sender wrote was delivered, or the receiver hung up.
+        await asyncio.wait([deliver, back], return_when=asyncio.FIRST_COMPLETED)
+        for task in (impair, deliver, back):
+            task.cancel()
+        for w in (writer, up_writer):
+            w.close()
+
+    async def _impair(self, reader, queue):
+        while True:
+            data = await reader.read(CHUNK_SIZE)
+            if not data:
+                await queue.put(None)
+                return
+            release = self.link.stream(len(data))
+            while release is None:
+                # Bottleneck queue full: stop reading, like a link that stops acknowledging.
+                await asyncio.sleep(0.001)
+                release = self.link.stream(len(data))
+            await queue.put((release, data))
+
+    @staticmethod
+    async def _deliver(queue, writer):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            release, data = item
+            delay = release - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            writer.write(data)
+            await writer.drain()
+
+    @staticmethod
+    async def _copy(reader, writer):
+        while True:
+            data = await reader.read(CHUNK_SIZE)
+            if not data:
+                return
+            writer.write(data)
+            await writer.drain()
+
+
+def parse_target(text):
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loopback proxy that plays back a network profile")
+    parser.add_argument("--profile", default="wifi-2.4ghz-busy")
+    parser.add_argument("--profile-file", help="JSON file with more profiles")
+    parser.add_argument("--listen", type=int, default=5100, help="Port the sender connects to")
+    parser.add_argument("--listen-ip", default="127.0.0.1")
+    parser.add_argument("--target", default="127.0.0.1:5000", help="Receiver host:port")
+    parser.add_argument("--udp", action="store_true", help="Proxy datagrams (udp / srt transport)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--list", action="store_true", help="Print the profiles and exit")
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.profile_file)
+    if args.list:
+        print(json.dumps(profiles, indent=2))
+        return
+    if args.profile not in profiles:
+        raise SystemExit(f"Unknown profile {args.profile}; have {', '.join(sorted(profiles))}")
+    proxy = ImpairmentProxy("udp" if args.udp else "tcp", args.listen, parse_target(args.target),
+                            profiles[args.profile], args.seed, args.listen_ip).start()
+    print(f"🌐 {args.profile}: {args.listen_ip}:{args.listen} -> {args.target} "
+          f"({'udp' if args.udp else 'tcp'}), Ctrl+C to stop", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(proxy.link.stats()), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.stop()
+
+
+if __name__ == "__main__":
+    main()
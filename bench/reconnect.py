@@ -0,0 +1,167 @@
+"""
+OpenSecondDisplay - Reconnect Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Runs the real sender pipeline (synthetic capture, sender.main() under a
+    Supervisor) against an in-process ingest-mode receiver whose decoder
+    just discards the stream. Every --interval seconds the receiver is shut
+    down, kept down for --downtime seconds and started again, so the sender
+    loses its connection, backs off and reconnects.
+
+    Reports the per-session timings recorded by the supervisor (connect,
+    first byte, first frame) for the reconnect sessions, and the recovery
+    time: from the receiver listening again to the first frame of the new
+    session (includes the remaining backoff wait). Run it with and without
+    --frame-gate to compare a warm capture against a full restart.
+
+Usage:
+    python3 bench/reconnect.py
+    python3 bench/reconnect.py --restarts 10 --downtime 0.5 --frame-gate --output reconnect.json
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+DISCARD_DECODER = ["sh", "-c", "cat >/dev/null"]
+FIRST_FRAME_TIMEOUT = 10.0  # seconds to wait for the first session before giving up
+
+
+class Receiver:
+    """An IngestServer that can be taken down and brought back on the same port."""
+
+    def __init__(self, ingest, port):
+        self.ingest = ingest
+        self.port = port
+        self.server = None
+        self.thread = None
+        self.up_at = []  # time.time() of every start
+
+    def start(self):
+        self.server = self.ingest.IngestServer(DISCARD_DECODER, listen_ip="127.0.0.1", port=self.port)
+        self.thread = threading.Thread(target=self._serve, args=(self.server,), daemon=True)
+        self.thread.start()
+        while not self.server.running:
+            time.sleep(0.005)
+        self.up_at.append(time.time())
+
+    def _serve(self, server):
+        try:
+            server.serve_forever()
+        finally:
+            server.close()
+
+    def stop(self):
+        self.server.stop()
+        self.thread.join(timeout=5)
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def recovery_ms(session, up_at):
+    """Receiver back up -> first frame of the session that reconnected to it."""
+    if session["first_frame_ms"] is None:
+        return None
+    return (session["started"] + session["first_frame_ms"] / 1000 - up_at) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sender reconnect timings against a restarting receiver")
+    parser.add_argument("--restarts", type=int, default=5, help="Number of receiver restarts")
+    parser.add_argument("--interval", type=float, default=3.0, help="Seconds of streaming between restarts")
+    parser.add_argument("--downtime", type=float, default=0.5, help="Seconds the receiver stays down")
+    parser.add_argument("--frame-gate", action="store_true", help="Keep the capture warm behind the frame gate")
+    parser.add_argument("--source-size", default="1280x720", help="Synthetic capture size (WxH)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a sender config value, e.g. --set RECONNECT_BACKOFF_MIN=0.1")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    receiver_side = common.load_side("receiver", "ingest")
+    sender_side = common.load_side("sender", "sender")
+    port, feedback_port = common.free_port(), common.free_port(socket.SOCK_DGRAM)
+    receiver_side.config.FEEDBACK_PORT = feedback_port
+    receiver_side.config.INSPECT_STREAM = False
+
+    config = sender_side.config
+    config.RECEIVER_IP = "127.0.0.1"
+    config.RECEIVER_PORT = port
+    config.FEEDBACK_PORT = feedback_port
+    config.TRANSPORT = "tcp"
+    config.CAPTURE_BACKEND = "synthetic"
+    config.SYNTHETIC_SIZE = args.source_size
+    config.SYNTHETIC_REALTIME = True
+    config.FRAME_GATE = args.frame_gate
+    config.ADAPTIVE_BITRATE = False
+    config.TELEMETRY_PRINT = False
+    common.apply_overrides(config, args.set)
+
+    receiver = Receiver(receiver_side.ingest, port)
+    receiver.start()
+    sup = sender_side.sender.create_supervisor()
+    thread = threading.Thread(target=sender_side.sender.main, args=(sup,), daemon=True)
+    thread.start()
+
+    def has_first_frame(count):
+        return lambda: len(sup.sessions) >= count and sup.sessions[-1].first_frame_ms is not None
+
+    if not wait_for(has_first_frame(1), FIRST_FRAME_TIMEOUT):
+        sup.stop()
+        receiver.stop()
+        raise SystemExit("sender never reached the receiver")
+    for _ in range(args.restarts):
+        time.sleep(args.interval)
+        count = len(sup.sessions)
+        receiver.stop()
+        time.sleep(args.downtime)
+        receiver.start()
+        # Sessions that hit the receiver while it was down end quickly; wait for a good one.
+        wait_for(lambda: len(sup.sessions) > count and has_first_frame(len(sup.sessions))(),
+                 args.interval + FIRST_FRAME_TIMEOUT)
+    time.sleep(1.0)
+    sup.stop()
+    thread.join(timeout=10)
+    receiver.stop()
+
+    sessions = [session.as_dict() for session in sup.sessions]
+    reconnects = [s for s in sessions if s["reason"] == "reconnect" and s["first_frame_ms"] is not None]
+    recoveries = []
+    for up_at in receiver.up_at[1:]:
+        after = [s for s in reconnects if s["started"] + s["connect_ms"] / 1000 >= up_at]
+        if after:
+            recoveries.append(recovery_ms(after[0], up_at))
+
+    result = {
+        "frame_gate": args.frame_gate,
+        "restarts": args.restarts,
+        "downtime_s": args.downtime,
+        "config": common.config_snapshot(config, [
+            "SCALING_RESOLUTION", "FPS", "BITRATE", "GOP_SIZE", "ENCODER",
+            "RECONNECT_BACKOFF_MIN", "RECONNECT_BACKOFF_MAX"]),
+        "sessions": len(sessions),
+        "failed_attempts": sum(1 for s in sessions if s["reason"] == "reconnect" and s["first_byte_ms"] is None),
+        "connect_ms": common.summarize([s["connect_ms"] for s in reconnects]),
+        "first_byte_ms": common.summarize([s["first_byte_ms"] for s in reconnects if s["first_byte_ms"] is not None]),
+        "first_frame_ms": common.summarize([s["first_frame_ms"] for s in reconnects]),
+        "recovery_ms": common.summarize([r for r in recoveries if r is not None]),
+        "session_log": sessions,
+    }
+    common.write_result(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
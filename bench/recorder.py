@@ -0,0 +1,169 @@
+"""
+OpenSecondDisplay - Recorder Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Measures what recording costs the display path. A paced synthetic
+    MPEG-TS stream (--rate Mbps) is sent over loopback to an in-process
+    ingest-mode receiver whose "decoder" only timestamps every read from
+    its stdin. The latency of a chunk is from just before its send() to the
+    decoder read that completes it (CLOCK_MONOTONIC is shared by both
+    processes). Run once with recording off and once with RECORD_DIR set.
+    By default (CATCHUP off) the first run uses splice, which recording
+    turns off; with --set CATCHUP=true both runs take the copy path.
+
+    With recording on, the written segments are checked afterwards: every
+    index entry must point at a keyframe packet, and a seek to the middle of
+    each segment must land on one.
+
+Usage:
+    python3 bench/recorder.py
+    python3 bench/recorder.py --rate 50 --seconds 10 --segment-seconds 2 --output recorder.json
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+STAMP_DECODER = """
+import os, sys, time
+out = open(sys.argv[1], "w", buffering=1)  # survives terminate()
+total = 0
+while True:
+    data = os.read(0, 1 << 16)
+    if not data:
+        break
+    total += len(data)
+    out.write(f"{time.monotonic()} {total}\\n")
+"""
+SEND_PACKETS = 70  # TS packets per send() (~13 KB)
+
+
+def run_mode(record, args, workdir):
+    side = common.load_side("receiver", "ingest", "mpegts", "recorder")
+    config = side.config
+    config.INSPECT_STREAM = False
+    config.FEEDBACK_PORT = common.free_port(socket.SOCK_DGRAM)
+    config.STATS_INTERVAL = 3600
+    config.CATCHUP_MAX_FRAMES = 1 << 20  # synthetic frames are tiny; no skipping of measured chunks
+    config.CATCHUP_MAX_KB = 1 << 20
+    config.RECORD_DIR = os.path.join(workdir, "segments") if record else None
+    config.RECORD_SEGMENT_SECONDS = args.segment_seconds
+    common.apply_overrides(config, args.set)
+
+    stamps = os.path.join(workdir, f"stamps-{'on' if record else 'off'}.txt")
+    port = common.free_port()
+    server = side.ingest.IngestServer([sys.executable, "-c", STAMP_DECODER, stamps],
+                                      listen_ip="127.0.0.1", port=port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    while not server.running:
+        time.sleep(0.005)
+
+    data = side.mpegts.synthetic_stream(30_000, keyframe_every=args.keyframe_every)
+    chunk = side.mpegts.TS_PACKET_SIZE * SEND_PACKETS
+    interval = chunk * 8 / (args.rate * 1e6)
+    sends = []  # (time before send, cumulative bytes after it)
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    view = memoryview(data)
+    sent, position = 0, 0
+    start = time.monotonic()
+    deadline = start + args.seconds
+    while True:
+        due = start + len(sends) * interval
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        if due > now:
+            time.sleep(due - now)
+        if position + chunk > len(data):
+            position = 0
+        piece = view[position:position + chunk]
+        position += chunk
+        sends.append((time.monotonic(), sent + len(piece)))
+        sock.sendall(piece)
+        sent += len(piece)
+    time.sleep(0.5)  # let the last bytes reach the decoder
+    sock.close()
+    time.sleep(0.2)
+    server.stop()
+    thread.join(timeout=5)
+    recorder_stats = server.recorder.stats() if server.recorder else None
+    server.close()
+
+    reads = []
+    with open(stamps) as f:
+        for line in f:
+            t, total = line.split()
+            reads.append((float(t), int(total)))
+    latencies, i = [], 0
+    for sent_at, cumulative in sends:
+        while i < len(reads) and reads[i][1] < cumulative:
+            i += 1
+        if i == len(reads):
+            break
+        latencies.append((reads[i][0] - sent_at) * 1000)
+
+    result = {
+        "recording": record,
+        "rate_mbps": args.rate,
+        "sent_mb": round(sent / 1e6, 1),
+        "delivered_mb": round(reads[-1][1] / 1e6, 1) if reads else 0,
+        "latency_ms": common.summarize(latencies, 3),
+    }
+    if record:
+        result["recorder"] = recorder_stats
+        result["index_check"] = check_segments(side, config.RECORD_DIR)
+    return result
+
+
+def check_segments(side, directory):
+    """Every index entry and a mid-segment seek must land on a keyframe packet."""
+    segments = sorted(name for name in os.listdir(directory) if name.endswith(".ts"))
+    entries = bad = seeks_ok = 0
+    for name in segments:
+        segment = side.recorder.Segment(os.path.join(directory, name))
+        for k in range(segment.count):
+            offset, _ = segment.keyframe(k)
+            entries += 1
+            bad += not side.ingest.is_keyframe_packet(segment.data, offset)
+        if segment.count:
+            middle_ms = segment.keyframe(segment.count // 2)[1] + 1
+            seeks_ok += side.ingest.is_keyframe_packet(segment.data, segment.seek(middle_ms / 1000))
+        segment.close()
+    return {"segments": len(segments), "index_entries": entries, "entries_not_on_keyframe": bad,
+            "mid_seeks_on_keyframe": seeks_ok}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Receive-to-decoder latency with and without recording")
+    parser.add_argument("--rate", type=float, default=20.0, help="Stream rate in Mbps")
+    parser.add_argument("--seconds", type=float, default=8.0, help="Seconds per run")
+    parser.add_argument("--keyframe-every", type=int, default=3000, help="TS packets between keyframes")
+    parser.add_argument("--segment-seconds", type=float, default=2.0, help="RECORD_SEGMENT_SECONDS for the run")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a receiver config value, e.g. --set CATCHUP=true")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="osd-recorder-")
+    try:
+        runs = [run_mode(False, args, workdir), run_mode(True, args, workdir)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    off, on = (run["latency_ms"] for run in runs)
+    added = {key: round(on[key] - off[key], 3) for key in ("p50", "p95", "p99") if key in on and key in off}
+    common.write_result({"runs": runs, "added_latency_ms": added}, args.output)
+
+
+if __name__ == "__main__":
+    main()
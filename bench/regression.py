@@ -0,0 +1,164 @@
+"""
+OpenSecondDisplay - Network Regression Suite
+Role: Networking & Performance Engineer
+
+Description:
+    Runs bench/latency.py's real pipeline (sender.build_ffmpeg_command()
+    encode settings, receiver decode flags, sender/config.py defaults plus
+    any --set) through bench/netem.py's impairment proxy once per network
+    profile and checks the result against budgets:
+
+      p95_ms      - 95th percentile frame latency
+      stall_ms    - total time of gaps longer than 3 frame intervals
+      dropped_pct - frames sent but never decoded (after the first one)
+      recovery_s  - scripted profiles: from the link coming back (start of
+                    the last phase) until latency stays under recovered_ms
+                    for RECOVERY_HOLD seconds
+
+    With --baseline (an earlier --output of this script) every measured
+    value must also stay within --tolerance of the baseline's, so a change
+    to the config defaults or the command builders that makes things worse
+    fails even while it is still inside the budgets. Exits 1 on any failure.
+
+Usage:
+    python3 bench/regression.py --output baseline.json
+    python3 bench/regression.py --set PRESET=veryfast --baseline baseline.json
+    python3 bench/regression.py --profiles gigabit,wifi-dropout --budgets my_budgets.json
+
+Dependencies:
+    - ffmpeg with libx264 and lavfi (Linux host)
+"""
+
+import json
+import os
+import socket
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+import latency
+import netem
+
+RECOVERY_HOLD = 1.0   # seconds under recovered_ms that count as recovered
+SLACK = {"p95_ms": 5.0, "stall_ms": 100.0, "dropped_pct": 0.5, "recovery_s": 0.25}  # noise allowed vs baseline
+
+# For the defaults in sender/config.py (720p30, 5 Mbit/s, tcp). None = not checked.
+BUDGETS = {
+    "gigabit": {"p95_ms": 120, "stall_ms": 0, "dropped_pct": 0.5},
+    "wifi-5ghz": {"p95_ms": 150, "stall_ms": 300, "dropped_pct": 1.0},
+    "wifi-2.4ghz-busy": {"p95_ms": 400, "stall_ms": 2000, "dropped_pct": 5.0},
+    "congested": {"p95_ms": 800, "stall_ms": 4000, "dropped_pct": 10.0},
+    "wifi-dropout": {"p95_ms": None, "stall_ms": 5000, "dropped_pct": 30.0, "recovery_s": 3.0,
+                     "recovered_ms": 150},
+}
+
+
+def load_budgets(path=None):
+    budgets = {name: dict(values) for name, values in BUDGETS.items()}
+    if path:
+        with open(path) as f:
+            for name, values in json.load(f).items():
+                budgets.setdefault(name, {}).update(values)
+    return budgets
+
+
+def recovery_seconds(timeline, recovered_at, recovered_ms):
+    """Seconds from recovered_at until the latency stays under recovered_ms for RECOVERY_HOLD; None if never."""
+    since = None
+    for sent, ms in timeline:
+        if sent < recovered_at:
+            continue
+        if ms > recovered_ms:
+            since = None
+        elif since is None:
+            since = sent
+        elif sent - since >= RECOVERY_HOLD:
+            return round(since - recovered_at, 3)
+    return None
+
+
+def run_profile(name, phases, budget, args):
+    sender = common.load_side("sender", "sender")
+    receiver = common.load_side("receiver", "receiver")
+    common.apply_overrides(sender.config, args.set)
+    kind = "tcp" if sender.config.TRANSPORT == "tcp" else "udp"
+    socket_kind = socket.SOCK_STREAM if kind == "tcp" else socket.SOCK_DGRAM
+    receiver_port = common.free_port(socket_kind)
+    proxy = netem.ImpairmentProxy(kind, common.free_port(socket_kind), receiver_port, phases, args.seed).start()
+    try:
+        result = latency.run_benchmark(sender.sender, receiver.receiver, args.duration, args.warmup,
+                                       latency.parse_size(args.source_size), receiver_port=receiver_port,
+                                       sender_port=proxy.listen[1], keep_samples=True)
+    finally:
+        proxy.stop()
+    timeline = result.pop("latency_timeline")
+    result.pop("latency_samples_ms")
+
+    sent = result["frames_sent"] - result["startup_frames"]
+    measured = {
+        "p95_ms": result["latency_ms"].get("p95"),
+        "stall_ms": result["stall_time_ms"],
+        "dropped_pct": round(100 * result["dropped_frames"] / sent, 2) if sent > 0 else 100.0,
+    }
+    recovered_at = netem.recovery_start(phases)
+    if recovered_at is not None:
+        measured["recovery_s"] = recovery_seconds(timeline, proxy.link.started + recovered_at,
+                                                  budget.get("recovered_ms", 150))
+    return {"profile": name, "measured": measured, "link": proxy.link.stats(), "run": result}
+
+
+def check(run, budget, baseline, tolerance):
+    """Failure messages for one profile run."""
+    failures = []
+    for key, value in run["measured"].items():
+        limit = budget.get(key)
+        if value is None:
+            if limit is not None:
+                failures.append(f"{key}: no value (never recovered / no frames)")
+            continue
+        if limit is not None and value > limit:
+            failures.append(f"{key}: {value} > budget {limit}")
+        previous = (baseline or {}).get(key)
+        if previous is not None and value > previous * (1 + tolerance) + SLACK.get(key, 0):
+            failures.append(f"{key}: {value} worse than baseline {previous} (+{tolerance:.0%})")
+    return failures
+
+
+def main():
+    parser = latency.build_arg_parser("Latency, stall and recovery budgets under simulated networks")
+    parser.set_defaults(duration=12.0)
+    parser.add_argument("--profiles", help="Comma-separated profile names (default: all)")
+    parser.add_argument("--profile-file", help="JSON file with more profiles (see bench/netem.py)")
+    parser.add_argument("--budgets", help="JSON file overriding budgets: {\"profile\": {\"p95_ms\": ...}}")
+    parser.add_argument("--baseline", help="Earlier --output of this script to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression vs the baseline")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    profiles = netem.load_profiles(args.profile_file)
+    budgets = load_budgets(args.budgets)
+    names = args.profiles.split(",") if args.profiles else list(profiles)
+    unknown = [name for name in names if name not in profiles]
+    if unknown:
+        raise SystemExit(f"Unknown profiles: {', '.join(unknown)}")
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {run["profile"]: run["measured"] for run in json.load(f)["runs"]}
+
+    runs = []
+    for name in names:
+        run = run_profile(name, profiles[name], budgets.get(name, {}), args)
+        run["failures"] = check(run, budgets.get(name, {}), baseline.get(name), args.tolerance)
+        status = "FAIL" if run["failures"] else "ok"
+        print(f"{name:>18} {status:>4}  " + "  ".join(f"{k}={v}" for k, v in run["measured"].items())
+              + "".join(f"\n{'':>24}{failure}" for failure in run["failures"]), file=sys.stderr)
+        runs.append(run)
+
+    passed = not any(run["failures"] for run in runs)
+    common.write_result({"passed": passed, "budgets": budgets, "runs": runs}, args.output)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
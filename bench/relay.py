@@ -0,0 +1,164 @@
+"""
+OpenSecondDisplay - Fan-out Relay Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Feeds a synthetic MPEG-TS stream (mpegts.synthetic_stream, one IDR per
+    second of stream) through sender/relay.py to 1, 4 and 16 loopback
+    clients, plus one deliberately slow client that reads far below the
+    stream rate. The clients run in a separate process so the relay's CPU
+    time can be measured on its own.
+
+    Per run it reports the relay's CPU use, the aggregate delivered rate and
+    each client's lag, drops and skips. The fast clients must see no skips
+    while the slow one keeps skipping to the next IDR ("isolated").
+    --rate-mbps 0 feeds as fast as possible to find the relay's ceiling.
+
+Usage:
+    python3 bench/relay.py
+    python3 bench/relay.py --clients 1,4,16 --rate-mbps 20,0 --duration 5 --output relay.json
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+CHUNK = 188 * 348
+SLOW_READ = 4096        # bytes per read for the slow client
+SLOW_INTERVAL = 0.02    # seconds between reads (~1.6 Mbps)
+
+
+def run_sinks(count, slow, conn):
+    """Child process: `count` fast sinks (+ one slow one); reports byte counts via conn."""
+
+    async def main():
+        received = {}
+
+        async def handle(reader, writer, port, delay):
+            try:
+                while True:
+                    data = await reader.read(SLOW_READ if delay else 1 << 20)
+                    if not data:
+                        break
+                    received[port] += len(data)
+                    if delay:
+                        await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                pass  # asyncio.run() cancels the handlers still reading at teardown
+            finally:
+                writer.close()
+
+        servers = []
+        for i in range(count + (1 if slow else 0)):
+            delay = SLOW_INTERVAL if i == count else 0
+            server = await asyncio.start_server(
+                lambda r, w, i=i, delay=delay: handle(r, w, servers[i].sockets[0].getsockname()[1], delay),
+                "127.0.0.1", 0)
+            servers.append(server)
+            received[server.sockets[0].getsockname()[1]] = 0
+        conn.send([s.sockets[0].getsockname()[1] for s in servers])
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, conn.recv)  # "stop"
+        conn.send(received)
+
+    asyncio.run(main())
+
+
+async def feed(relay, stream, rate_bps, duration):
+    """Feeds the stream in CHUNK pieces, paced to rate_bps (0 = as fast as possible)."""
+    view = memoryview(stream)
+    started = time.monotonic()
+    sent = pos = 0
+    while time.monotonic() - started < duration:
+        chunk = view[pos:pos + CHUNK]
+        pos = pos + CHUNK if pos + CHUNK < len(stream) else 0
+        relay.feed(chunk)
+        sent += len(chunk)
+        if rate_bps:
+            wait = started + sent * 8 / rate_bps - time.monotonic()
+            await asyncio.sleep(max(0.0, wait))
+        else:
+            await asyncio.sleep(0)
+    return sent, time.monotonic() - started
+
+
+async def run_once(relay_module, ports, slow, stream, rate_bps, duration):
+    targets = [("127.0.0.1", port) for port in ports]
+    relay = relay_module.Relay(targets)
+    await relay.start()
+    while not all(c.connected for c in relay.clients):
+        await asyncio.sleep(0.05)
+
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    fed, elapsed = await feed(relay, stream, rate_bps, duration)
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    await asyncio.sleep(0.5)  # let the queues drain
+    stats = relay.stats()
+    await relay.close()
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    return fed, elapsed, cpu, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fan-out relay throughput and slow-client isolation")
+    parser.add_argument("--clients", default="1,4,16", help="Comma-separated fast client counts")
+    parser.add_argument("--rate-mbps", default="20,0", help="Comma-separated input rates (0 = flat out)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run")
+    parser.add_argument("--no-slow-client", action="store_true", help="Only fast clients")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    sender = common.load_side("sender", "relay", "mpegts")
+    slow = not args.no_slow_client
+    runs = []
+    for rate_mbps in [float(x) for x in args.rate_mbps.split(",")]:
+        rate_bps = rate_mbps * 1e6
+        # One IDR per second of stream at the paced rate (every ~4MB flat out)
+        packets_per_second = int((rate_bps or 20e6) / 8 / 188) // 30 * 30
+        stream = sender.mpegts.synthetic_stream(packets_per_second * 2, keyframe_every=packets_per_second)
+
+        for count in [int(x) for x in args.clients.split(",")]:
+            parent, child = multiprocessing.Pipe()
+            sinks = multiprocessing.Process(target=run_sinks, args=(count, slow, child), daemon=True)
+            sinks.start()
+            ports = parent.recv()
+            fed, elapsed, cpu, stats = asyncio.run(
+                run_once(sender.relay, ports, slow, stream, rate_bps, args.duration))
+            parent.send("stop")
+            received = parent.recv()
+            sinks.join(timeout=5)
+
+            fast = stats[:count]
+            run = {
+                "clients": count,
+                "slow_client": slow,
+                "rate_mbps": rate_mbps,
+                "fed_mbps": round(fed * 8 / elapsed / 1e6, 1),
+                "delivered_mbps": round(sum(received[p] for p in ports[:count]) * 8 / elapsed / 1e6, 1),
+                "relay_cpu_pct": round(100 * cpu / elapsed, 1),
+                "fast_max_lag_ms": max(s["max_lag_ms"] for s in fast),
+                "fast_dropped_bytes": sum(s["dropped_bytes"] for s in fast),
+                "fast_skips": sum(s["skips"] for s in fast),
+                "isolated": all(s["skips"] == 0 for s in fast) if rate_bps else None,
+                "per_client": stats,
+            }
+            if slow:
+                run["slow"] = {"received_bytes": received[ports[-1]], **stats[-1]}
+            print(f"rate={rate_mbps or 'max':>5} clients={count:>2}: fed {run['fed_mbps']} Mbps, "
+                  f"delivered {run['delivered_mbps']} Mbps total, relay CPU {run['relay_cpu_pct']}%, "
+                  f"fast skips {run['fast_skips']}, slow skips {stats[-1]['skips'] if slow else '-'}",
+                  file=sys.stderr)
+            runs.append(run)
+
+    common.write_result({"runs": runs}, args.output)
+
+
+if __name__ == "__main__":
+    main()
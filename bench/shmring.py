@@ -0,0 +1,168 @@
+"""
+OpenSecondDisplay - Frame Ring Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Throughput and latency of the receiver's shared-memory frame output
+    (shmring.py) at 1080p60 and 4K30. A producer process stands in for the
+    decoder: it writes raw frames to a pipe, stamping CLOCK_MONOTONIC into
+    the first bytes of each frame just before writing it. The ring reads
+    the pipe into its slots with the same read_frame() loop the receiver's
+    publisher thread runs, and --readers reader processes attach to it.
+
+    Per size it reports:
+      max_fps          - unpaced publish rate without readers, and with the
+                         readers attached (readers must not slow the writer)
+      publish_ms       - paced at the target fps: from the producer starting
+                         a frame's write to the frame being committed
+      delivery_ms      - from commit to a reader seeing the frame
+      readers          - fps each reader got, frames it skipped (dropped)
+                         and frames overwritten while it used them (torn)
+    With --copy the readers copy every frame out (bytes(frame.data));
+    otherwise they only touch it in place, like a zero-copy consumer.
+
+Usage:
+    python3 bench/shmring.py
+    python3 bench/shmring.py --cases 1920x1080@60,3840x2160@30 --readers 3 --copy --output ring.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+PRODUCER = """
+import os, struct, sys, time
+frame_size, fps, seconds = int(sys.argv[1]), float(sys.argv[2]), float(sys.argv[3])
+frame = bytearray(os.urandom(4096) * (frame_size // 4096 + 1))[:frame_size]
+out = os.fdopen(1, "wb", buffering=0)
+interval = 1 / fps if fps else 0
+start = time.monotonic()
+i = 0
+while time.monotonic() - start < seconds:
+    due = start + i * interval
+    if due > time.monotonic():
+        time.sleep(due - time.monotonic())
+    struct.pack_into("<Q", frame, 0, time.monotonic_ns())
+    view = memoryview(frame)
+    while view:
+        view = view[out.write(view):]
+    i += 1
+"""
+
+READER = """
+import json, sys, time
+sys.path.insert(0, sys.argv[1])
+import shmring
+reader = shmring.RingReader(sys.argv[2])
+copy = sys.argv[3] == "copy"
+frames, delivery, checksum = 0, [], 0
+first = last = None
+for frame in reader.frames():
+    now = time.monotonic_ns()
+    delivery.append((now - frame.monotonic_ns) / 1e6)
+    if copy:
+        checksum += len(frame.copy() or b"")
+    else:
+        checksum += frame.data[-1]
+    frames += 1
+    first = first or now
+    last = now
+fps = (frames - 1) / ((last - first) / 1e9) if frames > 1 and last > first else 0
+print(json.dumps({"frames": frames, "fps": round(fps, 1), "dropped": reader.dropped,
+                  "torn": reader.torn, "delivery_ms": delivery}))
+"""
+
+
+def start_readers(count, name, copy):
+    receiver_dir = os.path.join(common.ROOT, "receiver")
+    return [subprocess.Popen([sys.executable, "-c", READER, receiver_dir, name, "copy" if copy else "view"],
+                             stdout=subprocess.PIPE, text=True) for _ in range(count)]
+
+
+def run(side, name, width, height, fps, args, readers, paced):
+    """One producer run into a fresh ring. Returns (publish fps, publish latencies ms, reader results)."""
+    ring = side.shmring.FrameRing(name, width, height, args.pix_fmt, args.slots)
+    stamp = side.shmring.struct.Struct("<Q")
+    procs = start_readers(readers, name, args.copy)
+    time.sleep(0.3)  # readers attached
+    producer = subprocess.Popen([sys.executable, "-c", PRODUCER, str(ring.frame_size),
+                                 str(fps if paced else 0), str(args.seconds)], stdout=subprocess.PIPE, bufsize=0)
+    publish = []
+    started = time.monotonic()
+
+    # The loop publish_from() runs in the receiver, here in this thread so each commit can be timed.
+    def observe():
+        base = ring._slot(ring.seq)
+        sent_ns = stamp.unpack_from(ring.map, base + side.shmring.SLOT_HEADER_SIZE)[0]
+        committed_ns = side.shmring.SLOT_HEADER.unpack_from(ring.map, base)[2]
+        publish.append((committed_ns - sent_ns) / 1e6)
+
+    try:
+        import fcntl
+        fcntl.fcntl(producer.stdout.fileno(), fcntl.F_SETPIPE_SZ, side.shmring.PIPE_SIZE)
+    except (ImportError, AttributeError, OSError):
+        pass
+    while ring.read_frame(producer.stdout) is not None:
+        observe()
+    elapsed = time.monotonic() - started
+    producer.wait()
+    ring.close()
+    results = []
+    for proc in procs:
+        out, _ = proc.communicate(timeout=30)
+        results.append(json.loads(out))
+    return len(publish) / elapsed, publish, results
+
+
+def run_case(side, case, args):
+    size, _, fps = case.partition("@")
+    width, height = (int(v) for v in size.split("x"))
+    fps = float(fps or 60)
+    name = f"osd-bench-{os.getpid()}"
+    frame_mb = side.shmring.frame_size(width, height, args.pix_fmt) / 1e6
+
+    max_alone, _, _ = run(side, name, width, height, fps, args, 0, paced=False)
+    max_shared, _, _ = run(side, name, width, height, fps, args, args.readers, paced=False)
+    paced_fps, publish, readers = run(side, name, width, height, fps, args, args.readers, paced=True)
+    delivery = [d for r in readers for d in r.pop("delivery_ms")]
+    return {
+        "case": case,
+        "frame_mb": round(frame_mb, 2),
+        "max_fps": {"no_readers": round(max_alone, 1), f"{args.readers}_readers": round(max_shared, 1)},
+        "max_gbps": round(max_alone * frame_mb * 8 / 1000, 2),
+        "paced_fps": round(paced_fps, 1),
+        "publish_ms": common.summarize(publish, 3),
+        "delivery_ms": common.summarize(delivery, 3),
+        "readers": readers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared-memory frame ring throughput and latency")
+    parser.add_argument("--cases", default="1920x1080@60,3840x2160@30", help="Comma-separated WxH@fps")
+    parser.add_argument("--pix-fmt", default="yuv420p", help="Ring pixel format (FRAME_RING_PIX_FMT)")
+    parser.add_argument("--slots", type=int, default=4, help="FRAME_RING_SLOTS")
+    parser.add_argument("--readers", type=int, default=2, help="Reader processes")
+    parser.add_argument("--copy", action="store_true", help="Readers copy every frame instead of using it in place")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Seconds per run (3 runs per case)")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    side = common.load_side("receiver", "shmring")
+    common.write_result({
+        "cpu_count": os.cpu_count(),
+        "pix_fmt": args.pix_fmt,
+        "slots": args.slots,
+        "reader_mode": "copy" if args.copy else "in place",
+        "cases": [run_case(side, case, args) for case in args.cases.split(",")],
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+OpenSecondDisplay - Switchover Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Streams the synthetic capture through the real sender (sender.main()
+    under a Supervisor) to a loopback receiver that timestamps every frame
+    start it receives, and changes settings through the control API
+    (POST /settings) every --interval seconds: bitrate, resolution, GOP and
+    back. Run once with SEAMLESS_SWITCH (new encoder switched in at its
+    first IDR) and once without (encoder restart).
+
+    The visible gap of a change is the longest pause between two frames
+    arriving at the receiver around it; gap_extra_ms is that minus the
+    normal frame interval. The received stream is decoded afterwards with
+    FFmpeg to check that the spliced stream is clean (decode_errors).
+
+Usage:
+    python3 bench/switchover.py
+    python3 bench/switchover.py --switches 8 --interval 2 --mode seamless --output switch.json
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+CHANGES = [
+    {"bitrate": "3000k"},
+    {"resolution": "960:540"},
+    {"gop": 60},
+    {"resolution": "1280:720", "bitrate": "5000k", "gop": 30},
+]
+SETTLE = 1.0  # seconds after a change that still count towards its gap
+
+
+class FrameSink:
+    """Loopback receiver: accepts connection after connection, logs frame arrival times."""
+
+    def __init__(self, mpegts, path):
+        self.mpegts = mpegts
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(4)
+        self.port = self.listener.getsockname()[1]
+        self.frames = []       # (arrival time, is_key)
+        self.connections = 0
+        self.file = open(path, "wb")
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            inspector = self.mpegts.TSInspector()
+            carry = b""
+            while True:
+                data = conn.recv(1 << 16)
+                if not data:
+                    break
+                now = time.monotonic()
+                self.file.write(data)
+                data = carry + data
+                whole = len(data) - len(data) % self.mpegts.TS_PACKET_SIZE
+                carry = data[whole:]
+                for _, is_key in inspector.feed(data[:whole]):
+                    self.frames.append((now, is_key))
+            conn.close()
+
+    def close(self):
+        self.listener.close()
+        self.file.close()
+
+
+def post_settings(port, changes):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/settings", data=json.dumps(changes).encode(),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=15) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read())
+
+
+def frame_gaps(frames, start, end):
+    """Intervals (ms) between consecutive frame arrivals in [start, end]."""
+    times = [t for t, _ in frames if start <= t <= end]
+    return [(b - a) * 1000 for a, b in zip(times, times[1:])]
+
+
+def decode_errors(path):
+    """Error lines FFmpeg prints decoding the recorded stream (a crash counts as one)."""
+    result = subprocess.run(["ffmpeg", "-v", "error", "-i", path, "-f", "null", "-"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    errors = [line for line in result.stderr.splitlines() if line.strip()]
+    if result.returncode and not errors:
+        errors.append(f"ffmpeg exited with code {result.returncode}")
+    return errors
+
+
+def run_mode(seamless, args):
+    sender_side = common.load_side("sender", "sender", "mpegts")
+    config = sender_side.config
+    path = os.path.join(tempfile.gettempdir(), f"osd-switchover-{'seamless' if seamless else 'restart'}.ts")
+    sink = FrameSink(sender_side.mpegts, path)
+    control_port = common.free_port()
+    config.RECEIVER_IP = "127.0.0.1"
+    config.RECEIVER_PORT = sink.port
+    config.TRANSPORT = "tcp"
+    config.CAPTURE_BACKEND = "synthetic"
+    config.SYNTHETIC_SIZE = args.source_size
+    config.SYNTHETIC_REALTIME = True
+    config.SCALING_RESOLUTION = "1280:720"
+    config.BITRATE = "5000k"
+    config.GOP_SIZE = 30
+    config.ADAPTIVE_BITRATE = False
+    config.TELEMETRY_PRINT = False
+    config.CONTROL_PORT = control_port
+    config.SEAMLESS_SWITCH = seamless
+    common.apply_overrides(config, args.set)
+
+    sup = sender_side.sender.create_supervisor()
+    thread = threading.Thread(target=sender_side.sender.main, args=(sup,), daemon=True)
+    thread.start()
+    time.sleep(args.interval)
+
+    switches = []
+    for i in range(args.switches):
+        changes = CHANGES[i % len(CHANGES)]
+        requested = time.monotonic()
+        reply = post_settings(control_port, changes)
+        switches.append({"changes": changes, "requested": requested, "reply": reply})
+        time.sleep(args.interval)
+    with urllib.request.urlopen(f"http://127.0.0.1:{control_port}/status", timeout=5) as response:
+        status = json.loads(response.read())
+    sup.stop()
+    thread.join(timeout=10)
+    sink.close()
+
+    # Normal frame interval: frames well away from any change.
+    quiet = []
+    bounds = [s["requested"] for s in switches] + [time.monotonic()]
+    for start, end in zip(bounds, bounds[1:]):
+        quiet += frame_gaps(sink.frames, start + args.interval / 2, end)
+    quiet.sort()
+    interval_ms = common.percentile(quiet, 50) or 1000 / config.FPS
+
+    results = []
+    for s in switches:
+        gaps = frame_gaps(sink.frames, s["requested"] - 0.2, s["requested"] + (s["reply"].get("ms") or 0) / 1000 + SETTLE)
+        gap = max(gaps) if gaps else None
+        results.append({
+            "changes": s["changes"],
+            "switch": s["reply"].get("switch"),
+            "error": s["reply"].get("error"),
+            "switch_ms": s["reply"].get("ms"),
+            "gap_ms": round(gap, 1) if gap is not None else None,
+            "gap_extra_ms": round(gap - interval_ms, 1) if gap is not None else None,
+        })
+    errors = decode_errors(path)
+    return {
+        "mode": "seamless" if seamless else "restart",
+        "frame_interval_ms": round(interval_ms, 1),
+        "connections": sink.connections,
+        "frames_received": len(sink.frames),
+        "gap_ms": common.summarize([r["gap_ms"] for r in results if r["gap_ms"] is not None], 1),
+        "gap_extra_ms": common.summarize([r["gap_extra_ms"] for r in results if r["gap_extra_ms"] is not None], 1),
+        "decode_errors": len(errors),
+        "decode_error_sample": errors[:5],
+        "output": status["output"],
+        "switches": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Visible gap of a live settings change, seamless vs restart")
+    parser.add_argument("--mode", choices=["seamless", "restart", "both"], default="both")
+    parser.add_argument("--switches", type=int, default=4, help="Settings changes per run")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between changes")
+    parser.add_argument("--source-size", default="1920x1080", help="Synthetic capture size (WxH)")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a sender config value, e.g. --set FRAME_GATE=true")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    modes = {"seamless": [True], "restart": [False], "both": [True, False]}[args.mode]
+    common.write_result({"runs": [run_mode(seamless, args) for seamless in modes]}, args.output)
+
+
+if __name__ == "__main__":
+    main()
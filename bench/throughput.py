@@ -0,0 +1,116 @@
+"""
+OpenSecondDisplay - Encode Throughput Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Measures how many frames per second the sender pipeline can push with the
+    synthetic capture backend running flat out (SYNTHETIC_REALTIME = False),
+    separately from any real screen capture:
+
+      source - the synthetic capture alone, raw frames to /dev/null
+      encode - sender.start_stream(): capture + scale + encode + mux, sent to
+               a loopback TCP sink
+
+    For each --sizes entry the result says whether the pipeline keeps up with
+    --fps in real time. The encoder is whatever select_encoder() picks here
+    (override with --set ENCODER=libx264).
+
+Usage:
+    python3 bench/throughput.py
+    python3 bench/throughput.py --sizes 1920x1080,3840x2160 --fps 60 --set SCALING_RESOLUTION=None
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+
+def source_fps(sender, duration):
+    """Frames per second the synthetic source alone delivers as raw frames."""
+    encoder = sender.current_encoder()
+    pix_fmt = sender.capture.pick_pix_fmt(encoder)
+    cmd = sender.capture.input_args(pix_fmt) + ["-t", str(duration), "-f", "rawvideo", "-pix_fmt", pix_fmt,
+                                                 "-loglevel", "error", "-progress", "pipe:1", "-y", "/dev/null"]
+    started = time.monotonic()
+    result = subprocess.run(["ffmpeg"] + cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    elapsed = time.monotonic() - started
+    frames = [int(line[6:]) for line in result.stdout.splitlines() if line.startswith("frame=")]
+    return round(frames[-1] / elapsed, 1) if frames else None
+
+
+def encode_fps(sender, duration):
+    """Frames per second through the full sender pipeline (to a loopback sink)."""
+    sink = common.ByteSink()
+    sender.config.RECEIVER_IP = "127.0.0.1"
+    sender.config.RECEIVER_PORT = sink.port
+    sender.config.TRANSPORT = "tcp"
+
+    launched = time.monotonic()
+    process = sender.start_stream()
+    if process is None:
+        raise SystemExit("capture failed to start")
+    time.sleep(1.0)  # skip encoder startup
+    start_frame, started = sender.telemetry_snapshot().frame, time.monotonic()
+    time.sleep(duration)
+    stats = sender.telemetry_snapshot()
+    frames = stats.frame - start_frame
+    elapsed = time.monotonic() - started
+    common.stop_process(process)
+    sink.thread.join(timeout=5)
+    return {
+        "fps": round(frames / elapsed, 1),
+        "speed": stats.speed,
+        "dropped": stats.drop_frames,
+        "queue_depth": stats.queue_depth,
+        "mbps": round(sink.received * 8 / (time.monotonic() - launched) / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maximum encode throughput with the synthetic capture backend")
+    parser.add_argument("--sizes", default="1920x1080,3840x2160", help="Comma-separated source sizes (WxH)")
+    parser.add_argument("--fps", type=int, default=60, help="Frame rate the pipeline must sustain")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds measured per size")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a sender config value, e.g. --set ENCODER=libx264")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    sender = common.load_side("sender", "sender")
+    config = sender.config
+    common.apply_overrides(config, args.set)
+    config.CAPTURE_BACKEND = "synthetic"
+    config.SYNTHETIC_REALTIME = False
+    config.FPS = args.fps
+    sender.sender.select_encoder()
+
+    runs = []
+    for size in args.sizes.split(","):
+        config.SYNTHETIC_SIZE = size
+        run = {
+            "size": size,
+            "source_fps": source_fps(sender.sender, args.duration),
+            "encode": encode_fps(sender.sender, args.duration),
+        }
+        run["realtime"] = run["encode"]["fps"] >= args.fps
+        print(f"{size:>9}: source {run['source_fps']} fps, pipeline {run['encode']['fps']} fps "
+              f"({'keeps up' if run['realtime'] else 'too slow'} at {args.fps} fps)", file=sys.stderr)
+        runs.append(run)
+
+    result = {
+        "encoder": sender.sender.active_encoder,
+        "config": common.config_snapshot(config, [
+            "SCALING_RESOLUTION", "BITRATE", "PRESET", "FRAME_GATE", "CAPTURE_PIX_FMT"]),
+        "fps_target": args.fps,
+        "runs": runs,
+    }
+    common.write_result(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+OpenSecondDisplay - Tile Wall Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Aggregate decode throughput of the receiver's tile wall (tiles.py) as
+    the tile count grows from 1 to --max-tiles. A test clip is encoded once
+    (testsrc2, libx264 ultrafast/zerolatency like the sender's defaults) and
+    every tile gets a loopback sender that sends it over and over into that
+    tile's ingest server, which runs the real per-tile decoder command
+    (receiver.build_raw_decoder_command(), scaled to the tile) and the real
+    compositor. The wall's output goes to a sink instead of FFplay.
+
+    By default the clip is sent flat out (TCP backpressure from the decoder
+    pipe paces it, CATCHUP is off so nothing is skipped): the decoders run
+    as fast as their CPU share allows. With --paced every sender sends at
+    the clip's real-time rate instead, which shows whether N live streams
+    keep up and what compositing adds to the latency.
+
+    Per tile count it reports the aggregate and per-tile decoded fps, the
+    scaling efficiency (aggregate fps / (tiles * single-tile fps)), the
+    wall's output fps, compose time per composite and the compose delay
+    (decoded to handed to the output).
+
+Usage:
+    python3 bench/tiles.py
+    python3 bench/tiles.py --max-tiles 9 --wall-size 3840x2160 --source-size 1920x1080 --output tiles.json
+    python3 bench/tiles.py --paced --fps 30
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+
+START_TIMEOUT = 20.0  # seconds for every tile to show decoded frames
+CHUNK = 188 * 348
+
+
+def encode_clip(path, args):
+    """The test clip every sender loops (H.264 in MPEG-TS)."""
+    subprocess.run([
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={args.source_size}:rate={args.fps}",
+        "-t", str(args.clip_seconds),
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency",
+        "-g", str(int(args.fps)), "-pix_fmt", "yuv420p",
+        "-f", "mpegts", path,
+    ], check=True)
+
+
+def feed(port, clip, rate, stop):
+    """Sends clip to port again and again until stop is set; rate in bytes/s (None = flat out)."""
+    try:
+        conn = socket.create_connection(("127.0.0.1", port), timeout=5)
+    except OSError:
+        return
+    conn.settimeout(0.5)
+    view = memoryview(clip)
+    started, sent = time.monotonic(), 0
+    try:
+        while not stop.is_set():
+            for offset in range(0, len(clip), CHUNK):
+                if stop.is_set():
+                    break
+                if rate:
+                    due = started + sent / rate
+                    if due > time.monotonic():
+                        time.sleep(due - time.monotonic())
+                chunk = view[offset:offset + CHUNK]
+                while chunk and not stop.is_set():
+                    try:
+                        chunk = chunk[conn.send(chunk):]
+                    except socket.timeout:
+                        continue
+                sent += CHUNK
+    except OSError:
+        pass
+    finally:
+        conn.close()
+
+
+def run_count(side, count, clip, args):
+    width, height = (int(v) for v in args.wall_size.split("x"))
+    wall = side.tiles.TileWall(width, height, count, args.columns)
+    servers = [side.ingest.IngestServer(
+        side.receiver.build_raw_decoder_command("pipe:0", side.tiles.PIX_FMT, f"{tile.width}x{tile.height}",
+                                                fit=True),
+        listen_ip="127.0.0.1", port=common.free_port(), frame_ring=tile, name=tile.name) for tile in wall.tiles]
+    outputs = [0]
+
+    def output(canvas):
+        outputs[0] += 1
+
+    compositor = threading.Thread(target=wall.serve, args=(servers, output), daemon=True)
+    compositor.start()
+    time.sleep(0.5)  # listening, decoders started
+    stop = threading.Event()
+    rate = len(clip) / args.clip_seconds if args.paced else None
+    feeders = [threading.Thread(target=feed, args=(server.port, clip, rate, stop), daemon=True)
+               for server in servers]
+    for thread in feeders:
+        thread.start()
+    try:
+        deadline = time.monotonic() + START_TIMEOUT
+        while not all(tile.seq for tile in wall.tiles):
+            if time.monotonic() > deadline:
+                print(f"{count} tiles: not every tile decoded a frame "
+                      f"({[tile.seq for tile in wall.tiles]})", file=sys.stderr)
+                break
+            time.sleep(0.2)
+        time.sleep(args.warmup)
+        wall.stats()  # resets the windows
+        start, first, first_outputs = time.monotonic(), [tile.seq for tile in wall.tiles], outputs[0]
+        time.sleep(args.duration)
+        elapsed = time.monotonic() - start
+        last, last_outputs = [tile.seq for tile in wall.tiles], outputs[0]
+        stats = wall.stats()
+    finally:
+        stop.set()
+        wall.stop()
+        compositor.join(timeout=10)
+        for thread in feeders:
+            thread.join(timeout=5)
+    per_tile = [(b - a) / elapsed for a, b in zip(first, last)]
+    delays = [t["compose_delay_ms"] for t in stats["tiles"] if t["compose_delay_ms"] is not None]
+    return {
+        "tiles": count,
+        "grid": f"{wall.columns}x{wall.rows}",
+        "tile_size": f"{wall.tiles[0].width}x{wall.tiles[0].height}",
+        "aggregate_fps": round(sum(per_tile), 1),
+        "per_tile_fps": [round(fps, 1) for fps in per_tile],
+        "min_tile_fps": round(min(per_tile), 1),
+        "output_fps": round((last_outputs - first_outputs) / elapsed, 1),
+        "compose_ms": stats["compose_ms"],
+        "compose_delay_ms": round(sum(delays) / len(delays), 2) if delays else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate decode throughput of the tile wall, 1..N tiles")
+    parser.add_argument("--max-tiles", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=6.0, help="Measured seconds per tile count")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of decoding before measuring")
+    parser.add_argument("--source-size", default="1280x720", help="Size of the streams the senders send (WxH)")
+    parser.add_argument("--fps", type=float, default=30.0, help="Frame rate of the clip")
+    parser.add_argument("--clip-seconds", type=float, default=4.0)
+    parser.add_argument("--wall-size", default="1920x1080", help="Composite size (TILE_WALL_SIZE)")
+    parser.add_argument("--columns", default="auto", help="TILE_COLUMNS")
+    parser.add_argument("--paced", action="store_true", help="Send at the clip's real-time rate, not flat out")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", help="receiver config override")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    side = common.load_side("receiver", "receiver", "tiles", "ingest")
+    side.config.CATCHUP = args.paced  # flat out, catch-up would skip what the decoder has not read yet
+    side.config.STATS_INTERVAL = 1e9  # the windows are read here
+    side.config.FEEDBACK_PORT = common.free_port(socket.SOCK_DGRAM)
+    common.apply_overrides(side.config, args.set)
+
+    workdir = tempfile.mkdtemp(prefix="osd-tiles-")
+    try:
+        path = os.path.join(workdir, "clip.ts")
+        encode_clip(path, args)
+        with open(path, "rb") as f:
+            clip = f.read()
+        runs = [run_count(side, count, clip, args) for count in range(1, args.max_tiles + 1)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    single = runs[0]["aggregate_fps"] or 1
+    for run in runs:
+        run["scaling"] = round(run["aggregate_fps"] / (run["tiles"] * single), 2)
+    common.write_result({
+        "cpu_count": os.cpu_count(),
+        "mode": "paced" if args.paced else "flat out",
+        "source_size": args.source_size,
+        "wall_size": args.wall_size,
+        "receiver_config": common.config_snapshot(side.config, ("CATCHUP", "FFLAGS", "TILE_FPS")),
+        "runs": runs,
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+OpenSecondDisplay - Transport Comparison Benchmark
+Role: Networking & Performance Engineer
+
+Description:
+    Runs bench/latency.py once per transport (tcp / udp / srt) and loss rate,
+    with a loss-injecting relay between sender and receiver on loopback:
+      - UDP/SRT: each sender datagram is dropped with the given probability
+      - TCP:     a "lost" segment holds the stream for a retransmission
+                 timeout (head-of-line blocking), which is what loss costs TCP
+
+    Reports latency percentiles, stalls and dropped/corrupted frames per run.
+
+Usage:
+    python3 bench/transports.py
+    python3 bench/transports.py --transports udp,srt --loss 0,1,5 --output transports.json
+"""
+
+import os
+import random
+import selectors
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common
+import latency
+
+TCP_RTO = 0.2         # Linux minimum retransmission timeout
+TCP_SEGMENT = 1448    # MSS on a 1500 MTU
+
+
+class LossyRelay:
+    """Loopback relay that forwards listen_port -> target_port with injected loss."""
+
+    def __init__(self, kind, listen_port, target_port, loss):
+        self.kind = kind
+        self.listen_port = listen_port
+        self.target = ("127.0.0.1", target_port)
+        self.loss = loss
+        self.running = False
+        self.dropped = 0
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        target = self._run_tcp if self.kind == "tcp" else self._run_udp
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def _run_udp(self):
+        front = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        front.bind(("127.0.0.1", self.listen_port))
+        back = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        back.connect(self.target)
+        client = None
+        selector = selectors.DefaultSelector()
+        selector.register(front, selectors.EVENT_READ)
+        selector.register(back, selectors.EVENT_READ)
+        while self.running:
+            for key, _ in selector.select(timeout=0.2):
+                if key.fileobj is front:
+                    data, client = front.recvfrom(65536)
+                    if random.random() < self.loss:
+                        self.dropped += 1
+                        continue
+                    back.send(data)
+                elif client:
+                    # Return path (SRT ACK/NAK, handshake) is left intact.
+                    front.sendto(back.recv(65536), client)
+        front.close()
+        back.close()
+
+    def _run_tcp(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(("127.0.0.1", self.listen_port))
+        listener.listen(1)
+        listener.settimeout(0.2)
+        while self.running:
+            try:
+                client, _ = listener.accept()
+            except socket.timeout:
+                continue
+            upstream = socket.create_connection(self.target)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client.settimeout(0.2)
+            while self.running:
+                try:
+                    data = client.recv(65536)
+                except socket.timeout:
+                    continue
+                if not data:
+                    break
+                segments = -(-len(data) // TCP_SEGMENT)
+                if random.random() < 1 - (1 - self.loss) ** segments:
+                    self.dropped += 1
+                    time.sleep(TCP_RTO)
+                upstream.sendall(data)
+            client.close()
+            upstream.close()
+        listener.close()
+
+
+def main():
+    parser = latency.build_arg_parser("Latency and stall rate per transport under injected loss")
+    parser.add_argument("--transports", default="tcp,udp,srt", help="Comma-separated transports")
+    parser.add_argument("--loss", default="0,1,3", help="Comma-separated loss rates in percent")
+    args = parser.parse_args()
+
+    results = []
+    for kind in args.transports.split(","):
+        for loss_pct in [float(x) for x in args.loss.split(",")]:
+            sender = common.load_side("sender", "sender")
+            receiver = common.load_side("receiver", "receiver")
+            common.apply_overrides(sender.config, args.set)
+            sender.config.TRANSPORT = kind
+
+            socket_kind = socket.SOCK_STREAM if kind == "tcp" else socket.SOCK_DGRAM
+            receiver_port = common.free_port(socket_kind)
+            relay_port = common.free_port(socket_kind)
+            relay = LossyRelay(kind, relay_port, receiver_port, loss_pct / 100)
+            relay.start()
+            try:
+                result = latency.run_benchmark(
+                    sender.sender, receiver.receiver, args.duration, args.warmup,
+                    latency.parse_size(args.source_size),
+                    receiver_port=receiver_port, sender_port=relay_port)
+            finally:
+                relay.stop()
+            result["transport"] = kind
+            result["loss_pct"] = loss_pct
+            result["relay_drops"] = relay.dropped
+            print(f"{kind:>4} loss={loss_pct:>4}%  p50={result['latency_ms'].get('p50')}ms "
+                  f"p99={result['latency_ms'].get('p99')}ms stalls={result['stalls']} "
+                  f"dropped={result['dropped_frames']} unreadable={result['unreadable_frames']}",
+                  file=sys.stderr)
+            results.append(result)
+
+    common.write_result({"runs": results}, args.output)
+
+
+if __name__ == "__main__":
+    main()
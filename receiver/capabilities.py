@@ -0,0 +1,188 @@
+"""
+OpenSecondDisplay - FFmpeg Capability Probe
+Role: Networking & Performance Engineer
+
+Description:
+    Enumerates the encoders, decoders, hwaccels and pixel formats of an
+    FFmpeg/FFplay binary once and caches the result on disk, keyed by the
+    binary's resolved path and mtime. A cache hit costs one stat() instead of
+    spawning processes at every launch; upgrading FFmpeg changes the mtime and
+    invalidates the entry.
+
+    Encoders that failed at runtime are remembered in the same entry for
+    FAILURE_TTL seconds so the next launches go straight to one that works;
+    after that they are tried again (a driver update or a freed-up hardware
+    session may have fixed them).
+
+    This file is kept identical in sender/ and receiver/ (deployment isolation,
+    see design/architecture.md).
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import time
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "openseconddisplay")
+CACHE_FILE = os.path.join(CACHE_DIR, "capabilities.json")
+FAILURE_TTL = 24 * 3600  # seconds an encoder marked as failed is skipped
+
+
+def _cache_key(path):
+    return f"{path}:{os.stat(path).st_mtime_ns}"
+
+
+def _load_cache():
+    try:
+        with open(CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = CACHE_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f, indent=1)
+        os.replace(tmp, CACHE_FILE)
+    except OSError:
+        pass  # a read-only home only costs us the cache
+
+
+def _run(path, flag):
+    try:
+        result = subprocess.run([path, "-hide_banner", flag], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+    return result.stdout
+
+
+def _parse_codec_list(text):
+    """Parses `-encoders` / `-decoders` output: ' V....D libx264  description'."""
+    names = []
+    in_table = False
+    for line in text.splitlines():
+        if line.strip().startswith("------"):
+            in_table = True
+            continue
+        parts = line.split()
+        if in_table and len(parts) >= 2 and parts[0][:1] == "V":
+            names.append(parts[1])
+    return names
+
+
+def _parse_pix_fmts(text):
+    names = []
+    in_table = False
+    for line in text.splitlines():
+        if line.strip().startswith("-----"):
+            in_table = True
+            continue
+        parts = line.split()
+        if in_table and len(parts) >= 2:
+            names.append(parts[1])
+    return names
+
+
+def _parse_input_protocols(text):
+    """Parses `-protocols` output: the names listed under "Input:"."""
+    names = []
+    section = None
+    for line in text.splitlines():
+        if not line.startswith(" "):
+            section = line.strip().rstrip(":")
+        elif section == "Input" and line.strip():
+            names.append(line.strip())
+    return names
+
+
+def _parse_version(text):
+    """[major, minor] from `-version` output ('ffmpeg version 4.4.2-0ubuntu0.22.04.1 ...'),
+    or None for builds without a release number (git snapshots)."""
+    match = re.search(r"version n?(\d+)\.(\d+)", text)
+    return [int(match.group(1)), int(match.group(2))] if match else None
+
+
+def _parse_hwaccels(text):
+    lines = [line.strip() for line in text.splitlines()]
+    return [line for line in lines[1:] if line] if lines else []
+
+
+def probe(binary="ffmpeg", refresh=False):
+    """Capabilities of `binary`, or None if it is not installed.
+
+    Returns a dict: binary, version ([major, minor] or None), encoders, decoders, hwaccels, pix_fmts,
+    protocols (input), failed_encoders ({encoder: time.time() it failed}, expired
+    ones left out), cached (True when no process had to be spawned).
+    """
+    path = shutil.which(binary)
+    if not path:
+        return None
+    path = os.path.realpath(path)
+    key = _cache_key(path)
+
+    cache = _load_cache()
+    entry = cache.get(key)
+    if entry and not refresh and "version" in entry:  # entries older than "version" are re-probed
+        entry["failed_encoders"] = _current_failures(entry)
+        entry["cached"] = True
+        return entry
+
+    entry = {
+        "binary": path,
+        "version": _parse_version(_run(path, "-version")),
+        "encoders": _parse_codec_list(_run(path, "-encoders")),
+        "decoders": _parse_codec_list(_run(path, "-decoders")),
+        "hwaccels": _parse_hwaccels(_run(path, "-hwaccels")),  # FFmpeg only; empty for FFplay
+        "pix_fmts": _parse_pix_fmts(_run(path, "-pix_fmts")),
+        "protocols": _parse_input_protocols(_run(path, "-protocols")),
+        "failed_encoders": {},
+    }
+    # Drop entries for older builds of the same binary.
+    cache = {k: v for k, v in cache.items() if v.get("binary") != path}
+    cache[key] = entry
+    _save_cache(cache)
+    entry["cached"] = False
+    return entry
+
+
+def _current_failures(entry):
+    """The failed_encoders of a cache entry that have not expired yet."""
+    failed = entry.get("failed_encoders")
+    if not isinstance(failed, dict):
+        return {}  # list from before failures expired: no timestamps, so forget them
+    now = time.time()
+    return {encoder: at for encoder, at in failed.items() if now - at < FAILURE_TTL}
+
+
+def passthrough_args(binary="ffmpeg"):
+    """Output options that keep every frame with its own timestamp (no duplicates or drops).
+
+    -fps_mode exists from FFmpeg 5.1; the 4.x builds of Debian/Ubuntu/Raspberry Pi OS
+    only know -vsync, which newer builds still accept but warn about.
+    """
+    caps = probe(binary)
+    version = caps.get("version") if caps else None
+    if version and tuple(version) < (5, 1):
+        return ["-vsync", "passthrough"]
+    return ["-fps_mode", "passthrough"]
+
+
+def mark_encoder_failed(binary, encoder):
+    """Remembers for FAILURE_TTL seconds that `encoder` does not work with this binary on this host."""
+    path = shutil.which(binary)
+    if not path:
+        return
+    key = _cache_key(os.path.realpath(path))
+    cache = _load_cache()
+    entry = cache.get(key)
+    if entry is None:
+        return
+    entry["failed_encoders"] = _current_failures(entry)
+    entry["failed_encoders"][encoder] = time.time()
+    _save_cache(cache)
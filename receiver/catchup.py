@@ -0,0 +1,274 @@
+"""
+OpenSecondDisplay - Receiver Catch-up Buffer
+Role: Linux Receiver Engineer
+
+Description:
+    With TCP, -fflags nobuffer and setpts=0, FFplay plays every frame it is
+    given at real time. A backlog (Wi-Fi burst, decoder hiccup) is therefore
+    never discarded and the display stays behind by however long it was.
+
+    In ingest mode the stream passes through this buffer on its way to the
+    decoder. The ingest server reads the socket as fast as data arrives and
+    writes to the decoder only as fast as the decoder takes it, so anything
+    not yet played sits here where it can be measured: pending bytes and
+    pending frames (frame starts found by the MPEG-TS inspector). When the
+    backlog exceeds CATCHUP_MAX_FRAMES or CATCHUP_MAX_KB, everything up to the
+    most recent IDR is dropped and the display snaps back to live. If there
+    is no IDR to jump to and the backlog keeps growing, the buffer is flushed
+    and the stream resumes at the next IDR.
+
+    The time skipped is taken from the PES timestamps of the dropped frames
+    (frame count times the measured frame interval when a PTS is missing).
+    Frames are tracked by their decode timestamp (DTS, or the PTS when there
+    is none), which keeps increasing along the stream even with B-frames.
+
+    With JITTER_BUFFER, jitterbuffer.py's FramePacer holds frames here until
+    they are due: write_to() is given a stream position not to write past
+    and reports each frame start it hands to the decoder.
+"""
+
+import os
+import time
+from collections import deque
+
+import config
+import mpegts
+
+TS_PACKET_SIZE = mpegts.TS_PACKET_SIZE
+PTS_WRAP = mpegts.PTS_WRAP
+PTS_HZ = mpegts.PTS_HZ
+DEFAULT_FRAME_INTERVAL = 1 / 60  # until two timestamps have been seen
+COMPACT_BYTES = 1 << 20          # drop already-written bytes from the front past this
+
+
+class CatchUp:
+    """Queue between the socket and the decoder that can skip ahead to an IDR."""
+
+    def __init__(self, inspector=None, max_frames=None, max_bytes=None, clock=time.monotonic):
+        self.inspector = inspector or mpegts.TSInspector(clock=clock)
+        self.max_frames = max_frames or config.CATCHUP_MAX_FRAMES
+        self.max_bytes = max_bytes or config.CATCHUP_MAX_KB * 1024
+        self.clock = clock
+        self.pending = bytearray()
+        self.head = 0                # bytes of pending already written to the decoder
+        self.base = 0                # stream position of pending[0]
+        self.session_start = 0       # stream position where the current connection began
+        self.frames = deque()        # (position, is_key, dts) of frame starts not yet written
+        self.waiting_for_key = False
+        self.skip_from = None        # (pts, frames, bytes) while flushing to the next IDR
+        self.last_pts = None
+        self.frame_interval = DEFAULT_FRAME_INTERVAL
+
+        self.catchups = 0
+        self.skipped_frames = 0
+        self.skipped_bytes = 0
+        self.skipped_seconds = 0.0
+        self.max_backlog_frames = 0
+        self.max_backlog_bytes = 0
+
+    # --- Input ---
+
+    def reset(self):
+        """New connection: anything still queued from the old one is stale."""
+        self.skipped_bytes += self._drop_unwritten()
+        self.session_start = self.base + len(self.pending)
+        self.frames.clear()
+        self.waiting_for_key = False
+        self.skip_from = None
+        self.last_pts = None
+        self.inspector.reset()
+
+    def push(self, data):
+        """Queues packet-aligned data. Returns the inspector's (offset, is_key) frame starts."""
+        view = memoryview(data)
+        events = self.inspector.feed(view)
+        # Packet-aligned input, so offsets are >= 0 and point at the frame's first packet.
+        frames = [(offset, is_key, mpegts.pes_dts(view, offset)) for offset, is_key in events]
+        if self.waiting_for_key:
+            keys = [offset for offset, is_key, _ in frames if is_key]
+            if not keys:
+                self._add_skip(frames, len(view))
+                return events
+            # Resume at the IDR, after the PAT/PMT if the decoder has none from this connection.
+            key = keys[0]
+            psi = self._psi_packets(view[:key]) if not self._decoder_has_psi() else b""
+            self._add_skip([f for f in frames if f[0] < key], key - len(psi))
+            self._finish_skip(next(pts for offset, _, pts in frames if offset == key))
+            frames = [(offset - key + len(psi), is_key, pts) for offset, is_key, pts in frames if offset >= key]
+            view = memoryview(psi + view[key:]) if psi else view[key:]
+
+        position = self.base + len(self.pending)
+        for offset, is_key, pts in frames:
+            self._track_interval(pts)
+            self.frames.append((position + offset, is_key, pts))
+        self.pending += view
+        self._check()
+        return events
+
+    def _track_interval(self, pts):
+        if pts is None:
+            return
+        if self.last_pts is not None:
+            delta = ((pts - self.last_pts) % PTS_WRAP) / PTS_HZ
+            if 0 < delta < 1:
+                self.frame_interval = delta
+        self.last_pts = pts
+
+    # --- Backlog ---
+
+    def backlog(self):
+        """(bytes, frames) received but not yet handed to the decoder."""
+        return len(self.pending) - self.head, len(self.frames)
+
+    def _check(self):
+        pending_bytes, pending_frames = self.backlog()
+        self.max_backlog_frames = max(self.max_backlog_frames, pending_frames)
+        self.max_backlog_bytes = max(self.max_backlog_bytes, pending_bytes)
+        if pending_frames <= self.max_frames and pending_bytes <= self.max_bytes:
+            return
+        keys = [i for i, (_, is_key, _) in enumerate(self.frames) if is_key]
+        if keys and keys[-1] > 0:
+            self._skip_to(keys[-1])
+        elif not keys and pending_bytes > 2 * self.max_bytes:
+            self._flush_to_next_key()
+
+    def _skip_to(self, index):
+        """Drops the unwritten frames before self.frames[index] (an IDR)."""
+        first_pts = self.frames[0][2]
+        key_pos, _, key_pts = self.frames[index]
+        cut = self._written_boundary()
+        if key_pos <= cut:
+            return
+        # The decoder needs PAT/PMT before the IDR. It has them unless nothing of this
+        # connection was written yet; then the ones in the dropped range are kept.
+        start, end = cut - self.base, key_pos - self.base
+        psi = self._psi_packets(memoryview(self.pending)[start:end]) if not self._decoder_has_psi() else b""
+        self.pending[start:end] = psi
+        dropped = key_pos - cut - len(psi)
+        for _ in range(index):
+            self.frames.popleft()
+        self.frames = deque((pos - dropped, is_key, pts) for pos, is_key, pts in self.frames)
+        self._record(index, dropped, self._span(first_pts, key_pts, index))
+
+    def _flush_to_next_key(self):
+        """No IDR queued and the backlog is still growing: drop it all and wait for one."""
+        first_pts = self.frames[0][2] if self.frames else None
+        self.skip_from = (first_pts, len(self.frames), self._drop_unwritten(keep_psi=not self._decoder_has_psi()))
+        self.frames.clear()
+        self.waiting_for_key = True
+
+    def _add_skip(self, frames, size):
+        """Counts frames and bytes dropped while waiting for the next IDR."""
+        first_pts, count, dropped = self.skip_from
+        if first_pts is None and frames:
+            first_pts = frames[0][2]
+        self.skip_from = (first_pts, count + len(frames), dropped + size)
+
+    def _finish_skip(self, key_pts):
+        first_pts, frames, dropped = self.skip_from
+        self.skip_from = None
+        self._record(frames, dropped, self._span(first_pts, key_pts, frames))
+
+    def _span(self, first_pts, last_pts, frames):
+        """Seconds of stream between two timestamps (frame count as a fallback)."""
+        if first_pts is not None and last_pts is not None:
+            return ((last_pts - first_pts) % PTS_WRAP) / PTS_HZ
+        return frames * self.frame_interval
+
+    def _record(self, frames, dropped, seconds):
+        self.catchups += 1
+        self.skipped_frames += frames
+        self.skipped_bytes += dropped
+        self.skipped_seconds += seconds
+        print(f"⏩ Catch-up: skipped {frames} frames ({seconds * 1000:.0f} ms, {dropped // 1024} KB) to the latest keyframe")
+
+    def _written_boundary(self):
+        """First packet boundary at or after what the decoder already has (never tear a packet)."""
+        written = self.base + self.head
+        torn = written % TS_PACKET_SIZE
+        return written + (TS_PACKET_SIZE - torn if torn else 0)
+
+    def _drop_unwritten(self, keep_psi=False):
+        """Drops everything unwritten except the rest of a torn packet (and with keep_psi
+        the PAT/PMT packets). Returns bytes dropped."""
+        cut = self._written_boundary()
+        end = self.base + len(self.pending)
+        if cut >= end:
+            return 0
+        psi = self._psi_packets(memoryview(self.pending)[cut - self.base:]) if keep_psi else b""
+        self.pending[cut - self.base:] = psi
+        return end - cut - len(psi)
+
+    def _decoder_has_psi(self):
+        """True once data of this connection was written: it starts with PAT/PMT."""
+        return self.base + self.head > self.session_start
+
+    def _psi_packets(self, view):
+        """The PAT and PMT packets of packet-aligned data."""
+        pids = {mpegts.PAT_PID} | self.inspector.pmt_pids
+        return b"".join(view[i:i + TS_PACKET_SIZE] for i in range(0, len(view) - TS_PACKET_SIZE + 1, TS_PACKET_SIZE)
+                        if ((view[i + 1] & 0x1F) << 8 | view[i + 2]) in pids)
+
+    # --- Output ---
+
+    def write_to(self, fd, limit=None, on_start=None):
+        """Writes as much as the (non-blocking) decoder pipe takes. False if the decoder went away.
+
+        limit: stream position not to write past (None: no limit).
+        on_start: called with the timestamp of every frame whose start was written.
+        """
+        end = self._end(limit)
+        if self.head >= end:
+            return True
+        try:
+            written = os.write(fd, memoryview(self.pending)[self.head:end])
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        self.head += written
+        position = self.base + self.head
+        while self.frames and self.frames[0][0] < position:
+            _, _, ts = self.frames.popleft()
+            if on_start:
+                on_start(ts)
+        if self.head >= len(self.pending) or self.head >= COMPACT_BYTES:
+            del self.pending[:self.head]
+            self.base += self.head
+            self.head = 0
+        return True
+
+    def has_pending(self, limit=None):
+        return self.head < self._end(limit)
+
+    def _end(self, limit):
+        """Index in pending to write up to."""
+        return len(self.pending) if limit is None else max(0, min(len(self.pending), limit - self.base))
+
+    def decoder_pipe_bytes(self, fd):
+        """Bytes sitting in the decoder's stdin pipe (not yet read by FFplay); 0 where unknown."""
+        try:
+            import fcntl
+            import termios
+            return int.from_bytes(fcntl.ioctl(fd, termios.FIONREAD, b"\0\0\0\0"), "little")
+        except (ImportError, OSError):
+            return 0  # not a Unix system (Windows builds), or not a pipe
+
+    def stats(self):
+        pending_bytes, pending_frames = self.backlog()
+        return {
+            "backlog_bytes": pending_bytes,
+            "backlog_frames": pending_frames,
+            "max_backlog_bytes": self.max_backlog_bytes,
+            "max_backlog_frames": self.max_backlog_frames,
+            "catchups": self.catchups,
+            "skipped_frames": self.skipped_frames,
+            "skipped_bytes": self.skipped_bytes,
+            "skipped_ms": round(self.skipped_seconds * 1000),
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"backlog {s['backlog_frames']} frames / {s['backlog_bytes'] // 1024} KB "
+                f"(max {s['max_backlog_frames']} / {s['max_backlog_bytes'] // 1024} KB), "
+                f"{s['catchups']} catch-ups, {s['skipped_ms']} ms skipped")
@@ -8,6 +8,17 @@ Role: Linux Receiver Engineer
 LISTEN_IP = "0.0.0.0"
 PORT = 12345
 DISCOVERY_PORT = 5001
+# Display mode advertised to senders during discovery ("WxH" or "WxH@Hz").
+# "auto" asks xrandr (X11) or the first connected DRM output.
+DISPLAY_MODE = "auto"
+
+# Transport: "tcp", "udp" or "srt" (must match on both ends)
+# tcp - reliable; a lost packet stalls the stream until it is retransmitted
+# udp - lowest latency; packet loss shows as artifacts until the next keyframe
+# srt - retransmits lost packets within SRT_LATENCY_MS, then gives up on them
+TRANSPORT = "tcp"
+MTU = 1500            # UDP/SRT datagrams carry as many 188-byte TS packets as fit
+SRT_LATENCY_MS = 40   # SRT retransmission window; raise on lossy Wi-Fi
 
 # Playback Configuration
 # "fullscreen" to occupy the entire monitor
@@ -25,3 +36,99 @@ FFLAGS = "nobuffer"
 # Reduce these to start playback faster, at the risk of misdetecting stream info (rare for mpegts).
 PROBESIZE = "32" # Bytes
 ANALYZEDURATION = "0" # Microseconds
+
+# Ingest Mode
+# When True the receiver owns the listening socket and feeds every connection into
+# one long-lived FFplay over stdin. Reconnects then skip process startup, window
+# creation and stream probing (only the demuxer resyncs).
+INGEST_MODE = False
+
+# Stream Inspection
+# Run every received MPEG-TS packet through mpegts.py (ingest mode only) and print
+# per-PID bitrate, continuity errors, PCR jitter and keyframe counts.
+# Disables the zero-copy splice path while enabled.
+INSPECT_STREAM = False
+STATS_INTERVAL = 5  # Seconds between stats printouts
+
+# Backlog Catch-up (ingest mode)
+# FFplay plays queued frames at real time, so a burst or decoder hiccup would leave
+# the display behind for good. Received data waits in front of the decoder; when
+# more than CATCHUP_MAX_FRAMES frames or CATCHUP_MAX_KB are queued, everything up to
+# the latest keyframe is dropped. Costs the zero-copy splice path: every byte is then
+# copied through Python (see INGEST_MODE); turn it on when the display falls behind.
+CATCHUP = False
+CATCHUP_MAX_FRAMES = 6    # ~100 ms at 60 fps
+CATCHUP_MAX_KB = 2048
+
+# Jitter Buffer (ingest mode with CATCHUP, jitterbuffer.py)
+# Holds frames in the catch-up queue and hands them to the decoder on a steady
+# cadence (rounded to the display refresh) instead of as they arrive. The delay
+# follows the measured arrival jitter between the two limits (in frame intervals;
+# 1 = no delay beyond the frame the demuxer waits for anyway).
+JITTER_BUFFER = False
+JITTER_MIN_FRAMES = 1.0
+JITTER_MAX_FRAMES = 3.0       # keep below CATCHUP_MAX_FRAMES
+JITTER_QUANTILE = 0.95        # share of frames that should arrive in time
+JITTER_WINDOW = 2.0           # Seconds of arrivals the jitter is measured over
+JITTER_SHRINK = 0.05          # Frame intervals the delay may shrink by per frame
+JITTER_LOG = None             # CSV file: depth, delay and late/repeated/dropped counts per second
+
+# Sender Feedback (ingest mode)
+# UDP OSD_STATS reports (bytes received, arrival rate) sent back to the sender's
+# adaptive bitrate controller. Must match FEEDBACK_PORT in sender/config.py.
+FEEDBACK_PORT = 5002
+FEEDBACK_INTERVAL = 0.5  # Seconds
+
+# Recording (ingest mode, recorder.py)
+# Write the received MPEG-TS to disk as-is (no decoding) in segments with a keyframe
+# index for seeking. Disk writes happen on a background thread. None = off.
+# Disables the zero-copy splice path while enabled.
+RECORD_DIR = None             # e.g. "~/OpenSecondDisplay/recordings"
+RECORD_SEGMENT_MB = 512       # Start a new segment (at the next keyframe) after this much...
+RECORD_SEGMENT_SECONDS = 600  # ...or this many seconds (0 = size only)
+
+# Live Latency Metrics (ingest mode, latencystats.py)
+# Per-frame latency from the sender's in-band timestamps (FRAME_TIMESTAMPS in
+# sender/config.py): network (sender output -> received), decode (-> decoded) and
+# total (capture -> decoded). The clocks are compared over FEEDBACK_PORT.
+# Disables the zero-copy splice path while enabled.
+LATENCY_METRICS = False
+METRICS_FILE = None           # Prometheus text file, rewritten every STATS_INTERVAL
+METRICS_LISTEN = "127.0.0.1"
+METRICS_PORT = None           # e.g. 9464: serve http://METRICS_LISTEN:METRICS_PORT/metrics
+
+# Live Graphs (gui.py, timeseries.py)
+# The GUI samples fps, bitrate, latency, queue depth and CPU every METRICS_INTERVAL
+# seconds into fixed-size ring buffers, graphs the last GRAPH_WINDOW seconds and can
+# export the session to CSV or JSON.
+METRICS_INTERVAL = 1.0        # Seconds between samples (and graph redraws)
+METRICS_HISTORY = 3600        # Samples kept per metric (older ones are overwritten)
+GRAPH_WINDOW = 300            # Seconds shown in the graphs
+
+# Cursor Channel (cursor.py)
+# Draw the pointer the sender sends on CURSOR_PORT (CURSOR_CHANNEL in sender/config.py)
+# on top of the video, instead of it being part of the picture. Needs an X display
+# (X11 or XWayland) and FULLSCREEN; not used with FRAME_RING.
+CURSOR_CHANNEL = False
+CURSOR_PORT = 5004
+CURSOR_TIMEOUT = 2.0          # Seconds without updates before the pointer is hidden
+
+# Shared-Memory Frame Output (shmring.py, Linux)
+# Decode to raw frames and publish them in a ring in /dev/shm/<FRAME_RING> for other
+# local processes (compositor, mixer, OCR) instead of showing an FFplay window.
+# Readers attach with shmring.RingReader(FRAME_RING). None = normal FFplay playback.
+FRAME_RING = None              # e.g. "osd-frames"
+FRAME_RING_SIZE = "auto"       # "WxH"; "auto" = the display mode advertised to senders
+FRAME_RING_PIX_FMT = "yuv420p" # decoder output, no conversion; "bgra" costs a colour conversion
+FRAME_RING_SLOTS = 4           # frames kept; a reader more than this far behind skips ahead
+
+# Tiled Wall (tiles.py, tcp)
+# Show TILES senders at once in one window, in a grid: sender i (from 0) connects to
+# PORT + i (set RECEIVER_PORT in its config.py; discovery advertises PORT only). Every
+# tile gets its own ingest server and FFmpeg decoder process; one compositor feeds one
+# FFplay window (or FRAME_RING, which must then be "yuv420p"). 0 = one stream as usual.
+TILES = 0
+TILE_COLUMNS = "auto"         # Grid columns; "auto" = as square as the tile count allows
+TILE_WALL_SIZE = "auto"       # Output "WxH"; "auto" = the display mode advertised to senders
+TILE_FPS = 60                 # Most composites per second (only changed tiles are copied)
+TILE_TIMEOUT = 5.0            # Seconds after a sender disconnects before its tile is blanked
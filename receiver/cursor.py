@@ -0,0 +1,297 @@
+"""
+OpenSecondDisplay - Cursor Channel (Receiver)
+Role: Linux Receiver Engineer
+
+Description:
+    Draws the sender's pointer on top of the video when the sender runs
+    with CURSOR_CHANNEL (see sender/cursor.py): the pointer then moves with
+    network latency instead of frame + encode + decode latency.
+
+    CursorListener receives the datagrams on CURSOR_PORT (cursorwire.py)
+    and keeps the newest position and the shapes seen. CursorOverlay is a
+    small borderless, always-on-top Tk window holding the cursor image,
+    cut to the image's outline with the X Shape extension (libXext through
+    ctypes) and transparent to clicks. It runs on its own thread; the UDP
+    socket is a Tk file handler, so a datagram moves the window as soon as
+    it arrives, without polling.
+
+    Positions are relative to the captured area; they are mapped to where
+    a fullscreen FFplay shows the video (scaled to fit, centered), so the
+    overlay assumes FULLSCREEN. The pointer is hidden when the sender says
+    so or goes quiet for CURSOR_TIMEOUT seconds.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import selectors
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+import config
+import cursorwire
+import discovery
+
+SHAPES_KEPT = 16    # shapes cached by id (apps switch between a handful)
+SOURCE_SWITCH = 2.0  # Seconds of silence after which another sender (or a restarted one) is accepted
+
+
+class CursorListener:
+    """The cursor channel's socket and the latest state it delivered."""
+
+    def __init__(self, port=None, listen_ip=None, on_position=None):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((listen_ip or config.LISTEN_IP, port or config.CURSOR_PORT))
+        self.sock.setblocking(False)
+        self.on_position = on_position  # called with (position, receive time us) for every accepted update
+        self.position = None
+        self.shapes = OrderedDict({cursorwire.DEFAULT_SHAPE_ID: cursorwire.default_shape()})
+        self.source = None
+        self.updated = 0.0  # monotonic time of the last accepted position
+        self.received = 0
+        self.stale = 0
+        self.invalid = 0
+        self.stop_event = threading.Event()
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def receive(self):
+        """Reads every queued datagram. Returns True if what should be shown changed."""
+        changed = False
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(65536)
+            except (BlockingIOError, InterruptedError):
+                return changed
+            except OSError:
+                return changed  # e.g. ICMP errors surfacing on Linux; the socket stays usable
+            message = cursorwire.parse(data)
+            if message is None:
+                self.invalid += 1
+                continue
+            kind, value = message
+            if kind == "shape":
+                self.shapes[value.shape_id] = value
+                self.shapes.move_to_end(value.shape_id)
+                while len(self.shapes) > SHAPES_KEPT:
+                    self.shapes.popitem(last=False)
+                changed |= bool(self.position and self.position["shape"] == value.shape_id)
+                continue
+            self.received += 1
+            now = time.monotonic()
+            if (self.position is not None and addr == self.source and now - self.updated < SOURCE_SWITCH
+                    and not cursorwire.seq_newer(value["seq"], self.position["seq"])):
+                self.stale += 1  # reordered or duplicated: a newer one was shown already
+                continue
+            self.position, self.source, self.updated = value, addr, now
+            changed = True
+            if self.on_position:
+                self.on_position(value, time.time_ns() // 1000)
+
+    def current(self):
+        """(position dict or None, Shape) to show; None while hidden or without a live sender."""
+        position = self.position
+        if position is None or not position["visible"] or time.monotonic() - self.updated > config.CURSOR_TIMEOUT:
+            return None, None
+        shape = self.shapes.get(position["shape"]) or self.shapes[cursorwire.DEFAULT_SHAPE_ID]
+        return position, shape
+
+    def run(self):
+        """Receives without a display (benchmarks, headless use) until stop()."""
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.sock, selectors.EVENT_READ)
+            while not self.stop_event.is_set():
+                if selector.select(0.2):
+                    self.receive()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def format_stats(self):
+        return f"{self.received} updates, {self.stale} out of order, {len(self.shapes) - 1} shapes"
+
+    def close(self):
+        self.stop()
+        self.sock.close()
+
+
+def video_rect(video_w, video_h, screen_w, screen_h):
+    """(left, top, width, height) of video_w x video_h scaled to fit the screen, centered."""
+    if not video_w or not video_h:
+        return 0, 0, screen_w, screen_h
+    scale = min(screen_w / video_w, screen_h / video_h)
+    width, height = video_w * scale, video_h * scale
+    return (screen_w - width) / 2, (screen_h - height) / 2, width, height
+
+
+def screen_point(position, shape, screen_w, screen_h):
+    """Top left corner of the cursor window for a position."""
+    left, top, width, height = video_rect(position["video_w"], position["video_h"], screen_w, screen_h)
+    return round(left + position["x"] * width) - shape.hot_x, round(top + position["y"] * height) - shape.hot_y
+
+
+class WindowShaper:
+    """Cuts a window to a cursor's outline and makes it click-through (X Shape extension)."""
+
+    SHAPE_BOUNDING = 0
+    SHAPE_INPUT = 2
+    SHAPE_SET = 0
+
+    def __init__(self):
+        self.x11 = ctypes.CDLL(ctypes.util.find_library("X11") or "libX11.so.6")
+        self.xext = ctypes.CDLL(ctypes.util.find_library("Xext") or "libXext.so.6")
+        self.x11.XOpenDisplay.restype = ctypes.c_void_p
+        self.x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.x11.XCreateBitmapFromData.restype = ctypes.c_ulong
+        self.x11.XCreateBitmapFromData.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_char_p,
+                                                   ctypes.c_uint, ctypes.c_uint]
+        self.x11.XFreePixmap.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        self.x11.XFlush.argtypes = [ctypes.c_void_p]
+        self.x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.xext.XShapeCombineMask.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+                                                ctypes.c_int, ctypes.c_ulong, ctypes.c_int]
+        self.xext.XShapeCombineRectangles.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int,
+                                                      ctypes.c_int, ctypes.c_int, ctypes.c_void_p,
+                                                      ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        self.display = self.x11.XOpenDisplay(None)
+        if not self.display:
+            raise OSError("cannot open the X display")
+
+    @staticmethod
+    def mask(shape):
+        """XBM bitmap (rows padded to bytes, least significant bit first) of the opaque pixels."""
+        stride = (shape.width + 7) // 8
+        bits = bytearray(stride * shape.height)
+        for y in range(shape.height):
+            for x in range(shape.width):
+                if shape.alpha(x, y) >= 128:
+                    bits[y * stride + x // 8] |= 1 << (x % 8)
+        return bytes(bits)
+
+    def apply(self, window, shape):
+        bitmap = self.x11.XCreateBitmapFromData(self.display, window, self.mask(shape), shape.width, shape.height)
+        self.xext.XShapeCombineMask(self.display, window, self.SHAPE_BOUNDING, 0, 0, bitmap, self.SHAPE_SET)
+        # An empty input region: clicks go to the window below
+        self.xext.XShapeCombineRectangles(self.display, window, self.SHAPE_INPUT, 0, 0, None, 0, self.SHAPE_SET, 0)
+        self.x11.XFreePixmap(self.display, bitmap)
+        self.x11.XFlush(self.display)
+
+    def close(self):
+        if self.display:
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+
+
+class CursorOverlay:
+    """The cursor window; owns its Tk interpreter on its own thread."""
+
+    def __init__(self, listener, screen_size=None):
+        self.listener = listener
+        self.screen_size = screen_size
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.root = self.label = self.image = self.shaper = None
+        self.shape_id = None
+        self.placed = None
+        self.moves = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        import tkinter as tk
+        self.root = tk.Tk()
+        self.root.overrideredirect(True)
+        self.root.attributes("-topmost", True)
+        self.root.withdraw()
+        self.label = tk.Label(self.root, bd=0, highlightthickness=0, bg="black")
+        self.label.pack()
+        if not self.screen_size:
+            self.screen_size = (self.root.winfo_screenwidth(), self.root.winfo_screenheight())
+        try:
+            self.shaper = WindowShaper()
+        except OSError as e:
+            print(f"⚠️  Cursor overlay without X Shape ({e}): the pointer is drawn on a square.")
+        self.root.tk.createfilehandler(self.listener.sock, tk.READABLE, self._readable)
+        self.root.after(250, self._tick)
+        try:
+            self.root.mainloop()
+        finally:
+            self.root.tk.deletefilehandler(self.listener.sock)
+            if self.shaper:
+                self.shaper.close()
+
+    def _readable(self, *_):
+        if self.listener.receive():
+            self.update()
+
+    def _tick(self):
+        if self.stop_event.is_set():
+            self.root.destroy()
+            return
+        self.update()  # hides the pointer when the sender went quiet
+        self.root.after(250, self._tick)
+
+    def _set_shape(self, shape):
+        import tkinter as tk
+        self.image = tk.PhotoImage(master=self.root, width=shape.width, height=shape.height)
+        rows = []
+        for y in range(shape.height):
+            row = shape.rgba[y * shape.width * 4:(y + 1) * shape.width * 4]
+            rows.append("{" + " ".join(f"#{row[i]:02x}{row[i + 1]:02x}{row[i + 2]:02x}"
+                                       for i in range(0, len(row), 4)) + "}")
+        self.image.put(" ".join(rows))
+        self.label.configure(image=self.image, width=shape.width, height=shape.height)
+        self.root.geometry(f"{shape.width}x{shape.height}")
+        self.root.update_idletasks()
+        if self.shaper:
+            self.shaper.apply(int(self.root.wm_frame(), 16), shape)
+        self.shape_id = shape.shape_id
+
+    def update(self):
+        position, shape = self.listener.current()
+        if position is None:
+            if self.placed is not None:
+                self.root.withdraw()
+                self.placed = None
+            return
+        if shape.shape_id != self.shape_id:
+            self._set_shape(shape)
+        x, y = screen_point(position, shape, *self.screen_size)
+        if (x, y) != self.placed:
+            self.root.geometry(f"+{x}+{y}")
+            if self.placed is None:
+                self.root.deiconify()
+                self.root.lift()
+            self.placed = (x, y)
+            self.moves += 1
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.listener.close()
+        print(f"🖱️  Cursor channel: {self.listener.format_stats()}")
+
+
+def start():
+    """Listens on CURSOR_PORT and shows the pointer over the video. Returns the overlay or None."""
+    if not os.environ.get("DISPLAY"):
+        print("⚠️  CURSOR_CHANNEL needs an X display (X11 or XWayland); the pointer is not drawn.")
+        return None
+    if not config.FULLSCREEN:
+        print("ℹ️ CURSOR_CHANNEL places the pointer for a fullscreen video; it will be off in a window.")
+    try:
+        listener = CursorListener()
+    except OSError as e:
+        print(f"⚠️  Cursor channel off: port {config.CURSOR_PORT}: {e}")
+        return None
+    mode = discovery.display_mode()
+    print(f"🖱️  Cursor channel on {config.LISTEN_IP}:{config.CURSOR_PORT} (udp), drawn over the video")
+    return CursorOverlay(listener, mode[:2] if mode else None).start()
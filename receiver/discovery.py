@@ -0,0 +1,238 @@
+"""
+OpenSecondDisplay - Receiver Discovery Service
+Role: Linux Receiver Engineer
+
+Description:
+    Answers OSD_DISCOVER broadcasts from senders. Runs as an asyncio UDP
+    endpoint in a background thread, so a burst of scans never holds up the
+    receiver.
+
+    One socket bound to 0.0.0.0 hears the broadcast on every interface. The
+    reply names the address of the interface whose subnet the sender is on
+    (a kernel route lookup for senders behind a router), so a host with
+    Ethernet + Wi-Fi answers each side with the right IP. The interface
+    table is read with ioctl()s and re-read every INTERFACE_REFRESH seconds;
+    a reply is rebuilt only when an address changes. Without ioctl()s
+    (Windows) only the address of the default route is known.
+
+    Reply (the first three fields are all that older senders read):
+
+        OSD_ACK:<hostname>:<ip>:res=<WxH>:hz=<refresh>:dec=<h264,hevc>:tr=<tcp,udp,srt>:port=<port>
+
+    res/hz describe the display the receiver plays on, so the sender can
+    encode at exactly that size instead of scaling twice.
+"""
+
+import asyncio
+import glob
+import os
+import re
+import socket
+import struct
+import subprocess
+import threading
+from collections import namedtuple
+
+import capabilities
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: no interface ioctls, see interfaces()
+    fcntl = None
+
+DISCOVER = b"OSD_DISCOVER"
+INTERFACE_REFRESH = 5.0  # seconds
+STREAM_CODECS = ("h264", "hevc")
+
+# Linux <linux/sockios.h> / <net/if.h>
+SIOCGIFFLAGS = 0x8913
+SIOCGIFADDR = 0x8915
+SIOCGIFBRDADDR = 0x8919
+SIOCGIFNETMASK = 0x891B
+IFF_UP = 0x1
+IFF_BROADCAST = 0x2
+IFF_LOOPBACK = 0x8
+
+# xrandr: "   1920x1080     60.00*+  50.00    59.94"
+XRANDR_CURRENT_RE = re.compile(r"^\s+(\d+)x(\d+)\S*\s.*?([\d.]+)\*")
+
+Interface = namedtuple("Interface", "name address netmask broadcast")
+
+
+def _ifreq(sock, request, name):
+    return fcntl.ioctl(sock.fileno(), request, struct.pack("256s", name.encode()[:15]))
+
+
+def interfaces():
+    """IPv4 interfaces that are up and broadcast-capable."""
+    if fcntl is None:
+        return _default_interface()
+    found = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for _, name in socket.if_nameindex():
+            try:
+                flags = struct.unpack("H", _ifreq(sock, SIOCGIFFLAGS, name)[16:18])[0]
+                if not flags & IFF_UP or not flags & IFF_BROADCAST or flags & IFF_LOOPBACK:
+                    continue
+                found.append(Interface(
+                    name,
+                    socket.inet_ntoa(_ifreq(sock, SIOCGIFADDR, name)[20:24]),
+                    socket.inet_ntoa(_ifreq(sock, SIOCGIFNETMASK, name)[20:24]),
+                    socket.inet_ntoa(_ifreq(sock, SIOCGIFBRDADDR, name)[20:24]),
+                ))
+            except OSError:
+                continue  # no IPv4 address on this interface
+    return found
+
+
+def _default_interface():
+    """The interface of the default route, assumed to be a /24 (no ioctls to ask)."""
+    address = route_address("8.8.8.8")
+    if not address or address.startswith("127."):
+        return []
+    netmask = "255.255.255.0"
+    broadcast = socket.inet_ntoa(struct.pack(">I", _ip_int(address) | 0xFF))
+    return [Interface("default", address, netmask, broadcast)]
+
+
+def _ip_int(address):
+    return int.from_bytes(socket.inet_aton(address), "big")
+
+
+def route_address(peer):
+    """Local address the kernel would use to reach peer (no packet is sent)."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        try:
+            sock.connect((peer, 9))
+            return sock.getsockname()[0]
+        except OSError:
+            return None
+
+
+def display_mode():
+    """(width, height, refresh_hz) of the display FFplay shows on; refresh may be None."""
+    if config.DISPLAY_MODE != "auto":
+        size, _, hz = config.DISPLAY_MODE.partition("@")
+        width, height = size.split("x")
+        return int(width), int(height), float(hz) if hz else None
+    if os.environ.get("DISPLAY"):
+        try:
+            out = subprocess.run(["xrandr", "--current"], stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL, text=True, timeout=5).stdout
+        except (OSError, subprocess.TimeoutExpired):
+            out = ""
+        for line in out.splitlines():
+            match = XRANDR_CURRENT_RE.match(line)
+            if match:
+                return int(match.group(1)), int(match.group(2)), float(match.group(3))
+    # Console / Wayland without xrandr: preferred mode of the first connected DRM output.
+    for status in sorted(glob.glob("/sys/class/drm/card*-*/status")):
+        try:
+            with open(status) as f:
+                if f.read().strip() != "connected":
+                    continue
+            with open(os.path.join(os.path.dirname(status), "modes")) as f:
+                mode = f.readline().strip()
+        except OSError:
+            continue
+        if "x" in mode:
+            width, height = mode.split("x")[:2]
+            return int(width), int(re.match(r"\d+", height).group()), None
+    return None
+
+
+def receiver_info():
+    """Everything the ACK advertises apart from the address (spawns xrandr/FFplay once)."""
+    caps = capabilities.probe("ffplay") or {"decoders": [], "protocols": []}
+    decoders = [codec for codec in STREAM_CODECS
+                if any(name == codec or name.startswith(codec + "_") for name in caps["decoders"])]
+    transports = ["tcp", "udp"] + (["srt"] if "srt" in caps.get("protocols", []) else [])
+    fields = []
+    mode = display_mode()
+    if mode:
+        fields.append(f"res={mode[0]}x{mode[1]}")
+        if mode[2]:
+            fields.append(f"hz={mode[2]:g}")
+    fields += [f"dec={','.join(decoders)}", f"tr={','.join(transports)}", f"port={config.PORT}"]
+    return ":".join(fields)
+
+
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, service):
+        self.service = service
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if data.strip() == DISCOVER:
+            self.transport.sendto(self.service.reply_for(addr[0]), addr)
+
+    def error_received(self, exc):
+        print(f"⚠️ Discovery Error: {exc}")
+
+
+class DiscoveryService:
+    """OSD_DISCOVER responder; reply bytes are built once per interface address."""
+
+    def __init__(self):
+        self.hostname = socket.gethostname()
+        self.info = ""
+        self.interfaces = []
+        self.replies = {}   # local address -> ACK bytes
+        self.answered = 0
+
+    def refresh_interfaces(self):
+        table = interfaces()
+        if table != self.interfaces:
+            self.interfaces = table
+            self.replies = {}
+            names = ", ".join(f"{i.name} {i.address}" for i in table) or "no broadcast interfaces"
+            print(f"📡 Discovery answering on: {names}")
+
+    def address_for(self, peer):
+        """Address of our interface on the sender's subnet, else the routed one."""
+        peer_ip = _ip_int(peer)
+        for iface in self.interfaces:
+            mask = _ip_int(iface.netmask)
+            if peer_ip & mask == _ip_int(iface.address) & mask:
+                return iface.address
+        return route_address(peer) or (self.interfaces[0].address if self.interfaces else "127.0.0.1")
+
+    def reply_for(self, peer):
+        address = self.address_for(peer)
+        reply = self.replies.get(address)
+        if reply is None:
+            reply = self.replies[address] = f"OSD_ACK:{self.hostname}:{address}:{self.info}".encode()
+        self.answered += 1
+        return reply
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        self.info = await loop.run_in_executor(None, receiver_info)
+        self.refresh_interfaces()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: DiscoveryProtocol(self), local_addr=("0.0.0.0", config.DISCOVERY_PORT))
+        print(f"📡 Discovery Service listening on port {config.DISCOVERY_PORT} ({self.info})")
+        try:
+            while True:
+                await asyncio.sleep(INTERFACE_REFRESH)
+                self.refresh_interfaces()
+        finally:
+            transport.close()
+
+
+def start():
+    """Runs the discovery service in a daemon thread. Returns the service."""
+    service = DiscoveryService()
+
+    def runner():
+        try:
+            asyncio.run(service.run())
+        except OSError as e:
+            print(f"⚠️ Discovery Error: {e}")
+
+    threading.Thread(target=runner, daemon=True).start()
+    return service
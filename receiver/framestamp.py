@@ -0,0 +1,144 @@
+"""
+OpenSecondDisplay - Frame Timestamps
+Role: Networking & Performance Engineer
+
+Description:
+    In-band per-frame timestamps for measuring latency during a live
+    session (FRAME_TIMESTAMPS on the sender, LATENCY_METRICS on the
+    receiver). The sender puts one TS packet on a private PID right before
+    the first packet of every video frame:
+
+      "OSDT", frame sequence number, PTS (90 kHz), capture time and
+      send time (both sender wall clock, microseconds)
+
+    STAMP_PID is not listed in the PMT, so decoders and players skip it;
+    the receiver finds it with a byte search. Send time is when the frame
+    came out of the encoder. Capture time is reconstructed from the PTS
+    (which FFmpeg takes from the capture clock): anchor + PTS elapsed, with
+    the anchor at the earliest send time seen minus PTS elapsed, so it is
+    exact up to the encoder's fastest frame (a few ms at most).
+
+    The two wall clocks are compared NTP-style over the feedback channel:
+    the receiver sends OSD_CLOCK:<t1> to the sender's FEEDBACK_PORT, the
+    sender answers OSD_CLOCK:<t1>:<t2>:<t3> (receive and reply times) and
+    the receiver, with its receive time t4, gets
+      offset = ((t2 - t1) + (t3 - t4)) / 2    (sender minus receiver)
+      rtt    = (t4 - t1) - (t3 - t2)
+    The sample with the lowest rtt is the most accurate (see latencystats.py).
+
+    This file is identical in sender/ and receiver/ (like mpegts.py).
+"""
+
+import struct
+import time
+
+import mpegts
+
+TS_PACKET_SIZE = mpegts.TS_PACKET_SIZE
+STAMP_PID = 0x1FF0
+STAMP_MAGIC = b"OSDT"
+STAMP = struct.Struct(">4sIQQQ")  # magic, seq, pts (NO_PTS if none), capture us, send us
+NO_PTS = 2**64 - 1
+CLOCK_PREFIX = "OSD_CLOCK"
+
+# Sync byte, payload_unit_start + PID: what find_stamps() searches for.
+_STAMP_HEAD = bytes([mpegts.TS_SYNC_BYTE, 0x40 | STAMP_PID >> 8, STAMP_PID & 0xFF])
+
+
+def now_us():
+    return time.time_ns() // 1000
+
+
+def stamp_packet(seq, pts, capture_us, sent_us, cc):
+    """One 188-byte TS packet carrying a frame's timestamps."""
+    payload = STAMP.pack(STAMP_MAGIC, seq & 0xFFFFFFFF, NO_PTS if pts is None else pts, capture_us, sent_us)
+    return _STAMP_HEAD + bytes([0x10 | (cc & 0x0F)]) + payload + b"\xff" * (TS_PACKET_SIZE - 4 - len(payload))
+
+
+def find_stamps(buffer, end, start=0):
+    """(offset, seq, pts or None, capture us, send us) of every stamp packet in buffer[start:end].
+
+    buffer is bytes or a bytearray holding whole, packet-aligned TS packets from start.
+    """
+    stamps = []
+    i = buffer.find(_STAMP_HEAD, start, end)
+    while i >= 0:
+        if (i - start) % TS_PACKET_SIZE == 0 and i + 4 + STAMP.size <= end:
+            magic, seq, pts, capture_us, sent_us = STAMP.unpack_from(buffer, i + 4)
+            if magic == STAMP_MAGIC:
+                stamps.append((i, seq, None if pts == NO_PTS else pts, capture_us, sent_us))
+        i = buffer.find(_STAMP_HEAD, i + 1, end)
+    return stamps
+
+
+class CaptureClock:
+    """Sender wall-clock capture time of a frame from its PTS (one per encoder)."""
+
+    def __init__(self):
+        self.base_pts = None
+        self.anchor_us = None
+
+    def capture_us(self, pts, sent_us):
+        if pts is None:
+            return sent_us
+        if self.base_pts is None:
+            self.base_pts = pts
+        elapsed_us = (pts - self.base_pts) % mpegts.PTS_WRAP * 1_000_000 // mpegts.PTS_HZ
+        if self.anchor_us is None or sent_us - elapsed_us < self.anchor_us:
+            self.anchor_us = sent_us - elapsed_us
+        return self.anchor_us + elapsed_us
+
+
+class FrameStamper:
+    """Inserts a stamp packet in front of every frame of an encoder's TS output."""
+
+    def __init__(self):
+        self.seq = 0
+        self.cc = 0
+
+    def stamp(self, chunk, events, clock):
+        """Returns chunk with stamps inserted and events moved onto them (packet-aligned chunk).
+
+        events are the inspector's (offset, is_key) frame starts in chunk; clock is
+        the encoder's CaptureClock.
+        """
+        if not events:
+            return chunk, events
+        sent_us = now_us()
+        out = bytearray()
+        moved = []
+        previous = 0
+        for offset, is_key in events:
+            out += chunk[previous:offset]
+            moved.append((len(out), is_key))
+            pts = mpegts.pes_pts(chunk, offset)
+            self.seq += 1
+            out += stamp_packet(self.seq, pts, clock.capture_us(pts, sent_us), sent_us, self.cc)
+            self.cc += 1
+            previous = offset
+        out += chunk[previous:]
+        return bytes(out), moved
+
+
+def clock_request(t1_us):
+    return f"{CLOCK_PREFIX}:{t1_us}".encode()
+
+
+def clock_reply(request, t2_us):
+    """The sender's answer to a clock request (None if it is not one)."""
+    parts = request.decode(errors="replace").strip().split(":")
+    if len(parts) != 2 or parts[0] != CLOCK_PREFIX or not parts[1].isdigit():
+        return None
+    return f"{CLOCK_PREFIX}:{parts[1]}:{t2_us}:{now_us()}".encode()
+
+
+def parse_clock_reply(data, t4_us):
+    """(offset us, rtt us) from a reply received at t4_us, or None. offset = sender - receiver clock."""
+    parts = data.decode(errors="replace").strip().split(":")
+    if len(parts) != 4 or parts[0] != CLOCK_PREFIX:
+        return None
+    try:
+        t1, t2, t3 = (int(p) for p in parts[1:])
+    except ValueError:
+        return None
+    return ((t2 - t1) + (t3 - t4_us)) / 2, (t4_us - t1) - (t3 - t2)
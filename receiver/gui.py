@@ -13,22 +13,20 @@ import threading
 import sys
 import os
 import config
+import timeseries
 
-import socket
 
 # Global state
 running_process = None
 
 def get_ip():
+    """Addresses of every broadcast-capable interface (works on offline LANs too)."""
     try:
-        # Connect to an external server (doesn't send data) to get the preferred interface IP
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
-        s.close()
-        return ip
-    except Exception:
-        return "127.0.0.1"
+        import discovery
+        addresses = [iface.address for iface in discovery.interfaces()]
+    except (ImportError, OSError):
+        addresses = []
+    return ", ".join(addresses) or "127.0.0.1"
 
 def start_listening():
     global running_process
@@ -36,16 +34,18 @@ def start_listening():
     # 1. Update Config based on UI inputs
     port = port_entry.get()
     fullscreen = fullscreen_var.get()
+    transport = transport_var.get()
     
     # Pass via monkey-patching since we import receiver
     import receiver
     receiver.config.PORT = port
     receiver.config.FULLSCREEN = fullscreen
+    receiver.config.TRANSPORT = transport
     
     # UI Update
     start_btn.config(state=tk.DISABLED)
     stop_btn.config(state=tk.NORMAL)
-    status_label.config(text=f"Status: Listening on Port {port}...", fg="green")
+    status_label.config(text=f"Status: Listening on Port {port} ({transport})...", fg="green")
     
     def run():
         # Receiver main loop blocks usually, but we need to control it.
@@ -74,7 +74,7 @@ def stop_listening():
 # --- UI Setup ---
 root = tk.Tk()
 root.title("OpenSecondDisplay Receiver")
-root.geometry("300x250")
+root.geometry("380x640")
 root.resizable(False, False)
 
 header = tk.Label(root, text="📺 Receiver", font=("Arial", 16, "bold"))
@@ -95,6 +95,11 @@ fullscreen_var = tk.BooleanVar(value=config.FULLSCREEN)
 fs_check = tk.Checkbutton(form_frame, text="Fullscreen", variable=fullscreen_var)
 fs_check.grid(row=1, column=1, pady=5, sticky="w")
 
+tk.Label(form_frame, text="Transport:").grid(row=2, column=0, sticky="e", pady=5)
+transport_var = tk.StringVar(value=config.TRANSPORT)
+transport_dropdown = tk.OptionMenu(form_frame, transport_var, "tcp", "udp", "srt")
+transport_dropdown.grid(row=2, column=1, pady=5, sticky="w")
+
 btn_frame = tk.Frame(root)
 btn_frame.pack(pady=20)
 
@@ -104,6 +109,22 @@ start_btn.pack(side=tk.LEFT, padx=5)
 stop_btn = tk.Button(btn_frame, text="Stop", bg="red", fg="white", state=tk.DISABLED, command=stop_listening)
 stop_btn.pack(side=tk.RIGHT, padx=5)
 
+# Live graphs: sampled on a background thread, redrawn from the Tk loop with after()
+def metrics_snapshot():
+    receiver = sys.modules.get("receiver")
+    return receiver.metrics_snapshot() if receiver else {}
+
+def metrics_info():
+    """Receiver settings saved with a JSON export."""
+    return {"port": port_entry.get(), "transport": transport_var.get(), "ingest_mode": config.INGEST_MODE,
+            "catchup": config.CATCHUP, "jitter_buffer": config.JITTER_BUFFER}
+
+metrics_store = timeseries.MetricsStore()
+timeseries.MetricsSampler(metrics_store, metrics_snapshot,
+                          rates={"bytes": ("bitrate_mbps", 8e-6), "frames": ("fps", 1.0)}).start()
+graph_panel = timeseries.GraphPanel(root, metrics_store, info=metrics_info).pack(pady=(0, 5))
+graph_panel.start()
+
 status_label = tk.Label(root, text="Status: Idle", font=("Arial", 10))
 status_label.pack(side=tk.BOTTOM, pady=10)
 
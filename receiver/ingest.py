@@ -0,0 +1,441 @@
+"""
+OpenSecondDisplay - Receiver Ingest Server
+Role: Linux Receiver Engineer
+
+Description:
+    Owns the listening socket and forwards every incoming MPEG-TS connection
+    into ONE long-lived FFplay reading from stdin. A reconnecting sender then
+    only costs a demuxer resync instead of process startup, SDL window creation
+    and stream probing.
+
+    Bytes are moved with os.splice() (socket -> pipe, no copy through Python)
+    once the first keyframe of a connection has been seen. Until then they are
+    read into a preallocated buffer with recv_into() so the packet headers can
+    be checked for the keyframe that marks "time to first frame". With
+    INSPECT_STREAM enabled every byte takes the recv_into() path and is run
+    through the MPEG-TS inspector (mpegts.py). With CATCHUP enabled they are
+    queued in catchup.py instead and written to the decoder as fast as it
+    reads them, so a backlog can be measured and skipped (see catchup.py).
+    With JITTER_BUFFER as well, jitterbuffer.py decides when each queued
+    frame may go on to the decoder; the select loop wakes up for it.
+    With RECORD_DIR set, every chunk is also handed to recorder.py after it
+    went to the decoder (copy path only, like the two above). With a frame
+    ring (FRAME_RING) the decoder writes raw frames to stdout, which
+    shmring.py publishes to shared memory (with TILES one server per tile
+    feeds tiles.py's compositor the same way). With LATENCY_METRICS every chunk
+    is searched for the sender's frame timestamps and the decoder's log
+    for decoded frames (latencystats.py, copy path only).
+
+    While a sender is connected, an OSD_STATS report (bytes received on this
+    connection, bytes/sec, session number, time to first keyframe) goes back to it over UDP every
+    FEEDBACK_INTERVAL seconds for the sender's adaptive bitrate controller.
+"""
+
+import os
+import selectors
+import socket
+import subprocess
+import time
+import threading
+import catchup
+import config
+import discovery
+import jitterbuffer
+import latencystats
+import mpegts
+import recorder
+import transport
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+
+# 348 packets ~= 64KB, the default Linux pipe capacity.
+CHUNK_SIZE = TS_PACKET_SIZE * 348
+
+HAVE_SPLICE = hasattr(os, "splice")
+
+
+def is_keyframe_packet(view, offset):
+    """True if the TS packet at offset carries the random access indicator."""
+    if view[offset] != TS_SYNC_BYTE:
+        return False
+    has_adaptation = view[offset + 3] & 0x20
+    # adaptation_field_length > 0 and random_access_indicator set
+    return bool(has_adaptation and view[offset + 4] > 0 and view[offset + 5] & 0x40)
+
+
+class IngestServer:
+    """Accepts sender connections and feeds them to a persistent decoder."""
+
+    def __init__(self, decoder_cmd, listen_ip=None, port=None, frame_ring=None, name=None):
+        self.decoder_cmd = decoder_cmd
+        self.frame_ring = frame_ring  # shmring.FrameRing (or tiles.Tile) fed from the decoder's stdout
+        self.tag = f"[{name}] " if name else ""  # prefixes messages when several servers run (tiles.py)
+        self.listen_ip = listen_ip or config.LISTEN_IP
+        self.port = int(port or config.PORT)
+        self.selector = selectors.DefaultSelector()
+        self.listen_sock = None
+        self.decoder = None
+        self.conn = None
+        self.running = False
+
+        self.buffer = bytearray(CHUNK_SIZE)
+        self.view = memoryview(self.buffer)
+        self.fill = 0
+
+        # Per-connection state
+        self.accepted_at = 0.0
+        self.keyframe_seen = False
+        self.spliced_bytes = 0
+        self.peer_ip = None
+        self.conn_bytes = 0
+        self.window_bytes = 0
+        self.window_start = 0.0
+        self.arrival_bps = 0.0
+        self.feedback_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        # Stats
+        self.total_bytes = 0     # all connections (counters for the GUI's graphs)
+        self.frames_received = 0
+        self.sessions = 0
+        self.last_ttff = None
+        self.inspector = mpegts.TSInspector() if config.INSPECT_STREAM else None
+        self.catchup = catchup.CatchUp(self.inspector) if config.CATCHUP else None
+        self.pacer = None
+        if config.JITTER_BUFFER:
+            if self.catchup:
+                mode = discovery.display_mode()
+                self.pacer = jitterbuffer.FramePacer(mode[2] if mode else None, log_path=config.JITTER_LOG)
+            else:
+                print("ℹ️ JITTER_BUFFER holds frames in the catch-up queue; it needs CATCHUP = True.")
+        self.recorder = None
+        if config.RECORD_DIR:
+            self.recorder = recorder.Recorder(inspector=self.catchup.inspector if self.catchup else self.inspector)
+        self.latency = latencystats.LatencyTracker() if config.LATENCY_METRICS else None
+        self.metrics_server = None
+        self.last_metrics_write = 0.0
+        self.write_watch = None  # decoder stdin while registered for EVENT_WRITE
+        self.last_stats_print = time.monotonic()
+
+    # --- Decoder ---
+
+    def start_decoder(self):
+        """Starts the decoder if it is not running (first start or window closed)."""
+        if self.decoder and self.decoder.poll() is None:
+            return
+        if self.decoder:
+            print(f"{self.tag}⚠️ Decoder exited with code {self.decoder.returncode}, restarting...")
+            if self.write_watch:
+                self.selector.unregister(self.write_watch)
+                self.write_watch = None
+            try:
+                self.decoder.stdin.close()
+            except OSError:
+                pass  # unflushed data for a dead decoder
+        self.decoder =subprocess.Popen(self.decoder_cmd, stdin=subprocess.PIPE, bufsize=0,
+                                        stdout=subprocess.PIPE if self.frame_ring else None,
+                                        stderr=subprocess.PIPE if self.latency else None)
+        if self.frame_ring:
+            self.frame_ring.publish_from(self.decoder.stdout)
+        if self.latency:
+            threading.Thread(target=latencystats.read_decoder_log, args=(self.decoder.stderr, self.latency),
+                             daemon=True).start()
+        if self.catchup:
+            # Written from the select loop: never block on a slow decoder.
+            os.set_blocking(self.decoder.stdin.fileno(), False)
+
+    def _write_decoder(self, data):
+        """Writes all of data to the decoder's stdin. Returns False if it went away."""
+        fd = self.decoder.stdin.fileno()
+        try:
+            while data:
+                written = os.write(fd, data)
+                data = data[written:]
+        except (BrokenPipeError, OSError):
+            return False
+        return True
+
+    def _flush_catchup(self, _=None):
+        """Hands queued stream data to the decoder as far as its pipe takes it (and the pacer allows)."""
+        limit = self.pacer.write_limit(self.catchup.frames) if self.pacer else None
+        if not self.catchup.write_to(self.decoder.stdin.fileno(), limit, self.pacer.started if self.pacer else None):
+            self.start_decoder()
+        # Only ask for EVENT_WRITE while something may be written.
+        stdin = self.decoder.stdin if self.catchup.has_pending(limit) else None
+        if stdin is not self.write_watch:
+            if self.write_watch:
+                self.selector.unregister(self.write_watch)
+            if stdin:
+                self.selector.register(stdin, selectors.EVENT_WRITE, self._flush_catchup)
+            self.write_watch = stdin
+
+    # --- Connections ---
+
+    def _accept(self):
+        conn, addr = self.listen_sock.accept()
+        if self.conn:
+            # A new sender replaces the old one (e.g. sender restarted before
+            # our side noticed the disconnect).
+            self._close_conn()
+        conn.setblocking(False)
+        transport.tune_socket(conn, "recv")
+        self.conn = conn
+        self.accepted_at = time.monotonic()
+        self.keyframe_seen = False
+        self.fill = 0
+        self.spliced_bytes = 0
+        self.peer_ip = addr[0]
+        self.conn_bytes = 0
+        self.window_bytes = 0
+        self.window_start = self.accepted_at
+        self.arrival_bps = 0.0
+        self.sessions += 1
+        if self.inspector:
+            self.inspector.reset()
+        if self.catchup:
+            self.catchup.reset()
+        if self.pacer:
+            self.pacer.reset()
+        if self.recorder:
+            if not (self.inspector or self.catchup):
+                self.recorder.inspector.reset()
+            self.recorder.new_session(self.sessions)
+        if self.latency:
+            self.latency.new_session()
+        self.selector.register(conn, selectors.EVENT_READ, self._read)
+        print(f"{self.tag}🔗 Sender connected from {addr[0]}:{addr[1]} (session {self.sessions})")
+
+    def _close_conn(self):
+        self.selector.unregister(self.conn)
+        self.conn.close()
+        self.conn = None
+        # Splice moves bytes without regard to packet boundaries. Complete a torn
+        # packet with stuffing so the demuxer resyncs on the next sync byte.
+        torn = self.spliced_bytes % TS_PACKET_SIZE
+        if torn:
+            self._write_decoder(b"\xff" * (TS_PACKET_SIZE - torn))
+        if self.recorder:
+            self.recorder.end_session()
+        print(f"{self.tag}🔌 Sender disconnected, decoder kept warm.")
+
+    def _read(self, conn):
+        if (self.keyframe_seen and HAVE_SPLICE and not self.inspector and not self.catchup and not self.recorder
+                and not self.latency):
+            ok = self._read_splice(conn)
+        else:
+            ok = self._read_copy(conn)
+        if not ok:
+            self._close_conn()
+
+    def _read_copy(self, conn):
+        """recv_into() path: forwards whole packets and looks for the first keyframe."""
+        try:
+            n = conn.recv_into(self.view[self.fill:])
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        if not n:
+            return False
+        self.conn_bytes += n
+        self.window_bytes += n
+        self.total_bytes += n
+
+        end = self.fill + n
+        whole = end - end % TS_PACKET_SIZE
+        chunk = self.view[:whole]
+        if self.latency:
+            self.latency.scan(self.buffer, whole)  # first: the arrival time is the measurement
+        if self.catchup:
+            events = self.catchup.push(chunk)
+            if self.pacer:
+                self.pacer.arrived(chunk, events)
+        elif self.inspector:
+            events = self.inspector.feed(chunk)
+        elif self.recorder:
+            events = self.recorder.inspector.feed(chunk)
+        else:
+            events = None
+        if events is not None:
+            self.frames_received += len(events)
+            found = any(keyframe for _, keyframe in events)
+        else:
+            found = False
+            if not self.keyframe_seen:
+                found = any(is_keyframe_packet(self.view, offset) for offset in range(0, whole, TS_PACKET_SIZE))
+        if found and not self.keyframe_seen:
+            self.keyframe_seen = True
+            self.last_ttff = time.monotonic() - self.accepted_at
+            print(f"{self.tag}⏱️ Time to first keyframe: {self.last_ttff * 1000:.0f} ms")
+
+        if self.catchup:
+            self._flush_catchup()
+        elif whole and not self._write_decoder(self.view[:whole]):
+            self.start_decoder()
+        if self.recorder:
+            self.recorder.write(chunk, events)  # after the decoder has it
+
+        # Keep the partial packet (< 188 bytes) at the front of the buffer.
+        self.fill = end - whole
+        if self.fill:
+            self.buffer[:self.fill] = self.view[whole:end]
+        return True
+
+    def _read_splice(self, conn):
+        """Zero-copy path: socket -> decoder pipe inside the kernel."""
+        if self.fill:
+            # Leftover partial packet from the copy path goes first.
+            self._write_decoder(self.view[:self.fill])
+            self.spliced_bytes = self.fill
+            self.fill = 0
+        try:
+            n = os.splice(conn.fileno(), self.decoder.stdin.fileno(), CHUNK_SIZE)
+        except BlockingIOError:
+            return True
+        except BrokenPipeError:
+            self.start_decoder()
+            return True
+        except OSError:
+            return False
+        if not n:
+            return False
+        self.spliced_bytes += n
+        self.conn_bytes += n
+        self.window_bytes += n
+        self.total_bytes += n
+        return True
+
+    # --- Lifecycle ---
+
+    def serve_forever(self):
+        self.listen_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listen_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        transport.tune_socket(self.listen_sock, "recv")  # inherited by accepted sockets
+        self.listen_sock.bind((self.listen_ip, self.port))
+        self.listen_sock.listen(1)
+        self.listen_sock.setblocking(False)
+        self.selector.register(self.listen_sock, selectors.EVENT_READ, None)
+        if self.latency:
+            # Clock replies from the sender come back to the feedback socket.
+            self.feedback_sock.setblocking(False)
+            self.selector.register(self.feedback_sock, selectors.EVENT_READ, self._read_clock_replies)
+            if config.METRICS_PORT:
+                self.metrics_server = latencystats.start_server(self.latency)
+
+        self.start_decoder()
+        self.running = True
+        while self.running:
+            timeout = 0.1
+            if self.pacer and self.pacer.wakeup is not None:
+                timeout = min(timeout, max(0.0, self.pacer.wakeup - time.monotonic()))
+            for key, _ in self.selector.select(timeout=timeout):
+                if key.data is None:
+                    self._accept()
+                else:
+                    key.data(key.fileobj)
+            if self.pacer:
+                if self.pacer.wakeup is not None and self.pacer.wakeup <= time.monotonic():
+                    self._flush_catchup()
+                self.pacer.tick()
+            self.start_decoder()
+            self._send_feedback()
+            self._print_stats()
+            self._write_metrics()
+
+    def _send_feedback(self):
+        """OSD_STATS:<bytes this connection>:<bytes/sec>:<session>:<first keyframe ms> back to the sender."""
+        if not self.conn:
+            return
+        now = time.monotonic()
+        elapsed = now - self.window_start
+        if elapsed < config.FEEDBACK_INTERVAL:
+            return
+        self.arrival_bps = self.window_bytes / elapsed
+        self.window_bytes = 0
+        self.window_start = now
+        ttff_ms = self.last_ttff * 1000 if self.keyframe_seen else -1
+        report = f"OSD_STATS:{self.conn_bytes}:{self.arrival_bps:.0f}:{self.sessions}:{ttff_ms:.0f}"
+        try:
+            self.feedback_sock.sendto(report.encode(), (self.peer_ip, config.FEEDBACK_PORT))
+            if self.latency:
+                self.feedback_sock.sendto(self.latency.clock_request(), (self.peer_ip, config.FEEDBACK_PORT))
+        except OSError:
+            pass
+
+    def _read_clock_replies(self, sock):
+        while True:
+            try:
+                data = sock.recv(256)
+            except OSError:  # BlockingIOError once drained; ICMP errors while the sender is not listening
+                return
+            self.latency.clock_reply(data)
+
+    def _write_metrics(self):
+        if not (self.latency and config.METRICS_FILE):
+            return
+        now = time.monotonic()
+        if now - self.last_metrics_write >= config.STATS_INTERVAL:
+            self.last_metrics_write = now
+            latencystats.write_metrics_file(self.latency)
+
+    def _print_stats(self):
+        if not (self.inspector or self.catchup or self.recorder or self.frame_ring or self.latency) or not self.conn:
+            return
+        now = time.monotonic()
+        if now - self.last_stats_print >= config.STATS_INTERVAL:
+            self.last_stats_print = now
+            if self.inspector:
+                print(f"{self.tag}📊 Stream stats:\n" + self.inspector.format_stats())
+            if self.catchup:
+                piped = self.catchup.decoder_pipe_bytes(self.decoder.stdin.fileno())
+                print(f"{self.tag}⏩ Catch-up: {self.catchup.format_stats()}, decoder pipe {piped // 1024} KB")
+            if self.pacer:
+                print(f"{self.tag}🎞️  Jitter buffer: {self.pacer.format_stats()}")
+            if self.recorder:
+                print(f"{self.tag}⏺️  Recorder: {self.recorder.format_stats()}")
+            if self.frame_ring:
+                print(f"{self.tag}🖼️  {self.frame_ring.format_stats()}")
+            if self.latency:
+                print(f"{self.tag}⏱️  Latency: {self.latency.format_stats()}")
+
+    def metrics(self):
+        """Counters and gauges for the GUI's live graphs (see receiver.metrics_snapshot())."""
+        latency = self.latency.take_mean("total") if self.latency else None
+        decoder = self.decoder
+        return {
+            "bytes": self.total_bytes,
+            # Frame starts are only seen when the stream is parsed (not on the splice path).
+            "frames": self.frames_received if self.inspector or self.catchup or self.recorder else None,
+            "queue_frames": len(self.catchup.frames) if self.catchup else None,
+            "latency_ms": latency * 1000 if latency is not None else None,
+            "pids": [decoder.pid] if decoder and decoder.poll() is None else [],
+        }
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        if self.conn:
+            self._close_conn()
+        if self.listen_sock:
+            self.selector.unregister(self.listen_sock)
+            self.listen_sock.close()
+            self.listen_sock = None
+        if self.latency and self.feedback_sock in self.selector.get_map():
+            self.selector.unregister(self.feedback_sock)
+        self.feedback_sock.close()
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+            self.metrics_server = None
+        if self.recorder:
+            self.recorder.close()
+        if self.pacer:
+            self.pacer.close()
+        if self.decoder and self.decoder.poll() is None:
+            self.decoder.terminate()
+            try:
+                self.decoder.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.decoder.kill()
+        self.decoder = None
@@ -0,0 +1,244 @@
+"""
+OpenSecondDisplay - Receiver Jitter Buffer
+Role: Linux Receiver Engineer
+
+Description:
+    FFplay runs with setpts=0: every frame is shown the moment it is decoded,
+    so frames that arrive unevenly (Wi-Fi, a busy sender) are shown unevenly,
+    and a frame that comes late leaves the previous one on screen for an
+    extra refresh or more. With JITTER_BUFFER the ingest server keeps each
+    frame in the catch-up queue (catchup.py) until it is due, and the decoder
+    gets frames on a steady cadence instead of as they happen to arrive.
+
+      - The MPEG-TS demuxer passes a frame on only when the next one starts
+        (video PES packets carry no length), so a frame is presented by
+        writing the first packet of the frame after it. That packet is what
+        waits for the frame's due time; even without this buffer a frame
+        waits for the next one, so the delay below counts from there.
+      - A frame is due at its decode timestamp (DTS) on the local clock plus
+        a playout delay. The clock offset is the smallest transit (arrival
+        - timestamp) of the last JITTER_WINDOW seconds: the frame that got
+        through fastest. The delay is one frame interval (the wait for the
+        next frame) plus the JITTER_QUANTILE share of how much later than
+        that the other frames arrived, kept between JITTER_MIN_FRAMES and
+        JITTER_MAX_FRAMES frame intervals.
+      - The delay grows at once (a frame is held a little longer, once) and
+        shrinks by at most JITTER_SHRINK of a frame interval per frame, so
+        the buffer drains without a visible jump.
+      - Due times are rounded up to the display's refresh interval (from
+        DISPLAY_MODE / the detected mode): 30 fps on a 60 Hz panel then
+        always gets two refreshes per frame. The refresh phase (vblank) is
+        not known here, only the interval.
+
+    Per presented frame it counts frames shown late (more than half a
+    refresh after their due time, because the next frame was not there),
+    refreshes the previous frame was repeated for beyond its own, and
+    dropped frames (replaced within half a refresh, so never really seen:
+    what happens when the buffer runs dry and refills). A pause of the
+    sender (FRAME_GATE sends nothing for a still screen) is not counted as
+    late. The buffer depth (frames held) is sampled for every frame; it is
+    printed every STATS_INTERVAL and, with JITTER_LOG, written to a CSV file
+    once a second together with the delay and the counters.
+"""
+
+import math
+import time
+from collections import OrderedDict, deque
+
+import config
+import mpegts
+
+PTS_WRAP = mpegts.PTS_WRAP
+PTS_HZ = mpegts.PTS_HZ
+DEFAULT_FRAME_INTERVAL = 1 / 60  # until two timestamps have been seen
+DISCONTINUITY = 10.0    # seconds: a bigger (or backwards) timestamp step is a new timeline (new encoder)
+PAUSE_FRAMES = 2.5      # a frame this many intervals after the previous one follows a sender pause
+TIMESTAMPS_KEPT = 512   # frames tracked ahead of the decoder (frames a catch-up drops age out)
+LOG_INTERVAL = 1.0
+LOG_HEADER = "time_s,frames,depth_mean,depth_max,delay_ms,jitter_ms,late,repeated,dropped\n"
+
+
+class FramePacer:
+    """Decides how much of the catch-up queue may go to the decoder, and when."""
+
+    def __init__(self, refresh_hz=None, clock=time.monotonic, log_path=None):
+        self.clock = clock
+        self.refresh = 1 / refresh_hz if refresh_hz else None
+        self.frame_interval = DEFAULT_FRAME_INTERVAL
+        self.wakeup = None   # clock time the next held frame becomes due, None if nothing is held
+        self.depth = 0       # frames in the queue at the last write
+
+        self.frames = 0
+        self.late = 0
+        self.repeated = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.depth_sum = 0
+        self.window = [0, 0, 0, 0, 0, 0]  # frames, depth sum, depth max, late, repeated, dropped
+        self.started_at = clock()
+        self.last_log = self.started_at
+        self.log = None
+        if log_path:
+            self.log = open(log_path, "w")
+            self.log.write(LOG_HEADER)
+        self.reset()
+
+    def reset(self):
+        """New connection: a new timeline."""
+        self.last_dts = None
+        self.seconds = 0.0             # stream time of the newest frame
+        self.timeline = OrderedDict()  # dts -> stream time of frames not yet started
+        self.transits = deque()        # (arrival, arrival - stream time)
+        self.offset = None             # smallest recent transit
+        self.delay = None
+        self.jitter = 0.0
+        self.current = None            # stream time of the frame the decoder is waiting to complete
+        self.previous = None           # stream time of the frame presented before it
+        self.presented_at = None
+        self.epoch = None              # a due time on the refresh grid
+        self.wakeup = None
+
+    # --- Input ---
+
+    def arrived(self, view, events):
+        """Takes the arrival of frame starts (the inspector's (offset, is_key) events in view)."""
+        now = self.clock()
+        for offset, _ in events:
+            dts = mpegts.pes_dts(view, offset)
+            if dts is None:
+                continue
+            step = ((dts - self.last_dts) % PTS_WRAP) / PTS_HZ if self.last_dts is not None else None
+            if step is None or step >= DISCONTINUITY:
+                # Continue the timeline where this frame fits the current offset.
+                self.seconds = now - self.offset if self.offset is not None else 0.0
+            else:
+                self.seconds += step
+                if 0 < step < 1:
+                    self.frame_interval = step
+            self.last_dts = dts
+            self.timeline[dts] = self.seconds
+            while len(self.timeline) > TIMESTAMPS_KEPT:
+                self.timeline.popitem(last=False)
+            self._adapt(now, now - self.seconds)
+
+    def _adapt(self, now, transit):
+        self.transits.append((now, transit))
+        while self.transits[0][0] < now - config.JITTER_WINDOW:
+            self.transits.popleft()
+        spread = sorted(t for _, t in self.transits)
+        self.offset = spread[0]
+        self.jitter = spread[min(len(spread) - 1, int(config.JITTER_QUANTILE * len(spread)))] - self.offset
+        interval = self.frame_interval
+        target = min(config.JITTER_MAX_FRAMES * interval, max(config.JITTER_MIN_FRAMES * interval,
+                                                                interval + self.jitter))
+        if self.delay is None or target > self.delay:
+            self.delay = target
+        else:
+            self.delay = max(target, self.delay - config.JITTER_SHRINK * interval)
+
+    def due(self, seconds):
+        """Clock time at which the frame at stream time `seconds` should be shown."""
+        t = seconds + self.offset + self.delay
+        if self.refresh:
+            if self.epoch is None:
+                self.epoch = t
+            t = self.epoch + math.ceil((t - self.epoch) / self.refresh - 1e-6) * self.refresh
+        return t
+
+    # --- Output ---
+
+    def write_limit(self, frames):
+        """Stream position the decoder may be given data up to (None: all of it).
+
+        frames: the catch-up queue's (position, is_key, dts) frame starts.
+        The first frame whose predecessor is not due yet stops the write.
+        """
+        self.depth = len(frames)
+        self.wakeup = None
+        previous = self.current
+        if self.offset is None:
+            return None
+        now = self.clock()
+        for position, _, dts in frames:
+            seconds = self.timeline.get(dts)
+            if previous is not None and seconds is not None:
+                due = self.due(previous)
+                if due > now:
+                    self.wakeup = due
+                    return position
+            previous = seconds
+        return None
+
+    def started(self, dts):
+        """The first packet of a frame went to the decoder: the frame before it is presented."""
+        now = self.clock()
+        seconds = self.timeline.pop(dts, None)
+        if self.current is not None and seconds is not None and self.offset is not None:
+            self._presented(now, seconds - self.current)
+        self.previous, self.current = self.current, seconds
+
+    def _presented(self, now, step):
+        slot = self.refresh or self.frame_interval
+        late = now - self.due(self.current)
+        late_frame = late > slot / 2 and step <= PAUSE_FRAMES * self.frame_interval
+        repeats = 0
+        if late_frame and self.presented_at is not None and self.previous is not None:
+            # Refreshes the previous frame stayed up beyond its own share of stream time.
+            repeats = max(0, round((now - self.presented_at - (self.current - self.previous)) / slot))
+        dropped = self.presented_at is not None and now - self.presented_at < slot / 2
+        self.presented_at = now
+
+        self.frames += 1
+        self.late += late_frame
+        self.repeated += repeats
+        self.dropped += dropped
+        self.depth_sum += self.depth
+        self.max_depth = max(self.max_depth, self.depth)
+        w = self.window
+        w[0] += 1
+        w[1] += self.depth
+        w[2] = max(w[2], self.depth)
+        w[3] += late_frame
+        w[4] += repeats
+        w[5] += dropped
+
+    # --- Stats ---
+
+    def tick(self):
+        """Writes a JITTER_LOG line once a second (called from the ingest loop)."""
+        now = self.clock()
+        if not self.log or now - self.last_log < LOG_INTERVAL:
+            return
+        self.last_log = now
+        frames, depth_sum, depth_max, late, repeated, dropped = self.window
+        self.window = [0, 0, 0, 0, 0, 0]
+        depth_mean = depth_sum / frames if frames else 0.0
+        delay_ms = self.delay * 1000 if self.delay is not None else 0.0
+        self.log.write(f"{now - self.started_at:.3f},{frames},{depth_mean:.2f},{depth_max},{delay_ms:.1f},"
+                       f"{self.jitter * 1000:.1f},{late},{repeated},{dropped}\n")
+        self.log.flush()
+
+    def stats(self):
+        return {
+            "delay_ms": round(self.delay * 1000, 1) if self.delay is not None else None,
+            "jitter_ms": round(self.jitter * 1000, 1),
+            "depth_frames": self.depth,
+            "mean_depth_frames": round(self.depth_sum / self.frames, 2) if self.frames else None,
+            "max_depth_frames": self.max_depth,
+            "frames": self.frames,
+            "late": self.late,
+            "repeated": self.repeated,
+            "dropped": self.dropped,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        delay = f"{s['delay_ms']} ms" if s["delay_ms"] is not None else "-"
+        return (f"delay {delay} (jitter {s['jitter_ms']} ms), depth {s['depth_frames']} frames "
+                f"(mean {s['mean_depth_frames']}, max {s['max_depth_frames']}), {s['frames']} frames: "
+                f"{s['late']} late, {s['repeated']} repeated refreshes, {s['dropped']} dropped")
+
+    def close(self):
+        if self.log:
+            self.log.close()
+            self.log = None
@@ -0,0 +1,295 @@
+"""
+OpenSecondDisplay - Live Latency Metrics
+Role: Networking & Performance Engineer
+
+Description:
+    Per-frame latency during a session, from the timestamps the sender puts
+    in the stream (FRAME_TIMESTAMPS, see framestamp.py). With
+    LATENCY_METRICS in ingest mode every received chunk is searched for
+    stamp packets, and the decoder runs a showinfo filter whose per-frame
+    log line (with the frame's PTS) tells when the frame was decoded:
+
+      network - sender output -> stamp received here (first byte of the frame)
+      decode  - sender output -> frame decoded
+      total   - capture       -> frame decoded
+
+    Sender times are converted to this machine's clock with the offset
+    measured over the feedback channel (OSD_CLOCK, every FEEDBACK_INTERVAL):
+    of the last CLOCK_SAMPLES measurements the one with the lowest round
+    trip is used, as its error is at most half that round trip. Without
+    replies (relay mode, old sender) the offset is 0, which is only right
+    for NTP-synced machines; osd_clock_synced says which.
+
+    Each stage keeps a histogram with fixed log-spaced buckets in an
+    array (4 per octave, 0.5 ms to 8 s): no per-frame storage, and
+    quantiles from bucket interpolation are within one bucket (19 %).
+    They are exported in the Prometheus text format to METRICS_FILE (for
+    node_exporter's textfile collector) and/or http://METRICS_LISTEN:
+    METRICS_PORT/metrics, cumulative since start, so an alert can use
+    histogram_quantile(0.99, rate(osd_frame_latency_seconds_bucket[5m])).
+"""
+
+import bisect
+import os
+import re
+import sys
+import threading
+from array import array
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+import framestamp
+import mpegts
+
+STAGES = ("network", "decode", "total")
+BUCKET_BOUNDS = tuple(0.0005 * 2 ** (i / 4) for i in range(57))  # seconds: 0.5 ms .. 8.2 s
+CLOCK_SAMPLES = 16     # clock offset measurements kept (lowest round trip wins)
+PENDING_FRAMES = 512   # stamps waiting for their frame to be decoded; skipped frames age out
+DECODER_FILTER = "showinfo=checksum=0"
+SHOWINFO_RE = re.compile(rb"Parsed_showinfo.*\] n:\s*\d+ pts:\s*(-?\d+)")
+
+
+class LatencyHistogram:
+    """Counts per fixed bucket (array-backed); observe() is a bisect and an increment."""
+
+    def __init__(self, bounds=BUCKET_BOUNDS):
+        self.bounds = bounds
+        self.counts = array("Q", bytes(8 * (len(bounds) + 1)))  # last bucket: +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def reset(self):
+        self.counts = array("Q", bytes(8 * (len(self.bounds) + 1)))
+        self.count = 0
+        self.sum = 0.0
+
+    def quantile(self, q):
+        """Seconds below which a fraction q of the samples fall (interpolated in its bucket), or None."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+    def prometheus(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.bounds, self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels},le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class ClockSync:
+    """Sender-minus-receiver wall clock offset from OSD_CLOCK round trips."""
+
+    def __init__(self):
+        self.samples = deque(maxlen=CLOCK_SAMPLES)  # (offset us, rtt us)
+
+    def add(self, offset_us, rtt_us):
+        if rtt_us >= 0:
+            self.samples.append((offset_us, rtt_us))
+
+    def reset(self):
+        self.samples.clear()
+
+    @property
+    def synced(self):
+        return bool(self.samples)
+
+    def best(self):
+        """(offset us, rtt us) of the most accurate sample; (0, None) before the first reply."""
+        return min(self.samples, key=lambda s: s[1]) if self.samples else (0, None)
+
+
+class LatencyTracker:
+    """Matches stamps to received and decoded frames and keeps the stage histograms."""
+
+    def __init__(self):
+        self.clock = ClockSync()
+        self.lock = threading.Lock()  # scan() runs on the select loop, decoded() on the log reader
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.window = {stage: LatencyHistogram() for stage in STAGES}  # since the last format_stats()
+        self.sums = {stage: [0.0, 0] for stage in STAGES}  # (seconds, frames) since the last take_mean()
+        self.pending = OrderedDict()  # pts -> (send us, capture us) until decoded
+        self.stamped = 0
+        self.matched = 0
+
+    def new_session(self):
+        """A new connection may be another sender with another clock."""
+        with self.lock:
+            self.pending.clear()
+            self.clock.reset()
+
+    def _observe(self, stage, seconds):
+        seconds = max(0.0, seconds)  # a clock offset error can make the fastest frames "negative"
+        self.histograms[stage].observe(seconds)
+        self.window[stage].observe(seconds)
+        total = self.sums[stage]
+        total[0] += seconds
+        total[1] += 1
+
+    def scan(self, buffer, end):
+        """Finds stamp packets in buffer[:end] (just received, packet aligned)."""
+        stamps = framestamp.find_stamps(buffer, end)
+        if not stamps:
+            return
+        now = framestamp.now_us()
+        with self.lock:
+            offset, _ = self.clock.best()
+            for _, _, pts, capture_us, sent_us in stamps:
+                self.stamped += 1
+                self._observe("network", (now - (sent_us - offset)) / 1e6)
+                if pts is not None:
+                    self.pending[pts] = (sent_us, capture_us)
+            while len(self.pending) > PENDING_FRAMES:
+                self.pending.popitem(last=False)
+
+    def decoded(self, pts):
+        """The decoder finished the frame with this PTS (90 kHz)."""
+        now = framestamp.now_us()
+        with self.lock:
+            entry = self.pending.pop(pts % mpegts.PTS_WRAP, None)
+            if entry is None:
+                return
+            self.matched += 1
+            offset, _ = self.clock.best()
+            sent_us, capture_us = entry
+            self._observe("decode", (now - (sent_us - offset)) / 1e6)
+            self._observe("total", (now - (capture_us - offset)) / 1e6)
+
+    def take_mean(self, stage):
+        """Mean latency (seconds) of a stage since the last call, None without frames (live graphs)."""
+        with self.lock:
+            seconds, count = self.sums[stage]
+            self.sums[stage] = [0.0, 0]
+        return seconds / count if count else None
+
+    def clock_request(self):
+        return framestamp.clock_request(framestamp.now_us())
+
+    def clock_reply(self, data):
+        result = framestamp.parse_clock_reply(data, framestamp.now_us())
+        if result:
+            with self.lock:
+                self.clock.add(*result)
+
+    def format_stats(self):
+        """Window quantiles since the last call, e.g. for the stats printout."""
+        with self.lock:
+            parts = []
+            for stage in STAGES:
+                h = self.window[stage]
+                if h.count:
+                    parts.append(f"{stage} p50 {h.quantile(0.5) * 1000:.1f} / p99 {h.quantile(0.99) * 1000:.1f} ms")
+                h.reset()
+            offset, rtt = self.clock.best()
+        if not parts:
+            return "no stamped frames (FRAME_TIMESTAMPS off on the sender?)"
+        clock = f"clock {offset / 1000:+.1f} ms (rtt {rtt / 1000:.1f} ms)" if rtt is not None else "clock not synced"
+        return ", ".join(parts) + f", {clock}"
+
+    def prometheus(self):
+        with self.lock:
+            lines = ["# HELP osd_frame_latency_seconds Per-frame latency: network (sender output to received), "
+                     "decode (to decoded), total (capture to decoded).",
+                     "# TYPE osd_frame_latency_seconds histogram"]
+            for stage in STAGES:
+                lines += self.histograms[stage].prometheus("osd_frame_latency_seconds", f'stage="{stage}"')
+            offset, rtt = self.clock.best()
+            lines += [
+                "# HELP osd_frames_stamped_total Frames received with a sender timestamp.",
+                "# TYPE osd_frames_stamped_total counter",
+                f"osd_frames_stamped_total {self.stamped}",
+                "# HELP osd_frames_decoded_stamped_total Stamped frames seen leaving the decoder.",
+                "# TYPE osd_frames_decoded_stamped_total counter",
+                f"osd_frames_decoded_stamped_total {self.matched}",
+                "# HELP osd_clock_synced 1 if the sender answers clock requests (else offset 0 is assumed).",
+                "# TYPE osd_clock_synced gauge",
+                f"osd_clock_synced {int(rtt is not None)}",
+                "# HELP osd_clock_offset_seconds Sender minus receiver wall clock.",
+                "# TYPE osd_clock_offset_seconds gauge",
+                f"osd_clock_offset_seconds {offset / 1e6:.6f}",
+                "# HELP osd_clock_rtt_seconds Round trip of the clock measurement in use.",
+                "# TYPE osd_clock_rtt_seconds gauge",
+                f"osd_clock_rtt_seconds {(rtt or 0) / 1e6:.6f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def read_decoder_log(stream, tracker):
+    """Decoder stderr: showinfo lines go to the tracker, everything else is passed through."""
+    for line in iter(stream.readline, b""):
+        match = SHOWINFO_RE.search(line)
+        if match:
+            tracker.decoded(int(match.group(1)))
+        elif b"Parsed_showinfo" not in line:
+            sys.stderr.buffer.write(line)
+            sys.stderr.flush()
+
+
+def write_metrics_file(tracker, path=None):
+    """Rewrites the Prometheus text file atomically (readers never see half a file)."""
+    path = os.path.expanduser(path or config.METRICS_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            f.write(tracker.prometheus())
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"⚠️ Could not write {path}: {e}")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    server_version = "OpenSecondDisplay"
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.tracker.prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, tracker, address=None):
+        super().__init__(address or (config.METRICS_LISTEN, config.METRICS_PORT), MetricsHandler)
+        self.tracker = tracker
+
+
+def start_server(tracker):
+    """Serves GET /metrics in a daemon thread. Returns the server, or None if it could not bind."""
+    try:
+        server = MetricsServer(tracker)
+    except OSError as e:
+        print(f"⚠️ Metrics endpoint not available on port {config.METRICS_PORT}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    print(f"📈 Latency metrics on http://{host}:{port}/metrics")
+    return server
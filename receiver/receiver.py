@@ -4,7 +4,9 @@ Role: Linux Receiver Engineer
 
 Description:
     Listens for an incoming TCP stream and plays it back using FFplay.
-    Designed for Linux (X11/Wayland) with auto-recovery.
+    Designed for Linux (X11/Wayland) with auto-recovery. With FRAME_RING set
+    the decoded frames go to shared memory instead (shmring.py). With TILES
+    several senders are shown at once in a grid (tiles.py).
 
 Usage:
     python3 receiver.py
@@ -17,69 +19,53 @@ Dependencies:
 import subprocess
 import sys
 import time
+import capabilities
 import config
-import socket
-import threading
+import cursor
+import discovery
+import ingest
+import latencystats
+import shmring
+import tiles
+import transport
 
 def start_discovery_service():
-    """Starts a UDP listener to respond to discovery broadcasts."""
-    def listener():
-        udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        udp_sock.bind(("0.0.0.0", config.DISCOVERY_PORT))
-        print(f"📡 Discovery Service listening on port {config.DISCOVERY_PORT}...")
-        
-        while True:
-            try:
-                data, addr = udp_sock.recvfrom(1024)
-                if data.decode().strip() == "OSD_DISCOVER":
-                    # Respond with Hostname and IP
-                    hostname = socket.gethostname()
-                    # Best attempt to get LAN IP
-                    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                    try:
-                        s.connect(("8.8.8.8", 80))
-                        ip = s.getsockname()[0]
-                    except:
-                        ip = "127.0.0.1"
-                    finally:
-                        s.close()
-                        
-                    response = f"OSD_ACK:{hostname}:{ip}"
-                    udp_sock.sendto(response.encode(), addr)
-            except Exception as e:
-                print(f"⚠️ Discovery Error: {e}")
-
-    t = threading.Thread(target=listener, daemon=True)
-    t.start()
+    """Answers discovery broadcasts (asyncio, background thread; see discovery.py)."""
+    return discovery.start()
 
 def check_ffplay():
     """Verifies that FFplay is installed."""
-    try:
-        subprocess.run(["ffplay", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        print("✅ FFplay found.")
-    except FileNotFoundError:
+    # Probed once per FFplay build and cached; a cache hit spawns nothing.
+    if capabilities.probe("ffplay") is None:
         print("❌ Error: FFplay not found. Please install ffmpeg package.")
         sys.exit(1)
+    print("✅ FFplay found.")
+
+def check_ffmpeg():
+    """Verifies that FFmpeg is installed (decoder of the frame ring output)."""
+    if capabilities.probe("ffmpeg") is None:
+        print("❌ Error: FFmpeg not found. Please install ffmpeg package.")
+        sys.exit(1)
+    print("✅ FFmpeg found.")
+
+def build_ffplay_command(input_url=None):
+    """Constructs the FFplay command for low-latency playback.
 
-def build_ffplay_command():
-    """Constructs the FFplay command for low-latency playback."""
+    input_url defaults to FFplay listening on the configured TRANSPORT itself.
+    Ingest mode passes "pipe:0" so the stream is fed over stdin instead.
+    """
     
     # Input URL: Listen mode
-    input_url = f"tcp://{config.LISTEN_IP}:{config.PORT}?listen"
+    if input_url is None:
+        input_url = build_input_url()
 
     cmd = [
         "ffplay",
         "-window_title", config.WINDOW_TITLE,
-        "-fflags", config.FFLAGS,
-        "-flags", "low_delay",
-        "-strict", "experimental",
-        
-        # Optimization for fast start
-        "-probesize", config.PROBESIZE,
-        "-analyzeduration", config.ANALYZEDURATION,
+        *low_latency_input_args(),
         
         # Video Logic
-        "-vf", "setpts=0",  # Remove timestamps to play frames immediately as they arrive
+        "-vf", ",".join(latency_filters() + ["setpts=0"]),  # Remove timestamps to play frames immediately as they arrive
         
         # Protocol
         "-f", "mpegts",
@@ -88,11 +74,118 @@ def build_ffplay_command():
 
     if config.FULLSCREEN:
         cmd.insert(1, "-fs")
+    if latency_filters():
+        cmd.insert(1, "-nostats")  # stderr carries the per-frame log latencystats.py reads
 
     # Hide cursor over window if possible (ffplay doesn't natively hide always, but fullscreen helps)
     
     return cmd
 
+def measures_latency():
+    """LATENCY_METRICS is in effect: only the ingest server (tcp) sees the stream's timestamps."""
+    return config.LATENCY_METRICS and (config.INGEST_MODE or config.TILES) and config.TRANSPORT == "tcp"
+
+def latency_filters():
+    """Decoder filters for LATENCY_METRICS: a log line per decoded frame (see latencystats.py)."""
+    return [latencystats.DECODER_FILTER] if measures_latency() else []
+
+def build_input_url(port=None):
+    """Listening URL for the configured transport (tcp / udp / srt)."""
+    return transport.receiver_url(config.TRANSPORT, config.LISTEN_IP, port or config.PORT,
+                                  config.MTU, config.SRT_LATENCY_MS)
+
+def low_latency_input_args():
+    """Decoder input flags shared by every receive pipeline."""
+    return [
+        "-fflags", config.FFLAGS,
+        "-flags", "low_delay",
+        "-strict", "experimental",
+        
+        # Optimization for fast start
+        "-probesize", config.PROBESIZE,
+        "-analyzeduration", config.ANALYZEDURATION,
+    ]
+
+def build_raw_decoder_command(input_url, pix_fmt="yuv420p", size=None, fit=False):
+    """Same low-latency decode as FFplay, but writes raw frames to stdout.
+
+    Used when frames are consumed by Python instead of shown in a window
+    (benchmarks, frame pipelines, the frame ring, wall tiles). Every decoded
+    frame is emitted exactly once. size ("WxH") scales every frame to a fixed
+    size; fit keeps the aspect ratio and pads with black instead of stretching.
+    """
+    filters = latency_filters()
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel", "info" if filters else "error",
+        "-nostats",
+        *low_latency_input_args(),
+        "-f", "mpegts",
+        "-i", input_url,
+        *capabilities.passthrough_args(),
+    ]
+    if filters:
+        cmd.append("-copyts")  # decoded frames keep the stream's PTS, which the timestamps refer to
+    if size:
+        w, h = size.split("x")
+        if fit:
+            filters += [f"scale={w}:{h}:force_original_aspect_ratio=decrease:force_divisible_by=2",
+                        f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2"]
+        else:
+            filters.append(f"scale={w}:{h}")  # no-op when the stream already has it
+    if filters:
+        cmd.extend(["-vf", ",".join(filters)])
+    return cmd + [
+        "-f", "rawvideo",
+        "-pix_fmt", pix_fmt,
+        "pipe:1"
+    ]
+
+def create_frame_ring():
+    """The shared-memory frame ring for FRAME_RING (shmring.py)."""
+    size = config.FRAME_RING_SIZE
+    if size == "auto":
+        mode = discovery.display_mode()
+        size = f"{mode[0]}x{mode[1]}" if mode else "1920x1080"
+    width, height = (int(v) for v in size.split("x"))
+    return shmring.FrameRing(config.FRAME_RING, width, height, config.FRAME_RING_PIX_FMT, config.FRAME_RING_SLOTS)
+
+def build_decoder_command(input_url=None, frame_ring=None):
+    """FFplay, or with a frame ring an FFmpeg decoding to raw frames of the ring's size."""
+    if not frame_ring:
+        return build_ffplay_command(input_url)
+    return build_raw_decoder_command(input_url or build_input_url(), frame_ring.pix_fmt,
+                                     f"{frame_ring.width}x{frame_ring.height}")
+
+def build_wall_player_command(width, height):
+    """FFplay showing the tile wall: raw yuv420p composites on stdin, shown as they come."""
+    cmd = [
+        "ffplay",
+        "-window_title", config.WINDOW_TITLE,
+        "-fflags", "nobuffer",
+        "-f", "rawvideo",
+        "-pixel_format", tiles.PIX_FMT,
+        "-video_size", f"{width}x{height}",
+        "-framerate", str(config.TILE_FPS),
+        "-vf", "setpts=0",
+        "pipe:0",
+    ]
+    if config.FULLSCREEN:
+        cmd.insert(1, "-fs")
+    return cmd
+
+def wall_size():
+    """(width, height) of the tile wall: the frame ring's, TILE_WALL_SIZE or the display mode."""
+    if frame_ring:
+        return frame_ring.width, frame_ring.height
+    size = config.TILE_WALL_SIZE
+    if size == "auto":
+        mode = discovery.display_mode()
+        return (mode[0], mode[1]) if mode else (1920, 1080)
+    width, height = size.split("x")
+    return int(width), int(height)
+
 # ... imports ...
 running_process = None
 
@@ -117,15 +210,128 @@ def stop_receiver_signal():
     # Let's just modify the main loop to listen to a flag.
     
 keep_running = True
+ingest_server = None
+frame_ring = None
+tile_wall = None
+
+def run_ingest():
+    """Ingest mode: we own the socket, one FFplay lives across reconnects."""
+    global ingest_server
+    ingest_server = ingest.IngestServer(build_decoder_command("pipe:0", frame_ring), frame_ring=frame_ring)
+    print(f"👂 Ingest listening on {config.LISTEN_IP}:{config.PORT} (persistent decoder)...")
+    try:
+        ingest_server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping receiver...")
+    finally:
+        ingest_server.close()
+        ingest_server = None
+
+def run_tiles():
+    """TILES: one ingest server and decoder per sender on PORT, PORT + 1, ...; one window."""
+    global tile_wall
+    if frame_ring and frame_ring.pix_fmt != tiles.PIX_FMT:
+        print(f"❌ TILES composes {tiles.PIX_FMT} frames; set FRAME_RING_PIX_FMT = \"{tiles.PIX_FMT}\".")
+        return
+    for key in ("METRICS_FILE", "METRICS_PORT", "JITTER_LOG"):
+        if getattr(config, key):
+            print(f"ℹ️ {key} is one file/port for one stream; not used with TILES (the wall prints per-tile stats).")
+            setattr(config, key, None)
+    width, height = wall_size()
+    wall = tiles.TileWall(width, height, config.TILES, config.TILE_COLUMNS)
+    base = int(config.PORT)
+    servers = [ingest.IngestServer(build_raw_decoder_command("pipe:0", tiles.PIX_FMT,
+                                                             f"{tile.width}x{tile.height}", fit=True),
+                                   port=base + tile.index, frame_ring=tile, name=tile.name)
+               for tile in wall.tiles]
+    player = None
+    if frame_ring:
+        output = frame_ring.publish
+    else:
+        player = subprocess.Popen(build_wall_player_command(wall.width, wall.height), stdin=subprocess.PIPE)
+
+        def output(canvas):
+            try:
+                player.stdin.write(canvas)
+            except (BrokenPipeError, ValueError):
+                print("🪟 Wall window closed.")
+                wall.stop()
+
+    print(f"🧩 Tile wall {wall.width}x{wall.height}, {wall.columns}x{wall.rows} grid: senders connect to "
+          f"{config.LISTEN_IP}:{base}-{base + len(wall.tiles) - 1} (tcp)")
+    tile_wall = wall
+    try:
+        wall.serve(servers, output)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping receiver...")
+    finally:
+        tile_wall = None
+        if player:
+            try:
+                player.stdin.close()
+            except BrokenPipeError:
+                pass
+            player.terminate()
+            player.wait()
+
+def metrics_snapshot():
+    """Values for the GUI's live graphs (timeseries.MetricsSampler).
+
+    "bytes" and "frames" are counters (the sampler turns them into bitrate_mbps
+    and fps). Ingest mode only, except the FRAME_RING frame count (decoded frames).
+    """
+    server = ingest_server
+    values = server.metrics() if server else {}
+    if frame_ring:
+        values["frames"] = frame_ring.seq
+    return values
 
 def main():
-    global keep_running
+    global keep_running, frame_ring
     print("📺 OpenSecondDisplay - Linux Receiver")
     start_discovery_service()
-    check_ffplay()
+    if config.TILES:
+        check_ffmpeg()  # one decoder per tile
+    if config.FRAME_RING:
+        check_ffmpeg()
+        frame_ring = create_frame_ring()
+        print(f"🖼️  Publishing frames to {frame_ring.path} ({frame_ring.width}x{frame_ring.height} "
+              f"{frame_ring.pix_fmt}, {frame_ring.slots} slots)")
+    else:
+        check_ffplay()
+    cursor_overlay = None
+    if config.CURSOR_CHANNEL and (frame_ring or config.TILES):
+        print("ℹ️ CURSOR_CHANNEL draws over the FFplay window of one stream; not with FRAME_RING or TILES.")
+    elif config.CURSOR_CHANNEL:
+        cursor_overlay = cursor.start()
+    try:
+        run()
+    finally:
+        if cursor_overlay:
+            cursor_overlay.close()
+        if frame_ring:
+            frame_ring.close()
+            frame_ring = None
+
+def run():
+    global keep_running
+    if config.TILES:
+        if config.TRANSPORT == "tcp":
+            run_tiles()
+            return
+        print(f"ℹ️ TILES is TCP only (one ingest server per tile); showing one {config.TRANSPORT} stream.")
+    if config.INGEST_MODE:
+        if config.TRANSPORT == "tcp":
+            run_ingest()
+            return
+        print(f"ℹ️ Ingest mode is TCP only, FFplay reads {config.TRANSPORT} directly.")
+    if config.LATENCY_METRICS:
+        print("ℹ️ LATENCY_METRICS needs ingest mode over tcp; not measuring.")
+    if config.JITTER_BUFFER:
+        print("ℹ️ JITTER_BUFFER needs ingest mode over tcp; frames are shown as they arrive.")
     
-    cmd = build_ffplay_command()
-    print(f"👂 Listening on {config.LISTEN_IP}:{config.PORT}...")
+    cmd = build_decoder_command(frame_ring=frame_ring)
+    print(f"👂 Listening on {config.LISTEN_IP}:{config.PORT} ({config.TRANSPORT})...")
 
     keep_running = True
     while keep_running:
@@ -140,7 +346,13 @@ def main():
             # For this 'Engineer' role, let's keep it simple: Ctrl+C is primary. 
             # GUI 'Stop' might just exit the app.
             
-            process = subprocess.run(cmd)
+            if frame_ring:
+                process = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=0)
+                publisher = frame_ring.publish_from(process.stdout)
+                process.wait()
+                publisher.join()
+            else:
+                process = subprocess.run(cmd)
 
             if process.returncode == 0:
                 print("✅ Stream ended normally.")
@@ -162,6 +374,10 @@ def stop_receiver_signal():
     keep_running = False
     # In a real app we would kill the FFplay process ID here.
     # For MVP, this flag stops the *next* loop.
+    if ingest_server:
+        ingest_server.stop()
+    if tile_wall:
+        tile_wall.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,332 @@
+"""
+OpenSecondDisplay - Session Recorder
+Role: Linux Receiver Engineer
+
+Description:
+    Writes the MPEG-TS an ingest-mode receiver gets to disk as it arrives:
+    no decode, no remux, the bytes the decoder is fed. The select loop only
+    appends each chunk to an in-memory buffer (after it went to the decoder);
+    full buffers are handed to a writer thread that does the file I/O in
+    bulk writes of about FLUSH_BYTES, so a slow disk never holds up the
+    display. If the disk falls more than MAX_QUEUED_BYTES behind, buffers are
+    dropped (counted) instead of growing memory.
+
+    The recording is cut into segments by size (RECORD_SEGMENT_MB) or age
+    (RECORD_SEGMENT_SECONDS), always right before a keyframe, and each new
+    connection starts a new segment. A segment starts with the stream's
+    PAT/PMT and an IDR, so it plays on its own:
+
+        osd-20260101-120000-s1-001.ts    the stream
+        osd-20260101-120000-s1-001.idx   its keyframe index
+
+    The index is a 20-byte header (magic, wall-clock start in ms, bytes of
+    PAT/PMT at the segment start) followed by one 12-byte entry per keyframe:
+    its byte offset in the segment and ms since the segment started. Seeking
+    (Segment.seek) binary-searches the mmapped index and lands on the
+    keyframe at or before the requested time; the stream bytes are read
+    from an mmap of the segment, PAT/PMT first.
+
+Usage:
+    python3 recorder.py list <segment.ts>                  # keyframes of a segment
+    python3 recorder.py cut <segment.ts> <seconds> <out.ts>
+    python3 recorder.py cut <segment.ts> 90 - | ffplay -   # play from 1:30
+"""
+
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+import config
+import mpegts
+
+TS_PACKET_SIZE = mpegts.TS_PACKET_SIZE
+INDEX_MAGIC = b"OSDIDX1\n"
+INDEX_HEADER = struct.Struct("<8sQI")  # magic, segment start (unix ms), PAT/PMT bytes at the start
+INDEX_ENTRY = struct.Struct("<QI")     # keyframe byte offset, ms since segment start
+
+FLUSH_BYTES = 1 << 20       # hand the buffer to the writer thread at this size...
+FLUSH_INTERVAL = 0.5        # ...or after this many seconds
+MAX_QUEUED_BYTES = 64 << 20  # drop buffers while the writer is this far behind
+
+
+class Recorder:
+    """Records whole TS packets handed over by the ingest server into indexed segments."""
+
+    def __init__(self, directory=None, inspector=None, segment_mb=None, segment_seconds=None,
+                 clock=time.monotonic):
+        self.directory = os.path.expanduser(directory or config.RECORD_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.inspector = inspector or mpegts.TSInspector(clock=clock)
+        self.segment_bytes = (segment_mb if segment_mb is not None else config.RECORD_SEGMENT_MB) << 20
+        self.segment_seconds = segment_seconds if segment_seconds is not None else config.RECORD_SEGMENT_SECONDS
+        self.clock = clock
+
+        self.session = 0
+        self.psi = {}            # pid -> latest PAT / PMT packet
+        self.segment = None      # path without extension while a segment is open
+        self.segment_start = 0.0
+        self.segment_size = 0    # bytes appended to the open segment
+        self.count = 0
+        self.buffer = bytearray()
+        self.index = bytearray()
+        self.last_flush = clock()
+
+        # Stats
+        self.segments = 0
+        self.keyframes = 0
+        self.bytes_written = 0   # updated by the writer thread
+        self.queued_bytes = 0    # under lock: added here, taken off by the writer thread
+        self.queued_lock = threading.Lock()
+        self.dropped_bytes = 0
+        self.failed = None       # error message once writing failed
+
+        self.queue = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    # --- Select loop side (cheap) ---
+
+    def new_session(self, number):
+        """A new sender connection: its data goes to a new segment."""
+        self.end_session()
+        self.session = number
+        self.psi = {}
+
+    def end_session(self):
+        if self.segment:
+            self._close_segment()
+
+    def write(self, chunk, events):
+        """Records chunk (whole TS packets) given its frame starts from the inspector."""
+        if self.failed or not chunk:
+            return
+        keys = [offset for offset, is_key in events if is_key and offset >= 0]
+        if self.segment is None or keys:
+            self._remember_psi(chunk)
+        now = self.clock()
+        if keys and (self.segment is None or self._segment_full(now)):
+            # Segments start at a keyframe: everything before it ends the old segment
+            # (or is dropped if this connection has no segment yet).
+            cut = keys[0]
+            if self.segment and cut:
+                self._append(chunk[:cut], (), now)
+            self._open_segment(now)
+            chunk = chunk[cut:]
+            keys = [offset - cut for offset in keys]
+        if self.segment is None:
+            return
+        self._append(chunk, keys, now)
+        if len(self.buffer) >= FLUSH_BYTES or now - self.last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Hands what is buffered to the writer thread."""
+        self.last_flush = self.clock()
+        if not self.buffer:
+            return
+        if self.queued_bytes > MAX_QUEUED_BYTES:
+            # The disk is not keeping up: leave a gap in the recording, not in memory.
+            if not self.dropped_bytes:
+                print("⚠️ Recorder: disk too slow, dropping data from the recording.")
+            self.dropped_bytes += len(self.buffer)
+            self.segment_size -= len(self.buffer)
+            self.buffer = bytearray()
+            self.index = bytearray()
+            return
+        with self.queued_lock:
+            self.queued_bytes += len(self.buffer)
+        self.queue.put(("data", self.buffer, self.index))
+        self.buffer = bytearray()
+        self.index = bytearray()
+
+    def close(self):
+        """Finishes the open segment and waits for the writer thread."""
+        self.end_session()
+        self.queue.put(("stop",))
+        self.writer.join(timeout=10)
+
+    def _remember_psi(self, chunk):
+        """Keeps the latest PAT/PMT packets to put in front of the next segment."""
+        for pos in range(0, len(chunk) - TS_PACKET_SIZE + 1, TS_PACKET_SIZE):
+            pid = (chunk[pos + 1] & 0x1F) << 8 | chunk[pos + 2]
+            if pid == mpegts.PAT_PID or pid in self.inspector.pmt_pids:
+                self.psi[pid] = bytes(chunk[pos:pos + TS_PACKET_SIZE])
+
+    def _segment_full(self, now):
+        return (self.segment_size >= self.segment_bytes
+                or (self.segment_seconds and now - self.segment_start >= self.segment_seconds))
+
+    def _open_segment(self, now):
+        if self.segment:
+            self._close_segment()
+        self.count += 1
+        self.segments += 1
+        name = f"osd-{time.strftime('%Y%m%d-%H%M%S')}-s{self.session}-{self.count:03d}"
+        self.segment = os.path.join(self.directory, name)
+        self.segment_start = now
+        self.segment_size = 0
+        psi = b"".join(packet for _, packet in sorted(self.psi.items()))  # PAT (pid 0) first
+        header = INDEX_HEADER.pack(INDEX_MAGIC, int(time.time() * 1000), len(psi))
+        self.queue.put(("open", self.segment, header))
+        self._append(psi, (), now)
+
+    def _close_segment(self):
+        self.flush()
+        self.queue.put(("close",))
+        self.segment = None
+
+    def _append(self, data, keys, now):
+        ms = int((now - self.segment_start) * 1000)
+        for offset in keys:
+            self.index += INDEX_ENTRY.pack(self.segment_size + offset, ms)
+        self.keyframes += len(keys)
+        self.buffer += data
+        self.segment_size += len(data)
+
+    # --- Writer thread ---
+
+    def _write_loop(self):
+        stream = index = None
+        while True:
+            item = self.queue.get()
+            kind = item[0]
+            try:
+                if kind == "data":
+                    _, data, entries = item
+                    with self.queued_lock:
+                        self.queued_bytes -= len(data)
+                    if stream:
+                        stream.write(data)
+                        stream.flush()
+                        if entries:
+                            index.write(entries)
+                            index.flush()
+                        self.bytes_written += len(data)
+                    continue
+                if stream:
+                    stream.close()
+                    index.close()
+                    stream = index = None
+                if kind == "open" and not self.failed:
+                    _, path, header = item
+                    stream = open(path + ".ts", "wb")
+                    index = open(path + ".idx", "wb")
+                    index.write(header)
+                    print(f"⏺️  Recording {path}.ts")
+                elif kind == "stop":
+                    return
+            except OSError as e:
+                self.failed = str(e)
+                print(f"⚠️ Recorder stopped: {e}")
+                for f in (stream, index):
+                    try:
+                        if f:
+                            f.close()
+                    except OSError:
+                        pass
+                stream = index = None
+
+    # --- Stats ---
+
+    def stats(self):
+        return {
+            "segment": self.segment + ".ts" if self.segment else None,
+            "segments": self.segments,
+            "keyframes": self.keyframes,
+            "bytes_written": self.bytes_written,
+            "queued_bytes": self.queued_bytes,
+            "dropped_bytes": self.dropped_bytes,
+            "failed": self.failed,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        text = (f"{s['segments']} segments, {s['bytes_written'] / 1e6:.1f} MB written, "
+                f"{s['keyframes']} keyframes indexed, {s['queued_bytes'] // 1024} KB queued")
+        if s["dropped_bytes"]:
+            text += f", {s['dropped_bytes'] / 1e6:.1f} MB dropped"
+        if s["failed"]:
+            text += f", FAILED: {s['failed']}"
+        return text
+
+
+class Segment:
+    """A recorded segment opened for reading; stream and index are mmapped."""
+
+    def __init__(self, path):
+        stem = path[:-3] if path.endswith(".ts") else path
+        self.path = stem + ".ts"
+        self.data = _map(self.path)
+        self.index = _map(stem + ".idx")
+        magic, self.started_ms, self.psi_bytes = INDEX_HEADER.unpack_from(self.index, 0)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{stem}.idx is not a recording index")
+        # A segment still being written may end in a partial entry.
+        self.count = (len(self.index) - INDEX_HEADER.size) // INDEX_ENTRY.size
+
+    def keyframe(self, i):
+        """(byte offset, ms since segment start) of the i-th keyframe."""
+        return INDEX_ENTRY.unpack_from(self.index, INDEX_HEADER.size + i * INDEX_ENTRY.size)
+
+    def seek(self, seconds):
+        """Byte offset of the last keyframe at or before seconds into the segment."""
+        target = seconds * 1000
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.keyframe(mid)[1] <= target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return self.keyframe(max(lo - 1, 0))[0] if self.count else self.psi_bytes
+
+    def stream_from(self, seconds):
+        """(PAT/PMT, stream from the keyframe) as memoryviews into the mmap; play them in that order."""
+        view = memoryview(self.data)
+        return view[:self.psi_bytes], view[self.seek(seconds):]
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+def _map(path):
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            raise ValueError(f"{path} is empty")
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("list", "cut") or (sys.argv[1] == "cut" and len(sys.argv) < 5):
+        print("Usage: python3 recorder.py list <segment.ts>\n"
+              "       python3 recorder.py cut <segment.ts> <seconds> <out.ts | ->")
+        sys.exit(1)
+    segment = Segment(sys.argv[2])
+    if sys.argv[1] == "list":
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(segment.started_ms / 1000))
+        print(f"{segment.path}: {len(segment.data) / 1e6:.1f} MB, started {started}, {segment.count} keyframes")
+        for i in range(segment.count):
+            offset, ms = segment.keyframe(i)
+            print(f"  {ms / 1000:9.3f} s  @ {offset}")
+    else:
+        psi, stream = segment.stream_from(float(sys.argv[3]))
+        out = sys.stdout.buffer if sys.argv[4] == "-" else open(sys.argv[4], "wb")
+        try:
+            out.write(psi)
+            out.write(stream)
+        except BrokenPipeError:
+            pass
+        finally:
+            del psi, stream  # release the exported buffers before closing the mmap
+            if out is not sys.stdout.buffer:
+                out.close()
+    segment.close()
+
+
+if __name__ == "__main__":
+    main()
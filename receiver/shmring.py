@@ -0,0 +1,382 @@
+"""
+OpenSecondDisplay - Shared-Memory Frame Ring
+Role: Linux Receiver Engineer
+
+Description:
+    Publishes decoded frames to other local processes (a compositor, a
+    mixer, a screenshot/OCR service) instead of, or next to, a window. With
+    FRAME_RING set the receiver decodes to raw frames (FFmpeg, rawvideo on
+    stdout) and a thread reads every frame straight into the next slot of a
+    fixed-size ring in shared memory; readers map the same file and look at
+    the pixels in place.
+
+    The ring is a file in /dev/shm (the temp directory elsewhere) rather
+    than multiprocessing.shared_memory, whose resource tracker unlinks a
+    segment when any attached process exits. Layout (little endian):
+
+      0     header: magic, version, slot count, width, height, pix_fmt,
+            frame size, slot stride
+      64    latest committed sequence number (0 = none yet)
+      72    state (1 = live, 2 = closed), writer pid
+      4096  slots, each page aligned:
+              seq_begin, seq_end, CLOCK_MONOTONIC ns, wall clock ns
+              (64 bytes), then the frame
+
+    The writer never waits for readers: the oldest slot is overwritten.
+    Each slot works as a seqlock: seq_begin is set before the pixels are
+    written, seq_end after, so a reader knows a frame is complete when both
+    match and that it was not overwritten meanwhile when seq_begin is still
+    the same after it is done with it (Frame.valid()). A reader that falls
+    more than a ring behind jumps to the newest frame. Frames have a fixed
+    size (FRAME_RING_SIZE): the decoder scales to it if the stream differs.
+    CLOCK_MONOTONIC is shared by all processes, so readers can compute how
+    long ago a frame was published.
+
+Usage:
+    python3 shmring.py osd-frames        # attach and print fps / age / drops
+"""
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; Frame.data (a memoryview) works without it.
+    np = None
+
+MAGIC = b"OSDRING1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIII16sQQ")  # magic, version, slots, width, height, pix_fmt, frame size, stride
+SEQ = struct.Struct("<Q")               # latest seq, and a slot's seq_begin
+LATEST_OFFSET = 64
+STATE = struct.Struct("<II")            # state, writer pid
+STATE_OFFSET = 72
+STATE_LIVE, STATE_CLOSED = 1, 2
+SLOT_HEADER = struct.Struct("<QQQQ")    # seq_begin, seq_end, monotonic ns, wall clock ns
+SLOT_HEADER_SIZE = 64                   # frame data starts cache-line aligned
+DATA_OFFSET = 4096
+PAGE = 4096
+PIPE_SIZE = 1 << 20                     # decoder stdout pipe (Linux default max); fewer reads per frame
+POLL_INTERVAL = 0.0005                  # RingReader.wait() sleep between checks
+
+# Bytes per pixel of the raw formats a ring can hold.
+PIX_FMT_BYTES = {
+    "yuv420p": 1.5, "nv12": 1.5, "gray": 1, "yuyv422": 2, "uyvy422": 2,
+    "rgb24": 3, "bgr24": 3, "rgba": 4, "bgra": 4, "rgb0": 4, "bgr0": 4,
+}
+
+
+def ring_path(name):
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, name)
+
+
+def frame_size(width, height, pix_fmt):
+    if pix_fmt not in PIX_FMT_BYTES:
+        raise ValueError(f"unsupported pix_fmt {pix_fmt!r} (one of {', '.join(PIX_FMT_BYTES)})")
+    if PIX_FMT_BYTES[pix_fmt] == 1.5 and (width % 2 or height % 2):
+        raise ValueError(f"{pix_fmt} needs an even width and height, got {width}x{height}")
+    return int(width * height * PIX_FMT_BYTES[pix_fmt])
+
+
+def publish_frames(reader, stream):
+    """Calls reader.read_frame(stream) until it returns None, on a background thread.
+
+    reader.publisher holds that thread; a previous one is joined first (its
+    decoder's stdout has ended). Returns the new thread.
+    """
+    try:
+        import fcntl
+        fcntl.fcntl(stream.fileno(), fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+    except (ImportError, AttributeError, OSError):
+        pass  # not Linux, or above pipe-max-size: the default pipe works, with more reads
+
+    def run():
+        while reader.read_frame(stream) is not None:
+            pass
+
+    if reader.publisher:
+        reader.publisher.join()
+    reader.publisher = threading.Thread(target=run, daemon=True)
+    reader.publisher.start()
+    return reader.publisher
+
+
+class FrameRing:
+    """Writer side: owns the ring file and publishes frames into it."""
+
+    def __init__(self, name, width, height, pix_fmt="yuv420p", slots=4):
+        self.name = name
+        self.width, self.height, self.pix_fmt = width, height, pix_fmt
+        self.slots = max(2, slots)
+        self.frame_size = frame_size(width, height, pix_fmt)
+        self.slot_stride = -(-(SLOT_HEADER_SIZE + self.frame_size) // PAGE) * PAGE
+        self.path = ring_path(name)
+        size = DATA_OFFSET + self.slots * self.slot_stride
+
+        # Built under a temporary name, then renamed: a reader never maps a half-initialised
+        # ring, and readers of a previous ring keep their (now unlinked) file until they reattach.
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.map = mmap.mmap(fd, size)
+            self.inode = os.fstat(fd).st_ino
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, self.slots, width, height,
+                         pix_fmt.encode(), self.frame_size, self.slot_stride)
+        STATE.pack_into(self.map, STATE_OFFSET, STATE_LIVE, os.getpid())
+        os.replace(tmp, self.path)
+        self.view = memoryview(self.map)
+
+        self.seq = 0
+        self.lock = threading.Lock()  # one publisher at a time (decoder restarts)
+        self.publisher = None
+        self.partial = 0              # frames cut off by a decoder exit
+        self.window_frames = 0
+        self.window_start = time.monotonic()
+        self.fps = 0.0
+
+    def _slot(self, seq):
+        return DATA_OFFSET + (seq - 1) % self.slots * self.slot_stride
+
+    def _commit(self, base, seq):
+        SLOT_HEADER.pack_into(self.map, base, seq, seq, time.monotonic_ns(), time.time_ns())
+        SEQ.pack_into(self.map, LATEST_OFFSET, seq)
+        self.seq = seq
+        self.window_frames += 1
+
+    def publish(self, frame):
+        """Copies one frame (bytes-like, frame_size long) into the ring. Returns its seq."""
+        with self.lock:
+            seq = self.seq + 1
+            base = self._slot(seq)
+            SLOT_HEADER.pack_into(self.map, base, seq, 0, 0, 0)  # seq_end 0: being written
+            start = base + SLOT_HEADER_SIZE
+            self.view[start:start + self.frame_size] = frame
+            self._commit(base, seq)
+            return seq
+
+    def read_frame(self, stream):
+        """Reads one frame from stream (raw, readinto) directly into the next slot.
+
+        Returns the frame's seq, or None at end of stream (a partial frame is not published).
+        """
+        with self.lock:
+            seq = self.seq + 1
+            base = self._slot(seq)
+            SLOT_HEADER.pack_into(self.map, base, seq, 0, 0, 0)
+            start = base + SLOT_HEADER_SIZE
+            target = self.view[start:start + self.frame_size]
+            filled = 0
+            while filled < self.frame_size:
+                n = stream.readinto(target[filled:])
+                if not n:
+                    self.partial += filled > 0
+                    return None
+                filled += n
+            self._commit(base, seq)
+            return seq
+
+    def publish_from(self, stream):
+        """Publishes every frame of stream (e.g. the decoder's stdout) on a background thread."""
+        return publish_frames(self, stream)
+
+    def stats(self):
+        now = time.monotonic()
+        if now - self.window_start >= 1.0:
+            self.fps = self.window_frames / (now - self.window_start)
+            self.window_frames, self.window_start = 0, now
+        return {"frames": self.seq, "fps": round(self.fps, 1), "partial": self.partial}
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"Frame ring: {self.path} {self.width}x{self.height} {self.pix_fmt}, {s['frames']} frames, "
+                f"{s['fps']:.1f} fps" + (f", {s['partial']} partial" if s["partial"] else ""))
+
+    def close(self):
+        STATE.pack_into(self.map, STATE_OFFSET, STATE_CLOSED, os.getpid())
+        try:
+            if os.stat(self.path).st_ino == self.inode:
+                os.unlink(self.path)  # attached readers keep their mapping
+        except OSError:
+            pass
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # the publisher thread still holds a view until the decoder's stdout ends
+
+
+class Frame:
+    """One frame in a reader's mapping. data is a read-only view into shared memory (no copy)."""
+
+    __slots__ = ("reader", "seq", "monotonic_ns", "realtime_ns", "data", "_base")
+
+    def __init__(self, reader, base, seq, monotonic_ns, realtime_ns):
+        self.reader = reader
+        self._base = base
+        self.seq = seq
+        self.monotonic_ns = monotonic_ns
+        self.realtime_ns = realtime_ns
+        start = base + SLOT_HEADER_SIZE
+        self.data = reader.view[start:start + reader.frame_size]
+
+    @property
+    def age_ms(self):
+        """Milliseconds since the frame was published."""
+        return (time.monotonic_ns() - self.monotonic_ns) / 1e6
+
+    def valid(self):
+        """True while the writer has not started overwriting this slot. Check after using data."""
+        return SEQ.unpack_from(self.reader.map, self._base)[0] == self.seq
+
+    def copy(self):
+        """The frame as bytes, or None if it was overwritten while copying."""
+        data = bytes(self.data)
+        return data if self.valid() else None
+
+    def array(self):
+        """The frame as a read-only NumPy array without copying: (h, w, channels), or flat for 4:2:0."""
+        if np is None:
+            raise RuntimeError("NumPy is not installed; use Frame.data")
+        flat = np.frombuffer(self.data, dtype=np.uint8)
+        channels = PIX_FMT_BYTES[self.reader.pix_fmt]
+        if channels == 1.5:
+            return flat
+        return flat.reshape(self.reader.height, self.reader.width, int(channels))
+
+
+class RingReader:
+    """Reader side: attaches to a ring by name. Raises FileNotFoundError if there is none."""
+
+    def __init__(self, name):
+        self.path = ring_path(name)
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            self.inode = os.fstat(fd).st_ino
+            self.map = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        magic, version, self.slots, self.width, self.height, pix_fmt, self.frame_size, self.slot_stride = \
+            HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError(f"{self.path} is not a frame ring (version {VERSION})")
+        self.pix_fmt = pix_fmt.rstrip(b"\0").decode()
+        self.view = memoryview(self.map)
+        self.last_seq = 0
+        self.dropped = 0  # frames overwritten before this reader got to them
+        self.torn = 0     # frames overwritten while being read
+
+    def latest_seq(self):
+        return SEQ.unpack_from(self.map, LATEST_OFFSET)[0]
+
+    def closed(self):
+        """True once the writer closed the ring."""
+        return STATE.unpack_from(self.map, STATE_OFFSET)[0] == STATE_CLOSED
+
+    def replaced(self):
+        """True if the ring file is gone or a new ring took its name (reattach with a new reader)."""
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except OSError:
+            return True
+
+    def frame(self, seq):
+        """Frame seq if it is complete and still in the ring, else None."""
+        if seq < 1:
+            return None
+        base = DATA_OFFSET + (seq - 1) % self.slots * self.slot_stride
+        begin, end, monotonic_ns, realtime_ns = SLOT_HEADER.unpack_from(self.map, base)
+        if begin != seq or end != seq:
+            return None
+        return Frame(self, base, seq, monotonic_ns, realtime_ns)
+
+    def latest(self):
+        return self.frame(self.latest_seq())
+
+    def next(self):
+        """The oldest frame this reader has not seen yet, or None if there is none."""
+        latest = self.latest_seq()
+        if latest <= self.last_seq:
+            return None
+        seq = self.last_seq + 1
+        if latest - seq >= self.slots - 1:
+            seq = latest  # fell behind: the slots in between may be rewritten any moment
+        frame = self.frame(seq)
+        if frame is None:
+            seq = latest
+            frame = self.frame(seq)
+            if frame is None:
+                return None
+        self.dropped += seq - self.last_seq - 1 if self.last_seq else 0
+        self.last_seq = seq
+        return frame
+
+    def wait(self, timeout=None):
+        """Blocks until next() has a frame. None on timeout or when the writer closed the ring."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            frame = self.next()
+            if frame is not None:
+                return frame
+            if self.closed() or (deadline is not None and time.monotonic() >= deadline):
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def frames(self):
+        """Yields frames until the writer closes the ring. Counts torn frames after each is used."""
+        while True:
+            frame = self.wait()
+            if frame is None:
+                return
+            yield frame
+            if not frame.valid():
+                self.torn += 1
+
+    def close(self):
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # a Frame still holds a view; the mapping goes away with it
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(__doc__.split("Usage:")[1].strip())
+        return
+    try:
+        reader = RingReader(sys.argv[1])
+    except FileNotFoundError:
+        print(f"❌ No frame ring at {ring_path(sys.argv[1])} (is the receiver running with FRAME_RING set?)")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"🖼️  {reader.path}: {reader.width}x{reader.height} {reader.pix_fmt}, {reader.slots} slots")
+    count, ages, start = 0, [], time.monotonic()
+    try:
+        for frame in reader.frames():
+            count += 1
+            ages.append(frame.age_ms)
+            now = time.monotonic()
+            if now - start >= 1.0:
+                ages.sort()
+                print(f"   {count / (now - start):5.1f} fps, age p50 {ages[len(ages) // 2]:.2f} ms, "
+                      f"max {ages[-1]:.2f} ms, dropped {reader.dropped}, torn {reader.torn}")
+                count, ages, start = 0, [], now
+    except KeyboardInterrupt:
+        pass
+    print("👋 Ring closed." if reader.closed() else "👋 Detached.")
+
+
+if __name__ == "__main__":
+    main()
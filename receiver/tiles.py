@@ -0,0 +1,292 @@
+"""
+OpenSecondDisplay - Tiled Multi-Sender Wall
+Role: Linux Receiver Engineer
+
+Description:
+    Shows TILES senders at once in one window, in a grid (several Macs on
+    one large display). Sender i connects to PORT + i.
+
+      - Every tile has its own ingest server (ingest.py: catch-up, jitter
+        buffer, latency metrics, a warm decoder across reconnects) on its
+        own thread, and its own FFmpeg decoder process that scales to the
+        tile size (letterboxed). Decoding spreads over the cores, and a
+        sender that stalls or goes away only affects its own tile.
+      - A decoder writes raw yuv420p frames to a pipe. Per tile a reader
+        thread reads each frame into a back buffer and swaps it with the
+        front one when it is complete (Tile; fed through publish_from()
+        like shmring.FrameRing, so the ingest server needs nothing else).
+      - The compositor wakes up when any tile has a new frame, copies the
+        newest frame of every changed tile into the wall canvas (one slice
+        assignment per plane with NumPy, one per row without) and hands the
+        canvas to the output: one FFplay reading raw video on stdin, or the
+        FRAME_RING. At most TILE_FPS composites a second; frames that
+        arrive in between are merged into the next one. A tile whose sender
+        has been gone for TILE_TIMEOUT seconds is blanked.
+
+    Every STATS_INTERVAL it prints each tile's decoded fps, latency (capture
+    to decoded; needs LATENCY_METRICS and FRAME_TIMESTAMPS on that sender)
+    and compose delay (decoded to handed to the output), and the wall's
+    output fps and compose time.
+"""
+
+import math
+import threading
+import time
+
+import config
+import shmring
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; rows are copied one by one without it.
+    np = None
+
+PIX_FMT = "yuv420p"
+BLACK = (16, 128, 128)  # Y, U, V of black (limited range)
+IDLE_CHECK = 0.1        # seconds between disconnect checks while no frame arrives
+
+
+def grid(count, columns="auto"):
+    """(columns, rows) of the grid for count tiles."""
+    columns = math.ceil(math.sqrt(count)) if columns == "auto" else max(1, min(int(columns), count))
+    return columns, math.ceil(count / columns)
+
+
+def planes(width, height):
+    """(offset, stride, rows, scale) of the yuv420p planes of a width x height frame."""
+    luma = width * height
+    return [(0, width, height, 1), (luma, width // 2, height // 2, 2), (luma * 5 // 4, width // 2, height // 2, 2)]
+
+
+def fill_black(buffer, width, height, x=0, y=0, w=None, h=None):
+    """Paints a rectangle of a yuv420p frame black."""
+    w, h = w or width, h or height
+    view = memoryview(buffer)
+    for (offset, stride, _, scale), value in zip(planes(width, height), BLACK):
+        row = bytes([value]) * (w // scale)
+        for r in range(y // scale, (y + h) // scale):
+            start = offset + r * stride + x // scale
+            view[start:start + len(row)] = row
+
+
+class Tile:
+    """One grid cell: the newest decoded frame of one stream."""
+
+    def __init__(self, index, x, y, width, height):
+        self.index = index
+        self.name = f"tile {index + 1}"
+        self.x, self.y = x, y
+        self.width, self.height = width, height
+        self.pix_fmt = PIX_FMT
+        self.frame_size = width * height * 3 // 2
+        self.front = bytearray(self.frame_size)  # newest complete frame (under lock)
+        self.back = bytearray(self.frame_size)   # frame being read
+        self.lock = threading.Lock()
+        self.changed = None      # threading.Event of the wall, set for every new frame
+        self.publisher = None
+        self.server = None       # ingest.IngestServer feeding this tile
+
+        self.seq = 0
+        self.drawn = 0           # seq in the canvas
+        self.decoded_at = None   # time.monotonic() the front frame was complete
+        self.idle_since = None   # time.monotonic() the sender went away
+        self.blank = True
+        self.partial = 0         # frames cut off by a decoder exit
+        self.window = [0, 0.0, 0]  # frames, compose delay sum, composed frames since the last stats line
+
+    def read_frame(self, stream):
+        """Reads one frame from stream into the back buffer and makes it the front one.
+
+        Returns its seq, or None at end of stream (a partial frame is not shown).
+        """
+        target = memoryview(self.back)
+        filled = 0
+        while filled < self.frame_size:
+            n = stream.readinto(target[filled:])
+            if not n:
+                self.partial += filled > 0
+                return None
+            filled += n
+        with self.lock:
+            self.front, self.back = self.back, self.front
+            self.seq += 1
+            self.decoded_at = time.monotonic()
+            self.window[0] += 1
+        if self.changed:
+            self.changed.set()
+        return self.seq
+
+    def publish_from(self, stream):
+        """Reads every frame of stream (the decoder's stdout) on a background thread."""
+        return shmring.publish_frames(self, stream)
+
+    def format_stats(self):
+        return (f"Tile {self.index + 1}: {self.width}x{self.height} at +{self.x}+{self.y}, {self.seq} frames"
+                + (f", {self.partial} partial" if self.partial else ""))
+
+
+class TileWall:
+    """The tiles of a width x height yuv420p canvas and the compositor that fills it."""
+
+    def __init__(self, width, height, count, columns="auto"):
+        self.width, self.height = width - width % 2, height - height % 2
+        self.columns, self.rows = grid(count, columns)
+        cell_w = (self.width // self.columns) & ~1
+        cell_h = (self.height // self.rows) & ~1
+        self.tiles = [Tile(i, (i % self.columns) * cell_w, (i // self.columns) * cell_h, cell_w, cell_h)
+                      for i in range(count)]
+        self.frame_size = self.width * self.height * 3 // 2
+        self.canvas = bytearray(self.frame_size)
+        fill_black(self.canvas, self.width, self.height)
+        self.changed = threading.Event()
+        for tile in self.tiles:
+            tile.changed = self.changed
+        self._blitters = [self._blitter(tile) for tile in self.tiles]
+
+        self.stop_event = threading.Event()
+        self.outputs = 0
+        self.compose_times = []  # seconds per composite since the last stats line
+        self.last_stats = time.monotonic()
+        self.last_output_count = 0
+
+    # --- Compositing ---
+
+    def _blitter(self, tile):
+        """A function copying a frame of the tile (bytes-like) into its place in the canvas."""
+        canvas_planes = planes(self.width, self.height)
+        tile_planes = planes(tile.width, tile.height)
+        if np is not None:
+            canvas = np.frombuffer(self.canvas, dtype=np.uint8)
+            targets = []
+            for (offset, stride, rows, scale), (_, width, height, _) in zip(canvas_planes, tile_planes):
+                plane = canvas[offset:offset + stride * rows].reshape(rows, stride)
+                y, x = tile.y // scale, tile.x // scale
+                targets.append(plane[y:y + height, x:x + width])
+
+            def blit(frame):
+                source = np.frombuffer(frame, dtype=np.uint8)
+                for target, (offset, width, height, _) in zip(targets, tile_planes):
+                    target[:] = source[offset:offset + width * height].reshape(height, width)
+            return blit
+
+        canvas = memoryview(self.canvas)
+        rows = []  # (canvas start, frame start, length) of every row of every plane
+        for (offset, stride, _, scale), (src, width, height, _) in zip(canvas_planes, tile_planes):
+            dst = offset + (tile.y // scale) * stride + tile.x // scale
+            rows += [(dst + r * stride, src + r * width, width) for r in range(height)]
+
+        def blit(frame):
+            source = memoryview(frame)
+            for dst, src, length in rows:
+                canvas[dst:dst + length] = source[src:src + length]
+        return blit
+
+    def compose(self):
+        """Copies every changed tile into the canvas. Returns True if the canvas changed."""
+        now = time.monotonic()
+        changed = False
+        for tile, blit in zip(self.tiles, self._blitters):
+            if tile.seq != tile.drawn:
+                with tile.lock:
+                    blit(tile.front)
+                    tile.drawn = tile.seq
+                    tile.window[1] += now - tile.decoded_at
+                    tile.window[2] += 1
+                tile.blank = False
+                changed = True
+            server = tile.server
+            if server is None or server.conn is not None:
+                tile.idle_since = None
+                continue
+            tile.idle_since = tile.idle_since or now
+            if not tile.blank and now - tile.idle_since >= config.TILE_TIMEOUT:
+                fill_black(self.canvas, self.width, self.height, tile.x, tile.y, tile.width, tile.height)
+                tile.blank = changed = True
+        return changed
+
+    def run(self, output):
+        """Composites until stop(); output(canvas) shows one composite (may block)."""
+        interval = 1 / config.TILE_FPS
+        last_output = 0.0
+        while not self.stop_event.is_set():
+            if self.changed.wait(IDLE_CHECK):
+                wait = last_output + interval - time.monotonic()
+                if wait > 0:
+                    self.stop_event.wait(wait)  # frames of other tiles arriving meanwhile go in the same composite
+                self.changed.clear()
+            started = time.monotonic()
+            if self.compose():
+                self.compose_times.append(time.monotonic() - started)
+                output(self.canvas)
+                self.outputs += 1
+                last_output = started
+            self._print_stats()
+
+    def stop(self):
+        self.stop_event.set()
+        self.changed.set()
+
+    # --- Stats ---
+
+    def stats(self):
+        """Per tile and wall figures since the last call (resets the windows)."""
+        now = time.monotonic()
+        elapsed = max(now - self.last_stats, 1e-9)
+        self.last_stats = now
+        tiles = []
+        for tile in self.tiles:
+            with tile.lock:
+                frames, delay, composed = tile.window
+                tile.window = [0, 0.0, 0]
+            server = tile.server
+            latency = server.latency.take_mean("total") if server is not None and server.latency else None
+            tiles.append({
+                "tile": tile.index + 1,
+                "peer": server.peer_ip if server is not None and server.conn else None,
+                "frames": tile.seq,
+                "fps": round(frames / elapsed, 1),
+                "latency_ms": round(latency * 1000, 1) if latency is not None else None,
+                "compose_delay_ms": round(delay / composed * 1000, 1) if composed else None,
+            })
+        times = self.compose_times
+        self.compose_times = []
+        outputs, self.last_output_count = self.outputs - self.last_output_count, self.outputs
+        return {
+            "output_fps": round(outputs / elapsed, 1),
+            "compose_ms": round(sum(times) / len(times) * 1000, 2) if times else None,
+            "tiles": tiles,
+        }
+
+    def _print_stats(self):
+        if time.monotonic() - self.last_stats < config.STATS_INTERVAL:
+            return
+        s = self.stats()
+        lines = [f"🧩 Wall: {self.width}x{self.height}, {s['output_fps']} fps out, compose {s['compose_ms']} ms"]
+        for t in s["tiles"]:
+            if t["peer"] is None and not t["frames"]:
+                lines.append(f"   tile {t['tile']}: waiting for a sender")
+                continue
+            latency = f"{t['latency_ms']} ms" if t["latency_ms"] is not None else "-"
+            lines.append(f"   tile {t['tile']} ({t['peer'] or 'gone'}): {t['fps']} fps, latency {latency}, "
+                         f"compose delay {t['compose_delay_ms']} ms")
+        print("\n".join(lines))
+
+    # --- Lifecycle ---
+
+    def serve(self, servers, output):
+        """Runs one ingest server per tile on its own thread and composites into output until stop()."""
+        threads = []
+        for tile, server in zip(self.tiles, servers):
+            tile.server = server
+            thread = threading.Thread(target=server.serve_forever, name=tile.name, daemon=True)
+            thread.start()
+            threads.append(thread)
+        try:
+            self.run(output)
+        finally:
+            for server in servers:
+                server.stop()
+            for thread in threads:
+                thread.join(timeout=5)
+            for server in servers:
+                server.close()
@@ -0,0 +1,374 @@
+"""
+OpenSecondDisplay - Performance Time Series
+Role: Networking & Performance Engineer
+
+Description:
+    The last METRICS_HISTORY samples of a handful of metrics (fps, bitrate,
+    latency, queue depth, CPU), taken every METRICS_INTERVAL seconds while
+    the GUI runs, for the live graphs and for attaching a session to an
+    incident report.
+
+      Series        - one metric in a fixed-size ring of two array('d')
+                      (wall clock time, value): O(1) append, no per-sample
+                      objects, oldest samples overwritten
+      MetricsStore  - the series by name; export_csv() (one row per sample
+                      time, one column per metric) and export_json()
+      MetricsSampler- a background thread that calls a snapshot function
+                      (sender.metrics_snapshot() / receiver.metrics_snapshot())
+                      and turns counters into rates and process CPU time into
+                      percent of one core
+      GraphPanel    - a Tk frame with one small graph per metric, redrawn
+                      with after() every METRICS_INTERVAL; never waits on
+                      the sampler
+
+    Graphs show the last GRAPH_WINDOW seconds, downsampled to one point per
+    pixel column (bucket mean, and the bucket maximum as a lighter line so a
+    short spike stays visible). With NumPy the buckets are computed with one
+    reshape; without it in plain Python.
+
+    CPU time of other processes (the encoder, the decoder) comes from psutil
+    when installed, /proc on Linux, or ps elsewhere.
+
+    This file is identical in sender/ and receiver/ (like mpegts.py).
+"""
+
+import csv
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from array import array
+
+import config
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python path is used instead.
+    np = None
+
+try:
+    import psutil
+    PSUTIL_ERRORS = (psutil.Error,)
+except ImportError:  # psutil is optional; /proc or ps is used instead.
+    psutil = None
+    PSUTIL_ERRORS = ()
+
+# name: (label, unit) of the metrics the GUIs graph, in display order.
+METRICS = {
+    "fps": ("Frame rate", "fps"),
+    "bitrate_mbps": ("Bitrate", "Mbps"),
+    "latency_ms": ("Latency", "ms"),
+    "queue_frames": ("Queue", "frames"),
+    "cpu_pct": ("CPU", "%"),
+}
+
+
+class Series:
+    """A fixed-size ring buffer of (time, value) samples."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.head = 0   # next slot to write
+        self.count = 0
+
+    def append(self, t, value):
+        self.times[self.head] = t
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self):
+        """(time, value) of the newest sample, or None."""
+        if not self.count:
+            return None
+        i = (self.head - 1) % self.capacity
+        return self.times[i], self.values[i]
+
+    def snapshot(self, since=None):
+        """(times, values) in time order, from `since` on; arrays (NumPy arrays with NumPy)."""
+        start = (self.head - self.count) % self.capacity
+        if start + self.count <= self.capacity:
+            times = self.times[start:start + self.count]
+            values = self.values[start:start + self.count]
+        else:
+            times = self.times[start:] + self.times[:self.head]
+            values = self.values[start:] + self.values[:self.head]
+        if np is not None:
+            times, values = np.frombuffer(times, dtype=np.float64), np.frombuffer(values, dtype=np.float64)
+            if since is not None:
+                first = int(np.searchsorted(times, since))
+                times, values = times[first:], values[first:]
+            return times, values
+        if since is not None:
+            first = next((i for i, t in enumerate(times) if t >= since), len(times))
+            times, values = times[first:], values[first:]
+        return times, values
+
+    def downsample(self, points, since=None):
+        """At most `points` (time, mean, max) buckets of the samples from `since` on."""
+        times, values = self.snapshot(since)
+        n = len(times)
+        if not n:
+            return []
+        size = -(-n // points)  # samples per bucket
+        if size == 1:
+            return [(t, v, v) for t, v in zip(times, values)]
+        if np is not None:
+            whole = n - n % size
+            buckets = [(times[:whole].reshape(-1, size), values[:whole].reshape(-1, size))]
+            if whole < n:
+                buckets.append((times[whole:][None, :], values[whole:][None, :]))
+            return [(t, m, x) for bt, bv in buckets
+                    for t, m, x in zip(bt[:, -1].tolist(), bv.mean(axis=1).tolist(), bv.max(axis=1).tolist())]
+        result = []
+        for i in range(0, n, size):
+            chunk = values[i:i + size]
+            result.append((times[min(i + size, n) - 1], sum(chunk) / len(chunk), max(chunk)))
+        return result
+
+
+class MetricsStore:
+    """Named series, written by one sampler thread and read by the UI."""
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity or config.METRICS_HISTORY
+        self.series = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def append(self, name, value, t=None):
+        with self.lock:
+            series = self.series.get(name)
+            if series is None:
+                series = self.series[name] = Series(self.capacity)
+            series.append(time.time() if t is None else t, float(value))
+
+    def view(self, name, points, since):
+        """(downsampled buckets, latest sample) of a series for a graph; ([], None) if it has none."""
+        with self.lock:
+            series = self.series.get(name)
+            if series is None:
+                return [], None
+            return series.downsample(points, since), series.latest()
+
+    def rows(self):
+        """(names, [(time, {name: value})]) merged on sample time."""
+        with self.lock:
+            names = [name for name in METRICS if name in self.series] + sorted(set(self.series) - set(METRICS))
+            merged = {}
+            for name in names:
+                times, values = self.series[name].snapshot()
+                for t, v in zip(times, values):
+                    merged.setdefault(float(t), {})[name] = float(v)
+        return names, sorted(merged.items())
+
+    def export_csv(self, path):
+        names, rows = self.rows()
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["time_unix", "time_s"] + [f"{name} ({METRICS[name][1]})" if name in METRICS else name
+                                                      for name in names])
+            for t, values in rows:
+                writer.writerow([f"{t:.3f}", f"{t - self.started:.3f}"]
+                                + [f"{values[name]:.3f}" if name in values else "" for name in names])
+
+    def export_json(self, path, info=None):
+        names, rows = self.rows()
+        with open(path, "w") as f:
+            json.dump({
+                "started_unix": round(self.started, 3),
+                "exported_unix": round(time.time(), 3),
+                "interval_s": config.METRICS_INTERVAL,
+                "info": info or {},
+                "units": {name: METRICS[name][1] for name in names if name in METRICS},
+                "samples": [dict({"time_unix": round(t, 3)}, **{k: round(v, 3) for k, v in values.items()})
+                            for t, values in rows],
+            }, f, indent=1)
+
+
+# --- Sampling ---
+
+def process_cpu_seconds(pid):
+    """User + system CPU seconds of a process, None if it is gone or cannot be read."""
+    if pid == os.getpid():
+        t = os.times()
+        return t.user + t.system
+    try:
+        if psutil is not None:
+            t = psutil.Process(pid).cpu_times()
+            return t.user + t.system
+        if sys.platform.startswith("linux"):
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        out = subprocess.run(["ps", "-o", "time=", "-p", str(pid)], stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, text=True, timeout=2).stdout.strip()
+        return _parse_ps_time(out) if out else None
+    except (OSError, ValueError, IndexError, subprocess.TimeoutExpired) + PSUTIL_ERRORS:
+        return None
+
+
+def _parse_ps_time(text):
+    """ps "time" ([dd-][hh:]mm:ss[.cc]) in seconds."""
+    days, _, rest = text.rpartition("-")
+    seconds = 0.0
+    for part in rest.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds + (int(days) * 86400 if days else 0)
+
+
+class MetricsSampler:
+    """Calls snapshot() every METRICS_INTERVAL seconds and stores what it returns.
+
+    snapshot() returns {name: value or None}, plus optionally "pids": processes
+    whose CPU counts with this one's. Names in `rates` are counters:
+    {counter: (metric, scale)} stores the counter's rate times scale instead.
+    """
+
+    def __init__(self, store, snapshot, rates=None, interval=None):
+        self.store = store
+        self.snapshot = snapshot
+        self.rates = rates or {}
+        self.interval = interval or config.METRICS_INTERVAL
+        self.previous = {}   # counter -> (time, value); pid -> (time, cpu seconds)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:  # a metric source going away must not end the graphs
+                print(f"⚠️  Metrics sample failed: {e}")
+
+    def sample(self):
+        now = time.time()
+        values = dict(self.snapshot() or {})
+        pids = [os.getpid()] + [pid for pid in values.pop("pids", ()) if pid]
+        for counter, (name, scale) in self.rates.items():
+            values[name] = self._rate(counter, values.pop(counter, None), now, scale)
+        values["cpu_pct"] = self._cpu(pids, now)
+        for name, value in values.items():
+            if value is not None:
+                self.store.append(name, value, now)
+
+    def _rate(self, key, value, now, scale):
+        previous = self.previous.get(key)
+        self.previous[key] = (now, value) if value is not None else None
+        if previous is None or value is None or value < previous[1] or now <= previous[0]:
+            return None  # first sample, or the counter restarted (new encoder / session)
+        return (value - previous[1]) / (now - previous[0]) * scale
+
+    def _cpu(self, pids, now):
+        total = 0.0
+        known = False
+        for pid in pids:
+            seconds = process_cpu_seconds(pid)
+            key = ("cpu", pid)
+            previous = self.previous.get(key)
+            self.previous[key] = (now, seconds) if seconds is not None else None
+            if seconds is not None and previous is not None and now > previous[0]:
+                total += (seconds - previous[1]) / (now - previous[0]) * 100
+                known = True
+        return total if known else None
+
+    def stop(self):
+        self.stop_event.set()
+
+
+# --- Tk panel ---
+
+class GraphPanel:
+    """Small graphs of a MetricsStore's series plus export buttons, redrawn with after()."""
+
+    def __init__(self, parent, store, metrics=None, width=360, height=44, info=None):
+        import tkinter as tk
+        self.tk = tk
+        self.store = store
+        self.names = list(metrics or METRICS)
+        self.width = width
+        self.height = height
+        self.info = info  # callable returning a dict for the JSON export (settings, versions)
+        self.frame = tk.Frame(parent)
+        self.canvases = {}
+        for name in self.names:
+            label, unit = METRICS.get(name, (name, ""))
+            row = tk.Frame(self.frame)
+            row.pack(fill=tk.X)
+            text = tk.Label(row, text=label, font=("Arial", 8), anchor="w")
+            text.pack(fill=tk.X)
+            canvas = tk.Canvas(row, width=width, height=height, bg="white", highlightthickness=1,
+                               highlightbackground="#ccc")
+            canvas.pack()
+            peak = canvas.create_line(0, 0, 0, 0, fill="#9ecae1")
+            mean = canvas.create_line(0, 0, 0, 0, fill="#08519c", width=2)
+            self.canvases[name] = (canvas, text, peak, mean, label, unit)
+        buttons = tk.Frame(self.frame)
+        buttons.pack(pady=4)
+        tk.Button(buttons, text="Export CSV", command=lambda: self.export("csv")).pack(side=tk.LEFT, padx=4)
+        tk.Button(buttons, text="Export JSON", command=lambda: self.export("json")).pack(side=tk.LEFT, padx=4)
+        self.after_id = None
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+        return self
+
+    def start(self):
+        self._redraw()
+        return self
+
+    def _redraw(self):
+        since = time.time() - config.GRAPH_WINDOW
+        for name in self.names:
+            canvas, text, peak, mean, label, unit = self.canvases[name]
+            points, latest = self.store.view(name, self.width, since)
+            if latest and latest[0] >= since:
+                text.config(text=f"{label}: {latest[1]:.1f} {unit}")
+            else:
+                text.config(text=f"{label}: -")
+            if len(points) < 2:
+                canvas.coords(peak, 0, 0, 0, 0)
+                canvas.coords(mean, 0, 0, 0, 0)
+                continue
+            top = max(x for _, _, x in points) or 1.0
+            scale_x = self.width / config.GRAPH_WINDOW
+            scale_y = (self.height - 4) / (top * 1.1)
+
+            def line(index):
+                coords = []
+                for p in points:
+                    coords += [(p[0] - since) * scale_x, self.height - 2 - p[index] * scale_y]
+                return coords
+
+            canvas.coords(peak, *line(2))
+            canvas.coords(mean, *line(1))
+        self.after_id = self.frame.after(int(config.METRICS_INTERVAL * 1000), self._redraw)
+
+    def export(self, kind):
+        from tkinter import filedialog, messagebox
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = filedialog.asksaveasfilename(defaultextension=f".{kind}", initialfile=f"osd-metrics-{stamp}.{kind}",
+                                            filetypes=[(kind.upper(), f"*.{kind}")])
+        if not path:
+            return
+        try:
+            if kind == "csv":
+                self.store.export_csv(path)
+            else:
+                self.store.export_json(path, self.info() if self.info else None)
+        except OSError as e:
+            messagebox.showerror("Error", f"Export failed: {e}")
+
+    def stop(self):
+        if self.after_id:
+            self.frame.after_cancel(self.after_id)
+            self.after_id = None
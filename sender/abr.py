@@ -0,0 +1,237 @@
+"""
+OpenSecondDisplay - Adaptive Bitrate Controller
+Role: Networking & Performance Engineer
+
+Description:
+    Closed-loop controller that walks a ladder of (bitrate, fps, resolution)
+    profiles. It watches three congestion signals:
+      - backlog:      bytes the encoder produced that the receiver has not
+                      reported yet (send queue + in flight)
+      - arrival rate: bytes/sec the receiver reports it is getting, compared
+                      with the bytes/sec the encoder is putting out
+      - encoder speed: FFmpeg's realtime factor (< 1.0 = can't keep up)
+
+    Congestion steps down right away: one profile, or straight to the first
+    one that fits the receiver's arrival rate. Stepping up needs
+    ABR_UPGRADE_AFTER seconds of clean signals, and that wait doubles every
+    time an upgrade has to be undone. Changes are held back until the next
+    GOP boundary so the restart's IDR replaces one that was due anyway,
+    unless the backlog is already twice the budget (see urgent()).
+
+    The receiver side of the loop is the OSD_STATS report sent by
+    receiver/ingest.py to FEEDBACK_PORT. The same port answers the
+    receiver's OSD_CLOCK requests (clock offset for frame latency, see
+    framestamp.py).
+"""
+
+import collections
+import math
+import socket
+import threading
+import time
+import config
+import framestamp
+
+Profile = collections.namedtuple("Profile", ["bitrate", "fps", "resolution"])
+CongestionSample = collections.namedtuple(
+    "CongestionSample", ["backlog_bytes", "arrival_bps", "send_bps", "encoder_speed"])
+
+# Encoder speed below this means it is dropping behind realtime.
+MIN_ENCODER_SPEED = 0.95
+# Receiver arrival rate below this fraction of our send rate means the link can't carry it.
+MIN_ARRIVAL_RATIO = 0.8
+# Headroom left when jumping straight to the profile that fits the arrival rate.
+FIT_RATIO = 0.85
+MAX_UPGRADE_WAIT = 120.0
+# Reports with an older session number are ignored this long after reset(); after
+# that they come from a restarted receiver whose session counter started over.
+STALE_REPORT_GRACE = 1.0
+
+
+def bitrate_bps(bitrate):
+    """'5000k' / '5M' / 5000000 -> bits per second."""
+    text = str(bitrate).strip().lower()
+    scale = {"k": 1e3, "m": 1e6}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def load_ladder():
+    return [Profile(*step) for step in config.ABR_LADDER]
+
+
+def start_index(ladder):
+    """Ladder step closest to the configured BITRATE (the launch profile)."""
+    target = bitrate_bps(config.BITRATE)
+    return min(range(len(ladder)), key=lambda i: abs(bitrate_bps(ladder[i].bitrate) - target))
+
+
+def apply_profile(profile):
+    """Writes a profile into config so build_ffmpeg_command() picks it up."""
+    config.BITRATE = profile.bitrate
+    config.FPS = profile.fps
+    config.SCALING_RESOLUTION = profile.resolution
+
+
+class AdaptiveController:
+    """Decides when to move along the profile ladder (index 0 = best)."""
+
+    def __init__(self, ladder, index=0, max_backlog_ms=None, upgrade_after=None, clock=time.monotonic):
+        self.ladder = ladder
+        self.index = index
+        self.max_backlog_ms = max_backlog_ms if max_backlog_ms is not None else config.ABR_MAX_BACKLOG_MS
+        self.base_upgrade_wait = upgrade_after if upgrade_after is not None else config.ABR_UPGRADE_AFTER
+        self.upgrade_wait = self.base_upgrade_wait
+        self.clock = clock
+        self.clean_since = clock()
+        self.last_change = clock()
+        self.last_change_was_upgrade = False
+        self.pending = None
+        self.changes = 0
+
+    @property
+    def profile(self):
+        return self.ladder[self.index]
+
+    def backlog_ms(self, sample):
+        return sample.backlog_bytes * 8 / bitrate_bps(self.profile.bitrate) * 1000
+
+    def is_congested(self, sample):
+        if sample.backlog_bytes is not None and self.backlog_ms(sample) > self.max_backlog_ms:
+            return True
+        if sample.encoder_speed is not None and sample.encoder_speed < MIN_ENCODER_SPEED:
+            return True
+        if sample.arrival_bps is not None and sample.send_bps:
+            return sample.arrival_bps < MIN_ARRIVAL_RATIO * sample.send_bps
+        return False
+
+    def fitting_index(self, sample):
+        """Best profile whose bitrate fits in what the receiver is actually getting."""
+        if not sample.arrival_bps:
+            return self.index + 1
+        budget = sample.arrival_bps * 8 * FIT_RATIO
+        for i, profile in enumerate(self.ladder):
+            if bitrate_bps(profile.bitrate) <= budget:
+                return i
+        return len(self.ladder) - 1
+
+    def urgent(self, sample):
+        """Backlog so large that waiting for the GOP boundary would make it worse."""
+        return sample.backlog_bytes is not None and self.backlog_ms(sample) > 2 * self.max_backlog_ms
+
+    def update(self, sample):
+        """Feeds one sample. Returns the index the ladder should move to, or None."""
+        now = self.clock()
+        if self.last_change_was_upgrade and now - self.last_change >= self.upgrade_wait:
+            # The last upgrade held: the next probe can come at the normal pace.
+            self.upgrade_wait = self.base_upgrade_wait
+            self.last_change_was_upgrade = False
+        if self.is_congested(sample):
+            self.clean_since = now
+            if self.last_change_was_upgrade and now - self.last_change < self.upgrade_wait:
+                # The last upgrade did not hold: probe less eagerly next time.
+                self.upgrade_wait = min(self.upgrade_wait * 2, MAX_UPGRADE_WAIT)
+            if self.index < len(self.ladder) - 1:
+                self.pending = max(self.index + 1, self.fitting_index(sample))
+        elif self.pending is None and self.index > 0 and now - self.clean_since >= self.upgrade_wait:
+            self.pending = self.index - 1
+        return self.pending
+
+    def commit(self):
+        """Called once the pending profile was actually applied (at a keyframe)."""
+        if self.pending is None:
+            return None
+        now = self.clock()
+        self.last_change_was_upgrade = self.pending < self.index
+        self.index = self.pending
+        self.pending = None
+        self.last_change = now
+        self.clean_since = now
+        self.changes += 1
+        return self.profile
+
+
+def next_keyframe(frame, gop_size):
+    """First frame number >= frame that falls on a GOP boundary."""
+    return int(math.ceil(frame / gop_size) * gop_size)
+
+
+class FeedbackListener:
+    """Collects OSD_STATS reports from the receiver (UDP, FEEDBACK_PORT).
+
+    Report format: OSD_STATS:<bytes received this connection>:<bytes/sec>:<session>[:<first frame ms>]
+    (the last field is the receiver's time from accept to the first keyframe,
+    -1 until it has arrived; older receivers leave it out)
+
+    sent_bytes is a callable returning how many bytes the encoder has written
+    so far. It is sampled when a report arrives, so the backlog compares two
+    counters from the same moment instead of a stale report with a live total.
+    """
+
+    def __init__(self, port=None, sent_bytes=None):
+        self.port = int(port or config.FEEDBACK_PORT)
+        self.sent_bytes = sent_bytes or (lambda: 0)
+        self.sent_at_report = 0
+        self.received_bytes = None
+        self.arrival_bps = None
+        self.first_frame_ms = None
+        self.session = 0
+        self.min_session = 0
+        self.reset_at = 0.0
+        self.updated_at = 0.0
+        self.sock = None
+
+    def start(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("0.0.0.0", self.port))
+        threading.Thread(target=self._listen, daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except OSError:
+                break
+            if data.startswith(framestamp.CLOCK_PREFIX.encode()):
+                reply = framestamp.clock_reply(data, framestamp.now_us())
+                if reply:
+                    try:
+                        self.sock.sendto(reply, addr)
+                    except OSError:
+                        pass
+                continue
+            parts = data.decode(errors="replace").strip().split(":")
+            if len(parts) >= 4 and parts[0] == "OSD_STATS":
+                try:
+                    session = int(parts[3])
+                    if session < self.min_session and time.monotonic() - self.reset_at < STALE_REPORT_GRACE:
+                        continue  # late report about the previous connection
+                    self.session = session
+                    self.sent_at_report = self.sent_bytes()
+                    self.received_bytes = int(parts[1])
+                    self.arrival_bps = float(parts[2])
+                    if len(parts) >= 5 and float(parts[4]) >= 0:
+                        self.first_frame_ms = float(parts[4])
+                    self.updated_at = time.monotonic()
+                except ValueError:
+                    pass
+
+    def reset(self):
+        """Forget the previous connection's counters (encoder restarted)."""
+        self.received_bytes = None
+        self.arrival_bps = None
+        self.first_frame_ms = None
+        self.sent_at_report = 0
+        self.min_session = self.session + 1
+        self.reset_at = time.monotonic()
+
+    def backlog_bytes(self):
+        """Bytes written by the encoder but not yet received, as of the last report."""
+        return max(0, self.sent_at_report - self.received_bytes)
+
+    def fresh(self, max_age=2.0):
+        return self.received_bytes is not None and time.monotonic() - self.updated_at <= max_age
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
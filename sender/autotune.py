@@ -0,0 +1,465 @@
+"""
+OpenSecondDisplay - Encoder Autotune
+Role: Networking & Performance Engineer
+
+Description:
+    Measures which encoder settings work best on this machine and saves
+    them as a profile the sender applies at startup (AUTOTUNE in config.py).
+    PRESET, thread count, slices, intra refresh, rate control and the
+    scaler are otherwise the same guesses on every host.
+
+    The test clip is a synthetic desktop rendered once at --source-size:
+    scrolling text, a window dragged across the screen, and video playing
+    in a window (one scene each, --seconds long). For every candidate the
+    clip is fed to the encoder in real time (FPS) through the same options
+    the sender uses, and the run records:
+
+      latency  - per frame, from the frame entering the encoder's stdin
+                 until its first bytes come out (p50/p95)
+      cpu      - CPU time of the encoder process / wall time (cores)
+      quality  - SSIM and PSNR of the decoded result against the clip
+                 (scaled to SCALING_RESOLUTION with lanczos) at BITRATE
+      realtime - share of frames the encoder took on time
+
+    The sweep changes one setting at a time, keeping the best value of
+    each before moving to the next (--full tries every combination). The
+    profile saved is the Pareto-optimal run (latency, cpu, quality) with
+    the best SSIM whose p95 latency fits --latency-budget (default: one
+    frame interval) and cpu --cpu-budget; if none fits, the fastest one.
+
+    Profiles are cached next to the capability cache, per FFmpeg binary
+    and per encoder / resolution / FPS.
+
+Usage:
+    python3 autotune.py                       # sweep and save
+    python3 autotune.py --seconds 2 --cpu-budget 2
+    python3 autotune.py --show                # saved profiles
+    python3 autotune.py --clear
+"""
+
+import argparse
+import itertools
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import capabilities
+import config
+import encoders
+
+PROFILE_FILE = os.path.join(capabilities.CACHE_DIR, "autotune.json")
+TUNED_KEYS = ("PRESET", "ENCODER_THREADS", "ENCODER_SLICES", "INTRA_REFRESH", "RATE_CONTROL", "SCALER")
+X264_PRESETS = ["ultrafast", "superfast", "veryfast", "faster"]
+SCALERS = ["fast_bilinear", "bilinear", "bicubic", "lanczos"]
+REALTIME_MIN = 0.98   # share of frames taken on time for a run to count as keeping up
+READ_SIZE = 1 << 16
+
+
+# --- Profiles (used by sender.py) ---
+
+def _binary_key():
+    path = shutil.which("ffmpeg")
+    if not path:
+        return None
+    path = os.path.realpath(path)
+    return f"{path}:{os.stat(path).st_mtime_ns}"
+
+
+def profile_name(encoder):
+    return f"{encoder} {config.SCALING_RESOLUTION or 'native'} {config.FPS}fps"
+
+
+def _load():
+    try:
+        with open(PROFILE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(data):
+    try:
+        os.makedirs(capabilities.CACHE_DIR, exist_ok=True)
+        tmp = PROFILE_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, PROFILE_FILE)
+    except OSError as e:
+        print(f"⚠️ Could not save the profile: {e}")
+
+
+def load_profile(encoder):
+    """The saved profile for encoder at the current resolution/FPS, or None."""
+    entry = _load().get(_binary_key() or "")
+    return (entry or {}).get("profiles", {}).get(profile_name(encoder))
+
+
+def apply_profile(encoder, keep=()):
+    """Sets the tuned settings of a saved profile (except the keys in keep). Returns the profile."""
+    if not config.AUTOTUNE:
+        return None
+    profile = load_profile(encoder)
+    if not profile:
+        return None
+    for key, value in profile["settings"].items():
+        if key in TUNED_KEYS and key not in keep:
+            setattr(config, key, value)
+    print(f"🎯 Autotuned profile: {describe(profile['settings'])}")
+    return profile
+
+
+def save_profile(encoder, settings, measured, clip):
+    data = _load()
+    key = _binary_key()
+    entry = data.setdefault(key, {"binary": key.rsplit(":", 1)[0], "profiles": {}})
+    # Drop profiles of older builds of the same binary.
+    data = {k: v for k, v in data.items() if k == key or v.get("binary") != entry["binary"]}
+    entry["profiles"][profile_name(encoder)] = {
+        "settings": settings,
+        "measured": measured,
+        "clip": clip,
+        "bitrate": config.BITRATE,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    _save(data)
+
+
+def describe(settings):
+    parts = [f"preset {settings['PRESET']}"] if "PRESET" in settings else []
+    parts.append(f"{settings.get('ENCODER_THREADS') or 'auto'} threads")
+    parts.append(f"{settings.get('ENCODER_SLICES') or 'default'} slices")
+    parts.append("intra refresh" if settings.get("INTRA_REFRESH") else "GOP")
+    parts.append(settings.get("RATE_CONTROL", "abr"))
+    parts.append(f"{settings.get('SCALER', 'bicubic')} scaler")
+    return ", ".join(parts)
+
+
+# --- Test clip ---
+
+class Clip:
+    """The synthetic desktop rendered to a raw yuv420p file."""
+
+    def __init__(self, directory, size, fps, scene_seconds):
+        self.width, self.height = (int(v) // 2 * 2 for v in size.split("x"))
+        self.fps = fps
+        self.frames = int(scene_seconds * fps) * 3
+        self.frame_size = self.width * self.height * 3 // 2
+        self.path = os.path.join(directory, "clip.yuv")
+        self.scene_seconds = scene_seconds
+
+    @property
+    def size(self):
+        return f"{self.width}x{self.height}"
+
+    def graph(self):
+        w, h, r, d = self.width, self.height, self.fps, self.scene_seconds
+        ww, wh = w // 3 // 2 * 2, h // 3 // 2 * 2
+        # Text: rows of dark glyph-sized blocks on white, scrolling up 4 lines a second.
+        text = (f"nullsrc=s={w}x{h}:r={r}:d={d},format=gray,"
+                "geq=lum='if(lt(mod(X,9),6)*lt(mod(Y+T*88,22),12)"
+                "*gt(mod(floor(X/9)*37+floor((Y+T*88)/22)*91,11),2),40,235)',format=yuv420p[text]")
+        desk = f"color=c=0x3a6ea5:s={w}x{h}:r={r}:d={d}"
+        window = f"color=c=0xf0f0f0:s={ww}x{wh}:r={r}:d={d},drawbox=x=0:y=0:w=iw:h=24:c=0x2050a0:t=fill"
+        drag = (f"{desk}[d1];{window}[win];[d1][win]overlay="
+                f"x='{w // 10}+mod(t*{w // 3},{w // 2})':y='{h // 6}+{h // 10}*sin(t*2)',format=yuv420p[drag]")
+        video = (f"{desk}[d2];testsrc2=s={w // 2 // 2 * 2}x{h // 2 // 2 * 2}:r={r}:d={d}[tv];"
+                 f"[d2][tv]overlay=x={w // 4}:y={h // 4},format=yuv420p[video]")
+        return f"{text};{drag};{video};[text][drag][video]concat=n=3:v=1:a=0"
+
+    def render(self):
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-filter_complex", self.graph(),
+                        "-frames:v", str(self.frames), "-f", "rawvideo", "-pix_fmt", "yuv420p", self.path],
+                       check=True)
+
+    def input_args(self):
+        return ["-f", "rawvideo", "-pix_fmt", "yuv420p", "-video_size", self.size,
+                "-framerate", str(self.fps), "-i"]
+
+
+# --- One encode ---
+
+class FrameStarts:
+    """Counts frame starts in an H.264/HEVC Annex B byte stream (first slice of each picture)."""
+
+    def __init__(self, codec):
+        self.hevc = codec == "hevc"
+        self.tail = b""
+
+    def feed(self, data):
+        buf = self.tail + data
+        count = 0
+        i = buf.find(b"\x00\x00\x01")
+        while i >= 0:
+            if i + 6 > len(buf):
+                break
+            header = buf[i + 3]
+            if self.hevc:
+                vcl, first = (header >> 1) & 0x3F < 32, buf[i + 5] & 0x80
+            else:
+                vcl, first = header & 0x1F in (1, 5), buf[i + 4] & 0x80  # first_mb_in_slice == 0
+            count += bool(vcl and first)
+            i = buf.find(b"\x00\x00\x01", i + 3)
+        self.tail = buf[i:] if i >= 0 else buf[-2:]
+        return count
+
+
+def encode_command(encoder, clip, pix_fmt="yuv420p"):
+    import sender  # for the scaler; sender.py imports this module too
+    cmd = ["ffmpeg", "-hide_banner", "-nostats", "-v", "error", *encoders.global_args(encoder),
+           *clip.input_args(), "pipe:0", *encoders.encoder_args(encoder, pix_fmt)]
+    filters = [sender.scale_filter()] if config.SCALING_RESOLUTION else []
+    filters += encoders.upload_filters(encoder)
+    if filters:
+        cmd.extend(["-vf", ",".join(filters)])
+    return cmd + ["-f", codec_of(encoder), "-flush_packets", "1", "pipe:1"]
+
+
+def codec_of(encoder):
+    return next((codec for name, codec, _ in encoders.ENCODER_PREFERENCE if name == encoder), "h264")
+
+
+def run_encode(encoder, clip, output_path):
+    """Feeds the clip in real time. Returns latencies (ms), cpu cores, realtime share, error."""
+    process = subprocess.Popen(encode_command(encoder, clip), stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    interval = 1 / clip.fps
+    fed = []       # clock() when frame i was completely written
+    on_time = [0]
+    stderr = []
+    threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True).start()
+
+    def feed():
+        with open(clip.path, "rb") as f:
+            start = time.monotonic()
+            try:
+                for i in range(clip.frames):
+                    delay = start + i * interval - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    process.stdin.write(f.read(clip.frame_size))
+                    process.stdin.flush()
+                    now = time.monotonic()
+                    fed.append(now)
+                    on_time[0] += now - (start + i * interval) <= interval
+            except BrokenPipeError:
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    started = time.monotonic()
+    feeder.start()
+    scanner = FrameStarts(codec_of(encoder))
+    out = []       # clock() when frame i's first bytes were read
+    with open(output_path, "wb") as f:
+        while True:
+            data = process.stdout.read1(READ_SIZE)
+            if not data:
+                break
+            now = time.monotonic()
+            out.extend([now] * scanner.feed(data))
+            f.write(data)
+    feeder.join()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.monotonic() - started
+    latencies = [(o - i) * 1000 for i, o in zip(fed, out)]
+    error = None
+    if process.returncode or len(out) < clip.frames * REALTIME_MIN:
+        error = (b"".join(stderr).decode(errors="replace").strip().splitlines() or ["no output"])[-1]
+    return latencies, (usage.ru_utime + usage.ru_stime) / wall, on_time[0] / clip.frames, error
+
+
+def measure_quality(encoded, codec, clip):
+    """(SSIM, PSNR) of the encoded stream against the clip at the output resolution."""
+    reference = "[1:v]"
+    if config.SCALING_RESOLUTION:
+        reference += f"scale={config.SCALING_RESOLUTION}:flags=lanczos,"
+    graph = f"{reference}split[r1][r2];[0:v][r1]ssim=shortest=1[s];[s][r2]psnr=shortest=1"
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-nostats", "-f", codec, "-i", encoded,
+                             *clip.input_args(), clip.path, "-filter_complex", graph, "-f", "null", "-"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    ssim = re.search(r"SSIM .*All:([\d.]+)", result.stderr)
+    psnr = re.search(r"PSNR .*average:([\d.]+|inf)", result.stderr)
+    return (float(ssim.group(1)) if ssim else None), (float(psnr.group(1)) if psnr else None)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))] if values else None
+
+
+def evaluate(encoder, clip, settings, workdir):
+    """Encodes the clip with settings applied to config. Returns the run's measurements."""
+    previous = {key: getattr(config, key) for key in settings}
+    for key, value in settings.items():
+        setattr(config, key, value)
+    try:
+        encoded = os.path.join(workdir, "encoded")
+        latencies, cpu, realtime, error = run_encode(encoder, clip, encoded)
+        ssim, psnr = measure_quality(encoded, codec_of(encoder), clip) if not error else (None, None)
+    finally:
+        for key, value in previous.items():
+            setattr(config, key, value)
+    return {
+        "settings": dict(settings),
+        "latency_p50_ms": round(percentile(latencies, 50), 2) if latencies else None,
+        "latency_p95_ms": round(percentile(latencies, 95), 2) if latencies else None,
+        "cpu_cores": round(cpu, 2),
+        "realtime": round(realtime, 3),
+        "ssim": ssim,
+        "psnr": psnr,
+        "error": error,
+    }
+
+
+# --- Sweep ---
+
+def dimensions(encoder):
+    """(config key, candidate values) to sweep for encoder, in sweep order."""
+    cores = os.cpu_count() or 1
+    dims = []
+    if encoder == "libx264":
+        dims.append(("PRESET", X264_PRESETS))
+    dims.append(("ENCODER_THREADS", [0] + [n for n in (1, 2, 4, 8, 16) if n <= cores]))
+    dims.append(("ENCODER_SLICES", [0, 2, 4]))
+    if encoder in encoders.INTRA_REFRESH_ENCODERS:
+        dims.append(("INTRA_REFRESH", [False, True]))
+    dims.append(("RATE_CONTROL", ["abr", "vbv", "cbr"]))
+    if config.SCALING_RESOLUTION:
+        dims.append(("SCALER", SCALERS))
+    return dims
+
+
+def usable(results):
+    good = [r for r in results if not r["error"] and r["ssim"] is not None]
+    return [r for r in good if r["realtime"] >= REALTIME_MIN] or good
+
+
+def dominates(a, b):
+    no_worse = (a["latency_p95_ms"] <= b["latency_p95_ms"] and a["cpu_cores"] <= b["cpu_cores"]
+                and a["ssim"] >= b["ssim"])
+    better = (a["latency_p95_ms"] < b["latency_p95_ms"] or a["cpu_cores"] < b["cpu_cores"]
+              or a["ssim"] > b["ssim"])
+    return no_worse and better
+
+
+def pareto_front(results):
+    candidates = usable(results)
+    return [r for r in candidates if not any(dominates(other, r) for other in candidates)]
+
+
+def choose(results, latency_budget, cpu_budget=None):
+    """Best SSIM within the budgets; the lowest latency if nothing fits."""
+    candidates = usable(results)
+    if not candidates:
+        return None
+    within = [r for r in candidates if r["latency_p95_ms"] <= latency_budget
+              and (cpu_budget is None or r["cpu_cores"] <= cpu_budget)]
+    if within:
+        return max(within, key=lambda r: (r["ssim"], -r["latency_p95_ms"], -r["cpu_cores"]))
+    return min(candidates, key=lambda r: (r["latency_p95_ms"], r["cpu_cores"]))
+
+
+def format_result(r):
+    if r["error"]:
+        return f"  {describe(r['settings']):<78} FAILED: {r['error'][:60]}"
+    return (f"  {describe(r['settings']):<78} {r['latency_p50_ms']:6.1f}/{r['latency_p95_ms']:6.1f} ms "
+            f"cpu {r['cpu_cores']:4.2f} SSIM {r['ssim']:.4f} PSNR {r['psnr'] or 0:5.2f}"
+            + ("" if r["realtime"] >= REALTIME_MIN else f" (late {1 - r['realtime']:.0%})"))
+
+
+def sweep(encoder, clip, workdir, latency_budget, cpu_budget, full=False):
+    dims = dimensions(encoder)
+    base = {key: getattr(config, key) for key, _ in dims}
+    results = {}
+
+    def run(settings):
+        key = tuple(sorted(settings.items()))
+        if key not in results:
+            results[key] = evaluate(encoder, clip, settings, workdir)
+            print(format_result(results[key]))
+        return results[key]
+
+    if full:
+        for values in itertools.product(*(candidates for _, candidates in dims)):
+            run(dict(zip([key for key, _ in dims], values)))
+    else:
+        for key, candidates in dims:
+            tried = [run(dict(base, **{key: value})) for value in candidates]
+            best = choose(tried, latency_budget, cpu_budget)
+            if best:
+                base[key] = best["settings"][key]
+    return list(results.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the best encoder settings for this machine")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Seconds per clip scene (3 scenes)")
+    parser.add_argument("--source-size", default="1920x1080", help="Clip size (the captured screen)")
+    parser.add_argument("--latency-budget", type=float, help="p95 encode latency limit in ms (default: one frame)")
+    parser.add_argument("--cpu-budget", type=float, help="CPU limit in cores (default: none)")
+    parser.add_argument("--full", action="store_true", help="Try every combination instead of one setting at a time")
+    parser.add_argument("--dry-run", action="store_true", help="Measure and print, but do not save")
+    parser.add_argument("--show", action="store_true", help="Print the saved profiles")
+    parser.add_argument("--clear", action="store_true", help="Delete the saved profiles")
+    args = parser.parse_args()
+
+    if args.clear:
+        if os.path.exists(PROFILE_FILE):
+            os.remove(PROFILE_FILE)
+        print("🗑️  Autotune profiles deleted.")
+        return
+    if args.show:
+        for entry in _load().values():
+            for name, profile in entry.get("profiles", {}).items():
+                print(f"{name} ({profile['created']}, {profile['bitrate']}): {describe(profile['settings'])}")
+                print(f"    {profile['measured']}")
+        return
+
+    import sender
+    sender.check_ffmpeg()
+    encoder = sender.select_encoder()
+    latency_budget = args.latency_budget or 1000 / config.FPS
+    print(f"🎯 Autotuning {encoder} for {config.SCALING_RESOLUTION or 'native'} @ {config.FPS}fps, {config.BITRATE} "
+          f"(p95 latency <= {latency_budget:.1f} ms"
+          + (f", cpu <= {args.cpu_budget} cores)" if args.cpu_budget else ")"))
+
+    workdir = tempfile.mkdtemp(prefix="osd-autotune-")
+    try:
+        clip = Clip(workdir, args.source_size, config.FPS, args.seconds)
+        print(f"🎬 Rendering the test clip ({clip.size}, {clip.frames} frames, "
+              f"{clip.frames * clip.frame_size / 1e6:.0f} MB)...")
+        clip.render()
+        results = sweep(encoder, clip, workdir, latency_budget, args.cpu_budget, args.full)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    front = pareto_front(results)
+    best = choose(front, latency_budget, args.cpu_budget)
+    if not best:
+        print("❌ No run succeeded; nothing saved.")
+        sys.exit(1)
+    print(f"\n📐 Pareto front ({len(front)} of {len(results)} runs):")
+    for r in sorted(front, key=lambda r: r["latency_p95_ms"]):
+        print(format_result(r))
+    print(f"\n✅ Best: {describe(best['settings'])}")
+    if args.dry_run:
+        return
+    measured = {key: best[key] for key in ("latency_p50_ms", "latency_p95_ms", "cpu_cores", "ssim", "psnr")}
+    save_profile(encoder, best["settings"], measured,
+                 {"size": clip.size, "frames": clip.frames, "seconds_per_scene": args.seconds})
+    print(f"💾 Saved as \"{profile_name(encoder)}\" in {PROFILE_FILE} (AUTOTUNE applies it at startup).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+OpenSecondDisplay - Capture Backends
+Role: macOS Sender Engineer
+
+Description:
+    FFmpeg input options for each way the sender can grab a screen:
+
+      avfoundation - macOS screens (SCREEN_INDEX)
+      x11grab      - Linux X11 / XWayland displays (X11_DISPLAY, CAPTURE_REGION)
+      kmsgrab      - Linux DRM/KMS framebuffer, works without X (Wayland,
+                     console); needs CAP_SYS_ADMIN. Frames arrive on the GPU and
+                     are downloaded before scaling. Pure PipeWire capture has no
+                     FFmpeg input device, so Wayland sessions use kmsgrab.
+      synthetic    - lavfi testsrc2 rendered once and looped from memory; pushes
+                     4K at 60+ fps, so encode throughput can be measured apart
+                     from capture (SYNTHETIC_REALTIME = False runs it flat out)
+
+    Each backend declares its native pixel formats, best first. The sender
+    picks the first one the encoder takes as-is, so e.g. AVFoundation hands
+    nv12 straight to libx264/VideoToolbox instead of converting uyvy422.
+"""
+
+import os
+import sys
+from collections import namedtuple
+
+import config
+import encoders
+
+# pix_fmts: native formats, best first (x11grab/kmsgrab deliver whatever the
+# framebuffer is); filters: needed before frames can be scaled on the CPU.
+Backend = namedtuple("Backend", "name pix_fmts filters")
+
+BACKENDS = {
+    "avfoundation": Backend("avfoundation", ["nv12", "uyvy422", "yuyv422", "0rgb", "bgr0"], []),
+    "x11grab": Backend("x11grab", ["bgr0"], []),
+    "kmsgrab": Backend("kmsgrab", ["bgr0"], ["hwdownload", "format=bgr0"]),
+    "synthetic": Backend("synthetic", ["nv12", "yuv420p", "bgr0"], []),
+}
+
+SYNTHETIC_LOOP_FRAMES = 16  # Frames rendered once and replayed (4K nv12: ~200MB of RAM)
+
+
+def backend_name():
+    """Resolves CAPTURE_BACKEND ("auto" picks one for this OS)."""
+    if config.CAPTURE_BACKEND != "auto":
+        if config.CAPTURE_BACKEND not in BACKENDS:
+            raise ValueError(f"Unknown capture backend: {config.CAPTURE_BACKEND}")
+        return config.CAPTURE_BACKEND
+    if sys.platform == "darwin":
+        return "avfoundation"
+    if sys.platform.startswith("linux"):
+        return "x11grab" if os.environ.get("DISPLAY") else "kmsgrab"
+    return "synthetic"
+
+
+def backend():
+    return BACKENDS[backend_name()]
+
+
+def pick_pix_fmt(encoder, wanted=None):
+    """Capture pixel format: CAPTURE_PIX_FMT, else the first native format the
+    encoder accepts without conversion, else the backend's default."""
+    source = backend()
+    if config.CAPTURE_PIX_FMT != "auto":
+        return config.CAPTURE_PIX_FMT
+    accepted = wanted or encoders.input_pix_fmts(encoder)
+    for pix_fmt in source.pix_fmts:
+        if pix_fmt in accepted:
+            return pix_fmt
+    return source.pix_fmts[0]
+
+
+def input_args(pix_fmt):
+    """FFmpeg input options for the configured backend delivering pix_fmt."""
+    name = backend_name()
+    if name == "avfoundation":
+        return [
+            "-f", "avfoundation",
+            "-capture_cursor", "0" if config.CURSOR_CHANNEL else "1",
+            "-pixel_format", pix_fmt,
+            "-framerate", str(config.FPS),
+            "-i", f"{config.SCREEN_INDEX}:{config.AUDIO_INDEX}",
+        ]
+    if name == "x11grab":
+        display = config.X11_DISPLAY or os.environ.get("DISPLAY", ":0")
+        draw_mouse = "0" if config.CURSOR_CHANNEL else "1"
+        args = ["-f", "x11grab", "-draw_mouse", draw_mouse, "-framerate", str(config.FPS)]
+        if config.CAPTURE_REGION:
+            size, _, offset = config.CAPTURE_REGION.partition("+")
+            args.extend(["-video_size", size])
+            display += "+" + (offset or "0,0")
+        return args + ["-i", display]
+    if name == "kmsgrab":
+        return ["-device", config.KMS_DEVICE, "-f", "kmsgrab", "-framerate", str(config.FPS), "-i", "-"]
+    # synthetic
+    graph = (f"testsrc2=size={config.SYNTHETIC_SIZE}:rate={config.FPS},format={pix_fmt},"
+             f"loop=loop=-1:size={SYNTHETIC_LOOP_FRAMES}")
+    args = ["-re"] if config.SYNTHETIC_REALTIME else []
+    return args + ["-f", "lavfi", "-i", graph]
+
+
+def input_filters():
+    """Filters that must run first (e.g. GPU -> CPU download for kmsgrab)."""
+    return list(backend().filters)
+
+
+def cursor_mode():
+    """Where the pointer is drawn: into the frames, or by the receiver (cursor.py)."""
+    return "Channel" if config.CURSOR_CHANNEL else "On"
+
+
+def describe():
+    name = backend_name()
+    if name == "avfoundation":
+        return f"AVFoundation screen {config.SCREEN_INDEX} (Cursor: {cursor_mode()})"
+    if name == "x11grab":
+        return (f"X11 display {config.X11_DISPLAY or os.environ.get('DISPLAY', ':0')} "
+                f"{config.CAPTURE_REGION or ''} (Cursor: {cursor_mode()})")
+    if name == "kmsgrab":
+        return f"KMS {config.KMS_DEVICE}"
+    return f"Synthetic {config.SYNTHETIC_SIZE} ({'realtime' if config.SYNTHETIC_REALTIME else 'as fast as possible'})"
@@ -6,9 +6,19 @@ Role: macOS Sender Engineer
 # Network Configuration
 # The IP address of the Linux Receiver
 RECEIVER_IP = "192.168.1.100"  # CHANGE THIS to your receiver's IP
+# "auto" = discovery broadcast; also adopts the receiver's display resolution,
+# decoders (RECEIVER_DECODERS) and port
 RECEIVER_PORT = 12345
 DISCOVERY_PORT = 5001
 
+# Transport: "tcp", "udp" or "srt" (must match on both ends)
+# tcp - reliable; a lost packet stalls the stream until it is retransmitted
+# udp - lowest latency; packet loss shows as artifacts until the next keyframe
+# srt - retransmits lost packets within SRT_LATENCY_MS, then gives up on them
+TRANSPORT = "tcp"
+MTU = 1500            # UDP/SRT datagrams carry as many 188-byte TS packets as fit
+SRT_LATENCY_MS = 40   # SRT retransmission window; raise on lossy Wi-Fi
+
 # Video Configuration
 # Target resolution for scaling (width:height). 
 # Set to None to use native capture resolution (high bandwidth).
@@ -18,12 +28,27 @@ SCALING_RESOLUTION = "1280:720"
 # Target Framerate
 FPS = 30
 
+# Capture Backend (see capture.py)
+# "auto" = avfoundation on macOS, x11grab on Linux with $DISPLAY, kmsgrab otherwise.
+# "synthetic" streams a test pattern (no screen needed; for load tests).
+CAPTURE_BACKEND = "auto"
+CAPTURE_PIX_FMT = "auto"  # "auto" = a native format the encoder takes without conversion
+
 # FFmpeg Capture Settings
 # Input device index for AVFoundation. "0" is usually the first screen.
 # Run 'ffmpeg -f avfoundation -list_devices true -i ""' to see indices.
 SCREEN_INDEX = "1"  # "0" typically webcam on some macs, "1" is often main screen if webcam is present.
 AUDIO_INDEX = "none" # Audio not supported in MVP
 
+# Linux capture
+X11_DISPLAY = None          # None = $DISPLAY
+CAPTURE_REGION = None       # x11grab region "WxH+X,Y", e.g. "1920x1080+1920,0"; None = whole screen
+KMS_DEVICE = "/dev/dri/card0"  # kmsgrab (needs CAP_SYS_ADMIN: sudo setcap cap_sys_admin+ep $(which ffmpeg))
+
+# Synthetic source
+SYNTHETIC_SIZE = "3840x2160"
+SYNTHETIC_REALTIME = True   # False = frames as fast as the encoder takes them (throughput tests)
+
 # Encoding Settings
 # "ultrafast" gives lowest latency but higher bitrate.
 PRESET = "ultrafast"
@@ -33,3 +58,137 @@ TUNE = "zerolatency"
 BITRATE = "5000k"
 # GME (Group of Pictures) size. Lower = lower latency recovery, higher overhead.
 GOP_SIZE = 30 
+# Encoder: "auto" picks the fastest one this FFmpeg build has (hardware first,
+# then libx264 / libopenh264) and falls back if it fails to start.
+# Or name one explicitly, e.g. "h264_videotoolbox" or "libx264".
+ENCODER = "auto"
+# Use HEVC when the receiver can decode it (same quality at a lower bitrate).
+ALLOW_HEVC = True
+# Decoders reported by the receiver (e.g. ["h264", "hevc"]); None = H.264 only.
+RECEIVER_DECODERS = None
+ENCODER_FAILURE_WINDOW = 5  # Seconds; an encoder error before this counts as "doesn't work here"
+# Host tuning: `python3 autotune.py` measures these on this machine and saves the
+# best set as a profile that replaces them at startup (AUTOTUNE).
+ENCODER_THREADS = 0     # FFmpeg -threads for the encoder; 0 = FFmpeg's default (one per core)
+ENCODER_SLICES = 0      # Slices per frame; 0 = encoder default
+INTRA_REFRESH = False   # libx264/NVENC: a moving intra column instead of IDR frames (no keyframe bitrate spikes)
+RATE_CONTROL = "abr"    # "abr" average BITRATE, "vbv" capped at BITRATE, "cbr" constant
+SCALER = "bicubic"      # SCALING_RESOLUTION algorithm: fast_bilinear, bilinear, bicubic, lanczos, area
+AUTOTUNE = True         # Apply the autotune.py profile for this encoder/resolution/FPS if there is one
+
+# Frame Gate (static desktop frame skipping)
+# When True, unchanged frames are dropped before the encoder: an idle desktop
+# costs almost no CPU or bandwidth, and frames are sent at up to FPS while
+# something moves. Keyframes stay GOP_SIZE/FPS seconds apart.
+FRAME_GATE = False
+IDLE_FPS = 1                # Keepalive frames per second while nothing changes (0 = none)
+FRAME_GATE_TILE = 32        # Tile size (pixels) for change detection
+FRAME_GATE_THRESHOLD = 1.5  # Mean per-pixel luma difference for a tile to count as changed
+FRAME_GATE_MIN_TILES = 1    # Changed tiles needed to send a frame
+
+# Fan-out Relay
+# Encode once and push the stream to several receivers ("ip:port" each). Empty = off
+# (stream to RECEIVER_IP only). Relay mode always uses TCP to the receivers.
+RELAY_RECEIVERS = []
+RELAY_MAX_QUEUE_KB = 512  # Per receiver; a receiver further behind skips to the next keyframe
+
+# Multi-Display Streaming (multistream.py)
+# Stream several screens at once, each to its own receiver. Each entry holds the
+# settings that differ for one stream (everything else comes from this file) and
+# runs as its own sender process with its own capture and encoder. FEEDBACK_PORT and
+# CONTROL_PORT default to the values below + stream index (0, 1, ...); set the same
+# FEEDBACK_PORT in that stream's receiver config.py.
+#   STREAMS = [
+#       {"SCREEN_INDEX": "1", "RECEIVER_IP": "192.168.1.100"},
+#       {"SCREEN_INDEX": "2", "RECEIVER_IP": "192.168.1.101"},   # feedback on 5003
+#   ]
+STREAMS = []  # Empty = one stream with the settings above
+# Linux: pin each stream's sender and FFmpeg processes to its own cores. "auto" splits
+# the cores evenly, or give one core list per stream, e.g. [[0, 1], [2, 3]]. None = off.
+# Each encoder also gets ENCODER_THREADS = its share of the cores unless that is set.
+STREAM_CPU_AFFINITY = "auto"
+
+# Live Control (control.py)
+# Local HTTP endpoint to change BITRATE, FPS, SCALING_RESOLUTION and GOP_SIZE while streaming:
+#   curl -s localhost:5003/settings -H 'Content-Type: application/json' -d '{"bitrate": "3000k", "resolution": "1920:1080"}'
+CONTROL_PORT = 5003           # None = off
+CONTROL_LISTEN = "127.0.0.1"  # Keep it local: the API has no authentication
+# Start the new encoder next to the running one and switch over at its first keyframe,
+# so a settings change shows no gap (switchover.py). The sender then owns the TCP
+# connection to the receiver instead of FFmpeg (tcp only). False = restart the encoder.
+SEAMLESS_SWITCH = False
+
+# Frame Timestamps (framestamp.py)
+# Put the capture and send time of every frame into the stream (a private TS PID that
+# players ignore) so a receiver with LATENCY_METRICS measures live per-frame latency.
+# Like SEAMLESS_SWITCH, the sender then owns the TCP connection (tcp only).
+FRAME_TIMESTAMPS = False
+
+# Egress Control (egress.py)
+# The sender owns the TCP socket (like SEAMLESS_SWITCH; tcp only) and keeps the unsent
+# backlog in its own queue, where it can be dropped: above EGRESS_MAX_BACKLOG_MS
+# non-reference frames are dropped, above twice that the stream skips to the next IDR.
+# RTT, congestion window and retransmissions (TCP_INFO) are printed every STATS_INTERVAL.
+EGRESS = False
+EGRESS_MAX_BACKLOG_MS = 150   # Latency budget for data waiting to be sent
+EGRESS_NOTSENT_KB = 16        # TCP_NOTSENT_LOWAT: unsent data the kernel may hold
+EGRESS_SAMPLE_INTERVAL = 0.1  # Seconds between TCP_INFO samples
+
+# Cursor Channel (cursor.py)
+# Leave the pointer out of the video and send it separately: CURSOR_RATE position
+# updates per second over UDP to the receiver's CURSOR_PORT, drawn there on top of the
+# picture. The pointer then moves with network latency instead of waiting for the
+# next frame, the encoder and the decoder. Enable CURSOR_CHANNEL on the receiver too.
+CURSOR_CHANNEL = False
+CURSOR_PORT = 5004
+CURSOR_RATE = 240             # Pointer polls per second (updates are sent only when it moves)
+CURSOR_KEEPALIVE = 0.5        # Seconds: resend an unchanged position (repairs lost datagrams)
+CURSOR_SHAPE_REFRESH = 2.0    # Seconds: resend an unchanged shape (receivers that start late)
+CURSOR_SCREEN = None          # macOS: display index (CGGetActiveDisplayList order) of the
+                              # captured screen; None = main display
+
+# Stream Inspection
+# Tee a copy of the outgoing MPEG-TS to mpegts.py and print per-PID bitrate,
+# continuity errors, PCR jitter and keyframe counts.
+INSPECT_STREAM = False
+STATS_INTERVAL = 5  # Seconds between stats printouts
+
+# Encoder Telemetry (telemetry.py)
+# FFmpeg's -progress output and stderr are read on background threads.
+TELEMETRY_PRINT = True      # Print fps/bitrate/speed/drops every STATS_INTERVAL seconds
+TELEMETRY_LOG_LINES = 200   # FFmpeg stderr lines kept for error reports
+
+# Live Graphs (gui.py, timeseries.py)
+# The GUI samples fps, bitrate, latency, queue depth and CPU every METRICS_INTERVAL
+# seconds into fixed-size ring buffers, graphs the last GRAPH_WINDOW seconds and can
+# export the session to CSV or JSON.
+METRICS_INTERVAL = 1.0        # Seconds between samples (and graph redraws)
+METRICS_HISTORY = 3600        # Samples kept per metric (older ones are overwritten)
+GRAPH_WINDOW = 300            # Seconds shown in the graphs
+
+# Reconnect (supervisor.py)
+# When the receiver goes away the sender retries with a jittered exponential backoff.
+RECONNECT = True
+RECONNECT_BACKOFF_MIN = 0.25  # Seconds before the first retry (doubles per failed attempt)
+RECONNECT_BACKOFF_MAX = 5.0
+SESSION_LOG = None            # Path to append per-session timings (JSON lines), e.g. "sessions.jsonl"
+
+# Adaptive Bitrate (ABR)
+# When True, BITRATE/FPS/SCALING_RESOLUTION follow the ladder below based on
+# congestion (send backlog, receiver arrival rate, encoder speed). Profile changes
+# restart the encoder at a GOP boundary; pair with INGEST_MODE on the receiver so
+# the reconnect is quick.
+ADAPTIVE_BITRATE = False
+FEEDBACK_PORT = 5002  # UDP port for the receiver's OSD_STATS reports
+# Profile ladder, best first: (bitrate, fps, scaling resolution)
+ABR_LADDER = [
+    ("8000k", 30, "1920:1080"),
+    ("5000k", 30, "1280:720"),
+    ("3000k", 30, "1280:720"),
+    ("2000k", 24, "1024:576"),
+    ("1000k", 15, "854:480"),
+]
+ABR_MAX_BACKLOG_MS = 150   # Unacknowledged data (in ms of video) that counts as congestion
+ABR_UPGRADE_AFTER = 10     # Seconds of clean signals before stepping back up
+ABR_SAMPLE_INTERVAL = 0.5  # Seconds between controller updates
+ABR_WARMUP = 2.0           # Seconds after an encoder (re)start before trusting its speed
@@ -0,0 +1,155 @@
+"""
+OpenSecondDisplay - Live Control API
+Role: Networking & Performance Engineer
+
+Description:
+    A small HTTP endpoint on localhost (CONTROL_LISTEN:CONTROL_PORT) for
+    changing the stream while it runs:
+
+        GET  /status     current settings, encoder telemetry, output stats,
+                         session timings, receiver feedback (link)
+        POST /settings   {"bitrate": "3000k", "fps": 60,
+                          "resolution": "1920:1080", "gop": 60}
+
+    POST needs "Content-Type: application/json", and requests carrying an
+    Origin header are refused: a web page can send a plain-text POST to
+    localhost from the user's browser, but not one of these.
+
+    Any subset of the settings may be sent; "resolution": "native" (or null)
+    streams at the capture size. sender.apply_settings() applies them: a
+    seamless switchover with SEAMLESS_SWITCH (see switchover.py), otherwise
+    an encoder restart. The reply says which and how long it took:
+
+        curl -s localhost:5003/settings -H 'Content-Type: application/json' -d '{"bitrate": "2500k"}'
+"""
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+BITRATE_RE = re.compile(r"^(\d+(\.\d+)?)([kM]?)$")
+RESOLUTION_RE = re.compile(r"^(\d+)[:x](\d+)$")
+MAX_FPS = 240
+MAX_BODY = 4096
+
+
+def parse_settings(body):
+    """JSON request body -> {config key: value}. Raises ValueError with a message for the client."""
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise ValueError("body must be a JSON object")
+    if not isinstance(data, dict) or not data:
+        raise ValueError("expected a JSON object with bitrate, fps, resolution and/or gop")
+    changes = {}
+    for key, value in data.items():
+        if key == "bitrate":
+            match = BITRATE_RE.match(str(value))
+            if not match or not int(float(match.group(1)) * {"k": 1e3, "M": 1e6}.get(match.group(3), 1)):
+                raise ValueError(f"bad bitrate {value!r} (a positive rate, e.g. \"3000k\" or \"8M\")")
+            changes["BITRATE"] = str(value)
+        elif key == "fps":
+            if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= MAX_FPS:
+                raise ValueError(f"fps must be an integer from 1 to {MAX_FPS}")
+            changes["FPS"] = value
+        elif key == "resolution":
+            if value in (None, "", "native", "Native"):
+                changes["SCALING_RESOLUTION"] = None
+                continue
+            match = RESOLUTION_RE.match(str(value))
+            width, height = (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+            if not width or not height or width % 2 or height % 2:
+                raise ValueError(f"bad resolution {value!r} (even \"W:H\", e.g. \"1920:1080\", or \"native\")")
+            changes["SCALING_RESOLUTION"] = f"{width}:{height}"
+        elif key == "gop":
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise ValueError("gop must be a positive integer (frames)")
+            changes["GOP_SIZE"] = value
+        else:
+            raise ValueError(f"unknown setting: {key}")
+    return changes
+
+
+def current_settings():
+    return {
+        "bitrate": config.BITRATE,
+        "fps": config.FPS,
+        "resolution": config.SCALING_RESOLUTION,
+        "gop": config.GOP_SIZE,
+    }
+
+
+class ControlHandler(BaseHTTPRequestHandler):
+    server_version = "OpenSecondDisplay"
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("", "/status"):
+            self._reply(200, self.server.status())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/settings":
+            self._reply(404, {"error": "not found"})
+            return
+        if self.headers.get("Origin") is not None:
+            self._reply(403, {"error": "cross-origin requests are not allowed"})
+            return
+        if self.headers.get_content_type() != "application/json":
+            self._reply(415, {"error": "Content-Type must be application/json"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._reply(400, {"error": "bad Content-Length"})
+            return
+        if length > MAX_BODY:
+            self._reply(413, {"error": "request too large"})
+            return
+        try:
+            changes = parse_settings(self.rfile.read(length))
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+            return
+        result = self.server.apply(changes)
+        self._reply(500 if "error" in result else 200, result)
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep the console for the stream's own output
+
+
+class ControlServer(ThreadingHTTPServer):
+    """HTTP server calling status() and apply(changes) (both provided by sender.py)."""
+
+    daemon_threads = True
+
+    def __init__(self, status, apply, address=None):
+        super().__init__(address or (config.CONTROL_LISTEN, config.CONTROL_PORT), ControlHandler)
+        self.status = status
+        self.apply = apply
+
+
+def start(status, apply):
+    """Serves the control API in a daemon thread. Returns the server, or None if it could not bind."""
+    try:
+        server = ControlServer(status, apply)
+    except OSError as e:
+        print(f"⚠️ Control API not available on port {config.CONTROL_PORT}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    print(f"🎛️  Control API on http://{host}:{port} (GET /status, POST /settings)")
+    return server
@@ -0,0 +1,365 @@
+"""
+OpenSecondDisplay - Cursor Channel (Sender)
+Role: macOS Sender Engineer
+
+Description:
+    With CURSOR_CHANNEL the pointer is no longer drawn into the captured
+    frames. It has to wait for the next capture, the encoder and the decoder
+    there: at 30 fps plus the pipeline, the pointer trails the hand by
+    tens of milliseconds, which makes small movements hard to aim. This
+    module polls the pointer CURSOR_RATE times a second and sends its
+    position (and its shape when that changes) to the receiver's
+    CURSOR_PORT as small UDP datagrams (cursorwire.py). The receiver draws
+    it over the video, so only the network sits between hand and pointer.
+
+    Pointer sources, matching the capture backend (capture.py):
+
+      avfoundation - CoreGraphics (ctypes): CGEventGetLocation, relative to
+                     CURSOR_SCREEN. The shape needs PyObjC (AppKit); without
+                     it the receiver draws a plain arrow.
+      x11grab      - Xlib XQueryPointer (ctypes), relative to CAPTURE_REGION
+                     or the whole screen; shape and hiding from XFixes.
+      synthetic    - a pointer circling the screen (benchmarks, tests).
+      kmsgrab      - no pointer source; the channel stays off.
+
+    Positions go out when they change, and at least every CURSOR_KEEPALIVE
+    seconds so a lost datagram is repaired quickly.
+"""
+
+import ctypes
+import ctypes.util
+import math
+import os
+import socket
+import threading
+import time
+from array import array
+
+import capture
+import config
+import cursorwire
+import relay
+
+SHAPE_INTERVAL = 0.1  # Seconds between shape checks (reading a cursor image is a round trip)
+
+
+class SyntheticPointer:
+    """A pointer going round an ellipse once every period seconds."""
+
+    def __init__(self, width=1920, height=1080, period=2.0):
+        self.size = (width, height)
+        self.period = period
+        self.start = time.perf_counter()
+
+    def area(self):
+        return (0, 0) + self.size
+
+    def position(self):
+        angle = 2 * math.pi * (time.perf_counter() - self.start) / self.period
+        width, height = self.size
+        return width / 2 + width * 0.4 * math.cos(angle), height / 2 + height * 0.4 * math.sin(angle)
+
+    def shape(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class X11Pointer:
+    """XQueryPointer / XFixesGetCursorImage through ctypes (no Python X bindings needed)."""
+
+    class CursorImage(ctypes.Structure):
+        _fields_ = [("x", ctypes.c_short), ("y", ctypes.c_short),
+                    ("width", ctypes.c_ushort), ("height", ctypes.c_ushort),
+                    ("xhot", ctypes.c_ushort), ("yhot", ctypes.c_ushort),
+                    ("cursor_serial", ctypes.c_ulong), ("pixels", ctypes.POINTER(ctypes.c_ulong)),
+                    ("atom", ctypes.c_ulong), ("name", ctypes.c_char_p)]
+
+    def __init__(self, display_name, region=None):
+        self.x11 = ctypes.CDLL(ctypes.util.find_library("X11") or "libX11.so.6")
+        self.x11.XOpenDisplay.restype = ctypes.c_void_p
+        self.x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        self.x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        self.x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self.x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        self.x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        self.x11.XQueryPointer.argtypes = [ctypes.c_void_p, ctypes.c_ulong,
+                                           ctypes.POINTER(ctypes.c_ulong), ctypes.POINTER(ctypes.c_ulong),
+                                           ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int),
+                                           ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int),
+                                           ctypes.POINTER(ctypes.c_uint)]
+        self.x11.XFree.argtypes = [ctypes.c_void_p]
+        self.x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self.display = self.x11.XOpenDisplay(display_name.encode())
+        if not self.display:
+            raise OSError(f"cannot open X display {display_name}")
+        self.root = self.x11.XDefaultRootWindow(self.display)
+        if region:
+            size, _, offset = region.partition("+")
+            width, height = (int(v) for v in size.split("x"))
+            left, top = (int(v) for v in (offset or "0,0").split(","))
+            self._area = (left, top, width, height)
+        else:
+            screen = self.x11.XDefaultScreen(self.display)
+            self._area = (0, 0, self.x11.XDisplayWidth(self.display, screen),
+                          self.x11.XDisplayHeight(self.display, screen))
+        self.xfixes = None
+        name = ctypes.util.find_library("Xfixes")
+        if name:
+            self.xfixes = ctypes.CDLL(name)
+            self.xfixes.XFixesGetCursorImage.restype = ctypes.POINTER(self.CursorImage)
+            self.xfixes.XFixesGetCursorImage.argtypes = [ctypes.c_void_p]
+        self.serial = None
+        self.current = None
+        self._out = [ctypes.c_ulong(), ctypes.c_ulong(), ctypes.c_int(), ctypes.c_int(),
+                     ctypes.c_int(), ctypes.c_int(), ctypes.c_uint()]
+        self._refs = [ctypes.byref(v) for v in self._out]
+
+    def area(self):
+        return self._area
+
+    def position(self):
+        if not self.x11.XQueryPointer(self.display, self.root, *self._refs):
+            return None  # on another screen
+        return self._out[2].value, self._out[3].value
+
+    def shape(self):
+        """The current cursor image, converted only when its serial changes."""
+        if not self.xfixes:
+            return None
+        image = self.xfixes.XFixesGetCursorImage(self.display)
+        if not image:
+            return self.current
+        try:
+            info = image.contents
+            if info.cursor_serial != self.serial:
+                self.serial = info.cursor_serial
+                count = info.width * info.height
+                # Pixels are premultiplied ARGB, one per unsigned long.
+                pixels = array("L", ctypes.string_at(info.pixels, count * ctypes.sizeof(ctypes.c_ulong)))
+                rgba = bytearray(count * 4)
+                for i, argb in enumerate(pixels):
+                    alpha = argb >> 24 & 0xFF
+                    if alpha:
+                        rgba[i * 4] = min(255, (argb >> 16 & 0xFF) * 255 // alpha)
+                        rgba[i * 4 + 1] = min(255, (argb >> 8 & 0xFF) * 255 // alpha)
+                        rgba[i * 4 + 2] = min(255, (argb & 0xFF) * 255 // alpha)
+                        rgba[i * 4 + 3] = alpha
+                rgba = bytes(rgba)
+                self.current = cursorwire.Shape(
+                    cursorwire.shape_id(rgba, info.width, info.height, info.xhot, info.yhot),
+                    info.width, info.height, info.xhot, info.yhot, rgba)
+        finally:
+            self.x11.XFree(image)
+        return self.current
+
+    def close(self):
+        if self.display:
+            self.x11.XCloseDisplay(self.display)
+            self.display = None
+
+
+class MacPointer:
+    """CoreGraphics through ctypes; the shape through PyObjC when it is installed."""
+
+    class Point(ctypes.Structure):
+        _fields_ = [("x", ctypes.c_double), ("y", ctypes.c_double)]
+
+    class Rect(ctypes.Structure):
+        _fields_ = [("x", ctypes.c_double), ("y", ctypes.c_double),
+                    ("width", ctypes.c_double), ("height", ctypes.c_double)]
+
+    def __init__(self, screen=None):
+        self.cg = ctypes.CDLL("/System/Library/Frameworks/ApplicationServices.framework/ApplicationServices")
+        self.cg.CGEventCreate.restype = ctypes.c_void_p
+        self.cg.CGEventCreate.argtypes = [ctypes.c_void_p]
+        self.cg.CGEventGetLocation.restype = self.Point
+        self.cg.CGEventGetLocation.argtypes = [ctypes.c_void_p]
+        self.cg.CFRelease.argtypes = [ctypes.c_void_p]
+        self.cg.CGDisplayBounds.restype = self.Rect
+        self.cg.CGDisplayBounds.argtypes = [ctypes.c_uint32]
+        displays = (ctypes.c_uint32 * 16)()
+        count = ctypes.c_uint32()
+        self.cg.CGGetActiveDisplayList(16, displays, ctypes.byref(count))
+        index = int(screen or 0)
+        if index >= count.value:
+            raise OSError(f"CURSOR_SCREEN {index}: only {count.value} displays")
+        bounds = self.cg.CGDisplayBounds(displays[index])  # points, origin top left of the main display
+        self._area = (bounds.x, bounds.y, bounds.width, bounds.height)
+        try:
+            import AppKit
+        except ImportError:
+            AppKit = None
+        self.appkit = AppKit
+        self.tiff = None
+        self.current = None
+
+    def area(self):
+        return self._area
+
+    def position(self):
+        event = self.cg.CGEventCreate(None)
+        if not event:
+            return None
+        try:
+            point = self.cg.CGEventGetLocation(event)
+        finally:
+            self.cg.CFRelease(event)
+        return point.x, point.y
+
+    def shape(self):
+        if self.appkit is None:
+            return None
+        cursor = self.appkit.NSCursor.currentSystemCursor()
+        if cursor is None:
+            return self.current
+        image = cursor.image()
+        tiff = bytes(image.TIFFRepresentation())
+        if tiff == self.tiff:
+            return self.current
+        self.tiff = tiff
+        rep = self.appkit.NSBitmapImageRep.imageRepWithData_(tiff)
+        width, height = rep.pixelsWide(), rep.pixelsHigh()
+        scale = width / image.size().width  # Retina cursors have 2 pixels per point
+        rgba = bytearray(width * height * 4)
+        for y in range(height):
+            for x in range(width):
+                color = rep.colorAtX_y_(x, y)
+                i = (y * width + x) * 4
+                rgba[i:i + 4] = bytes(round(c * 255) for c in (color.redComponent(), color.greenComponent(),
+                                                                color.blueComponent(), color.alphaComponent()))
+        hot = cursor.hotSpot()
+        hot_x, hot_y = round(hot.x * scale), round(hot.y * scale)
+        rgba = bytes(rgba)
+        self.current = cursorwire.Shape(cursorwire.shape_id(rgba, width, height, hot_x, hot_y),
+                                        width, height, hot_x, hot_y, rgba)
+        return self.current
+
+    def close(self):
+        pass
+
+
+def create_pointer():
+    """The pointer source for the capture backend, or None if it has none."""
+    name = capture.backend_name()
+    if name == "avfoundation":
+        return MacPointer(config.CURSOR_SCREEN)
+    if name == "x11grab":
+        return X11Pointer(config.X11_DISPLAY or os.environ.get("DISPLAY", ":0"), config.CAPTURE_REGION)
+    if name == "synthetic":
+        width, height = (int(v) for v in config.SYNTHETIC_SIZE.split("x"))
+        return SyntheticPointer(width, height)
+    return None
+
+
+def video_size(pointer):
+    """Size of the video the receiver shows (for its letterboxing)."""
+    if config.SCALING_RESOLUTION:
+        width, height = config.SCALING_RESOLUTION.split(":")
+        return int(width), int(height)
+    _, _, width, height = pointer.area()
+    return int(width), int(height)
+
+
+def targets():
+    """(host, CURSOR_PORT) of every receiver this sender streams to."""
+    hosts = [relay.parse_target(t)[0] for t in config.RELAY_RECEIVERS] or [config.RECEIVER_IP]
+    return [(host, config.CURSOR_PORT) for host in hosts]
+
+
+class CursorSender:
+    """Polls a pointer source on a thread and sends what changed to the receivers."""
+
+    def __init__(self, pointer, targets, video_size, rate=None):
+        self.pointer = pointer
+        self.targets = targets
+        self.video_size = video_size
+        self.interval = 1 / (rate or config.CURSOR_RATE)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.seq = 0
+        self.sent = 0
+        self.shapes_sent = 0
+        self.send_errors = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def send(self, data):
+        for target in self.targets:
+            try:
+                self.sock.sendto(data, target)
+            except OSError:  # full socket buffer or unreachable: the next update replaces this one
+                self.send_errors += 1
+
+    def run(self):
+        left, top, width, height = self.pointer.area()
+        video_w, video_h = self.video_size
+        last = None
+        last_sent = shape_checked = shape_sent = 0.0
+        shape = None
+        drawn = True
+        next_poll = time.perf_counter()
+        while not self.stop_event.is_set():
+            now = time.perf_counter()
+            if now - shape_checked >= SHAPE_INTERVAL:
+                shape_checked = now
+                current = self.pointer.shape()
+                if current is not None and (shape is None or current.shape_id != shape.shape_id
+                                            or now - shape_sent >= config.CURSOR_SHAPE_REFRESH):
+                    data = cursorwire.pack_shape(current)
+                    if data:
+                        self.send(data)
+                        self.shapes_sent += 1
+                        shape_sent = now
+                        shape = current
+                        drawn = any(shape.rgba[3::4])  # an all-transparent image: the app hid the pointer
+            point = self.pointer.position()
+            if point is None:
+                state = (0.0, 0.0, False)
+            else:
+                x, y = (point[0] - left) / width, (point[1] - top) / height
+                visible = 0 <= x < 1 and 0 <= y < 1 and drawn
+                state = (x, y, visible)
+            shape_key = shape.shape_id if shape else cursorwire.DEFAULT_SHAPE_ID
+            if (state, shape_key) != last or now - last_sent >= config.CURSOR_KEEPALIVE:
+                self.seq += 1
+                self.send(cursorwire.pack_position(self.seq, state[0], state[1], video_w, video_h,
+                                                   state[2], shape_key, time.time_ns() // 1000))
+                self.sent += 1
+                last, last_sent = (state, shape_key), now
+            next_poll += self.interval
+            delay = next_poll - time.perf_counter()
+            if delay > 0:
+                self.stop_event.wait(delay)
+            else:
+                next_poll = time.perf_counter()  # fell behind: don't burst
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.sock.close()
+        self.pointer.close()
+
+
+def start():
+    """Starts the cursor channel for the configured capture. Returns the CursorSender or None."""
+    try:
+        pointer = create_pointer()
+    except OSError as e:
+        print(f"⚠️  Cursor channel off: {e}")
+        return None
+    if pointer is None:
+        print(f"⚠️  Cursor channel off: no pointer source for {capture.backend_name()} capture.")
+        return None
+    sender = CursorSender(pointer, targets(), video_size(pointer))
+    print(f"🖱️  Cursor channel: {1 / sender.interval:.0f} Hz to "
+          f"{', '.join(f'{h}:{p}' for h, p in sender.targets)} (udp)")
+    return sender.start()
@@ -0,0 +1,139 @@
+"""
+OpenSecondDisplay - Cursor Channel Wire Format
+Role: Networking & Performance Engineer
+
+Description:
+    Datagrams of the cursor channel (CURSOR_CHANNEL): the sender stops
+    drawing the pointer into the video and sends it on CURSOR_PORT instead,
+    where the receiver draws it on top of the picture. Two message types,
+    each one UDP datagram:
+
+      position - "OSDC", 1, seq, x, y (0..65535 across the captured area),
+                 video width/height (for the player's letterboxing),
+                 flags (visible), shape id, send time (sender wall clock, us)
+      shape    - "OSDC", 2, shape id, width, height, hot spot x/y,
+                 zlib-compressed RGBA pixels (straight alpha)
+
+    Every position carries the full state, so a lost datagram is simply
+    replaced by the next one; nothing is retransmitted. The receiver keeps
+    the newest seq and drops older, reordered ones. Shapes are sent when
+    they change and repeated every CURSOR_SHAPE_REFRESH seconds so a
+    receiver that starts late (or lost one) catches up.
+
+    This file is identical in sender/ and receiver/ (like framestamp.py).
+"""
+
+import struct
+import zlib
+
+MAGIC = b"OSDC"
+POSITION = struct.Struct(">4sBIHHHHBIQ")  # magic, type, seq, x, y, video w, video h, flags, shape id, send us
+SHAPE = struct.Struct(">4sBIHHHH")       # magic, type, shape id, width, height, hot x, hot y (+ pixels)
+TYPE_POSITION = 1
+TYPE_SHAPE = 2
+FLAG_VISIBLE = 0x01
+COORD_MAX = 0xFFFF
+MAX_SHAPE_SIZE = 256        # pixels per side; bigger cursors are not sent
+MAX_DATAGRAM = 65000
+
+# The arrow drawn until the first shape arrives (and for senders that cannot read
+# the shape): "#" outline, "o" fill, anything else transparent.
+DEFAULT_ARROW = (
+    "#          ",
+    "##         ",
+    "#o#        ",
+    "#oo#       ",
+    "#ooo#      ",
+    "#oooo#     ",
+    "#ooooo#    ",
+    "#oooooo#   ",
+    "#ooooooo#  ",
+    "#oooooooo# ",
+    "#ooooo#####",
+    "#oo#oo#    ",
+    "#o# #oo#   ",
+    "##  #oo#   ",
+    "#    #oo#  ",
+    "     #oo#  ",
+    "      ##   ",
+)
+DEFAULT_SHAPE_ID = 0
+
+
+class Shape:
+    """A cursor image: RGBA rows (straight alpha) and its hot spot."""
+
+    __slots__ = ("shape_id", "width", "height", "hot_x", "hot_y", "rgba")
+
+    def __init__(self, shape_id, width, height, hot_x, hot_y, rgba):
+        self.shape_id = shape_id
+        self.width = width
+        self.height = height
+        self.hot_x = hot_x
+        self.hot_y = hot_y
+        self.rgba = rgba
+
+    def alpha(self, x, y):
+        return self.rgba[(y * self.width + x) * 4 + 3]
+
+    def __repr__(self):
+        return f"Shape({self.shape_id:#x}, {self.width}x{self.height}, hot {self.hot_x},{self.hot_y})"
+
+
+def default_shape():
+    colors = {"#": b"\x00\x00\x00\xff", "o": b"\xff\xff\xff\xff"}
+    width = max(len(row) for row in DEFAULT_ARROW)
+    rgba = b"".join(colors.get(c, b"\x00\x00\x00\x00") for row in DEFAULT_ARROW for c in row.ljust(width))
+    return Shape(DEFAULT_SHAPE_ID, width, len(DEFAULT_ARROW), 0, 0, rgba)
+
+
+def shape_id(rgba, width, height, hot_x, hot_y):
+    """Content id of a shape (never DEFAULT_SHAPE_ID)."""
+    return zlib.crc32(struct.pack(">HHHH", width, height, hot_x, hot_y), zlib.crc32(rgba)) or 1
+
+
+def pack_position(seq, x, y, video_w, video_h, visible, shape, sent_us):
+    """x, y: 0.0..1.0 across the captured area."""
+    return POSITION.pack(MAGIC, TYPE_POSITION, seq & 0xFFFFFFFF,
+                         min(COORD_MAX, max(0, round(x * COORD_MAX))),
+                         min(COORD_MAX, max(0, round(y * COORD_MAX))),
+                         video_w, video_h, FLAG_VISIBLE if visible else 0, shape, sent_us)
+
+
+def pack_shape(shape):
+    """The shape datagram, or None if the shape is too big to send."""
+    if max(shape.width, shape.height) > MAX_SHAPE_SIZE:
+        return None
+    data = SHAPE.pack(MAGIC, TYPE_SHAPE, shape.shape_id, shape.width, shape.height,
+                      shape.hot_x, shape.hot_y) + zlib.compress(shape.rgba, 6)
+    return data if len(data) <= MAX_DATAGRAM else None
+
+
+def parse(data):
+    """("position", dict) or ("shape", Shape) for a cursor datagram, None for anything else."""
+    if data[:4] != MAGIC or len(data) < 5:
+        return None
+    if data[4] == TYPE_POSITION and len(data) == POSITION.size:
+        _, _, seq, x, y, video_w, video_h, flags, shape, sent_us = POSITION.unpack(data)
+        return "position", {"seq": seq, "x": x / COORD_MAX, "y": y / COORD_MAX, "video_w": video_w,
+                            "video_h": video_h, "visible": bool(flags & FLAG_VISIBLE),
+                            "shape": shape, "sent_us": sent_us}
+    if data[4] == TYPE_SHAPE and len(data) > SHAPE.size:
+        _, _, sid, width, height, hot_x, hot_y = SHAPE.unpack_from(data)
+        if max(width, height) > MAX_SHAPE_SIZE:
+            return None
+        inflater = zlib.decompressobj()
+        try:
+            # Bounded: a small datagram must not inflate to megabytes before the size check
+            rgba = inflater.decompress(data[SHAPE.size:], MAX_SHAPE_SIZE * MAX_SHAPE_SIZE * 4 + 1)
+        except zlib.error:
+            return None
+        if inflater.unconsumed_tail or len(rgba) != width * height * 4:
+            return None
+        return "shape", Shape(sid, width, height, hot_x, hot_y, rgba)
+    return None
+
+
+def seq_newer(seq, last):
+    """True if seq comes after last (32-bit wrap-around)."""
+    return 0 < (seq - last) & 0xFFFFFFFF < 0x80000000
@@ -0,0 +1,137 @@
+"""
+OpenSecondDisplay - Receiver Discovery (sender side)
+Role: Networking & Performance Engineer
+
+Description:
+    Broadcasts OSD_DISCOVER and collects every OSD_ACK that comes back. The
+    scan is an asyncio UDP endpoint: all replies are gathered concurrently
+    and the scan ends QUIET_TIME after the last reply (or after SCAN_TIMEOUT
+    when nobody answers), so one receiver on a quiet LAN is found in a few
+    milliseconds. The broadcast is repeated once if the first one goes
+    unanswered (Wi-Fi drops broadcasts).
+
+    An ACK from a current receiver also carries its display mode, decoders,
+    transports and port (see receiver/discovery.py); apply() copies them
+    into config so the stream is encoded at exactly the receiver's
+    resolution with a codec it can decode.
+"""
+
+import asyncio
+import time
+
+import config
+
+DISCOVER = b"OSD_DISCOVER"
+SCAN_TIMEOUT = 1.5   # seconds to wait for the first reply
+QUIET_TIME = 0.25    # stop this long after the last reply
+RESEND_AFTER = 0.5   # repeat the broadcast once if nothing came back
+
+
+def parse_ack(text, sender_ip=None):
+    """OSD_ACK:<hostname>:<ip>[:key=value...] -> dict, or None."""
+    parts = text.strip().split(":")
+    if len(parts) < 3 or parts[0] != "OSD_ACK":
+        return None
+    receiver = {
+        "hostname": parts[1],
+        "ip": parts[2] or sender_ip,
+        "width": None,
+        "height": None,
+        "refresh": None,
+        "decoders": None,
+        "transports": None,
+        "port": None,
+    }
+    for field in parts[3:]:
+        key, _, value = field.partition("=")
+        try:
+            if key == "res":
+                width, height = value.split("x")
+                receiver["width"], receiver["height"] = int(width), int(height)
+            elif key == "hz":
+                receiver["refresh"] = float(value)
+            elif key == "dec":
+                receiver["decoders"] = [name for name in value.split(",") if name]
+            elif key == "tr":
+                receiver["transports"] = [name for name in value.split(",") if name]
+            elif key == "port":
+                receiver["port"] = int(value)
+        except ValueError:
+            continue  # unknown format from a newer receiver
+    return receiver
+
+
+def describe(receiver):
+    text = f"{receiver['hostname']} ({receiver['ip']})"
+    if receiver["width"]:
+        text += f" {receiver['width']}x{receiver['height']}"
+        if receiver["refresh"]:
+            text += f"@{receiver['refresh']:g}"
+    return text
+
+
+class _ScanProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.found = {}           # ip -> receiver, in arrival order
+        self.arrived = asyncio.Event()
+
+    def datagram_received(self, data, addr):
+        receiver = parse_ack(data.decode(errors="replace"), addr[0])
+        if receiver and receiver["ip"] not in self.found:
+            self.found[receiver["ip"]] = receiver
+            self.arrived.set()
+
+    def error_received(self, exc):
+        pass  # e.g. ICMP unreachable on a down interface; keep listening
+
+
+async def scan_async(timeout=SCAN_TIMEOUT, quiet=QUIET_TIME, port=None):
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        _ScanProtocol, local_addr=("0.0.0.0", 0), allow_broadcast=True)
+    target = ("255.255.255.255", port or config.DISCOVERY_PORT)
+    try:
+        transport.sendto(DISCOVER, target)
+        started = time.monotonic()
+        resent = False
+        while True:
+            now = time.monotonic()
+            if protocol.found:
+                wait = min(quiet, started + timeout + quiet - now)
+                if wait <= 0:
+                    break
+            else:
+                if not resent and now - started >= RESEND_AFTER:
+                    transport.sendto(DISCOVER, target)
+                    resent = True
+                wait = started + (RESEND_AFTER if not resent else timeout) - now
+                if wait <= 0:
+                    break
+            protocol.arrived.clear()
+            try:
+                await asyncio.wait_for(protocol.arrived.wait(), wait)
+            except asyncio.TimeoutError:
+                if protocol.found:
+                    break  # replies stopped arriving
+    finally:
+        transport.close()
+    return list(protocol.found.values())
+
+
+def scan(timeout=SCAN_TIMEOUT, quiet=QUIET_TIME, port=None):
+    """Receivers that answered, first reply first. Blocks for at most ~timeout seconds."""
+    return asyncio.run(scan_async(timeout, quiet, port))
+
+
+def apply(receiver):
+    """Points config at a discovered receiver and matches its display and decoders."""
+    config.RECEIVER_IP = receiver["ip"]
+    if receiver["port"]:
+        config.RECEIVER_PORT = receiver["port"]
+    if receiver["width"]:
+        config.SCALING_RESOLUTION = f"{receiver['width']}:{receiver['height']}"
+    if receiver["decoders"] is not None:
+        config.RECEIVER_DECODERS = receiver["decoders"]
+    if receiver["transports"] and config.TRANSPORT not in receiver["transports"]:
+        print(f"⚠️ Receiver does not support {config.TRANSPORT}, using {receiver['transports'][0]}")
+        config.TRANSPORT = receiver["transports"][0]
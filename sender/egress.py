@@ -0,0 +1,250 @@
+"""
+OpenSecondDisplay - Egress Control
+Role: Networking & Performance Engineer
+
+Description:
+    When FFmpeg writes to tcp:// itself, everything it produces goes into
+    the kernel's send buffer, and a Wi-Fi hiccup lets that buffer (and the
+    receiver's picture) fall seconds behind. With EGRESS the sender owns the
+    socket (through switchover.py / relay.py, like SEAMLESS_SWITCH) and this
+    client decides what still gets sent:
+
+      - TCP_NODELAY, SO_SNDBUF, and TCP_NOTSENT_LOWAT = EGRESS_NOTSENT_KB:
+        the socket only reports writable while less than that is unsent in
+        the kernel, so the backlog waits in this client's queue, where it
+        can still be thrown away, instead of in the kernel, where it can't.
+      - Frames are queued one by one. The backlog is the age of the oldest
+        queued byte plus the kernel's unsent bytes at the current BITRATE.
+        Above EGRESS_MAX_BACKLOG_MS, non-reference frames are dropped
+        (mpegts.frame_disposable; nothing else refers to them, so nothing
+        breaks). Above twice that, the queue is dropped and the stream
+        resumes at the next IDR: one freeze instead of a growing delay.
+        (x264 with TUNE=zerolatency makes every frame a reference, so there
+        only the skip applies; INTRA_REFRESH makes the next resync point a
+        few frames away.)
+      - TCP_INFO (Linux) / TCP_CONNECTION_INFO (macOS) is sampled every
+        EGRESS_SAMPLE_INTERVAL seconds: RTT, RTT variance, congestion
+        window, retransmissions, unacknowledged and unsent bytes. The
+        sender prints it every STATS_INTERVAL and the control API's
+        /status carries it under output.clients.
+"""
+
+import asyncio
+import socket
+import struct
+import sys
+from collections import namedtuple
+
+import abr
+import config
+import relay
+import transport
+
+# Not every Python build exports these.
+TCP_NOTSENT_LOWAT = getattr(socket, "TCP_NOTSENT_LOWAT", 0x201 if sys.platform == "darwin" else 25)
+TCP_INFO = getattr(socket, "TCP_INFO", 11)
+TCP_CONNECTION_INFO = 0x106  # macOS
+
+# struct tcp_info (linux/tcp.h) up to tcpi_delivery_rate; older kernels return less.
+LINUX_TCP_INFO_SIZE = 232
+LINUX_FIELDS = {  # name: (offset, format)
+    "snd_mss": (16, "I"), "unacked": (24, "I"), "rtt": (68, "I"), "rttvar": (72, "I"),
+    "snd_cwnd": (80, "I"), "total_retrans": (100, "I"), "notsent_bytes": (144, "I"),
+    "delivery_rate": (160, "Q"),
+}
+# struct tcp_connection_info (netinet/tcp.h): 4 bytes, 13 u32 (options .. bitfield), 7 u64
+MACOS_TCP_INFO = struct.Struct("<4B13I7Q")
+
+TcpInfo = namedtuple("TcpInfo", "rtt_ms rttvar_ms cwnd_bytes unacked_bytes notsent_bytes retransmits delivery_bps")
+
+
+def tcp_info(sock):
+    """A TcpInfo sample of a connected TCP socket; None where the platform has none.
+
+    Fields the platform does not report are None (macOS counts unsent and
+    unacknowledged bytes together, reported as notsent_bytes).
+    """
+    try:
+        if sys.platform.startswith("linux"):
+            data = sock.getsockopt(socket.IPPROTO_TCP, TCP_INFO, LINUX_TCP_INFO_SIZE)
+            f = {name: struct.unpack_from("<" + fmt, data, offset)[0] if offset + struct.calcsize(fmt) <= len(data)
+                 else None for name, (offset, fmt) in LINUX_FIELDS.items()}
+            mss = f["snd_mss"] or 0
+            return TcpInfo(f["rtt"] / 1000, f["rttvar"] / 1000, f["snd_cwnd"] * mss, f["unacked"] * mss,
+                           f["notsent_bytes"], f["total_retrans"],
+                           f["delivery_rate"] * 8 if f["delivery_rate"] is not None else None)
+        if sys.platform == "darwin":
+            data = sock.getsockopt(socket.IPPROTO_TCP, TCP_CONNECTION_INFO, MACOS_TCP_INFO.size)
+            v = MACOS_TCP_INFO.unpack_from(data)
+            # u32 fields start at index 4: options, flags, rto, maxseg, ssthresh, cwnd, snd_wnd,
+            # sbbytes, rcv_wnd, rttcur, srtt, rttvar, bitfield; then u64: txpackets, txbytes,
+            # txretransmitbytes, rxpackets, rxbytes, rxoutoforderbytes, txretransmitpackets.
+            return TcpInfo(float(v[14]), float(v[15]), v[9], None, v[11], v[23], None)
+    except (OSError, struct.error):
+        return None
+    return None
+
+
+def tune_socket(sock):
+    """Send-side options: the transport defaults plus a small unsent limit in the kernel."""
+    transport.tune_socket(sock, "send")
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, TCP_NOTSENT_LOWAT, config.EGRESS_NOTSENT_KB * 1024)
+    except OSError:
+        print("⚠️  Egress: TCP_NOTSENT_LOWAT not supported; the kernel may hold up to SO_SNDBUF unsent.")
+
+
+class EgressClient(relay.RelayClient):
+    """A relay client that owns its socket and drops frames instead of queueing latency."""
+
+    splits_frames = True
+
+    def __init__(self, host, port, max_queue_bytes, clock):
+        super().__init__(host, port, max_queue_bytes, clock)
+        self.sock = None
+        self.info = None          # latest TcpInfo
+        self.retransmits_base = 0  # total_retrans at connect (the counter is per connection anyway)
+        self.current = None        # memoryview of the segment being written (never cut short)
+        self.current_at = 0.0
+        self.dropping = False      # the frame being offered is being dropped
+        self.dropped_frames = 0
+        self.max_rtt_ms = 0.0
+
+    def backlog(self):
+        """Seconds of video waiting to be sent: oldest unsent byte here + unsent bytes in the kernel."""
+        now = self.clock()
+        oldest = self.current_at if self.current is not None else (self.queue[0][1] if self.queue else now)
+        kernel = self.info.notsent_bytes if self.info and self.info.notsent_bytes else 0
+        return now - oldest + kernel * 8 / abr.bitrate_bps(config.BITRATE)
+
+    def offer(self, segment, is_key, psi, starts_frame=False, disposable=False):
+        if not self.connected:
+            return
+        if starts_frame:
+            self.dropping = False
+            if not self.waiting_for_key:
+                budget = config.EGRESS_MAX_BACKLOG_MS / 1000
+                backlog = self.backlog()
+                if backlog > 2 * budget:
+                    # Too far behind for dropping single frames: resync at the next IDR.
+                    self.dropped_bytes += self.queued_bytes
+                    self.queue.clear()
+                    self.queued_bytes = 0
+                    self.skips += 1
+                    self.waiting_for_key = True
+                elif backlog > budget and disposable:
+                    self.dropping = True
+                    self.dropped_frames += 1
+        if self.dropping:
+            self.dropped_bytes += len(segment)
+            return
+        super().offer(segment, is_key, psi)
+
+    async def run(self):
+        """Connects (and reconnects) and writes queued segments while the kernel takes them."""
+        loop = asyncio.get_running_loop()
+        while True:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            try:
+                await loop.sock_connect(sock, (self.host, self.port))
+            except OSError:
+                sock.close()
+                await asyncio.sleep(relay.RECONNECT_DELAY)
+                continue
+            tune_socket(sock)
+            self.sock = sock
+            self.info = tcp_info(sock)
+            self.retransmits_base = self.info.retransmits if self.info and self.info.retransmits else 0
+            self.connected = True
+            self.waiting_for_key = True
+            self.connects += 1
+            self.connection_bytes = 0
+            sampler = asyncio.ensure_future(self._sample())
+            try:
+                await self._write_loop(loop, sock)
+            except (ConnectionError, OSError):
+                pass
+            finally:
+                sampler.cancel()
+                self.connected = False
+                self.dropped_bytes += self.queued_bytes + (len(self.current) if self.current is not None else 0)
+                self.queue.clear()
+                self.queued_bytes = 0
+                self.current = None
+                self.sock = None
+                sock.close()
+            await asyncio.sleep(relay.RECONNECT_DELAY)
+
+    async def _write_loop(self, loop, sock):
+        while True:
+            if self.current is None:
+                while not self.queue:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                self.update_lag()
+                segment, self.current_at = self.queue.popleft()
+                self.queued_bytes -= len(segment)
+                self.current = memoryview(segment)
+            # Writable only below TCP_NOTSENT_LOWAT: the rest stays droppable in the queue.
+            await self._writable(loop, sock)
+            try:
+                sent = sock.send(self.current)
+            except (BlockingIOError, InterruptedError):
+                continue
+            self.sent_bytes += sent
+            self.connection_bytes += sent
+            self.current = self.current[sent:] if sent < len(self.current) else None
+
+    @staticmethod
+    async def _writable(loop, sock):
+        ready = loop.create_future()
+        loop.add_writer(sock, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_writer(sock)
+
+    async def _sample(self):
+        while True:
+            await asyncio.sleep(config.EGRESS_SAMPLE_INTERVAL)
+            info = tcp_info(self.sock) if self.sock else None
+            if info:
+                self.info = info
+                self.max_rtt_ms = max(self.max_rtt_ms, info.rtt_ms)
+
+    def stats(self):
+        result = super().stats()
+        info = self.info
+        result.update({
+            "dropped_frames": self.dropped_frames,
+            "backlog_ms": round(self.backlog() * 1000, 1) if self.connected else None,
+            "rtt_ms": info.rtt_ms if info else None,
+            "rttvar_ms": info.rttvar_ms if info else None,
+            "max_rtt_ms": self.max_rtt_ms,
+            "cwnd_bytes": info.cwnd_bytes if info else None,
+            "unacked_bytes": info.unacked_bytes if info else None,
+            "notsent_bytes": info.notsent_bytes if info else None,
+            "retransmits": info.retransmits - self.retransmits_base if info and info.retransmits is not None else None,
+            "delivery_bps": info.delivery_bps if info else None,
+        })
+        return result
+
+
+def format_stats(clients):
+    """One line per egress client for the stats printout."""
+    def kb(value):
+        return f"{value // 1024}KB" if value is not None else "-"
+
+    lines = []
+    for s in (client.stats() for client in clients):
+        if not s["connected"]:
+            lines.append(f"  {s['client']:<21} down  connects={s['connects']}")
+            continue
+        rtt = f"{s['rtt_ms']:.1f}±{s['rttvar_ms']:.1f}ms" if s["rtt_ms"] is not None else "-"
+        lines.append(f"  {s['client']:<21} rtt={rtt} (max {s['max_rtt_ms']:.1f}) cwnd={kb(s['cwnd_bytes'])} "
+                     f"unacked={kb(s['unacked_bytes'])} unsent={kb(s['notsent_bytes'])} "
+                     f"queue={s['queued_bytes'] // 1024}KB backlog={s['backlog_ms']}ms "
+                     f"retrans={s['retransmits'] if s['retransmits'] is not None else '-'} "
+                     f"dropped={s['dropped_frames']} frames skips={s['skips']}")
+    return "\n".join(lines)
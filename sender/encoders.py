@@ -0,0 +1,161 @@
+"""
+OpenSecondDisplay - Encoder Selection
+Role: macOS Sender Engineer
+
+Description:
+    Picks the fastest working H.264/HEVC encoder from the capability probe
+    and builds its low-latency FFmpeg arguments. Order: hardware encoders
+    first, then libx264 / libopenh264. HEVC encoders are only considered when
+    the receiver reports an HEVC decoder (RECEIVER_DECODERS) and ALLOW_HEVC
+    is set; software HEVC is never picked (too slow for realtime).
+"""
+
+import abr
+import config
+
+# Fastest first. (name, codec, hardware)
+ENCODER_PREFERENCE = [
+    ("hevc_videotoolbox", "hevc", True),
+    ("hevc_nvenc", "hevc", True),
+    ("hevc_qsv", "hevc", True),
+    ("hevc_vaapi", "hevc", True),
+    ("h264_videotoolbox", "h264", True),
+    ("h264_nvenc", "h264", True),
+    ("h264_qsv", "h264", True),
+    ("h264_vaapi", "h264", True),
+    ("libx264", "h264", False),
+    ("libopenh264", "h264", False),
+]
+
+FALLBACK_ENCODER = "libx264"
+
+# Markers in FFmpeg's stderr that mean the encoder itself could not start
+# (as opposed to e.g. the receiver refusing the connection).
+ENCODER_FAILURE_MARKERS = (
+    "Error while opening encoder",
+    "Could not open encoder",
+    "Error initializing output stream",
+    "Unknown encoder",
+    "No capable devices found",
+    "Device creation failed",
+    "Cannot load",
+    "OpenEncodeSessionEx failed",
+    "Error creating a MFX session",
+    "cannot create compression session",
+)
+
+VAAPI_DEVICE = "/dev/dri/renderD128"
+
+# Encoders taking -intra-refresh (a moving intra column instead of IDR frames)
+INTRA_REFRESH_ENCODERS = ("libx264", "h264_nvenc", "hevc_nvenc")
+VBV_SECONDS = 0.5  # rate buffer for RATE_CONTROL "vbv" / "cbr"
+
+# Input pixel formats each encoder takes as-is while still producing a 4:2:0
+# stream, best first. Anything else is converted to the first entry.
+INPUT_PIX_FMTS = {
+    "libx264": ["yuv420p", "nv12"],
+    "libopenh264": ["yuv420p"],
+    "videotoolbox": ["nv12", "yuv420p"],
+    "nvenc": ["nv12", "yuv420p", "bgr0", "rgb0"],  # RGB is converted on the GPU
+    "qsv": ["nv12"],
+    "vaapi": ["nv12"],                             # uploaded by upload_filters()
+}
+
+
+def receiver_decodes_hevc():
+    decoders = config.RECEIVER_DECODERS or []
+    return config.ALLOW_HEVC and any(name.startswith("hevc") for name in decoders)
+
+
+def candidates(caps):
+    """Usable encoders in preference order for these capabilities."""
+    available = set(caps["encoders"]) if caps else {FALLBACK_ENCODER}
+    failed = set(caps["failed_encoders"]) if caps else set()
+    allow_hevc = receiver_decodes_hevc()
+    return [
+        name for name, codec, _ in ENCODER_PREFERENCE
+        if name in available and name not in failed and (codec == "h264" or allow_hevc)
+    ]
+
+
+def select(caps):
+    """Resolves config.ENCODER ("auto" or a name) to a concrete encoder."""
+    if config.ENCODER != "auto":
+        return config.ENCODER
+    usable = candidates(caps)
+    return usable[0] if usable else FALLBACK_ENCODER
+
+
+def is_encoder_failure(stderr_text):
+    return any(marker in stderr_text for marker in ENCODER_FAILURE_MARKERS)
+
+
+def input_pix_fmts(name):
+    family = name.rpartition("_")[2] if "_" in name and not name.startswith("lib") else name
+    return INPUT_PIX_FMTS.get(family, ["yuv420p"])
+
+
+def output_pix_fmt(name, input_pix_fmt=None):
+    """Pixel format handed to the encoder: the input's if it needs no conversion."""
+    accepted = input_pix_fmts(name)
+    return input_pix_fmt if input_pix_fmt in accepted else accepted[0]
+
+
+def global_args(name):
+    """Options that must come before the input (hardware device setup)."""
+    if name.endswith("_vaapi"):
+        return ["-vaapi_device", VAAPI_DEVICE]
+    return []
+
+
+def upload_filters(name):
+    """Filters appended after scaling to move frames to the encoder's device."""
+    if name.endswith("_vaapi"):
+        return ["format=nv12", "hwupload"]
+    return []
+
+
+def encoder_args(name, input_pix_fmt=None):
+    """Low-latency encode options for `name` (rate control, GOP, no B-frames)."""
+    return _codec_args(name, input_pix_fmt) + tuning_args(name)
+
+
+def _codec_args(name, input_pix_fmt):
+    common = ["-b:v", config.BITRATE, "-g", str(config.GOP_SIZE)]
+    # VAAPI gets its format from upload_filters()
+    pix_fmt = [] if name.endswith("_vaapi") else ["-pix_fmt", output_pix_fmt(name, input_pix_fmt)]
+
+    if name in ("libx264", "libx265"):
+        return ["-c:v", name, "-preset", config.PRESET, "-tune", config.TUNE, *common, *pix_fmt]
+    if name.endswith("_videotoolbox"):
+        return ["-c:v", name, "-realtime", "1", "-bf", "0", *common, *pix_fmt]
+    if name.endswith("_nvenc"):
+        return ["-c:v", name, "-preset", "p1", "-tune", "ull", "-zerolatency", "1", "-bf", "0",
+                *common, *pix_fmt]
+    if name.endswith("_qsv"):
+        return ["-c:v", name, "-preset", "veryfast", "-async_depth", "1", "-bf", "0", *common, *pix_fmt]
+    if name.endswith("_vaapi"):
+        return ["-c:v", name, "-bf", "0", *common]
+    # libopenh264 and anything set explicitly in config.ENCODER
+    return ["-c:v", name, *common, *pix_fmt]
+
+
+def tuning_args(name):
+    """Host-specific options (autotune.py measures which values work best here):
+    thread budget, slices, intra refresh and rate control mode."""
+    args = []
+    if config.ENCODER_THREADS:
+        args.extend(["-threads", str(config.ENCODER_THREADS)])
+    if config.ENCODER_SLICES:
+        args.extend(["-slices", str(config.ENCODER_SLICES)])
+    if config.INTRA_REFRESH and name in INTRA_REFRESH_ENCODERS:
+        args.extend(["-intra-refresh", "1"])
+    if config.RATE_CONTROL in ("vbv", "cbr"):
+        bufsize = int(abr.bitrate_bps(config.BITRATE) * VBV_SECONDS)
+        args.extend(["-maxrate", config.BITRATE, "-bufsize", str(bufsize)])
+        if config.RATE_CONTROL == "cbr":
+            if name == "libx264":
+                args.extend(["-x264-params", "nal-hrd=cbr"])
+            elif name.endswith("_nvenc"):
+                args.extend(["-rc", "cbr"])
+    return args
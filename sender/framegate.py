@@ -0,0 +1,217 @@
+"""
+OpenSecondDisplay - Frame Gate (static desktop frame skipping)
+Role: Networking & Performance Engineer
+
+Description:
+    A second display is mostly static. Instead of encoding a constant FPS
+    stream, the capture runs in its own FFmpeg process that writes raw 4:2:0
+    frames (yuv420p or nv12) to a pipe; this module compares each frame with
+    the last one sent and only forwards frames that changed. The encoder reads them
+    from stdin with wallclock timestamps (variable frame rate), and while the
+    desktop is idle a keepalive frame is still sent IDLE_FPS times a second.
+
+    The capture outlives the encoder: when the encoder exits (receiver gone)
+    frames keep being read and discarded, and attach() hands them to a new
+    encoder whose first frame, an IDR, goes out immediately. Reconnects
+    therefore skip capture startup.
+
+    Change detection: an exact comparison first (a memcmp, the common idle
+    case), then with NumPy a per-tile mean absolute difference on the luma
+    plane, so noise below FRAME_GATE_THRESHOLD (dithering, a blinking
+    caret) does not count as a change. Without NumPy only the exact
+    comparison is used.
+"""
+
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+
+import config
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Raw formats the gate understands: 4:2:0, luma plane first, w*h*3/2 bytes
+RAW_PIX_FMTS = ("yuv420p", "nv12")
+
+# "Stream #0:0: Video: rawvideo (I420 / 0x30323449), yuv420p, 1280x720, ..."
+STREAM_SIZE_RE = re.compile(r"Stream #0:0.*Video: rawvideo.*?, (\d+)x(\d+)")
+
+
+def raw_frame_size(width, height):
+    """Bytes in one yuv420p / nv12 frame."""
+    return width * height * 3 // 2
+
+
+class FrameGate:
+    """Forwards changed frames from a raw capture process to an encoder's stdin."""
+
+    def __init__(self, capture, pix_fmt="yuv420p", clock=time.monotonic):
+        self.capture = capture          # Popen with stdout=PIPE, stderr=PIPE (rawvideo, RAW_PIX_FMTS)
+        self.pix_fmt = pix_fmt          # the capture's raw format, one of RAW_PIX_FMTS
+        self.clock = clock
+        self.width = self.height = None
+        self.captured = self.sent = self.keepalives = 0
+        self.stderr_tail = deque(maxlen=20)
+        self.thread = None
+        self.encoder = None
+        self.force_send = False
+        self._scratch = None  # NumPy work buffers, allocated on first use
+
+    def read_geometry(self):
+        """Reads the raw output size from the capture's stderr banner. Returns (w, h) or None."""
+        for line in self.capture.stderr:
+            line = line.decode(errors="replace").rstrip()
+            self.stderr_tail.append(line)
+            match = STREAM_SIZE_RE.search(line)
+            if match:
+                self.width, self.height = int(match.group(1)), int(match.group(2))
+                break
+        # Keep draining so a chatty capture can never block on a full stderr pipe.
+        threading.Thread(target=self._drain_stderr, daemon=True).start()
+        return (self.width, self.height) if self.width else None
+
+    def _drain_stderr(self):
+        for line in self.capture.stderr:
+            self.stderr_tail.append(line.decode(errors="replace").rstrip())
+
+    def start(self, encoder):
+        """Starts pumping frames into encoder.stdin in a background thread."""
+        self.encoder = encoder
+        self.thread = threading.Thread(target=self._pump, daemon=True)
+        self.thread.start()
+
+    def attach(self, encoder):
+        """Feeds a new encoder (reconnect); the next captured frame is sent right away."""
+        self._detach()
+        self.force_send = True
+        self.encoder = encoder
+
+    def alive(self):
+        return self.capture.poll() is None and self.thread is not None and self.thread.is_alive()
+
+    def _detach(self):
+        encoder, self.encoder = self.encoder, None
+        if encoder:
+            try:
+                encoder.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+    def stop(self):
+        if self.capture.poll() is None:
+            self.capture.terminate()
+            try:
+                self.capture.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.capture.kill()
+
+    def changed(self, frame, reference):
+        """True if frame differs visibly from reference (both raw 4:2:0 buffers)."""
+        if frame == reference:  # whole-buffer memcmp, no copies
+            return False
+        if np is None:
+            return True
+        luma = self.width * self.height
+        tile = config.FRAME_GATE_TILE
+        rows, cols = self.height // tile, self.width // tile
+        if not rows or not cols:
+            return True
+        h, w = rows * tile, cols * tile
+        a = np.frombuffer(frame, np.uint8, luma).reshape(self.height, self.width)
+        b = np.frombuffer(reference, np.uint8, luma).reshape(self.height, self.width)
+        if self._scratch is None:
+            self._scratch = (np.empty((h, w), np.uint8), np.empty((h, w), np.uint8))
+        diff, low = self._scratch
+        # |a - b| without leaving uint8: max(a, b) - min(a, b)
+        np.maximum(a[:h, :w], b[:h, :w], out=diff)
+        np.minimum(a[:h, :w], b[:h, :w], out=low)
+        np.subtract(diff, low, out=diff)
+        row_sums = diff.reshape(h, cols, tile).sum(axis=2, dtype=np.uint32)
+        tile_sad = row_sums.reshape(rows, tile, cols).sum(axis=1)
+        changed = np.count_nonzero(tile_sad > config.FRAME_GATE_THRESHOLD * tile * tile)
+        if changed >= config.FRAME_GATE_MIN_TILES:
+            return True
+        # Strips at the right/bottom edge that do not fill a whole tile, cut into partial tiles
+        if w < self.width:
+            changed += self._edge_changes(a[:, w:], b[:, w:], tile, axis=1)
+        if h < self.height:
+            changed += self._edge_changes(a[h:, :w], b[h:, :w], tile, axis=0)
+        return changed >= config.FRAME_GATE_MIN_TILES
+
+    @staticmethod
+    def _edge_changes(a, b, tile, axis):
+        """Changed partial tiles of an edge strip; axis is the strip's short side."""
+        diff = np.abs(a.astype(np.int16) - b.astype(np.int16))
+        sums = diff.sum(axis=axis, dtype=np.uint32)  # one per pixel along the strip
+        starts = np.arange(0, len(sums), tile)
+        sizes = np.diff(np.append(starts, len(sums))) * diff.shape[axis]
+        return int(np.count_nonzero(np.add.reduceat(sums, starts) > config.FRAME_GATE_THRESHOLD * sizes))
+
+    def _read_frame(self, view):
+        filled = 0
+        while filled < len(view):
+            n = self.capture.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    def _pump(self):
+        size = raw_frame_size(self.width, self.height)
+        frame, reference = bytearray(size), bytearray(size)
+        frame_view = memoryview(frame)
+        keepalive = 1.0 / config.IDLE_FPS if config.IDLE_FPS else None
+        last_sent = None
+        last_print = self.clock()
+        try:
+            while self._read_frame(frame_view):
+                self.captured += 1
+                now = self.clock()
+                encoder = self.encoder
+                if encoder is None or encoder.poll() is not None:
+                    continue  # between encoders: keep the capture running, drop the frame
+                send = last_sent is None or self.force_send or self.changed(frame, reference)
+                self.force_send = False
+                if not send and keepalive is not None and now - last_sent >= keepalive:
+                    send = True
+                    self.keepalives += 1
+                if send:
+                    try:
+                        encoder.stdin.write(frame)
+                        encoder.stdin.flush()
+                    except (BrokenPipeError, ValueError, OSError):
+                        continue  # encoder exited; frames are dropped until attach()
+                    self.sent += 1
+                    last_sent = now
+                    # The frame just sent becomes the reference for the next one.
+                    frame, reference = reference, frame
+                    frame_view = memoryview(frame)
+
+                if now - last_print >= config.STATS_INTERVAL:
+                    last_print = now
+                    print(f"🧊 Frame gate: {self.format_stats()}")
+        except (ValueError, OSError):
+            pass  # capture stopped (profile switch, Ctrl+C) or exited
+        finally:
+            self.stop()
+            self._detach()
+
+    def stats(self):
+        skipped = self.captured - self.sent
+        return {
+            "captured": self.captured,
+            "sent": self.sent,
+            "keepalives": self.keepalives,
+            "skipped": skipped,
+            "skipped_pct": round(100.0 * skipped / self.captured, 1) if self.captured else 0.0,
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        return (f"{s['captured']} captured, {s['sent']} sent "
+                f"({s['keepalives']} keepalive), {s['skipped_pct']}% skipped")
@@ -14,11 +14,12 @@ import threading
 import sys
 import os
 import config
-import socket
-import time
+import discovery
+import timeseries
 
 # Global process handle
 process = None
+supervisor = None  # sender.create_supervisor() of the running stream
 
 def get_sender_script_path():
     """Returns the path to sender.py or the internal executable path."""
@@ -52,6 +53,9 @@ def start_stream():
     env["OSD_RECEIVER_IP"] = ip
     env["OSD_RECEIVER_PORT"] = port
     env["OSD_SCALING_RESOLUTION"] = resolution if resolution != "Native" else ""
+    env["OSD_TRANSPORT"] = transport_var.get()
+    if ip in discovered and discovered[ip]["decoders"] is not None:
+        env["OSD_RECEIVER_DECODERS"] = ",".join(discovered[ip]["decoders"])
     
     # Disable UI
     start_btn.config(state=tk.DISABLED)
@@ -98,16 +102,15 @@ def run_process(env):
         sender.config.RECEIVER_PORT = env["OSD_RECEIVER_PORT"]
         res = env["OSD_SCALING_RESOLUTION"]
         sender.config.SCALING_RESOLUTION = res if res else None
+        sender.config.TRANSPORT = env["OSD_TRANSPORT"]
+        if "OSD_RECEIVER_DECODERS" in env:
+            sender.config.RECEIVER_DECODERS = [d for d in env["OSD_RECEIVER_DECODERS"].split(",") if d]
         
-        # Sender main loop is blocking. We run it here.
-        # We need a way to kill it. sender.py uses Popen. 
-        # We will modify sender.py to return the process handle or expose it.
-        
-        # For now, let's assume sender.py has a global or class we can instantiate.
-        # To avoid complex refactoring now, let's just use subprocess for the FFMPEG call inside sender.
-        # We will modify sender.py to be more import-friendly.
-        
-        sender.main() 
+        # Sender main loop is blocking. We run it here; the supervisor it runs
+        # owns the FFmpeg processes and is what Stop talks to.
+        global supervisor
+        supervisor = sender.create_supervisor()
+        sender.main(supervisor)
         
     except Exception as e:
         print(e)
@@ -121,18 +124,16 @@ def run_process(env):
         pass
 
 def stop_stream():
-    # We need a way to stop the sender.main() loop or the ffmpeg process it spawned.
-    # This requires sender.py to expose a stop function.
-    import sender
-    # We will implement a stop signal in sender.py
-    sender.stop_stream_signal()
+    # Ends sender.main(): stops the encoder and any reconnect in progress.
+    if supervisor:
+        supervisor.stop()
     
     status_label.config(text="Status: Stopping...", fg="orange")
 
 # --- UI Setup ---
 root = tk.Tk()
 root.title("OpenSecondDisplay Sender")
-root.geometry("400x350")
+root.geometry("400x720")
 root.resizable(False, False)
 
 # Logo/Header
@@ -148,59 +149,55 @@ ip_entry = tk.Entry(form_frame)
 ip_entry.insert(0, config.RECEIVER_IP)
 ip_entry.grid(row=0, column=1, pady=5)
 
+# Receivers from the last scan, by IP (their decoders are passed to the sender)
+discovered = {}
+
 def scan_receivers():
-    try:
-        status_label.config(text="Status: Scanning...", fg="orange")
-        root.update()
-        
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        sock.settimeout(1.0)
-        
-        message = b"OSD_DISCOVER"
-        sock.sendto(message, ('255.255.255.255', config.DISCOVERY_PORT))
-        
-        found = []
-        start_time = time.time()
-        while time.time() - start_time < 1.0:
-            try:
-                data, addr = sock.recvfrom(1024)
-                text = data.decode()
-                if text.startswith("OSD_ACK:"):
-                    parts = text.split(":")
-                    if len(parts) >= 3:
-                        hostname = parts[1]
-                        ip = parts[2]
-                        found.append((hostname, ip))
-            except socket.timeout:
-                break
-            except:
-                pass
-                
-        sock.close()
-        
-        if not found:
-            messagebox.showinfo("Scan Result", "No receivers found.")
-            status_label.config(text="Status: Ready", fg="black")
-        elif len(found) == 1:
-            hostname, ip = found[0]
-            ip_entry.delete(0, tk.END)
-            ip_entry.insert(0, ip)
-            status_label.config(text=f"Found: {hostname} ({ip})", fg="green")
-            messagebox.showinfo("Scan Result", f"Found: {hostname}\nIP: {ip}\n(Auto-filled)")
-        else:
-            # Multiple found - naive Approach: pick first or list all
-            # For MVP: autofill first and show count
-            hostname, ip = found[0]
-            ip_entry.delete(0, tk.END)
-            ip_entry.insert(0, ip)
-            msg = "Found Receivers:\n" + "\n".join([f"{h} ({i})" for h, i in found])
-            messagebox.showinfo("Scan Result", msg)
-            status_label.config(text=f"Found {len(found)} - Selected {hostname}", fg="green")
-            
-    except Exception as e:
-        messagebox.showerror("Error", f"Scan failed: {e}")
+    """Scans in a background thread; the Tk main loop keeps running."""
+    status_label.config(text="Status: Scanning...", fg="orange")
+    scan_btn.config(state=tk.DISABLED)
+
+    def worker():
+        try:
+            found, error = discovery.scan(), None
+        except OSError as e:
+            found, error = [], e
+        root.after(0, show_scan_result, found, error)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+def show_scan_result(found, error):
+    scan_btn.config(state=tk.NORMAL)
+    if error:
+        messagebox.showerror("Error", f"Scan failed: {error}")
         status_label.config(text="Status: Error", fg="red")
+        return
+    if not found:
+        messagebox.showinfo("Scan Result", "No receivers found.")
+        status_label.config(text="Status: Ready", fg="black")
+        return
+
+    for receiver in found:
+        discovered[receiver["ip"]] = receiver
+    # Autofill the first reply: its IP, port and native display resolution
+    first = found[0]
+    ip_entry.delete(0, tk.END)
+    ip_entry.insert(0, first["ip"])
+    if first["port"]:
+        port_entry.delete(0, tk.END)
+        port_entry.insert(0, str(first["port"]))
+    if first["width"]:
+        resolution_var.set(f"{first['width']}:{first['height']}")
+    if first["transports"] and transport_var.get() not in first["transports"]:
+        transport_var.set(first["transports"][0])
+
+    if len(found) == 1:
+        status_label.config(text=f"Found: {first['hostname']} ({first['ip']})", fg="green")
+        messagebox.showinfo("Scan Result", f"Found: {discovery.describe(first)}\n(Auto-filled)")
+    else:
+        msg = "Found Receivers:\n" + "\n".join(discovery.describe(r) for r in found)
+        messagebox.showinfo("Scan Result", msg)
+        status_label.config(text=f"Found {len(found)} - Selected {first['hostname']}", fg="green")
 
 scan_btn = tk.Button(form_frame, text="Scan", command=scan_receivers)
 scan_btn.grid(row=0, column=2, padx=5)
@@ -215,6 +212,22 @@ resolution_var = tk.StringVar(value="1280:720")
 res_dropdown = tk.OptionMenu(form_frame, resolution_var, "Native", "1920:1080", "1280:720", "1024:768")
 res_dropdown.grid(row=2, column=1, pady=5)
 
+def change_resolution(*_):
+    """Applies a new resolution to the running stream (no gap with SEAMLESS_SWITCH)."""
+    sender = sys.modules.get("sender")
+    if not sender or not supervisor or supervisor.stopped():
+        return  # not streaming: used by the next Start
+    resolution = resolution_var.get()
+    changes = {"SCALING_RESOLUTION": resolution if resolution != "Native" else None}
+    threading.Thread(target=sender.apply_settings, args=(changes,), daemon=True).start()
+
+resolution_var.trace_add("write", change_resolution)
+
+tk.Label(form_frame, text="Transport:").grid(row=3, column=0, sticky="e", pady=5)
+transport_var = tk.StringVar(value=config.TRANSPORT)
+transport_dropdown = tk.OptionMenu(form_frame, transport_var, "tcp", "udp", "srt")
+transport_dropdown.grid(row=3, column=1, pady=5)
+
 # Buttons
 btn_frame = tk.Frame(root)
 btn_frame.pack(pady=20)
@@ -225,8 +238,42 @@ start_btn.pack(side=tk.LEFT, padx=10)
 stop_btn = tk.Button(btn_frame, text="Stop Stream", bg="red", fg="white", state=tk.DISABLED, command=stop_stream)
 stop_btn.pack(side=tk.RIGHT, padx=10)
 
+# Live graphs: sampled on a background thread, redrawn from the Tk loop with after()
+def metrics_snapshot():
+    sender = sys.modules.get("sender")
+    return sender.metrics_snapshot() if sender else {}
+
+def metrics_info():
+    """Stream settings saved with a JSON export."""
+    sender = sys.modules.get("sender")
+    if sender:
+        return sender.control_status()
+    return {"receiver": f"{ip_entry.get()}:{port_entry.get()}", "transport": transport_var.get()}
+
+metrics_store = timeseries.MetricsStore()
+timeseries.MetricsSampler(metrics_store, metrics_snapshot, rates={"bytes": ("bitrate_mbps", 8e-6)}).start()
+graph_panel = timeseries.GraphPanel(root, metrics_store, info=metrics_info).pack(pady=(0, 5))
+graph_panel.start()
+
 # Status
 status_label = tk.Label(root, text="Status: Ready", font=("Arial", 10))
 status_label.pack(side=tk.BOTTOM, pady=10)
 
+# Live encoder stats, polled from sender.telemetry_snapshot() (a plain read, no locking)
+stats_label = tk.Label(root, text="", font=("Arial", 9), fg="gray")
+stats_label.pack(side=tk.BOTTOM)
+
+def refresh_stats():
+    sender = sys.modules.get("sender")
+    stats = sender.telemetry_snapshot() if sender else None
+    if stats and stats.state == "continue":
+        bitrate = f"{stats.bitrate_kbps / 1000:.1f} Mbps" if stats.bitrate_kbps else "-"
+        stats_label.config(text=f"{stats.fps:.0f} fps | {bitrate} | {stats.speed or 0:.2f}x | "
+                                f"dropped {stats.drop_frames}")
+    else:
+        stats_label.config(text="")
+    root.after(1000, refresh_stats)
+
+refresh_stats()
+
 root.mainloop()
@@ -0,0 +1,536 @@
+"""
+OpenSecondDisplay - MPEG-TS Inspector
+Role: Networking & Performance Engineer
+
+Description:
+    Scans the 188-byte MPEG-TS packets that travel between sender and receiver
+    and keeps per-PID counters: bytes/sec, continuity-counter errors, PCR
+    jitter, PES (frame) boundaries and keyframe (IDR) positions. Used to tell
+    whether a stall came from the network, the encoder or the decoder.
+
+    Packets are read through memoryview slices (no copies). When NumPy is
+    installed, whole batches are decoded at once and only the few packets that
+    start a PES or carry a PCR are looked at individually, which keeps the
+    inspector well below line rate on multi-hundred-Mbps streams.
+
+    A chunk only has one arrival time (when it was read), so PCR jitter is
+    measured across chunk boundaries: the last PCR of each chunk is compared
+    with the last PCR of the chunk before. PCRs inside a chunk are counted
+    but not timed, so the figure does not depend on the read size.
+
+    This file is kept identical in sender/ and receiver/ (deployment isolation,
+    see design/architecture.md).
+
+Usage:
+    python3 mpegts.py capture.ts          # inspect a file
+    ffmpeg ... -f mpegts - | python3 mpegts.py -
+    python3 mpegts.py --bench             # measure inspector throughput
+"""
+
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python path is used instead.
+    np = None
+
+TS_PACKET_SIZE = 188
+TS_SYNC_BYTE = 0x47
+PCR_HZ = 27_000_000
+PCR_WRAP = 2**33 * 300
+PTS_HZ = 90_000
+PTS_WRAP = 2**33
+PAT_PID = 0x0000
+NULL_PID = 0x1FFF
+
+# PMT stream_type -> short codec name for the video types we care about.
+VIDEO_STREAM_TYPES = {0x01: "mpeg1", 0x02: "mpeg2", 0x1B: "h264", 0x24: "hevc"}
+
+# NAL unit types that mark a random access point.
+H264_KEY_NALS = {5, 7}              # IDR slice, SPS
+HEVC_KEY_NALS = set(range(16, 22)) | {32, 33}  # IRAP slices, VPS, SPS
+
+# Slice NAL unit types (the first one in a frame tells whether it is a reference).
+H264_SLICE_NALS = {1, 5}
+HEVC_SLICE_NALS = set(range(0, 10)) | set(range(16, 22))
+
+RATE_WINDOW = 1.0  # seconds
+
+
+def _pes_timestamp(view, p):
+    return (((view[p] >> 1) & 0x07) << 30 | view[p + 1] << 22 | (view[p + 2] >> 1) << 15
+            | view[p + 3] << 7 | view[p + 4] >> 1)
+
+
+def _pes_header(view, pos):
+    """Offset of the PES header in the TS packet at pos, or None if it holds none (with a PTS)."""
+    payload = pos + 4
+    if view[pos + 3] & 0x20:
+        payload += view[pos + 4] + 1
+    if payload + 14 > pos + TS_PACKET_SIZE or view[payload] or view[payload + 1] or view[payload + 2] != 1:
+        return None
+    if not view[payload + 7] & 0x80:  # PTS_DTS_flags
+        return None
+    return payload
+
+
+def pes_pts(view, pos):
+    """PTS (90 kHz) of the PES header starting in the TS packet at pos, or None."""
+    payload = _pes_header(view, pos)
+    return _pes_timestamp(view, payload + 9) if payload is not None else None
+
+
+def pes_dts(view, pos):
+    """DTS (90 kHz) of the PES header at pos (its PTS if it has no DTS), or None.
+
+    Frames arrive in decode order; with B-frames only the DTS increases
+    steadily along the stream.
+    """
+    payload = _pes_header(view, pos)
+    if payload is None:
+        return None
+    if view[payload + 7] & 0x40 and payload + 19 <= pos + TS_PACKET_SIZE:
+        return _pes_timestamp(view, payload + 14)
+    return _pes_timestamp(view, payload + 9)
+
+
+def frame_disposable(view, pos, codec):
+    """True if the frame whose PES starts in the TS packet at pos is not a reference for others.
+
+    Looks at the first slice NAL unit in that packet: nal_ref_idc 0 (H.264) or
+    a sub-layer non-reference type (HEVC, even types below 16). False when
+    unknown (no slice in the first packet, other codecs), so callers only
+    ever drop frames nothing else depends on.
+    """
+    payload = pos + 4
+    if view[pos + 3] & 0x20:
+        payload += view[pos + 4] + 1
+    end = pos + TS_PACKET_SIZE
+    if payload + 9 > end or view[payload] or view[payload + 1] or view[payload + 2] != 1:
+        return False
+    data = bytes(view[payload + 9 + view[payload + 8]:end])
+    i = data.find(b"\x00\x00\x01")
+    while 0 <= i < len(data) - 3:
+        header = data[i + 3]
+        if codec == "h264" and header & 0x1F in H264_SLICE_NALS:
+            return not header & 0x60
+        if codec == "hevc" and (header >> 1) & 0x3F in HEVC_SLICE_NALS:
+            nal_type = (header >> 1) & 0x3F
+            return nal_type < 16 and nal_type % 2 == 0
+        i = data.find(b"\x00\x00\x01", i + 3)
+    return False
+
+
+class PidStats:
+    """Counters for a single PID."""
+
+    __slots__ = (
+        "pid", "kind", "packets", "bytes", "cc_errors", "last_cc",
+        "frames", "keyframes", "last_keyframe_offset",
+        "pcr_count", "last_pcr", "last_pcr_arrival", "chunk_pcr", "pcr_jitter", "pcr_jitter_max",
+        "window_start", "window_bytes", "bytes_per_sec",
+    )
+
+    def __init__(self, pid, now):
+        self.pid = pid
+        self.kind = "data"
+        self.packets = 0
+        self.bytes = 0
+        self.cc_errors = 0
+        self.last_cc = -1
+        self.frames = 0
+        self.keyframes = 0
+        self.last_keyframe_offset = -1
+        self.pcr_count = 0
+        self.last_pcr = -1
+        self.last_pcr_arrival = 0.0
+        self.chunk_pcr = -1        # last PCR of the chunk being scanned, timed when it is done
+        self.pcr_jitter = 0.0
+        self.pcr_jitter_max = 0.0
+        self.window_start = now
+        self.window_bytes = 0
+        self.bytes_per_sec = 0.0
+
+    def as_dict(self):
+        return {
+            "pid": self.pid,
+            "kind": self.kind,
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "bytes_per_sec": round(self.bytes_per_sec),
+            "cc_errors": self.cc_errors,
+            "frames": self.frames,
+            "keyframes": self.keyframes,
+            "last_keyframe_offset": self.last_keyframe_offset,
+            "pcr_jitter_ms": round(self.pcr_jitter * 1000, 3),
+            "pcr_jitter_max_ms": round(self.pcr_jitter_max * 1000, 3),
+        }
+
+
+class TSInspector:
+    """Incremental MPEG-TS packet scanner.
+
+    feed() accepts arbitrary chunks (they do not have to be packet aligned)
+    and returns the frame starts found in the chunk as (offset, is_keyframe)
+    tuples. Offsets are relative to the start of the chunk; a frame whose
+    first packet began in the previous chunk gets a negative offset.
+    """
+
+    def __init__(self, clock=time.monotonic, use_numpy=True):
+        self.clock = clock
+        self.use_numpy = use_numpy and np is not None
+        self.pids = {}
+        self.video_pids = {}   # pid -> codec name
+        self.pmt_pids = set()
+        self.offset = 0        # stream bytes consumed (aligned to first sync)
+        self.synced = False
+        self.sync_losses = 0
+        self.carry = b""
+        self._chunk_pcrs = []  # PidStats with a PCR in the chunk being scanned
+        self._window_start = clock()
+
+    # --- Public API ---
+
+    def reset(self):
+        """Forget per-connection state (new sender connection)."""
+        self.__init__(self.clock, self.use_numpy)
+
+    def feed(self, data):
+        view = memoryview(data)
+        events = []
+        start = 0
+
+        if self.carry:
+            need = TS_PACKET_SIZE - len(self.carry)
+            if len(view) < need:
+                self.carry += bytes(view)
+                return events
+            packet = memoryview(self.carry + bytes(view[:need]))
+            self._scan(packet, 1, -len(self.carry), events)
+            self.carry = b""
+            start = need
+
+        if not self.synced or (start < len(view) and view[start] != TS_SYNC_BYTE):
+            sync = self._find_sync(view, start)
+            if sync < 0:
+                self._time_pcrs()
+                return events
+            start = sync
+
+        count = (len(view) - start) // TS_PACKET_SIZE
+        if count:
+            self._scan(view[start:start + count * TS_PACKET_SIZE], count, start, events)
+        tail = start + count * TS_PACKET_SIZE
+        if tail < len(view):
+            self.carry = bytes(view[tail:])
+        self._time_pcrs()
+        self._update_rates()
+        return events
+
+    def stats(self):
+        """Snapshot of all counters as plain dicts (cheap, safe to poll)."""
+        return {
+            "offset": self.offset,
+            "sync_losses": self.sync_losses,
+            "pids": [s.as_dict() for s in sorted(self.pids.values(), key=lambda s: s.pid)],
+        }
+
+    def video_stats(self):
+        """PidStats of the first video PID, or None before the PMT was seen."""
+        for pid in self.video_pids:
+            return self.pids.get(pid)
+        return None
+
+    def format_stats(self):
+        lines = []
+        for s in sorted(self.pids.values(), key=lambda s: s.pid):
+            if s.pid == NULL_PID:
+                continue
+            line = (f"PID 0x{s.pid:04x} {s.kind:<6} {s.bytes_per_sec * 8 / 1e6:7.2f} Mbps "
+                    f"cc_err={s.cc_errors}")
+            if s.pid in self.video_pids:
+                line += f" frames={s.frames} idr={s.keyframes}"
+            if s.pcr_count:
+                line += f" pcr_jitter={s.pcr_jitter * 1000:.2f}ms (max {s.pcr_jitter_max * 1000:.2f}ms)"
+            lines.append(line)
+        return "\n".join(lines)
+
+    # --- Scanning ---
+
+    def _find_sync(self, view, start):
+        """First offset with a sync byte that is followed by another one 188 bytes later."""
+        end = len(view)
+        for i in range(start, end):
+            if view[i] == TS_SYNC_BYTE and (i + TS_PACKET_SIZE >= end or view[i + TS_PACKET_SIZE] == TS_SYNC_BYTE):
+                if self.synced:
+                    self.sync_losses += 1
+                self.synced = True
+                self.offset += i - start
+                return i
+        self.offset += end - start
+        return -1
+
+    def _scan(self, view, count, base, events):
+        if self.use_numpy and count >= 8:
+            self._scan_numpy(view, count, base, events)
+        else:
+            now = self.clock()
+            for i in range(count):
+                self._packet(view, i * TS_PACKET_SIZE, base, now, events, True)
+        self.offset += count * TS_PACKET_SIZE
+
+    def _stats_for(self, pid, now):
+        stats = self.pids.get(pid)
+        if stats is None:
+            stats = self.pids[pid] = PidStats(pid, now)
+            if pid == PAT_PID:
+                stats.kind = "pat"
+            elif pid in self.pmt_pids:
+                stats.kind = "pmt"
+            elif pid in self.video_pids:
+                stats.kind = self.video_pids[pid]
+        return stats
+
+    def _packet(self, view, pos, base, now, events, count_it):
+        """Inspects one packet. count_it=False when the NumPy path already counted it."""
+        b1 = view[pos + 1]
+        b3 = view[pos + 3]
+        pid = ((b1 & 0x1F) << 8) | view[pos + 2]
+        afc = (b3 >> 4) & 0x3
+        stats = self._stats_for(pid, now)
+
+        adaptation_len = view[pos + 4] if afc & 0x2 else -1
+        flags = view[pos + 5] if adaptation_len > 0 else 0
+
+        if count_it:
+            stats.packets += 1
+            stats.bytes += TS_PACKET_SIZE
+            stats.window_bytes += TS_PACKET_SIZE
+            if afc & 0x1 and pid != NULL_PID:
+                cc = b3 & 0x0F
+                if stats.last_cc >= 0 and not flags & 0x80:
+                    if cc != (stats.last_cc + 1) & 0x0F and cc != stats.last_cc:
+                        stats.cc_errors += 1
+                stats.last_cc = cc
+
+        if flags & 0x10 and adaptation_len >= 7:
+            p = pos + 6
+            pcr_base = (view[p] << 25) | (view[p + 1] << 17) | (view[p + 2] << 9) | (view[p + 3] << 1) | (view[p + 4] >> 7)
+            pcr_ext = ((view[p + 4] & 0x01) << 8) | view[p + 5]
+            self._pcr(stats, pcr_base * 300 + pcr_ext)
+
+        if not b1 & 0x40:  # payload_unit_start_indicator
+            return
+        payload = pos + 4 + (adaptation_len + 1 if adaptation_len >= 0 else 0)
+        if payload >= pos + TS_PACKET_SIZE:
+            return
+
+        if pid == PAT_PID:
+            self._parse_pat(view, payload, pos + TS_PACKET_SIZE)
+        elif pid in self.pmt_pids:
+            self._parse_pmt(view, payload, pos + TS_PACKET_SIZE)
+        elif pid in self.video_pids:
+            keyframe = bool(flags & 0x40) or self._has_key_nal(view, payload, pos + TS_PACKET_SIZE, self.video_pids[pid])
+            stats.frames += 1
+            offset = base + pos
+            if keyframe:
+                stats.keyframes += 1
+                stats.last_keyframe_offset = self.offset + pos
+            events.append((offset, keyframe))
+
+    def _scan_numpy(self, view, count, base, events):
+        now = self.clock()
+        arr = np.frombuffer(view, dtype=np.uint8, count=count * TS_PACKET_SIZE).reshape(count, TS_PACKET_SIZE)
+        if not (arr[:, 0] == TS_SYNC_BYTE).all():
+            # Lost sync inside the batch: let the scalar path sort it out.
+            for i in range(count):
+                self._packet(view, i * TS_PACKET_SIZE, base, now, events, True)
+            return
+
+        b1 = arr[:, 1]
+        b3 = arr[:, 3]
+        pids = ((b1.astype(np.uint16) & 0x1F) << 8) | arr[:, 2]
+        afc = (b3 >> 4) & 0x3
+        has_af = ((afc & 0x2) != 0) & (arr[:, 4] > 0)
+        af_flags = np.where(has_af, arr[:, 5], 0)
+
+        unique_pids, counts = np.unique(pids, return_counts=True)
+        for pid, n in zip(unique_pids.tolist(), counts.tolist()):
+            stats = self._stats_for(pid, now)
+            stats.packets += n
+            stats.bytes += n * TS_PACKET_SIZE
+            stats.window_bytes += n * TS_PACKET_SIZE
+            if pid == NULL_PID:
+                continue
+            mask = (pids == pid) & ((afc & 0x1) != 0)
+            cc = (b3[mask] & 0x0F).astype(np.int16)
+            if not len(cc):
+                continue
+            discontinuity = (af_flags[mask] & 0x80) != 0
+            prev = np.empty_like(cc)
+            prev[0] = stats.last_cc
+            prev[1:] = cc[:-1]
+            step = (cc - prev) & 0x0F
+            bad = (step != 1) & (step != 0) & ~discontinuity
+            if stats.last_cc < 0:
+                bad[0] = False
+            stats.cc_errors += int(bad.sum())
+            stats.last_cc = int(cc[-1])
+
+        # Only packets that start a PES/section or carry a PCR need a closer look.
+        interesting = np.flatnonzero(((b1 & 0x40) != 0) | ((af_flags & 0x10) != 0))
+        for i in interesting.tolist():
+            self._packet(view, i * TS_PACKET_SIZE, base, now, events, False)
+
+    def _pcr(self, stats, pcr):
+        stats.pcr_count += 1
+        if stats.chunk_pcr < 0:
+            self._chunk_pcrs.append(stats)
+        stats.chunk_pcr = pcr
+
+    def _time_pcrs(self):
+        """Times the last PCR of each PID in the chunk just scanned, at the chunk's arrival."""
+        if not self._chunk_pcrs:
+            return
+        now = self.clock()
+        for stats in self._chunk_pcrs:
+            pcr, stats.chunk_pcr = stats.chunk_pcr, -1
+            if stats.last_pcr >= 0:
+                # RFC 3550 style interarrival jitter of PCR vs wall clock.
+                d = (now - stats.last_pcr_arrival) - ((pcr - stats.last_pcr) % PCR_WRAP) / PCR_HZ
+                stats.pcr_jitter += (abs(d) - stats.pcr_jitter) / 16
+                stats.pcr_jitter_max = max(stats.pcr_jitter_max, abs(d))
+            stats.last_pcr = pcr
+            stats.last_pcr_arrival = now
+        self._chunk_pcrs.clear()
+
+    def _has_key_nal(self, view, pos, end, codec):
+        """Looks for an IDR/SPS NAL unit in the first packet of a PES."""
+        if end - pos < 9 or view[pos] != 0 or view[pos + 1] != 0 or view[pos + 2] != 1:
+            return False
+        pos += 9 + view[pos + 8]  # skip PES header
+        data = bytes(view[pos:end])
+        i = data.find(b"\x00\x00\x01")
+        while 0 <= i < len(data) - 3:
+            header = data[i + 3]
+            if codec == "h264" and header & 0x1F in H264_KEY_NALS:
+                return True
+            if codec == "hevc" and (header >> 1) & 0x3F in HEVC_KEY_NALS:
+                return True
+            i = data.find(b"\x00\x00\x01", i + 3)
+        return False
+
+    def _parse_pat(self, view, pos, end):
+        pos += 1 + view[pos]  # pointer_field
+        if end - pos < 8:
+            return
+        section_len = ((view[pos + 1] & 0x0F) << 8) | view[pos + 2]
+        entries_end = min(pos + 3 + section_len - 4, end)
+        for p in range(pos + 8, entries_end - 3, 4):
+            program = (view[p] << 8) | view[p + 1]
+            pid = ((view[p + 2] & 0x1F) << 8) | view[p + 3]
+            if program != 0:
+                self.pmt_pids.add(pid)
+                if pid in self.pids:
+                    self.pids[pid].kind = "pmt"
+
+    def _parse_pmt(self, view, pos, end):
+        pos += 1 + view[pos]
+        if end - pos < 12:
+            return
+        section_len = ((view[pos + 1] & 0x0F) << 8) | view[pos + 2]
+        info_len = ((view[pos + 10] & 0x0F) << 8) | view[pos + 11]
+        p = pos + 12 + info_len
+        entries_end = min(pos + 3 + section_len - 4, end)
+        while p + 5 <= entries_end:
+            stream_type = view[p]
+            pid = ((view[p + 1] & 0x1F) << 8) | view[p + 2]
+            es_info_len = ((view[p + 3] & 0x0F) << 8) | view[p + 4]
+            if stream_type in VIDEO_STREAM_TYPES:
+                self.video_pids[pid] = VIDEO_STREAM_TYPES[stream_type]
+                if pid in self.pids:
+                    self.pids[pid].kind = self.video_pids[pid]
+            p += 5 + es_info_len
+
+    def _update_rates(self):
+        now = self.clock()
+        elapsed = now - self._window_start
+        if elapsed < RATE_WINDOW:
+            return
+        for stats in self.pids.values():
+            stats.bytes_per_sec = stats.window_bytes / elapsed
+            stats.window_bytes = 0
+        self._window_start = now
+
+
+def synthetic_stream(packets, video_pid=0x100, keyframe_every=300):
+    """Builds a TS byte string (PAT, PMT, video) for benchmarks and self-checks."""
+    out = bytearray()
+    pat = bytes([0x00, 0x00, 0xB0, 0x0D, 0x00, 0x01, 0xC1, 0x00, 0x00, 0x00, 0x01, 0xF0, 0x00, 0, 0, 0, 0])
+    pmt = bytes([0x00, 0x02, 0xB0, 0x12, 0x00, 0x01, 0xC1, 0x00, 0x00, 0xE1, 0x00, 0xF0, 0x00,
+                 0x1B, 0xE0 | (video_pid >> 8), video_pid & 0xFF, 0xF0, 0x00, 0, 0, 0, 0])
+    out += bytes([0x47, 0x40, 0x00, 0x10]) + pat + b"\xff" * (184 - len(pat))
+    out += bytes([0x47, 0x50, 0x00, 0x10]) + pmt + b"\xff" * (184 - len(pmt))
+    cc = 0
+    for i in range(packets):
+        start = i % 30 == 0
+        head = bytes([0x47, (0x40 if start else 0) | (video_pid >> 8), video_pid & 0xFF])
+        if start and i % keyframe_every == 0:
+            # adaptation field with random_access_indicator + PCR
+            pcr_base = i * 90
+            af = bytes([7, 0x50, (pcr_base >> 25) & 0xFF, (pcr_base >> 17) & 0xFF,
+                        (pcr_base >> 9) & 0xFF, (pcr_base >> 1) & 0xFF, ((pcr_base & 1) << 7) | 0x7E, 0])
+            out += head + bytes([0x30 | cc]) + af + b"\x00\x00\x01\xe0" + b"\x00" * (184 - len(af) - 4)
+        else:
+            out += head + bytes([0x10 | cc]) + (b"\x00\x00\x01\xe0" if start else b"\x00" * 4) + b"\x00" * 180
+        cc = (cc + 1) & 0x0F
+    return bytes(out)
+
+
+def run_bench():
+    """Measures inspector throughput with and without NumPy."""
+    data = synthetic_stream(200_000)
+    chunk = TS_PACKET_SIZE * 348
+    modes = [False] + ([True] if np is not None else [])
+    for use_numpy in modes:
+        inspector = TSInspector(use_numpy=use_numpy)
+        start = time.perf_counter()
+        view = memoryview(data)
+        for i in range(0, len(data), chunk):
+            inspector.feed(view[i:i + chunk])
+        elapsed = time.perf_counter() - start
+        mbps = len(data) * 8 / elapsed / 1e6
+        label = "numpy" if use_numpy else "pure-python"
+        print(f"{label:<12} {mbps:8.0f} Mbps  ({inspector.video_stats().frames} frames, "
+              f"{inspector.video_stats().cc_errors} cc errors)")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python3 mpegts.py <file.ts | - | --bench>")
+        sys.exit(1)
+    if sys.argv[1] == "--bench":
+        run_bench()
+        return
+
+    source = sys.stdin.buffer if sys.argv[1] == "-" else open(sys.argv[1], "rb")
+    inspector = TSInspector()
+    buffer = bytearray(TS_PACKET_SIZE * 348)
+    last_print = time.monotonic()
+    try:
+        while True:
+            n = source.readinto(buffer)
+            if not n:
+                break
+            inspector.feed(memoryview(buffer)[:n])
+            if time.monotonic() - last_print >= 1.0:
+                print(inspector.format_stats() + "\n")
+                last_print = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    print(inspector.format_stats())
+
+
+if __name__ == "__main__":
+    main()
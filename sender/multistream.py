@@ -0,0 +1,254 @@
+"""
+OpenSecondDisplay - Multi-Display Streaming
+Role: Networking & Performance Engineer
+
+Description:
+    Streams several screens at once (STREAMS in config.py), each to its own
+    receiver. sender.py keeps the state of one stream in module globals, so
+    every stream runs as its own sender process with its own capture,
+    encoder, supervisor (reconnects), feedback port and control API. This
+    module starts them, divides the CPU between them and shows them side by
+    side:
+
+      CPU   - on Linux each stream's sender, and with it its FFmpeg
+              processes, is pinned to its own cores (STREAM_CPU_AFFINITY).
+              Every encoder also gets ENCODER_THREADS = its share of the
+              cores unless set, so a busy stream cannot starve the others
+              where pinning is not available (macOS) or turned off.
+      View  - the streams' control APIs (GET /status) are polled every
+              STATS_INTERVAL seconds into one table: encode fps and speed,
+              bitrate, encoder queue and estimated latency (encoder queue
+              plus data sent but not yet received, from receiver feedback).
+
+    A stream process gets only its STREAMS entry on top of config.py
+    (passed as JSON on its command line); changes made to `config` in this
+    process at runtime do not reach it. Each stream's output is printed
+    with its number in front.
+
+Usage:
+    python3 sender.py           # with STREAMS set in config.py
+"""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import config
+
+STATUS_TIMEOUT = 1.0  # seconds for one GET /status
+STOP_TIMEOUT = 10.0   # seconds a stream gets to shut down after Ctrl+C
+
+
+def cpu_sets(count, affinity=None):
+    """Cores for each of count streams (None = not pinned)."""
+    affinity = config.STREAM_CPU_AFFINITY if affinity is None else affinity
+    if affinity != "auto":
+        sets = [sorted(cores) for cores in affinity or []]
+        return (sets + [None] * count)[:count]
+    if not hasattr(os, "sched_getaffinity"):
+        return [None] * count  # macOS: thread budgets only
+    cores = sorted(os.sched_getaffinity(0))
+    if len(cores) < count:
+        return [None] * count  # fewer cores than streams: pinning would only add contention
+    share = len(cores) // count
+    return [cores[i * share:(i + 1) * share] for i in range(count)]
+
+
+def stream_settings(streams=None, affinity=None):
+    """Per-stream config overrides with the defaults filled in. Raises ValueError on conflicts."""
+    streams = config.STREAMS if streams is None else streams
+    cores = cpu_sets(len(streams), affinity)
+    budget = max(1, (os.cpu_count() or 1) // max(1, len(streams)))
+    settings = []
+    for i, overrides in enumerate(streams):
+        merged = dict(overrides)
+        merged["STREAMS"] = []
+        if config.CONTROL_PORT is not None:
+            merged.setdefault("CONTROL_PORT", config.CONTROL_PORT + i)
+        merged.setdefault("FEEDBACK_PORT", config.FEEDBACK_PORT + i)
+        if not merged.get("ENCODER_THREADS", config.ENCODER_THREADS):
+            merged["ENCODER_THREADS"] = len(cores[i]) if cores[i] else budget
+        settings.append(merged)
+
+    for key in ("FEEDBACK_PORT", "CONTROL_PORT"):
+        ports = [s.get(key) for s in settings]
+        if len(set(ports)) != len(ports):
+            raise ValueError(f"streams share a {key}: {ports}")
+    return settings, cores
+
+
+class Stream:
+    """One sender process and its last reported status."""
+
+    def __init__(self, number, settings, cores, echo=True):
+        self.number = number
+        self.settings = settings
+        self.cores = cores
+        self.echo = echo
+        self.process = None
+        self.status = None
+
+    @property
+    def receiver(self):
+        ip = self.settings.get("RECEIVER_IP", config.RECEIVER_IP)
+        return f"{ip}:{self.settings.get('RECEIVER_PORT', config.RECEIVER_PORT)}"
+
+    def start(self):
+        spec = json.dumps({"settings": self.settings, "cores": self.cores})
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", os.path.abspath(__file__), "--stream", spec],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            start_new_session=True,  # Ctrl+C is passed on by MultiStream.stop()
+        )
+        threading.Thread(target=self._relay_output, daemon=True).start()
+
+    def _relay_output(self):
+        for line in self.process.stdout:
+            if self.echo:
+                print(f"[{self.number}] {line}", end="")
+
+    def poll_status(self):
+        port = self.settings.get("CONTROL_PORT")
+        if port is None or self.process.poll() is not None:
+            self.status = None
+            return None
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/status", timeout=STATUS_TIMEOUT) as response:
+                self.status = json.loads(response.read())
+        except (OSError, ValueError):
+            self.status = None
+        return self.status
+
+    def interrupt(self):
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGINT)  # sender.main() stops its encoder on KeyboardInterrupt
+
+    def wait(self):
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.wait(timeout=STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+
+
+def stream_row(stream):
+    """One line of the combined view as a dict (None values where unknown)."""
+    status = stream.status or {}
+    stats = status.get("telemetry") or {}
+    link = status.get("link")
+    fps = (status.get("settings") or {}).get("fps") or config.FPS
+    queue_ms = stats.get("queue_depth", 0) * 1000 / fps if stats else None
+    return {
+        "stream": stream.number,
+        "receiver": stream.receiver,
+        "cores": stream.cores,
+        "running": stream.process is not None and stream.process.poll() is None,
+        "streaming": status.get("streaming", False),
+        "frame": stats.get("frame"),
+        "fps": stats.get("fps"),
+        "speed": stats.get("speed"),
+        "bitrate_kbps": stats.get("bitrate_kbps"),
+        "queue_ms": round(queue_ms, 1) if queue_ms is not None else None,
+        "backlog_ms": link["backlog_ms"] if link else None,
+        "latency_ms": round(queue_ms + (link["backlog_ms"] if link else 0), 1) if queue_ms is not None else None,
+        "sessions": status.get("sessions", 0),
+    }
+
+
+def format_rows(rows):
+    def value(v, spec, suffix=""):
+        return "-" if v is None else f"{v:{spec}}{suffix}"
+    lines = []
+    for r in rows:
+        state = "streaming" if r["streaming"] else ("starting" if r["running"] else "stopped")
+        cores = ",".join(map(str, r["cores"])) if r["cores"] else "any"
+        lines.append(
+            f"  [{r['stream']}] {r['receiver']:<21} {state:<9} cores {cores:<7} "
+            f"fps {value(r['fps'], '5.1f')} speed {value(r['speed'], '.2f', 'x')} "
+            f"{value(r['bitrate_kbps'] and r['bitrate_kbps'] / 1000, '.2f', ' Mbps')} "
+            f"latency {value(r['latency_ms'], '.0f', ' ms')} (queue {value(r['queue_ms'], '.0f')} + "
+            f"network {value(r['backlog_ms'], '.0f')}) sessions {r['sessions']}")
+    return "\n".join(lines)
+
+
+class MultiStream:
+    """Starts one sender process per STREAMS entry and watches them."""
+
+    def __init__(self, streams=None, affinity=None, echo=True):
+        settings, cores = stream_settings(streams, affinity)
+        self.streams = [Stream(i + 1, s, c, echo) for i, (s, c) in enumerate(zip(settings, cores))]
+
+    def start(self):
+        for stream in self.streams:
+            stream.start()
+
+    def poll(self):
+        """Refreshes every stream's status. Returns the rows of the combined view."""
+        for stream in self.streams:
+            stream.poll_status()
+        return [stream_row(stream) for stream in self.streams]
+
+    def running(self):
+        return any(stream.process.poll() is None for stream in self.streams)
+
+    def stop(self):
+        for stream in self.streams:
+            stream.interrupt()
+        for stream in self.streams:
+            stream.wait()
+
+    def run(self):
+        """Streams until Ctrl+C or until every stream process has exited."""
+        self.start()
+        try:
+            while self.running():
+                time.sleep(config.STATS_INTERVAL)
+                print("🖥️  Streams:\n" + format_rows(self.poll()))
+        except KeyboardInterrupt:
+            print("\n🛑 Stopping all streams...")
+        finally:
+            self.stop()
+
+
+def run_stream(spec):
+    """Stream process: pin, apply this stream's settings, run the normal sender."""
+    if spec["cores"] and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, spec["cores"])  # inherited by the FFmpeg processes it starts
+    for key, value in spec["settings"].items():
+        if not hasattr(config, key):
+            raise SystemExit(f"Unknown config key in STREAMS: {key}")
+        setattr(config, key, value)
+    import sender
+    sender.fixed_settings = set(spec["settings"])  # e.g. ENCODER_THREADS: the stream's CPU share
+    sender.main()
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--stream":
+        run_stream(json.loads(sys.argv[2]))
+        return
+    if not config.STREAMS:
+        print("ℹ️ STREAMS is empty in config.py; run sender.py for a single stream.")
+        return
+    try:
+        multi = MultiStream()
+    except ValueError as e:
+        print(f"❌ STREAMS: {e}")
+        sys.exit(1)
+    print(f"🚀 OpenSecondDisplay - {len(multi.streams)} streams")
+    for stream in multi.streams:
+        cores = ",".join(map(str, stream.cores)) if stream.cores else "not pinned"
+        print(f"   [{stream.number}] -> {stream.receiver} (cores: {cores}, "
+              f"{stream.settings['ENCODER_THREADS']} encoder threads)")
+    multi.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+OpenSecondDisplay - Fan-out Relay
+Role: Networking & Performance Engineer
+
+Description:
+    Encode once, serve many: FFmpeg writes the MPEG-TS stream to stdout and
+    this asyncio relay pushes it to every receiver in RELAY_RECEIVERS over
+    TCP (each receiver listens exactly as it does for a direct sender).
+
+    Every client has its own bounded queue (RELAY_MAX_QUEUE_KB). A client
+    that falls behind is never waited for: when its queue would overflow,
+    the queue is dropped and the client skips ahead to the next IDR, so the
+    other receivers and the relay's memory are unaffected. New and
+    reconnecting clients also start at an IDR, preceded by the latest
+    PAT/PMT.
+
+    Per-client lag (time a segment waited in the queue), drops and skips are
+    printed every STATS_INTERVAL seconds.
+
+    The relay stays connected across encoder restarts: switchover.py runs
+    it, reads the encoders' stdout and feeds it one stream.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+import config
+import framestamp
+import mpegts
+import transport
+
+TS_PACKET_SIZE = mpegts.TS_PACKET_SIZE
+RECONNECT_DELAY = 1.0
+
+
+def parse_target(text):
+    host, _, port = text.rpartition(":")
+    return host, int(port)
+
+
+class RelayClient:
+    """One receiver: a queue of TS segments and the task that writes them."""
+
+    splits_frames = False  # True: the relay cuts segments at every frame, not only at IDRs
+
+    def __init__(self, host, port, max_queue_bytes, clock=time.monotonic):
+        self.host = host
+        self.port = port
+        self.max_queue_bytes = max_queue_bytes
+        self.clock = clock
+        self.queue = deque()        # (segment, enqueued_at)
+        self.queued_bytes = 0
+        self.wakeup = asyncio.Event()
+        self.connected = False
+        self.waiting_for_key = True  # start (and resume) at an IDR
+        self.task = None
+
+        self.sent_bytes = 0
+        self.connection_bytes = 0   # sent since the current connection was made
+        self.dropped_bytes = 0
+        self.skips = 0
+        self.connects = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+    @property
+    def name(self):
+        return f"{self.host}:{self.port}"
+
+    def offer(self, segment, is_key, psi, starts_frame=False, disposable=False):
+        """Queues a segment unless the client is skipping to the next IDR.
+
+        starts_frame / disposable describe per-frame segments (splits_frames clients).
+        """
+        if not self.connected:
+            return
+        if self.waiting_for_key:
+            if not is_key:
+                self.dropped_bytes += len(segment)
+                return
+            self.waiting_for_key = False
+            if psi:
+                self._push(psi)
+        elif self.queued_bytes + len(segment) > self.max_queue_bytes:
+            # Lagging: throw away what it has not sent yet and resync at the next IDR.
+            self.dropped_bytes += self.queued_bytes
+            self.queue.clear()
+            self.queued_bytes = 0
+            self.skips += 1
+            if not is_key:
+                self.waiting_for_key = True
+                self.dropped_bytes += len(segment)
+                return
+            if psi:
+                self._push(psi)
+        self._push(segment)
+
+    def _push(self, segment):
+        self.queue.append((segment, self.clock()))
+        self.queued_bytes += len(segment)
+        self.wakeup.set()
+
+    async def run(self):
+        """Connects (and reconnects) and writes queued segments."""
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            transport.tune_socket(writer.get_extra_info("socket"), "send")
+            self.connected = True
+            self.waiting_for_key = True
+            self.connects += 1
+            self.connection_bytes = 0
+            try:
+                await self._write_loop(writer)
+            except (ConnectionError, OSError):
+                pass
+            finally:
+                self.connected = False
+                self.dropped_bytes += self.queued_bytes
+                self.queue.clear()
+                self.queued_bytes = 0
+                writer.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _write_loop(self, writer):
+        while True:
+            while not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            self.update_lag()
+            # Hand everything queued to the transport, then wait for it to drain.
+            while self.queue:
+                segment, _ = self.queue.popleft()
+                self.queued_bytes -= len(segment)
+                self.sent_bytes += len(segment)
+                self.connection_bytes += len(segment)
+                writer.write(segment)
+            await writer.drain()
+
+    def update_lag(self):
+        """Age of the oldest segment still queued (0 when the queue is empty)."""
+        self.lag = self.clock() - self.queue[0][1] if self.queue else 0.0
+        self.max_lag = max(self.max_lag, self.lag)
+
+    def stats(self):
+        self.update_lag()
+        return {
+            "client": self.name,
+            "connected": self.connected,
+            "sent_bytes": self.sent_bytes,
+            "queued_bytes": self.queued_bytes,
+            "dropped_bytes": self.dropped_bytes,
+            "skips": self.skips,
+            "connects": self.connects,
+            "lag_ms": round(self.lag * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+        }
+
+
+class Relay:
+    """Splits the encoder's TS output at IDRs and offers it to every client."""
+
+    def __init__(self, targets, max_queue_bytes=None, clock=time.monotonic, client_class=RelayClient):
+        max_queue_bytes = max_queue_bytes or config.RELAY_MAX_QUEUE_KB * 1024
+        self.clients = [client_class(host, port, max_queue_bytes, clock) for host, port in targets]
+        self.split_frames = client_class.splits_frames
+        self.inspector = mpegts.TSInspector(clock=clock)
+        self.carry = b""
+        self.psi = {}               # pid -> latest PAT / PMT packet
+        self.fed_bytes = 0
+
+    async def start(self):
+        for client in self.clients:
+            client.task = asyncio.ensure_future(client.run())
+
+    async def close(self):
+        for client in self.clients:
+            if client.task:
+                client.task.cancel()
+        await asyncio.gather(*(c.task for c in self.clients if c.task), return_exceptions=True)
+
+    def feed(self, data):
+        """Distributes a chunk of encoder output (any alignment)."""
+        if self.carry:
+            data = self.carry + data
+        whole = len(data) - len(data) % TS_PACKET_SIZE
+        self.carry = bytes(data[whole:])
+        if not whole:
+            return
+        chunk = bytes(data[:whole])
+        self.fed_bytes += whole
+
+        # The inspector sees packet-aligned chunks only, so offsets are >= 0.
+        events = [(self._frame_start(chunk, offset), is_key)
+                  for offset, is_key in self.inspector.feed(chunk) if offset >= 0]
+        keys = [offset for offset, is_key in events if is_key]
+        if keys or len(self.psi) < 2:
+            # FFmpeg repeats PAT/PMT right before every keyframe.
+            self._remember_psi(chunk)
+        starts = [offset for offset, _ in events] if self.split_frames else keys
+        bounds = [0] + starts + [whole]
+        for start, end in zip(bounds, bounds[1:]):
+            if end > start:
+                segment = chunk[start:end] if (start, end) != (0, whole) else chunk
+                psi = b"".join(self.psi.values())
+                is_key = start in keys
+                starts_frame = start in starts
+                disposable = starts_frame and not is_key and self._disposable(chunk, start)
+                for client in self.clients:
+                    client.offer(segment, is_key, psi, starts_frame, disposable)
+
+    @staticmethod
+    def _frame_start(chunk, offset):
+        """A frame's first packet, or the timestamp packet right in front of it (framestamp.py)."""
+        if offset >= TS_PACKET_SIZE:
+            before = offset - TS_PACKET_SIZE
+            if ((chunk[before + 1] & 0x1F) << 8 | chunk[before + 2]) == framestamp.STAMP_PID:
+                return before
+        return offset
+
+    def _disposable(self, chunk, start):
+        """Whether the frame at start (maybe behind its timestamp packet) is a non-reference frame."""
+        pos = start
+        pid = (chunk[pos + 1] & 0x1F) << 8 | chunk[pos + 2]
+        if pid == framestamp.STAMP_PID and pos + 2 * TS_PACKET_SIZE <= len(chunk):
+            pos += TS_PACKET_SIZE
+            pid = (chunk[pos + 1] & 0x1F) << 8 | chunk[pos + 2]
+        codec = self.inspector.video_pids.get(pid)
+        return codec is not None and mpegts.frame_disposable(chunk, pos, codec)
+
+    def _remember_psi(self, chunk):
+        """Keeps the latest PAT and PMT so new clients can decode from their first IDR."""
+        pmt_pids = self.inspector.pmt_pids
+        for pos in range(0, len(chunk), TS_PACKET_SIZE):
+            pid = ((chunk[pos + 1] & 0x1F) << 8) | chunk[pos + 2]
+            if pid == mpegts.PAT_PID or pid in pmt_pids:
+                self.psi[pid] = chunk[pos:pos + TS_PACKET_SIZE]
+
+    def stats(self):
+        return [client.stats() for client in self.clients]
+
+    def format_stats(self):
+        lines = []
+        for s in self.stats():
+            state = "up" if s["connected"] else "down"
+            lines.append(f"  {s['client']:<21} {state:<4} sent={s['sent_bytes'] / 1e6:8.1f}MB "
+                         f"queue={s['queued_bytes'] // 1024:5d}KB lag={s['lag_ms']:6.1f}ms "
+                         f"(max {s['max_lag_ms']:.1f}) dropped={s['dropped_bytes'] // 1024}KB skips={s['skips']}")
+        return "\n".join(lines)
+
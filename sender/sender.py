@@ -14,20 +14,59 @@ Dependencies:
     - ffmpeg (installed via brew)
 """
 
+import os
 import subprocess
 import sys
 import time
 import signal
+import threading
 import config
+import abr
+import autotune
+import capabilities
+import capture
+import control
+import cursor
+import discovery
+import encoders
+import framegate
+import mpegts
+import multistream
+import relay
+import supervisor
+import switchover
+import telemetry
+import transport
+
+active_encoder = None
+fixed_settings = set()  # config keys set for this run (STREAMS) that an autotune profile must not change
 
 def check_ffmpeg():
     """Verifies that FFmpeg is installed and accessible."""
-    try:
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-        print("✅ FFmpeg found.")
-    except FileNotFoundError:
+    # Probed once per FFmpeg build and cached; a cache hit spawns nothing.
+    caps = capabilities.probe("ffmpeg")
+    if caps is None:
         print("❌ Error: FFmpeg not found. Please install it using 'brew install ffmpeg'.")
         sys.exit(1)
+    print("✅ FFmpeg found." + (" (cached capabilities)" if caps["cached"] else ""))
+
+def find_receiver():
+    """RECEIVER_IP = "auto": broadcasts a discovery scan and uses the first receiver."""
+    print("🔍 Scanning for receivers...")
+    found = discovery.scan()
+    if not found:
+        print("❌ Error: No receivers found. Set RECEIVER_IP in config.py.")
+        sys.exit(1)
+    for receiver in found:
+        print(f"   {discovery.describe(receiver)}")
+    discovery.apply(found[0])
+    print(f"✅ Using {discovery.describe(found[0])}")
+
+def select_encoder():
+    """Resolves config.ENCODER to the fastest encoder that works on this host."""
+    global active_encoder
+    active_encoder = encoders.select(capabilities.probe("ffmpeg"))
+    return active_encoder
 
 def list_devices():
     """Lists available AVFoundation devices to help user configure SCREEN_INDEX."""
@@ -37,108 +76,530 @@ def list_devices():
     subprocess.run(cmd, stderr=sys.stdout)
     print("\n👉 Update 'SCREEN_INDEX' in config.py based on the Video device index above.\n")
 
-def build_ffmpeg_command():
-    """Constructs the FFmpeg command string based on configuration."""
-    
-    # Base command: AVFoundation capture
-    cmd = [
-        "ffmpeg",
-        "-f", "avfoundation",
-        "-capture_cursor", "1",
-        "-pixel_format", "uyvy422", # Common pixel format for screen capture
-        "-framerate", str(config.FPS),
-        "-i", f"{config.SCREEN_INDEX}:{config.AUDIO_INDEX}",
-    ]
+def current_encoder():
+    return active_encoder or encoders.select(None)
 
-    # Video Encoding (h264_videotoolbox is hardware accelerated on macOS)
-    # We try to use hardware acceleration if possible, fallback to libx264 is simpler for portability but higher CPU.
-    # Architecture doc mandate: "h264_videotoolbox if available"
-    # Note: h264_videotoolbox doesn't always support 'ultrafast' preset in the same way libx264 does.
-    # For MVP safety + latency tuning, we'll stick to libx264 with ultrafast unless explicit performance issues.
-    # Actually, let's use libx264 for consistent 'tune zerolatency' support which is critical.
+def build_ffmpeg_command(input_args=None, gated=False, input_pix_fmt=None):
+    """Constructs the FFmpeg command string based on configuration.
+
+    input_args replaces the capture backend's input (used by the benchmarks
+    in bench/ to feed a synthetic source through the real encode settings);
+    input_pix_fmt says what it delivers, if known.
+    gated: the input is the frame gate's already scaled, variable frame rate
+    raw stream (see build_capture_command / framegate.py).
+    """
     
-    cmd.extend([
-        "-c:v", "libx264",
-        "-preset", config.PRESET,
-        "-tune", config.TUNE,
-        "-b:v", config.BITRATE,
-        "-g", str(config.GOP_SIZE),    # Frequent keyframes for recovery
-        "-pix_fmt", "yuv420p",         # Compatible with most players
-    ])
-
-    # Scaling
-    if config.SCALING_RESOLUTION:
-        cmd.extend(["-vf", f"scale={config.SCALING_RESOLUTION}"])
+    encoder = current_encoder()
 
-    # Output: MPEG-TS over TCP
-    # TCP connection to receiver
-    output_url = f"tcp://{config.RECEIVER_IP}:{config.RECEIVER_PORT}"
+    # Base command: screen capture (see capture.py), in a pixel format the
+    # encoder takes as-is where the backend offers one
+    filters = []
+    if input_args is None:
+        input_pix_fmt = capture.pick_pix_fmt(encoder)
+        input_args = capture.input_args(input_pix_fmt)
+        filters = capture.input_filters()
+    cmd = ["ffmpeg", *encoders.global_args(encoder), *input_args]
+
+    # Video Encoding: selected by select_encoder() (hardware first, see encoders.py)
+    cmd.extend(encoders.encoder_args(encoder, input_pix_fmt))
+
+    if gated:
+        # Keep frame timing as captured, and keyframes GOP_SIZE/FPS seconds
+        # apart however few frames an idle desktop produces.
+        cmd.extend([
+            *capabilities.passthrough_args(),
+            "-force_key_frames", f"expr:gte(t,n_forced*{config.GOP_SIZE / config.FPS:g})",
+        ])
+    elif config.SCALING_RESOLUTION:
+        # Scaling (the gated capture already scaled)
+        filters.append(scale_filter())
+    filters += encoders.upload_filters(encoder)  # GPU upload for VAAPI
+    if filters:
+        cmd.extend(["-vf", ",".join(filters)])
+
+    # Output: MPEG-TS over the configured transport (tcp / udp / srt)
+    output_url = transport.sender_url(config.TRANSPORT, config.RECEIVER_IP, config.RECEIVER_PORT,
+                                      config.MTU, config.SRT_LATENCY_MS)
     
-    cmd.extend([
-        "-f", "mpegts",
-        output_url
-    ])
+    if output_targets():
+        # Fan-out / seamless switching: switchover.py reads the stream from
+        # stdout and sends it on (and inspects it there)
+        cmd.extend(["-f", "mpegts", "pipe:1"])
+    elif config.INSPECT_STREAM:
+        # Tee a copy of the muxed stream to stdout for the inline inspector.
+        # onfail=ignore: a slow inspector must never stop the real output.
+        cmd.extend([
+            "-map", "0:v",
+            "-f", "tee",
+            f"[f=mpegts]{output_url}|[f=mpegts:onfail=ignore]pipe:1"
+        ])
+    else:
+        cmd.extend([
+            "-f", "mpegts",
+            output_url
+        ])
+
+    return cmd
+
+def scale_filter():
+    """Scaling to SCALING_RESOLUTION with the SCALER algorithm."""
+    return f"scale={config.SCALING_RESOLUTION}:flags={config.SCALER}"
 
+def gate_pix_fmt(encoder, native=None):
+    """Raw format between capture and frame gate: 4:2:0 with the luma plane
+    first (what framegate.py compares), ideally one the encoder takes as-is."""
+    accepted = [f for f in encoders.input_pix_fmts(encoder) if f in framegate.RAW_PIX_FMTS]
+    if native in accepted:
+        return native
+    return accepted[0] if accepted else "yuv420p"
+
+def build_capture_command(input_args=None, raw_pix_fmt="yuv420p"):
+    """Capture-only FFmpeg for the frame gate: scaled raw frames on stdout."""
+    cmd = ["ffmpeg", "-hide_banner", "-nostats"]
+    filters = []
+    if input_args is None:
+        input_args = capture.input_args(capture.pick_pix_fmt(current_encoder(), [raw_pix_fmt]))
+        filters = capture.input_filters()
+    cmd.extend(input_args)
+    if config.SCALING_RESOLUTION:
+        filters.append(scale_filter())
+    if filters:
+        cmd.extend(["-vf", ",".join(filters)])
+    cmd.extend(["-f", "rawvideo", "-pix_fmt", raw_pix_fmt, "pipe:1"])
     return cmd
 
+def gated_input_args(width, height, pix_fmt):
+    """Encoder input for the frame gate's pipe. Frames are stamped with the
+    wallclock time they arrive, so skipped frames leave gaps (VFR) instead of
+    slowing the video down; the 1/1000 time base keeps millisecond precision.
+    The rate is variable by design, so it is not probed: probing holds the
+    encoder (and its connection) back for ~15 frames, seconds when idle."""
+    return [
+        "-fpsprobesize", "0",
+        "-use_wallclock_as_timestamps", "1",
+        "-f", "rawvideo",
+        "-pix_fmt", pix_fmt,
+        "-video_size", f"{width}x{height}",
+        "-framerate", "1000",
+        "-i", "pipe:0",
+    ]
+
+def inspect_output(process):
+    """Runs the MPEG-TS inspector over FFmpeg's stdout copy of the stream."""
+    inspector = mpegts.TSInspector()
+    buffer = bytearray(mpegts.TS_PACKET_SIZE * 348)
+    view = memoryview(buffer)
+    last_print = time.monotonic()
+    while True:
+        n = process.stdout.readinto(buffer)
+        if not n:
+            break
+        inspector.feed(view[:n])
+        if time.monotonic() - last_print >= config.STATS_INTERVAL:
+            last_print = time.monotonic()
+            print("📊 Stream stats:\n" + inspector.format_stats())
+
 # ... imports ...
 running_process = None
+frame_gate = None
+encoder_telemetry = None  # telemetry.Telemetry of the current/last encoder
+active_supervisor = None  # the Supervisor main() is running (for stop_stream_signal)
+stream_output = None      # switchover.SwitchingOutput while the sender owns the connection
+pipeline_lock = threading.Lock()  # a switchover and stop_encoder() never interleave
 
-def stop_stream_signal():
-    """External hook to stop the stream."""
-    global running_process
-    if running_process:
-        print("\n🛑 Stopping stream via signal...")
-        running_process.terminate()
+def output_targets():
+    """Receivers the sender connects to itself (relay, SEAMLESS_SWITCH, FRAME_TIMESTAMPS,
+    EGRESS); [] when FFmpeg does."""
+    if config.RELAY_RECEIVERS:
+        return [relay.parse_target(t) for t in config.RELAY_RECEIVERS]
+    if (config.SEAMLESS_SWITCH or config.FRAME_TIMESTAMPS or config.EGRESS) and config.TRANSPORT == "tcp":
+        return [(config.RECEIVER_IP, int(config.RECEIVER_PORT))]
+    return []
+
+def stop_pipeline(process, gate):
+    """Stops an encoder and the frame gate's capture feeding it."""
+    if gate:
+        gate.stop()
+    if process:
+        process.terminate()
         try:
-            running_process.wait(timeout=5)
+            process.wait(timeout=5)
         except subprocess.TimeoutExpired:
-            running_process.kill()
-        running_process = None
+            process.kill()
 
-def main():
+def stop_encoder():
+    """Stops the current FFmpeg process and its capture (the supervisor may start new ones)."""
     global running_process
+    with pipeline_lock:
+        process, running_process = running_process, None
+        stop_pipeline(process, frame_gate)
+
+def stop_stream_signal():
+    """External hook to stop the stream started by main()."""
+    if active_supervisor and not active_supervisor.stopped():
+        print("\n🛑 Stopping stream via signal...")
+        active_supervisor.stop()
+
+def start_encoder(cmd, stdin=None):
+    """Starts FFmpeg with a Telemetry reader on its -progress output and stderr."""
+    global encoder_telemetry
+    stats = telemetry.Telemetry()
+    read_fd, write_fd = os.pipe()
+    cmd = cmd[:1] + stats.ffmpeg_args(write_fd) + cmd[1:]
+    # stdout carries the stream only for the switchover output and the inspector tee.
+    wants_stdout = output_targets() or config.INSPECT_STREAM
+
+    # Popen allows us to keep the script running and handle signals
+    process = subprocess.Popen(
+        cmd,
+        stdin=stdin,
+        stdout=subprocess.PIPE if wants_stdout else subprocess.DEVNULL,
+        stderr=subprocess.PIPE,  # read continuously by telemetry (a full pipe would stall FFmpeg)
+        pass_fds=(write_fd,),
+    )
+    os.close(write_fd)
+    stats.attach(process, read_fd)
+    encoder_telemetry = stats
+    if config.INSPECT_STREAM and not output_targets():
+        threading.Thread(target=inspect_output, args=(process,), daemon=True).start()
+    return process
+
+def telemetry_snapshot():
+    """Live EncoderStats of the running encoder (None before the first start). Cheap to poll."""
+    return encoder_telemetry.snapshot() if encoder_telemetry else None
+
+def log_tail(count=None):
+    """Last FFmpeg stderr lines of the current/last encoder."""
+    return encoder_telemetry.log_tail(count) if encoder_telemetry else []
+
+def start_stream(input_args=None, warm=False):
+    """Starts the encoder, behind the frame gate if FRAME_GATE is on.
+
+    warm: reuse the frame gate's running capture if there is one (reconnect).
+    Returns the encoder process, or None if the capture could not start.
+    """
+    global frame_gate
+    if not config.FRAME_GATE:
+        return start_encoder(build_ffmpeg_command(input_args))
+
+    if warm and frame_gate and frame_gate.alive():
+        process = start_gated_encoder(frame_gate)
+        frame_gate.attach(process)
+        return process
+    if frame_gate:
+        frame_gate.stop()
+    process, frame_gate = start_gated_pipeline(input_args)
+    return process
+
+def start_gated_pipeline(input_args=None):
+    """New capture, frame gate and encoder. Returns (process, gate), or (None, None)
+    if the capture could not start."""
+    encoder = current_encoder()
+    native = capture.pick_pix_fmt(encoder) if input_args is None else None
+    raw_pix_fmt = gate_pix_fmt(encoder, native)
+    grabber = subprocess.Popen(build_capture_command(input_args, raw_pix_fmt),
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    gate = framegate.FrameGate(grabber, pix_fmt=raw_pix_fmt)
+    if gate.read_geometry() is None:
+        gate.stop()
+        print("❌ Screen capture failed to start:\n" + "\n".join(gate.stderr_tail))
+        return None, None
+    process = start_gated_encoder(gate)
+    gate.start(process)
+    return process, gate
+
+def start_gated_encoder(gate):
+    """Encoder reading the frame gate's raw frames from stdin."""
+    return start_encoder(build_ffmpeg_command(gated_input_args(gate.width, gate.height, gate.pix_fmt),
+                                              gated=True, input_pix_fmt=gate.pix_fmt),
+                         stdin=subprocess.PIPE)
+
+def exit_log():
+    """FFmpeg's stderr tail once its readers have seen EOF."""
+    encoder_telemetry.wait()
+    return encoder_telemetry.stderr_text()
+
+def report_exit(process, stderr_out=None):
+    """Prints why FFmpeg stopped."""
+    if stderr_out is None:
+        stderr_out = exit_log()
+    print("\n❌ FFmpeg exited unexpectedly.")
+    if "Connection refused" in stderr_out:
+        print("👉 Could not connect to Receiver. Is it running?")
+    else:
+        print("FFmpeg Error Output:\n" + stderr_out[-500:]) # Last 500 chars
+
+def launch_encoder(warm=False):
+    """Supervisor hook: starts a session's encoder (and hands its stdout to the output)."""
+    global running_process
+    with pipeline_lock:
+        process = running_process = start_stream(warm=warm)
+        if process is None:
+            return None
+        if stream_output:
+            stream_output.attach(process)
+        return process, encoder_telemetry
+
+def apply_settings(changes):
+    """Changes encoder settings mid-stream (control API, GUI). changes: {config key: value}.
+
+    When the sender owns the output (SEAMLESS_SWITCH, relay mode) a new
+    pipeline is started next to the running one and switched in at its first
+    IDR; otherwise the supervisor restarts the encoder. Returns a summary.
+    """
+    global running_process, frame_gate, encoder_telemetry
+    started = time.monotonic()
+    with pipeline_lock:
+        previous = {key: getattr(config, key) for key in changes}
+        for key, value in changes.items():
+            setattr(config, key, value)
+        print(f"🎛️  Settings: {config.SCALING_RESOLUTION or 'Native'} @ {config.FPS}fps | "
+              f"{config.BITRATE} | GOP {config.GOP_SIZE}")
+        applied = control.current_settings()
+        sup = active_supervisor
+        if running_process is None or sup is None or sup.stopped():
+            return {"applied": applied, "switch": None}  # used by the next start
+        if not stream_output:
+            sup.request_restart()
+            return {"applied": applied, "switch": "restart"}
+
+        old = (running_process, frame_gate, encoder_telemetry)
+        if config.FRAME_GATE:
+            process, gate = start_gated_pipeline()
+        else:
+            process, gate = start_encoder(build_ffmpeg_command()), None
+        new_telemetry, encoder_telemetry = encoder_telemetry, old[2]  # show the live encoder until the switch
+        source = stream_output.attach(process) if process else None
+        if source is None or not stream_output.wait_live(source):
+            stop_pipeline(process, gate)
+            for key, value in previous.items():
+                setattr(config, key, value)
+            print("⚠️ Switchover failed, settings unchanged.")
+            return {"error": "the new encoder did not start", "applied": control.current_settings()}
+        running_process, frame_gate, encoder_telemetry = process, gate, new_telemetry
+        sup.adopt(process, new_telemetry)
+    # The old encoder's output is no longer read; stop it and its capture.
+    stop_pipeline(old[0], old[1])
+    elapsed = (time.monotonic() - started) * 1000
+    print(f"🔀 Switched encoders in {elapsed:.0f} ms (cut at {stream_output.switches[-1]['cut']})")
+    return {"applied": applied, "switch": "seamless", "ms": round(elapsed, 1),
+            "cut": stream_output.switches[-1]["cut"]}
+
+def control_status():
+    """GET /status of the control API."""
+    return {
+        "settings": control.current_settings(),
+        "encoder": active_encoder,
+        "streaming": running_process is not None and running_process.poll() is None,
+        "seamless_switch": stream_output is not None,
+        "telemetry": encoder_telemetry.as_dict() if encoder_telemetry else None,
+        "output": stream_output.stats() if stream_output else None,
+        "sessions": len(active_supervisor.sessions) if active_supervisor else 0,
+        "session": active_supervisor.session.as_dict() if active_supervisor and active_supervisor.session else None,
+        "link": link_status(),
+    }
+
+def link_status():
+    """The receiver's latest OSD_STATS report, None without recent feedback."""
+    feedback = active_supervisor.feedback if active_supervisor else None
+    if not feedback or not feedback.fresh():
+        return None
+    backlog = feedback.backlog_bytes()
+    return {
+        "arrival_bps": feedback.arrival_bps,
+        "backlog_bytes": backlog,
+        "backlog_ms": round(backlog * 8 / abr.bitrate_bps(config.BITRATE) * 1000, 1),
+        "first_frame_ms": feedback.first_frame_ms,
+    }
+
+def sent_bytes():
+    """Bytes sent on the current connection to the receiver (compared with its OSD_STATS)."""
+    if stream_output:
+        return stream_output.sent_bytes()
+    return telemetry_snapshot().total_size
+
+def metrics_snapshot():
+    """Values for the GUI's live graphs (timeseries.MetricsSampler).
+
+    "bytes" is a counter (the sampler turns it into bitrate_mbps); latency_ms is
+    the send backlog: the slowest receiver's with an owned connection, otherwise
+    the one the receiver reports over FEEDBACK_PORT (None without either).
+    """
+    stats = telemetry_snapshot()
+    if stats is None:
+        return {}
+    lags = []
+    for client in (stream_output.stats()["clients"] if stream_output else []):
+        lag = client.get("backlog_ms", client.get("lag_ms"))
+        if lag is not None:
+            lags.append(lag)
+    link = link_status() if not stream_output else None
+    process = running_process
+    return {
+        "fps": stats.fps,
+        "bytes": stats.total_size,
+        "queue_frames": stats.queue_depth,
+        "latency_ms": max(lags) if lags else (link["backlog_ms"] if link else None),
+        "pids": [process.pid] if process else [],
+    }
+
+def exit_action(process):
+    """Supervisor hook: FFmpeg exited on its own. Returns "fallback" (the encoder
+    failed to initialise and another one was selected), "reconnect" or "stop"."""
+    stderr_out = exit_log()
+    failed = active_encoder
+    if (config.ENCODER == "auto"
+            and time.monotonic() - encoder_telemetry.started_at < config.ENCODER_FAILURE_WINDOW
+            and encoders.is_encoder_failure(stderr_out)):
+        capabilities.mark_encoder_failed("ffmpeg", failed)
+        if select_encoder() != failed:
+            print(f"⚠️  Encoder {failed} failed to start, falling back to {active_encoder}.")
+            return "fallback"
+    if not stream_output and supervisor.is_connection_lost(stderr_out):
+        if "Connection refused" in stderr_out:
+            print("🔌 Receiver not reachable. Is it running?")
+        else:
+            print("🔌 Lost connection to the receiver.")
+        return "reconnect"
+    report_exit(process, stderr_out)
+    return "stop"
+
+def stats_monitor():
+    """Monitor that prints encoder telemetry every STATS_INTERVAL seconds."""
+    last_print = [time.monotonic()]
+
+    def monitor(process, stats):
+        if config.TELEMETRY_PRINT and time.monotonic() - last_print[0] >= config.STATS_INTERVAL:
+            last_print[0] = time.monotonic()
+            print(f"📈 Encoder: {stats.format_stats()}")
+        return False
+    return monitor
+
+def adaptive_monitor(controller, feedback):
+    """Monitor for the ABR controller: returns True to restart the encoder at
+    a GOP boundary once the controller wants another profile."""
+    state = {}
+
+    def reset():
+        now = time.monotonic()
+        state.update(started=now, last_sample=now, last_size=0, switch_at=None)
+
+    def monitor(process, stats_telemetry):
+        stats = stats_telemetry.snapshot()
+        frame = stats.frame
+        if state["switch_at"] is not None:
+            # Restart right before the GOP boundary so the new
+            # encoder's IDR takes the place of the scheduled one.
+            return frame >= state["switch_at"] - 1
+
+        now = time.monotonic()
+        if now - state["last_sample"] < config.ABR_SAMPLE_INTERVAL:
+            return False
+        warming_up = now - state["started"] < config.ABR_WARMUP
+        fresh = feedback.fresh()
+        sample = abr.CongestionSample(
+            backlog_bytes=feedback.backlog_bytes() if fresh else None,
+            arrival_bps=feedback.arrival_bps if fresh else None,
+            send_bps=(stats.total_size - state["last_size"]) / (now - state["last_sample"]),
+            # FFmpeg's speed figure is meaningless right after startup.
+            encoder_speed=None if warming_up else stats.speed,
+        )
+        state["last_sample"], state["last_size"] = now, stats.total_size
+        if controller.update(sample) is not None:
+            state["switch_at"] = 0 if controller.urgent(sample) else abr.next_keyframe(frame + 1, config.GOP_SIZE)
+        return False
+
+    monitor.reset = reset
+    return monitor
+
+def run_adaptive(sup):
+    """Streams with the ABR controller; profile changes restart the encoder at a GOP boundary."""
+    ladder = abr.load_ladder()
+    controller = abr.AdaptiveController(ladder, abr.start_index(ladder))
+    monitor = adaptive_monitor(controller, sup.feedback)
+
+    def launch(warm):
+        if not warm:
+            controller.commit()  # a pending switch takes effect with the restart
+        abr.apply_profile(controller.profile)
+        print(f"🎚️  Profile: {config.SCALING_RESOLUTION or 'Native'} @ {config.FPS}fps | {config.BITRATE}")
+        monitor.reset()
+        return launch_encoder(warm)
+
+    sup.launch = launch
+    return sup.run(monitor)
+
+def create_supervisor():
+    """A Supervisor for this sender's pipeline; main() runs it, stop() ends it."""
+    feedback = None
+    if not config.RELAY_RECEIVERS:
+        # Receiver reports: first-frame timing for every session, link state for ABR
+        feedback = abr.FeedbackListener(sent_bytes=sent_bytes)
+    return supervisor.Supervisor(launch_encoder, stop_encoder, exit_action, feedback)
+
+def main(sup=None):
+    """Streams until stopped. sup: a Supervisor from create_supervisor() to control it from outside."""
+    global active_supervisor, stream_output
     print("🚀 OpenSecondDisplay - macOS Sender")
     check_ffmpeg()
+    if config.RECEIVER_IP == "auto" and not config.RELAY_RECEIVERS:
+        find_receiver()  # before select_encoder(): the receiver's decoders matter
+    select_encoder()
+    autotune.apply_profile(active_encoder, keep=fixed_settings)
 
     # Optional: Uncomment if you want to see devices every run, or just rely on documentation
     # list_devices()
 
-    print(f"📡 Connecting to Receiver at {config.RECEIVER_IP}:{config.RECEIVER_PORT}...")
-    print(f"🎥 Capture Device Index: {config.SCREEN_INDEX} (Cursor: On)")
-    print(f"⚙️  Settings: {config.SCALING_RESOLUTION or 'Native'} @ {config.FPS}fps | {config.BITRATE}")
+    if config.RELAY_RECEIVERS:
+        print(f"📡 Relaying to {len(config.RELAY_RECEIVERS)} receivers: {', '.join(config.RELAY_RECEIVERS)} (tcp)")
+    else:
+        print(f"📡 Connecting to Receiver at {config.RECEIVER_IP}:{config.RECEIVER_PORT} ({config.TRANSPORT})...")
+    if config.SEAMLESS_SWITCH and config.TRANSPORT != "tcp" and not config.RELAY_RECEIVERS:
+        print(f"⚠️  SEAMLESS_SWITCH needs tcp; setting changes restart the encoder over {config.TRANSPORT}.")
+    if config.FRAME_TIMESTAMPS and config.TRANSPORT != "tcp" and not config.RELAY_RECEIVERS:
+        print(f"⚠️  FRAME_TIMESTAMPS needs tcp; frames go out over {config.TRANSPORT} without timestamps.")
+    if config.EGRESS and config.TRANSPORT != "tcp" and not config.RELAY_RECEIVERS:
+        print(f"⚠️  EGRESS needs tcp; FFmpeg sends {config.TRANSPORT} itself.")
+    print(f"🎥 Capture: {capture.describe()}")
+    print(f"⚙️  Settings: {config.SCALING_RESOLUTION or 'Native'} @ {config.FPS}fps | {config.BITRATE} | {active_encoder}")
     print("❌ Press Ctrl+C to stop streaming.")
 
-    cmd = build_ffmpeg_command()
-    # print("DEBUG Command:", " ".join(cmd))
-
+    sup = active_supervisor = sup or create_supervisor()
+    if sup.feedback:
+        sup.feedback.start()
+    if output_targets():
+        # The sender keeps the connection across encoders (see switchover.py).
+        stream_output = switchover.SwitchingOutput(output_targets())
+        stream_output.start()
+    control_server = control.start(control_status, apply_settings) if config.CONTROL_PORT else None
+    cursor_sender = cursor.start() if config.CURSOR_CHANNEL else None
     try:
-        # Popen allows us to keep the script running and handle signals
-        running_process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE, # Capture stderr to debug if needed, or let it flow to console
-            text=True
-        )
-        
-        # Stream FFmpeg output to console for feedback (optional, nice for debugging)
-        # For a clean sender, maybe mostly silent, but for 'Engineer' role, logging is good.
-        while running_process:
-            # Check if process is still alive
-            if running_process.poll() is not None:
-                # Process exited
-                stderr_out = running_process.stderr.read()
-                print("\n❌ FFmpeg exited unexpectedly.")
-                if "Connection refused" in stderr_out:
-                    print("👉 Could not connect to Receiver. Is it running?")
-                else:
-                    print("FFmpeg Error Output:\n" + stderr_out[-500:]) # Last 500 chars
-                break
-            time.sleep(1)
-
+        if config.ADAPTIVE_BITRATE and config.RELAY_RECEIVERS:
+            # One encode serves every receiver, so there is no single link to adapt to.
+            print("⚠️  ADAPTIVE_BITRATE is ignored in relay mode.")
+        if config.ADAPTIVE_BITRATE and not config.RELAY_RECEIVERS:
+            run_adaptive(sup)
+        else:
+            sup.run(stats_monitor())
     except KeyboardInterrupt:
         stop_stream_signal()
         print("👋 Stream stopped.")
+    finally:
+        sup.stop()
+        if control_server:
+            control_server.shutdown()
+            control_server.server_close()
+        if cursor_sender:
+            cursor_sender.close()
+        if stream_output:
+            stream_output.close()
+            stream_output = None
+        if sup.feedback:
+            sup.feedback.close()
+    return sup.sessions
 
 if __name__ == "__main__":
-    main()
+    if config.STREAMS:
+        multistream.main()  # one sender process per stream
+    else:
+        main()
@@ -0,0 +1,248 @@
+"""
+OpenSecondDisplay - Session Supervisor
+Role: Networking & Performance Engineer
+
+Description:
+    Owns the encoder process from start to stop. When FFmpeg exits because
+    the receiver went away (restart, network drop), the supervisor waits a
+    jittered, exponentially growing delay (RECONNECT_BACKOFF_MIN ..
+    RECONNECT_BACKOFF_MAX) and starts a new session, instead of giving up.
+    With the frame gate the capture process is kept warm across reconnects:
+    only the encoder restarts, and its first frame (an IDR) is sent as soon
+    as the next frame is captured. Without the gate, capture and encode are
+    one FFmpeg process and both restart.
+
+    Every session records:
+      connect_ms      - process start until FFmpeg has its output open
+      first_byte_ms   - until FFmpeg first reported muxed bytes written
+                        (resolution: one -progress period, 0.1 s)
+      first_frame_ms  - until the receiver had its first keyframe (from the
+                        OSD_STATS feedback of an ingest-mode receiver)
+    printed when known and appended as a JSON line to SESSION_LOG, so
+    reconnect performance can be compared across releases
+    (bench/reconnect.py measures it against a restarting receiver).
+
+    The pipeline itself is passed in by sender.py as three callables:
+      launch(warm)         -> (process, telemetry) or None if capture failed
+      shutdown()           -> stops the encoder (and the capture)
+      exit_action(process) -> "fallback" (retry now with another encoder),
+                              "reconnect" or "stop"
+"""
+
+import json
+import random
+import threading
+import time
+
+import config
+
+# FFmpeg stderr when the receiver end went away (refused, reset, write failed)
+CONNECTION_LOST_MARKERS = (
+    "Connection refused",
+    "Connection reset",
+    "Connection timed out",
+    "Broken pipe",
+    "No route to host",
+    "Network is unreachable",
+    "Error writing trailer",
+    "Error muxing a packet",
+    "Input/output error",
+)
+
+FIRST_FRAME_WAIT = 3.0  # seconds after the first byte to wait for the receiver's first-frame report
+
+
+def is_connection_lost(stderr_text):
+    return any(marker in stderr_text for marker in CONNECTION_LOST_MARKERS)
+
+
+class Backoff:
+    """Exponential backoff with jitter: each delay is random in [delay/2, delay]."""
+
+    def __init__(self, minimum=None, maximum=None, rng=random.random):
+        self.minimum = minimum if minimum is not None else config.RECONNECT_BACKOFF_MIN
+        self.maximum = maximum if maximum is not None else config.RECONNECT_BACKOFF_MAX
+        self.rng = rng
+        self.attempt = 0
+
+    def next_delay(self):
+        delay = min(self.maximum, self.minimum * 2 ** self.attempt)
+        self.attempt += 1
+        # Jitter so several senders do not hammer a restarting receiver in step.
+        return delay * (0.5 + 0.5 * self.rng())
+
+    def reset(self):
+        self.attempt = 0
+
+
+class Session:
+    """Timings of one encoder process (one connection to the receiver)."""
+
+    def __init__(self, number, reason, warm, started, backoff=0.0):
+        self.number = number
+        self.reason = reason          # "start", "reconnect", "fallback", "restart"
+        self.warm_capture = warm
+        self.backoff_s = backoff      # delay waited before this session
+        self.started = started        # clock() at launch
+        self.started_wall = time.time()
+        self.connect_ms = None
+        self.first_byte_ms = None
+        self.first_frame_ms = None
+        self.duration_s = None
+        self.end = None               # "stopped", "restart", "lost", "fallback", "failed"
+
+    def observe(self, telemetry, feedback=None):
+        """Fills in milestones from telemetry and receiver feedback. True once all are known."""
+        if self.connect_ms is None and telemetry.output_opened_at is not None:
+            self.connect_ms = (telemetry.output_opened_at - self.started) * 1000
+        stats = telemetry.snapshot()
+        if self.first_byte_ms is None and stats.total_size > 0:
+            self.first_byte_ms = (stats.updated - self.started) * 1000
+        if (self.first_frame_ms is None and self.connect_ms is not None
+                and feedback is not None and feedback.first_frame_ms is not None):
+            # The receiver measures from accept(), which is our connect.
+            self.first_frame_ms = self.connect_ms + feedback.first_frame_ms
+        return None not in (self.connect_ms, self.first_byte_ms, self.first_frame_ms)
+
+    def as_dict(self):
+        def ms(value):
+            return round(value, 1) if value is not None else None
+        return {
+            "session": self.number,
+            "reason": self.reason,
+            "warm_capture": self.warm_capture,
+            "started": round(self.started_wall, 3),
+            "backoff_s": round(self.backoff_s, 3),
+            "connect_ms": ms(self.connect_ms),
+            "first_byte_ms": ms(self.first_byte_ms),
+            "first_frame_ms": ms(self.first_frame_ms),
+            "duration_s": round(self.duration_s, 3) if self.duration_s is not None else None,
+            "end": self.end,
+        }
+
+    def describe(self):
+        def ms(value):
+            return f"{value:.0f} ms" if value is not None else "-"
+        return (f"connect {ms(self.connect_ms)}, first byte {ms(self.first_byte_ms)}, "
+                f"first frame {ms(self.first_frame_ms)}" + (" (warm capture)" if self.warm_capture else ""))
+
+
+class Supervisor:
+    """Starts, watches, reconnects and stops the encoder."""
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, launch, shutdown, exit_action, feedback=None, clock=time.monotonic):
+        self.launch = launch
+        self.shutdown = shutdown
+        self.exit_action = exit_action
+        self.feedback = feedback
+        self.clock = clock
+        self.backoff = Backoff()
+        self.stop_event = threading.Event()
+        self.restart_event = threading.Event()
+        self.sessions = []
+        self.process = None
+        self.telemetry = None
+        self.switches = 0
+
+    @property
+    def session(self):
+        return self.sessions[-1] if self.sessions else None
+
+    def stop(self):
+        """Ends the run loop and stops the encoder (safe from any thread)."""
+        self.stop_event.set()
+        self.shutdown()
+
+    def adopt(self, process, telemetry):
+        """Watches a replacement encoder from now on (seamless switchover: the
+        connection and so the session go on)."""
+        self.process, self.telemetry = process, telemetry
+        self.switches += 1
+
+    def request_restart(self):
+        """Restarts the encoder from scratch (capture too), e.g. after a profile change."""
+        self.restart_event.set()
+
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    def run(self, monitor=None):
+        """Runs sessions until stop() or a fatal exit.
+
+        monitor(process, telemetry) is called every POLL_INTERVAL while the
+        encoder runs; returning True restarts it (full restart, no backoff).
+        """
+        reason, warm, delay = "start", False, 0.0
+        while not self.stopped():
+            session = Session(len(self.sessions) + 1, reason, warm, self.clock(), delay)
+            self.sessions.append(session)
+            if self.feedback:
+                self.feedback.reset()
+            launched = self.launch(warm)
+            if launched is None:
+                session.end = "failed"
+                break
+            self.process, self.telemetry = launched
+            reported = False
+
+            restart = False
+            while self.process.poll() is None and not self.stopped():
+                self.stop_event.wait(self.POLL_INTERVAL)
+                if not reported and (session.observe(self.telemetry, self.feedback)
+                                     or self._first_frame_overdue(session)):
+                    reported = True
+                    self._report(session)
+                if self.restart_event.is_set() or (monitor and monitor(self.process, self.telemetry)):
+                    self.restart_event.clear()
+                    restart = True
+                    break
+            session.observe(self.telemetry, self.feedback)
+            session.duration_s = self.clock() - session.started
+            if session.first_byte_ms is not None:
+                self.backoff.reset()  # it did connect; start the next wait short again
+
+            if self.stopped():
+                session.end = "stopped"
+            elif restart:
+                session.end = "restart"
+                self.shutdown()
+                reason, warm, delay = "restart", False, 0.0
+            else:
+                action = self.exit_action(self.process)
+                if action == "fallback":
+                    session.end = "fallback"
+                    reason, warm, delay = "fallback", False, 0.0
+                elif action == "reconnect" and config.RECONNECT:
+                    session.end = "lost"
+                    delay = self.backoff.next_delay()
+                    print(f"🔁 Reconnecting in {delay:.1f}s...")
+                    self.stop_event.wait(delay)
+                    reason, warm = "reconnect", True
+                else:
+                    session.end = "failed"
+                    self.stop_event.set()
+            if not reported:
+                self._report(session)
+            self._log(session)
+        self.shutdown()
+        return self.sessions
+
+    def _first_frame_overdue(self, session):
+        """No first-frame report coming (non-ingest receiver, UDP/SRT): report without it."""
+        return (session.first_byte_ms is not None
+                and self.clock() - session.started > session.first_byte_ms / 1000 + FIRST_FRAME_WAIT)
+
+    def _report(self, session):
+        if session.connect_ms is not None:
+            print(f"⏱️  Session {session.number} ({session.reason}): {session.describe()}")
+
+    def _log(self, session):
+        if not config.SESSION_LOG:
+            return
+        try:
+            with open(config.SESSION_LOG, "a") as f:
+                f.write(json.dumps(session.as_dict()) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not write SESSION_LOG: {e}")
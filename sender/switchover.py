@@ -0,0 +1,257 @@
+"""
+OpenSecondDisplay - Encoder Switchover
+Role: Networking & Performance Engineer
+
+Description:
+    Lets the sender change encoder settings mid-stream without a gap on the
+    receiver. No FFmpeg encoder takes a new resolution, frame rate, GOP or
+    bitrate while it runs, so every change needs a new encoder. Restarting
+    it leaves the receiver without frames for the whole startup (capture,
+    encoder init, connect); here the new encoder starts while the old one
+    is still streaming:
+
+      1. Both encoders write MPEG-TS to stdout. The new one's output is
+         held back while the old one's is still forwarded.
+      2. When the new stream has its first IDR, the old stream is cut at
+         its next frame start (so its last frame reaches the receiver
+         whole), or at once if it has been quiet for IDLE_CUT seconds.
+      3. The new stream follows from its first byte (PAT/PMT, then the IDR)
+         and the old encoder is stopped.
+
+    The receiver keeps one TCP connection and sees an IDR right after the
+    old stream's last frame; `-vf setpts=0` ignores the timestamp jump, and
+    the decoder reinitialises on a new resolution. The gap is about one
+    frame interval instead of an encoder startup.
+
+    The output is owned by the relay's clients (relay.py), which connect,
+    reconnect and bound each receiver's queue. It serves RELAY_RECEIVERS in
+    relay mode, or RECEIVER_IP alone with SEAMLESS_SWITCH, FRAME_TIMESTAMPS
+    or EGRESS (egress.py clients), and stays up across encoder restarts. With
+    FRAME_TIMESTAMPS every frame gets its timestamp packet here, as it
+    comes out of its encoder (framestamp.py).
+"""
+
+import asyncio
+import threading
+import time
+
+import config
+import egress
+import framestamp
+import mpegts
+import relay
+
+TS_PACKET_SIZE = mpegts.TS_PACKET_SIZE
+IDLE_CUT = 0.1         # seconds without old-stream output after which the cut is made anyway
+SWITCH_TIMEOUT = 5.0   # seconds the new encoder gets to produce its first IDR
+TICK = 0.05            # seconds between idle / timeout checks
+
+
+class Source:
+    """One encoder's stdout as seen by the switchover."""
+
+    def __init__(self, name, clock):
+        self.name = name
+        self.inspector = mpegts.TSInspector(clock=clock)
+        self.carry = b""
+        self.held = bytearray()    # output held back until the switch
+        self.ready = False         # its first IDR has arrived
+        self.closed = False        # EOF: the encoder exited
+        self.last_data = clock()
+        self.added_at = clock()
+        self.transport = None
+        self.live = threading.Event()   # set once its output goes to the receivers
+        self.failed = False
+        self.capture_clock = framestamp.CaptureClock()
+
+    def aligned(self, data):
+        """Whole TS packets of data (the rest is kept for the next read)."""
+        if self.carry:
+            data = self.carry + data
+        whole = len(data) - len(data) % TS_PACKET_SIZE
+        self.carry = data[whole:]
+        return data[:whole]
+
+
+class _PipeProtocol(asyncio.Protocol):
+    def __init__(self, output, source):
+        self.output = output
+        self.source = source
+
+    def data_received(self, data):
+        self.output._data(self.source, data)
+
+    def eof_received(self):
+        self.output._eof(self.source)
+
+    def connection_lost(self, exc):
+        self.output._eof(self.source)
+
+
+class SwitchingOutput:
+    """Sends one encoder's stream to the receivers and splices in the next one."""
+
+    def __init__(self, targets, clock=time.monotonic):
+        self.targets = targets
+        self.clock = clock
+        self.relay = None
+        self.loop = None
+        self.thread = None
+        self.active = None
+        self.next = None
+        self.count = 0
+        self.switches = []   # {"wait_ms", "cut"} per completed switch
+        self.failed_switches = 0
+        self.stopped = None  # asyncio.Event, set by close()
+        self.stamper = framestamp.FrameStamper() if config.FRAME_TIMESTAMPS else None
+        self._last_print = clock()
+
+    # --- Thread API ---
+
+    def start(self):
+        """Starts the output's event loop thread and connects to the receivers."""
+        started = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(started,), daemon=True)
+        self.thread.start()
+        started.wait()
+
+    def attach(self, process):
+        """Adds an encoder (Popen with stdout=PIPE). Returns its Source.
+
+        With nothing streaming it goes live at once; otherwise it replaces the
+        current encoder at its first IDR (source.live is set then).
+        """
+        self.count += 1
+        source = Source(f"encoder {self.count}", self.clock)
+        asyncio.run_coroutine_threadsafe(self._attach(source, process.stdout), self.loop).result()
+        return source
+
+    def wait_live(self, source, timeout=SWITCH_TIMEOUT):
+        """True once source is the one being sent (False if it failed or timed out)."""
+        return source.live.wait(timeout) and not source.failed
+
+    def close(self):
+        if self.loop:
+            asyncio.run_coroutine_threadsafe(self._close(), self.loop).result()
+            self.thread.join(timeout=5)
+
+    def sent_bytes(self):
+        """Bytes written to the (first) receiver on its current connection, for feedback."""
+        return self.relay.clients[0].connection_bytes if self.relay else 0
+
+    def stats(self):
+        return {
+            "clients": self.relay.stats() if self.relay else [],
+            "switches": len(self.switches),
+            "failed_switches": self.failed_switches,
+            "last_switch": self.switches[-1] if self.switches else None,
+        }
+
+    # --- Event loop ---
+
+    def _run(self, started):
+        async def main():
+            self.loop = asyncio.get_running_loop()
+            client_class = egress.EgressClient if config.EGRESS else relay.RelayClient
+            self.relay = relay.Relay(self.targets, clock=self.clock, client_class=client_class)
+            await self.relay.start()
+            self.stopped = asyncio.Event()
+            started.set()
+            while not self.stopped.is_set():
+                try:
+                    await asyncio.wait_for(self.stopped.wait(), TICK)
+                except asyncio.TimeoutError:
+                    self._tick()
+            await self.relay.close()
+
+        asyncio.run(main())
+
+    async def _attach(self, source, pipe):
+        source.transport, _ = await self.loop.connect_read_pipe(lambda: _PipeProtocol(self, source), pipe)
+        if self.active is None or self.active.closed:
+            self._go_live(source)
+            return
+        if self.next:
+            self._retire(self.next, failed=True)  # superseded by a newer change
+        self.next = source
+
+    async def _close(self):
+        for source in (self.active, self.next):
+            if source:
+                self._retire(source)
+        self.stopped.set()
+
+    def _data(self, source, data):
+        source.last_data = self.clock()
+        chunk = source.aligned(data)
+        if not chunk:
+            return
+        events = source.inspector.feed(chunk)  # aligned input: offsets are >= 0
+        if self.stamper:
+            chunk, events = self.stamper.stamp(chunk, events, source.capture_clock)
+        if source is self.active:
+            if self.next and self.next.ready and events:
+                # Cut where the old stream's next frame starts; everything before it is a whole frame.
+                cut = events[0][0]
+                if cut:
+                    self.relay.feed(chunk[:cut])
+                self._switch("frame")
+                return
+            self.relay.feed(chunk)
+        elif source is self.next:
+            source.held += chunk
+            if not source.ready and any(is_key for _, is_key in events):
+                source.ready = True
+                if self.active.closed:
+                    self._switch("eof")
+
+    def _eof(self, source):
+        if source.closed:
+            return
+        source.closed = True
+        if source is self.next:
+            self._retire(source, failed=True)
+            self.next = None
+        elif source is self.active and self.next and self.next.ready:
+            self._switch("eof")
+
+    def _tick(self):
+        now = self.clock()
+        if self.next:
+            if self.next.ready and now - self.active.last_data >= IDLE_CUT:
+                self._switch("idle")  # e.g. the frame gate is holding back an unchanged screen
+            elif not self.next.ready and now - self.next.added_at > SWITCH_TIMEOUT:
+                print("⚠️ Switchover: the new encoder produced no keyframe, keeping the old one.")
+                self._retire(self.next, failed=True)
+                self.next = None
+        if now - self._last_print >= config.STATS_INTERVAL:
+            self._last_print = now
+            if config.EGRESS:
+                print("📶 Egress:\n" + egress.format_stats(self.relay.clients))
+            elif config.RELAY_RECEIVERS:
+                print("📡 Relay:\n" + self.relay.format_stats())
+            if config.INSPECT_STREAM:
+                print("📊 Stream stats:\n" + self.relay.inspector.format_stats())
+
+    def _switch(self, cut):
+        old, new = self.active, self.next
+        self.next = None
+        self._retire(old)
+        self.switches.append({"wait_ms": round((self.clock() - new.added_at) * 1000, 1), "cut": cut})
+        self._go_live(new)
+
+    def _go_live(self, source):
+        self.active = source
+        if source.held:
+            self.relay.feed(bytes(source.held))
+            source.held = bytearray()
+        source.live.set()
+
+    def _retire(self, source, failed=False):
+        """Stops reading source (its encoder gets EPIPE if it is still writing)."""
+        if failed:
+            source.failed = True
+            self.failed_switches += 1
+            source.live.set()  # wakes wait_live()
+        if source.transport:
+            source.transport.close()
@@ -0,0 +1,158 @@
+"""
+OpenSecondDisplay - Encoder Telemetry
+Role: Networking & Performance Engineer
+
+Description:
+    Reads everything FFmpeg reports while it runs, on background threads, so
+    neither pipe can fill up and block the encoder:
+
+      -progress pipe  - key=value blocks every PROGRESS_PERIOD seconds, parsed
+                        into an EncoderStats snapshot (frame, fps, bitrate,
+                        speed, dup/drop counts, queue depth)
+      stderr          - kept as the last TELEMETRY_LOG_LINES lines in a ring
+                        buffer (error reports, encoder failure detection)
+
+    Each finished progress block replaces the snapshot with a new immutable
+    namedtuple, so snapshot() is a plain attribute read: the GUI and tools
+    can poll it as often as they like without locking.
+
+    started_at is when the process was attached, and output_opened_at when
+    FFmpeg printed "Stream mapping:" (all inputs and outputs are open, i.e.
+    the connection to the receiver is up).
+
+    queue_depth estimates how many frames the encoder is behind real time:
+    wall-clock time since the first report minus the stream time encoded
+    since then, in frames at the target FPS. A healthy encoder stays at 0-1;
+    a growing value means frames are piling up in front of it.
+"""
+
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+import config
+
+PROGRESS_PERIOD = 0.1  # seconds between -progress blocks
+
+EncoderStats = namedtuple("EncoderStats", [
+    "frame",         # frames encoded
+    "fps",           # encode rate reported by FFmpeg
+    "bitrate_kbps",  # output bitrate so far (None while FFmpeg reports N/A)
+    "total_size",    # bytes written
+    "out_time",      # seconds of stream encoded
+    "speed",         # encode speed vs real time (1.0 = keeping up)
+    "dup_frames",
+    "drop_frames",
+    "queue_depth",   # frames behind real time (estimate, see module docstring)
+    "state",         # "starting", "continue", "end"
+    "updated",       # clock() of the last report
+])
+
+EMPTY_STATS = EncoderStats(0, 0.0, None, 0, 0.0, None, 0, 0, 0, "starting", None)
+
+_INT_KEYS = {"frame": "frame", "total_size": "total_size", "dup_frames": "dup_frames", "drop_frames": "drop_frames"}
+
+
+def _parse_block(block, stats):
+    """Applies one -progress block (dict of strings) to stats."""
+    values = {}
+    for key, field in _INT_KEYS.items():
+        try:
+            values[field] = int(block[key])
+        except (KeyError, ValueError):
+            pass  # "N/A" while the encoder warms up
+    for key, field, suffix in (("fps", "fps", ""), ("speed", "speed", "x"), ("bitrate", "bitrate_kbps", "kbits/s")):
+        try:
+            values[field] = float(block[key].strip().removesuffix(suffix))
+        except (KeyError, ValueError):
+            pass
+    try:
+        values["out_time"] = int(block["out_time_us"]) / 1e6
+    except (KeyError, ValueError):
+        pass
+    values["state"] = block.get("progress", stats.state)
+    return stats._replace(**values)
+
+
+class Telemetry:
+    """Live stats and log tail of one FFmpeg process."""
+
+    def __init__(self, fps=None, log_lines=None, clock=time.monotonic):
+        self.fps = fps or config.FPS
+        self.clock = clock
+        self.log = deque(maxlen=log_lines or config.TELEMETRY_LOG_LINES)
+        self.stats = EMPTY_STATS
+        self.threads = []
+        self.started_at = None
+        self.output_opened_at = None
+        self._origin = None  # (clock, out_time) of the first report
+
+    def ffmpeg_args(self, progress_fd):
+        """Global options that send progress to progress_fd (and keep stats lines off stderr)."""
+        return ["-progress", f"pipe:{progress_fd}", "-stats_period", str(PROGRESS_PERIOD), "-nostats"]
+
+    def attach(self, process, progress_fd):
+        """Starts the reader threads for process; progress_fd is the read end of the -progress pipe."""
+        self.started_at = self.clock()
+        for target, arg in ((self._read_progress, progress_fd), (self._read_stderr, process.stderr)):
+            thread = threading.Thread(target=target, args=(arg,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    # --- Readers ---
+
+    def _read_progress(self, fd):
+        block = {}
+        with os.fdopen(fd, "rb") as stream:
+            for line in stream:
+                key, _, value = line.decode(errors="replace").strip().partition("=")
+                block[key] = value
+                if key == "progress":  # last key of every block
+                    self._publish(block)
+                    block = {}
+
+    def _publish(self, block):
+        stats = _parse_block(block, self.stats)
+        now = self.clock()
+        if self._origin is None:
+            self._origin = (now, stats.out_time)
+        started, out_time = self._origin
+        behind = (now - started) - (stats.out_time - out_time)
+        self.stats = stats._replace(queue_depth=max(0, round(behind * self.fps)), updated=now)
+
+    def _read_stderr(self, stream):
+        for line in stream:
+            line = line.decode(errors="replace").rstrip()
+            if self.output_opened_at is None and line.startswith("Stream mapping:"):
+                self.output_opened_at = self.clock()
+            self.log.append(line)
+
+    # --- API ---
+
+    def snapshot(self):
+        """Latest EncoderStats (never blocks)."""
+        return self.stats
+
+    def log_tail(self, count=None):
+        lines = list(self.log)
+        return lines[-count:] if count else lines
+
+    def wait(self, timeout=2.0):
+        """Waits for the readers to reach EOF (after the process exited)."""
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def stderr_text(self):
+        """The buffered stderr lines as one string (after wait(), complete up to the ring size)."""
+        return "\n".join(self.log)
+
+    def as_dict(self):
+        return dict(self.stats._asdict(), log_tail=self.log_tail(10))
+
+    def format_stats(self):
+        s = self.stats
+        bitrate = f"{s.bitrate_kbps / 1000:.2f} Mbps" if s.bitrate_kbps else "N/A"
+        speed = f"{s.speed:.2f}x" if s.speed is not None else "N/A"
+        return (f"frame={s.frame} fps={s.fps:.1f} {bitrate} speed={speed} "
+                f"dup={s.dup_frames} drop={s.drop_frames} queue={s.queue_depth}")
@@ -0,0 +1,92 @@
+"""
+OpenSecondDisplay - Transports
+Role: Networking & Performance Engineer
+
+Description:
+    Builds the FFmpeg/FFplay URLs (and tunes Python-owned sockets) for the
+    MPEG-TS transports both ends understand:
+
+      tcp  - reliable, TCP_NODELAY, bounded send / large receive buffers
+      udp  - raw MPEG-TS datagrams, pkt_size aligned to the MTU; lowest
+             latency, loss shows up as artifacts until the next IDR
+      srt  - UDP with retransmission inside a fixed latency window
+             (SRT_LATENCY_MS); recovers loss without TCP's head-of-line stalls
+
+    This file is kept identical in sender/ and receiver/ (deployment isolation,
+    see design/architecture.md).
+"""
+
+import socket
+
+TRANSPORTS = ("tcp", "udp", "srt")
+
+TS_PACKET_SIZE = 188
+IP_UDP_OVERHEAD = 28   # IPv4 (20) + UDP (8)
+SRT_OVERHEAD = 16      # SRT data packet header
+
+# Send side: keep the kernel queue short so a stall can't hide seconds of video in it.
+SEND_BUFFER_SIZE = 256 * 1024
+# Receive side: large enough to absorb Wi-Fi bursts while the decoder is busy.
+RECV_BUFFER_SIZE = 2 * 1024 * 1024
+
+
+def ts_payload_size(mtu, overhead=IP_UDP_OVERHEAD):
+    """Largest multiple of 188 bytes that fits in one datagram (1316 for a 1500 MTU)."""
+    return (mtu - overhead) // TS_PACKET_SIZE * TS_PACKET_SIZE
+
+
+def _query(options):
+    return "&".join(f"{key}={value}" if value is not None else key for key, value in options)
+
+
+def sender_url(transport, host, port, mtu=1500, srt_latency_ms=40):
+    """URL FFmpeg writes the MPEG-TS stream to."""
+    if transport == "tcp":
+        options = [("tcp_nodelay", 1), ("send_buffer_size", SEND_BUFFER_SIZE)]
+        return f"tcp://{host}:{port}?{_query(options)}"
+    if transport == "udp":
+        options = [("pkt_size", ts_payload_size(mtu)), ("buffer_size", SEND_BUFFER_SIZE)]
+        return f"udp://{host}:{port}?{_query(options)}"
+    if transport == "srt":
+        options = [
+            ("mode", "caller"),
+            ("transtype", "live"),
+            ("latency", srt_latency_ms * 1000),  # microseconds
+            ("pkt_size", ts_payload_size(mtu, IP_UDP_OVERHEAD + SRT_OVERHEAD)),
+        ]
+        return f"srt://{host}:{port}?{_query(options)}"
+    raise ValueError(f"Unknown transport: {transport}")
+
+
+def receiver_url(transport, bind_ip, port, mtu=1500, srt_latency_ms=40):
+    """URL FFplay/FFmpeg reads the MPEG-TS stream from (listening side)."""
+    if transport == "tcp":
+        options = [("listen", 1), ("tcp_nodelay", 1), ("recv_buffer_size", RECV_BUFFER_SIZE)]
+        return f"tcp://{bind_ip}:{port}?{_query(options)}"
+    if transport == "udp":
+        options = [
+            ("pkt_size", ts_payload_size(mtu)),
+            ("buffer_size", RECV_BUFFER_SIZE),
+            ("fifo_size", RECV_BUFFER_SIZE // TS_PACKET_SIZE),  # in 188-byte units
+            ("overrun_nonfatal", 1),
+        ]
+        return f"udp://{bind_ip}:{port}?{_query(options)}"
+    if transport == "srt":
+        options = [
+            ("mode", "listener"),
+            ("transtype", "live"),
+            ("latency", srt_latency_ms * 1000),
+            ("pkt_size", ts_payload_size(mtu, IP_UDP_OVERHEAD + SRT_OVERHEAD)),
+        ]
+        return f"srt://{bind_ip}:{port}?{_query(options)}"
+    raise ValueError(f"Unknown transport: {transport}")
+
+
+def tune_socket(sock, role):
+    """Applies the same tuning to a socket owned by Python. role: "send" or "recv"."""
+    if sock.type == socket.SOCK_STREAM:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if role == "send":
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER_SIZE)
+    else:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECV_BUFFER_SIZE)